@@ -10,6 +10,13 @@ from app.omegafold.routes import omegafold
 from app.dashboard.routes import dashboard
 from app.result.routes import result
 from app.download.routes import download
+from app.monitoring.routes import monitoring
+from app.events.routes import events
+from app.multifold.routes import multifold
+from app.shared.job_view import get_job_views
+from app.shared.gpu_capacity import get_gpu_monitors
+from app.shared.job_names import release_pending_job_names
+from app.shared.inflight import release_pending_inflight_claims
 
 def create_app():
     app = Flask(__name__)
@@ -29,5 +36,20 @@ def create_app():
     app.register_blueprint(dashboard, url_prefix="/api/flask/dashboard")
     app.register_blueprint(result, url_prefix="/api/flask/result")
     app.register_blueprint(download, url_prefix="/api/flask/download")
+    app.register_blueprint(monitoring, url_prefix="/api/flask/monitoring")
+    app.register_blueprint(events, url_prefix="/api/flask/events")
+    app.register_blueprint(multifold, url_prefix="/api/flask/multifold")
+
+    # Release the job names reserved by failed submissions
+    app.teardown_request(release_pending_job_names)
+    # Release the in-flight claims of jobs which were not submitted, their followers fail
+    app.teardown_request(release_pending_inflight_claims)
+
+    # Follow the jobs and pods from the start, so the pod timelines of all the jobs are recorded
+    if app.config.get("WATCH_JOBS"):
+        get_job_views()
+    # Follow the nodes and GPU pods from the start, so the first capacity checks see the GPUs
+    if app.config.get("GPU_CAPACITY_MONITOR"):
+        get_gpu_monitors()
 
     return app
\ No newline at end of file
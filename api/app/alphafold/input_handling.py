@@ -1,25 +1,8 @@
 from flask import jsonify
 
 from app.shared.input_validation import validate_job_name, validate_sequence, validate_date, validate_numeric_input, \
-    validate_email
-
-
-def split_sequence_input(sequence_input):
-    """Split the sequence input into individual sequences by '>' character."""
-    try:
-        sequences = sequence_input.split(">")
-    except AttributeError:
-        return None
-
-    formatted_sequences = []
-    for seq in sequences:
-        if seq == "":
-            continue
-        else:
-            seq = ">" + seq
-            formatted_sequences.append(seq)
-
-    return formatted_sequences
+    validate_email, validate_sequence_length
+from app.shared.fasta import split_sequence_input
 
 
 def validate_protein_input(sequence):
@@ -36,8 +19,8 @@ def validate_protein_input(sequence):
     return None
 
 
-def validate_alphafold2_input(data):
-    """Validate the input data."""
+def validate_alphafold2_input(data, check_sequence=True):
+    """Validate the input data, without the protein sequence input if check_sequence is False (batch uploads)."""
     if "jobName" not in data or "proteinSequence" not in data or "maxTemplateDate" not in data or "dbPreset" not in data or "modelPreset" not in data or "reuseMSAs" not in data or "predictionsPerModel" not in data or "runRelax" not in data or "makeResultsPublic" not in data or "email" not in data or "version" not in data:
         return jsonify({"error": "Missing required fields"}), 400
 
@@ -47,9 +30,16 @@ def validate_alphafold2_input(data):
     if data["modelPreset"] not in ["monomer", "monomer_casp14", "monomer_ptm", "multimer"]:
         return jsonify({"error": "Invalid Model Preset value"}), 400
 
-    validateProteinInputError = validate_protein_input(data["proteinSequence"])
-    if validateProteinInputError:
-        return validateProteinInputError
+    if check_sequence:
+        validateProteinInputError = validate_protein_input(data["proteinSequence"])
+        if validateProteinInputError:
+            return validateProteinInputError
+
+        # Monomer inputs are submitted as a job per sequence
+        sequenceLengthError = validate_sequence_length(data["proteinSequence"], "AlphaFold",
+                                                       per_record=data["modelPreset"] != "multimer")
+        if sequenceLengthError:
+            return sequenceLengthError
 
     if data["version"] not in ["Alphafold 2.2.0", "Alphafold 2.3.1"]:
         return jsonify({"error": "Invalid AlphaFold version"}), 400
@@ -78,4 +68,7 @@ def validate_alphafold2_input(data):
     if data["makeResultsPublic"] not in [False, True]:
         return jsonify({"error": "Invalid Make Results Public value"}), 400
 
+    if data.get("allowReuse", False) not in [False, True]:
+        return jsonify({"error": "Invalid Allow Reuse value"}), 400
+
     return None
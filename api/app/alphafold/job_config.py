@@ -34,8 +34,10 @@ def create_alphafold2_job_config(data, user):
         "predictionsPerModel": data["predictionsPerModel"],
         "runRelax": data["runRelax"],
         "makeResultsPublic": str(data["makeResultsPublic"]).lower(),
+        "allowReuse": str(data.get("allowReuse", False)).lower(),
         "email": data["email"],
         "service": "AlphaFold",
+        "submission": dict(data),
         "forceComputation": data["forceComputation"]
     }
     
@@ -93,6 +95,7 @@ def create_alphafold2_file_config(jobConfig):
         "predictions": jobConfig["predictionsPerModel"],
         "runrelax": jobConfig["runRelax"],
         "public": jobConfig["makeResultsPublic"],
+        "allowReuse": jobConfig["allowReuse"],
         "service": jobConfig["service"]
     }
     
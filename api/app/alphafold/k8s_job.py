@@ -1,6 +1,10 @@
 from kubernetes import client
 
 from app.shared.job_submitting import generate_salt
+from app.shared.images import resolve_image, get_image_pull_policy
+from app.shared.job_events import EVENT_FUNCTION_CMD, event_cmd, outcome_event_cmd, failure_mail_cmd, get_event_env
+from app.shared.msa_store import get_af2_msa_commands
+from app.shared.job_runner import RUNNER_CMD, job_runner_enabled, get_runner_config, get_runner_env
 from config import Config
 
 def set_db_paths(modelPreset, jobConfig):
@@ -15,10 +19,21 @@ def set_db_paths(modelPreset, jobConfig):
 
     return db_paths_cmd
 
-def construct_command(jobConfig, user):
+def construct_command(jobConfig, user, runner_config=None):
+    """Return the command of the job pod, its post-processing runs in the Python runner with the runner configuration."""
     output_dir = f'/mnt/output/{user}/{jobConfig["simplename"]}'
     db_paths_cmd = set_db_paths(jobConfig["modelPreset"], jobConfig)
     salt = generate_salt()
+    restore_msas_cmd, publish_msas_cmd, msas_restored = get_af2_msa_commands(jobConfig, output_dir)
+    if jobConfig.get("msaSource"):
+        # A clone uses the MSAs and template hits of the job it was cloned from, linked when the storage allows it
+        source_dir = f'/mnt/output/{user}/{jobConfig["msaSource"]}/msas'
+        restore_msas_cmd = (
+            f'{{ ( [ -d {source_dir} ] && mkdir -p {output_dir}/msas && '
+            f'( cp -rl {source_dir}/. {output_dir}/msas/ || cp -r {source_dir}/. {output_dir}/msas/ ) ) || true; }}'
+        )
+        msas_restored = True
+    use_precomputed_msas = True if msas_restored else jobConfig["reuseMSAs"]
 
     # Construct the command for running Alphafold and handling the output
     mkdir_cmd = f'mkdir -p {output_dir}'
@@ -38,7 +53,7 @@ def construct_command(jobConfig, user):
         f'{jobConfig["reduced"]} '
         f'--model_preset={jobConfig["modelPreset"]} '
         f'--benchmark=False '
-        f'--use_precomputed_msas={jobConfig["reuseMSAs"]} '
+        f'--use_precomputed_msas={use_precomputed_msas} '
         f'--num_multimer_predictions_per_model={jobConfig["predictionsPerModel"]} '
         f'--run_relax={jobConfig["runRelax"]} '
         f'--use_gpu_relax=True '
@@ -54,9 +69,10 @@ def construct_command(jobConfig, user):
         f'zip -0 -r {jobConfig["simplename"]}.zip {jobConfig["simplename"]}; '
         f'mv {jobConfig["simplename"]}.zip {jobConfig["simplename"]}/download-{salt}.zip'
     )
+    inference_event_cmd = outcome_event_cmd(f'[ -s "{output_dir}/ranking_debug.json" ]')
     create_done_file_cmd = (
         f'if [ -s "{output_dir}/ranking_debug.json" ] ; '
-        f'then touch "{output_dir}/alphafold.done"; fi'
+        f'then touch "{output_dir}/alphafold.done"; {event_cmd("archived")}; fi'
     )
     email_notification_cmd = (
         f'if [ ! -z "{jobConfig["email"]}" ]; '
@@ -68,25 +84,38 @@ def construct_command(jobConfig, user):
         f'"To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\n'
         f'Subject:Alphafold computation has failed\n\n'
         f'Your alphafold computation \"{jobConfig["simplename"]}\" has failed.\n" '
-        f'| cat - {output_dir}/stdout | ssmtp -t; exit 1; '
+        f'| cat - {output_dir}/stdout | {failure_mail_cmd(output_dir)}; exit 1; '
         f' fi; fi'
     )
-    command = " && ".join([mkdir_cmd, alphafold_cmd, public_symlink_cmd, compression_cmd, create_done_file_cmd, email_notification_cmd])
+    if runner_config:
+        commands = [EVENT_FUNCTION_CMD, mkdir_cmd, restore_msas_cmd, event_cmd("started"), alphafold_cmd,
+                    inference_event_cmd, publish_msas_cmd, RUNNER_CMD]
+    else:
+        commands = [EVENT_FUNCTION_CMD, mkdir_cmd, restore_msas_cmd, event_cmd("started"), alphafold_cmd,
+                    inference_event_cmd, publish_msas_cmd, public_symlink_cmd, compression_cmd, create_done_file_cmd,
+                    email_notification_cmd]
+    command = " && ".join([cmd for cmd in commands if cmd])
 
     return command
 
-def create_alphafold2_k8s_config(jobConfig, user):
-    """Create the Kubernetes job object."""
+def create_alphafold2_k8s_config(jobConfig, user, target):
+    """Create the Kubernetes job object for the chosen target."""
 
     # Construct the command for running Alphafold and handling the output
-    arguments = construct_command(jobConfig, user)
+    runner_config = None
+    if job_runner_enabled():
+        runner_config = get_runner_config(user, jobConfig["simplename"], jobConfig["simplename"], "AlphaFold", "alphafold.done",
+                                          "ranking_debug.json", jobConfig["makeResultsPublic"] == "true", jobConfig["email"],
+                                          generate_salt())
+    arguments = construct_command(jobConfig, user, runner_config)
+    image = resolve_image(Config.ALPHAFOLD_IMAGE_V2)
 
     job = client.V1Job(
         api_version="batch/v1",
         kind="Job",
         metadata=client.V1ObjectMeta(
             name=jobConfig["uniquename"],
-            annotations={"user": user, "simplename": jobConfig["simplename"], "public": jobConfig["makeResultsPublic"]}),
+            annotations={"user": user, "simplename": jobConfig["simplename"], "public": jobConfig["makeResultsPublic"], "target": target["name"], "service": jobConfig["service"]}),
         spec=client.V1JobSpec(
             ttl_seconds_after_finished=100,
             backoff_limit=0,
@@ -101,13 +130,15 @@ def create_alphafold2_k8s_config(jobConfig, user):
                     containers=[
                         client.V1Container(
                             name=jobConfig["uniquename"],
-                            image=Config.ALPHAFOLD_IMAGE_V2,
-                            image_pull_policy="IfNotPresent",
+                            image=image,
+                            image_pull_policy=get_image_pull_policy(image),
                             command=["bash"],
                             args=["-c", 
                                   arguments],
                             env=[client.V1EnvVar(name="TF_FORCE_UNIFIED_MEMORY", value="1"), 
-                                 client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")],
+                                 client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")]
+                                + get_event_env(target, user, jobConfig["simplename"], jobConfig["uniquename"])
+                                + (get_runner_env(runner_config) if runner_config else []),
                             security_context=client.V1SecurityContext(
                                 run_as_user=1000,
                                 run_as_group=1000,
@@ -125,10 +156,10 @@ def create_alphafold2_k8s_config(jobConfig, user):
                                             ],
                         )
                     ],
-                    volumes=[client.V1Volume(name="vol-1", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_VOL1_ALPHAFOLD)),
-                             client.V1Volume(name="vol-2", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_VOL2)),
+                    volumes=[client.V1Volume(name="vol-1", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=target["pvcs"]["PVC_VOL1_ALPHAFOLD"])),
+                             client.V1Volume(name="vol-2", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=target["pvcs"]["PVC_VOL2"])),
                              client.V1Volume(name="dshm", empty_dir=client.V1EmptyDirVolumeSource(medium="Memory", size_limit="1Gi")),
-                             client.V1Volume(name="storage", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_STORAGE))
+                             client.V1Volume(name="storage", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=target["pvcs"]["PVC_STORAGE"]))
                              ],
                 )
             )
@@ -1,9 +1,14 @@
-from flask import jsonify, request, Blueprint
+import json
+from flask import jsonify, request, Blueprint, Response, stream_with_context
 from app.wrappers import token_required
 from kubernetes import client
 
 from app.alphafold.utilities import deploy_alphafold2_job
 from app.alphafold.input_handling import validate_alphafold2_input, split_sequence_input
+from app.shared.fasta import iter_fasta_records, format_fasta_record
+from app.shared.input_validation import validate_job_name, validate_sequence, validate_sequence_length
+from app.shared.job_submitting import get_response_error
+from config import Config
 
 import logging
 
@@ -15,8 +20,16 @@ alphafold = Blueprint('alphafold', __name__)
 @token_required
 def submit_job(current_user):
     """Submit a new AlphaFold job to the Kubernetes cluster."""
+    return submit_alphafold2_job(request.json, current_user)
+
+
+def submit_alphafold2_job(data, user, msa_source=None, sequence_hash=None):
+    """
+    Validate and submit the AlphaFold 2 jobs of the user, one per monomer sequence, returns the response.
+    With msa_source, the job uses the MSAs of that job of the user instead of searching (clones).
+    With sequence_hash, the canonical hash of the sequence computed by the caller is not computed again.
+    """
     try:
-        data = request.json
         jobName = data["jobName"]
 
         # Validate the request data, excluding protein sequence input
@@ -28,7 +41,7 @@ def submit_job(current_user):
         if data["modelPreset"] == "multimer":
             """ Enter single mode for multimer sequence """
             submitted_jobs = 1
-            jobDeploymentError = deploy_alphafold2_job(data, current_user)
+            jobDeploymentError = deploy_alphafold2_job(data, user, msa_source, sequence_hash)
             if jobDeploymentError:
                 return jobDeploymentError
         else:
@@ -41,7 +54,9 @@ def submit_job(current_user):
                 if len(sequences) > 1:
                     data["jobName"] = f"{jobName}-batch-{submitted_jobs}"
 
-                jobDeploymentError = deploy_alphafold2_job(data, current_user)
+                # Every sequence of a batch has its own hash
+                jobDeploymentError = deploy_alphafold2_job(data, user, msa_source,
+                                                           sequence_hash if len(sequences) == 1 else None)
                 if jobDeploymentError:
                     return jobDeploymentError
 
@@ -55,3 +70,78 @@ def submit_job(current_user):
         return jsonify({"error": f"File operation failed: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
+def submit_batch_record(data, current_user):
+    """Validate and submit one record of a batch upload, returns the error message or None."""
+    for validation_error in [validate_job_name(data["jobName"]), validate_sequence(data["proteinSequence"]),
+                             validate_sequence_length(data["proteinSequence"], "AlphaFold")]:
+        if validation_error:
+            return get_response_error(validation_error)
+
+    try:
+        jobDeploymentError = deploy_alphafold2_job(data, current_user)
+    except client.exceptions.ApiException as e:
+        return f"Kubernetes API error: {e.reason}"
+    except Exception as e:
+        logging.error(f"Error submitting batch job {data['jobName']}: {e}")
+        return f"An unexpected error occurred: {str(e)}"
+
+    if jobDeploymentError:
+        return get_response_error(jobDeploymentError)
+    return None
+
+
+@alphafold.route("/submit/batch", methods=["POST"])
+@token_required
+def submit_batch(current_user):
+    """
+    Submit an AlphaFold job for every record of an uploaded multi-FASTA file (monomer model presets).
+
+    The file is parsed and submitted one record at a time, the result of every record is streamed back
+    as a line of NDJSON, followed by a summary line.
+    """
+    try:
+        data = json.loads(request.form["data"])
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid batch settings: {str(e)}"}), 400
+
+    fasta_file = request.files.get("fastaFile")
+    if not fasta_file:
+        return jsonify({"error": "No FASTA file provided."}), 400
+
+    # The sequences are validated record by record
+    data["proteinSequence"] = ""
+    validation_error = validate_alphafold2_input(data, check_sequence=False)
+    if validation_error:
+        return validation_error
+
+    if data["modelPreset"] == "multimer":
+        return jsonify({"error": "Batch submission is only available for the monomer model presets."}), 400
+
+    jobName = data["jobName"]
+    max_records = getattr(Config, "MAX_BATCH_RECORDS", 1000)
+
+    def submit_records():
+        submitted_jobs, failed_jobs = 0, 0
+        for number, (header, sequence) in enumerate(iter_fasta_records(fasta_file.stream), start=1):
+            if number > max_records:
+                yield json.dumps({"record": number, "error": f"Batch submissions are limited to {max_records} records, the remaining records were not submitted."}) + "\n"
+                break
+
+            record = dict(data, jobName=f"{jobName}-batch-{number}",
+                          proteinSequence=format_fasta_record(header, sequence) if header is not None else sequence)
+            error = submit_batch_record(record, current_user)
+            if error:
+                failed_jobs += 1
+                yield json.dumps({"record": number, "header": header, "jobName": record["jobName"], "error": error}) + "\n"
+            else:
+                submitted_jobs += 1
+                yield json.dumps({"record": number, "header": header, "jobName": record["jobName"], "status": "submitted"}) + "\n"
+
+        logging.info(f"Batch {jobName} of user {current_user}: {submitted_jobs} jobs submitted, {failed_jobs} failed.")
+        yield json.dumps({"jobName": jobName, "submitted": submitted_jobs, "failed": failed_jobs}) + "\n"
+
+    # Proxies must not buffer the streamed results
+    return Response(stream_with_context(submit_records()), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
@@ -1,21 +1,28 @@
 import logging
+from flask import jsonify
 
-from app.shared.common import NAMESPACE
-from app.shared.kubernetes import connect_to_k8s
+from app.shared.kubernetes import get_batch_api
+from app.shared.placement import select_target, ALPHAFOLD_PVCS
 
 from app.shared.job_submitting import check_job_uniqueness, create_k8s_job, create_input_files
+from app.shared.result_cache import find_cached_result, link_cached_result
+from app.shared.inflight import claim_inflight_job, follow_inflight_job
 from app.alphafold.job_config import create_alphafold2_job_config, create_alphafold2_file_config
 from app.alphafold.k8s_job import create_alphafold2_k8s_config
 
-# Connect to kubernetes cluster
-batchApi = connect_to_k8s()
 
-
-def deploy_alphafold2_job(data, user):
-    """Deploy the computation to the Kubernetes cluster."""
+def deploy_alphafold2_job(data, user, msa_source=None, sequence_hash=None):
+    """
+    Deploy the computation to the Kubernetes cluster, with the MSAs of the msa_source job of the user if given
+    and the canonical hash of the sequence if the caller computed it.
+    """
 
     # Create job configuration from the request data
     jobConfig = create_alphafold2_job_config(data, user)
+    if msa_source:
+        jobConfig["msaSource"] = msa_source
+    if sequence_hash:
+        jobConfig["sequenceHash"] = sequence_hash
 
     # Create file configuration
     fileConfig = create_alphafold2_file_config(jobConfig)
@@ -26,11 +33,34 @@ def deploy_alphafold2_job(data, user):
         return job_uniqueness_error
     logging.info("Job uniqueness checked")
 
+    # Reuse the result of an identical finished job instead of computing it again
+    cached_result = find_cached_result(jobConfig, fileConfig, user)
+    if cached_result:
+        input_files_error = create_input_files(jobConfig, fileConfig, user)
+        if input_files_error:
+            return input_files_error
+        link_cached_result(cached_result, jobConfig, user)
+        return None
+
+    # Wait for the result of an identical job being computed instead of computing it again
+    leader = claim_inflight_job(jobConfig, fileConfig, user)
+    if leader:
+        input_files_error = create_input_files(jobConfig, fileConfig, user)
+        if input_files_error:
+            return input_files_error
+        follow_inflight_job(leader, jobConfig, user)
+        return None
+
+    # Choose the Kubernetes target for the job
+    target = select_target(ALPHAFOLD_PVCS)
+    if target is None:
+        return jsonify({"error": "No Kubernetes cluster is available for this tool."}), 503
+
     # Create Kubernetes Job Object
-    job = create_alphafold2_k8s_config(jobConfig, user)
+    job = create_alphafold2_k8s_config(jobConfig, user, target)
 
     # Submit Job to Kubernetes Cluster
-    create_k8s_job(batchApi, NAMESPACE, job)
+    create_k8s_job(get_batch_api(target), target["namespace"], job)
 
     # Create Input Files
     input_files_error = create_input_files(jobConfig, fileConfig, user)
@@ -0,0 +1,140 @@
+import json
+import re
+
+from app.shared.uploads import UPLOAD_CHUNK_SIZE
+
+# Characters changing the structure of the JSON document outside of strings
+STRUCTURAL_RE = re.compile(rb'["{}\[\],:]')
+# Characters ending or escaping inside of strings, everything else is copied without being looked at
+STRING_SPECIAL_RE = re.compile(rb'["\\]')
+# Longest key of the job object collected to be compared, longer keys are not AlphaFold 3 fields
+MAX_KEY_LENGTH = 256
+UNSUPPORTED_FORMAT = "The uploaded JSON file is not in a supported format. Please upload a JSON object or a list containing a single job."
+
+
+def rewrite_job_name(src, dst, name, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Copy the AlphaFold 3 JSON input from the src to the dst binary stream with the "name" of the job replaced.
+
+    The input is scanned chunk by chunk: strings below the job object, e.g. the MSAs and templates, are skipped
+    by a regular expression search and copied as they are, so the document is never held in memory and keeps
+    its original encoding. Only the top-level structure is validated: a job object, or a list with a single
+    job object (AlphaFold Server format), containing "sequences". Raises ValueError if the input is invalid.
+    """
+    replacement = json.dumps(name).encode()
+
+    top = None  # Opening character of the document
+    job_depth = None  # Depth of the job object
+    jobs = 0
+    depth = 0
+    in_string = escape = False
+    expect_key = False  # The next string of the job object is a key
+    key = None  # Key of the job object being collected
+    last_key = None
+    keys = set()
+    skipping = False  # Inside of the replaced name value
+
+    def check_outside(segment):
+        """Only whitespace is allowed around the document and between the jobs of the list."""
+        if segment.strip() and (depth == 0 or (top == b"[" and depth == 1)):
+            raise ValueError(UNSUPPORTED_FORMAT)
+
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+
+        pos = 0
+        out = 0  # Start of the part of the chunk not written yet
+        while pos < len(chunk):
+            if in_string:
+                if escape:
+                    escape = False
+                    if key is not None:
+                        key += chunk[pos:pos + 1]
+                    pos += 1
+                    continue
+
+                match = STRING_SPECIAL_RE.search(chunk, pos)
+                end = match.start() if match else len(chunk)
+                if key is not None:
+                    key += chunk[pos:end]
+                    if len(key) > MAX_KEY_LENGTH:
+                        key = None
+                if not match:
+                    pos = len(chunk)
+                    break
+
+                if match.group() == b"\\":
+                    escape = True
+                    if key is not None:
+                        key += b"\\"
+                else:
+                    in_string = False
+                    if expect_key and depth == job_depth:
+                        last_key = json.loads(b'"' + key + b'"') if key is not None else None
+                        keys.add(last_key)
+                    key = None
+                pos = match.end()
+                continue
+
+            match = STRUCTURAL_RE.search(chunk, pos)
+            check_outside(chunk[pos:match.start() if match else len(chunk)])
+            if not match:
+                pos = len(chunk)
+                break
+
+            char, at = match.group(), match.start()
+            if char == b'"':
+                check_outside(char)
+                in_string = True
+                if expect_key and depth == job_depth:
+                    key = b""
+            elif char in (b"{", b"["):
+                if depth == 0:
+                    if top is not None:
+                        raise ValueError("The uploaded JSON file contains data after the job.")
+                    top = char
+                    job_depth = 1 if char == b"{" else 2
+                elif top == b"[" and depth == 1:
+                    if char != b"{":
+                        raise ValueError(UNSUPPORTED_FORMAT)
+                    jobs += 1
+                    if jobs > 1:
+                        raise ValueError("The uploaded JSON file contains multiple jobs. Please submit each job separately.")
+                depth += 1
+                if depth == job_depth:
+                    expect_key, keys = True, set()
+            elif char in (b"}", b"]"):
+                if depth == 0:
+                    raise ValueError(UNSUPPORTED_FORMAT)
+                if depth == job_depth:
+                    if skipping:
+                        skipping, out = False, at
+                    if "sequences" not in keys:
+                        raise ValueError("The uploaded JSON file does not contain any sequences.")
+                    if "name" not in keys:
+                        dst.write(chunk[out:at])
+                        dst.write(b',"name":' + replacement if keys else b'"name":' + replacement)
+                        out = at
+                depth -= 1
+            elif char == b":" and depth == job_depth:
+                expect_key = False
+                if last_key == "name":
+                    dst.write(chunk[out:match.end()] + replacement)
+                    skipping = True
+            elif char == b"," and depth == job_depth:
+                expect_key = True
+                if skipping:
+                    skipping, out = False, at
+            pos = match.end()
+
+        if not skipping:
+            dst.write(chunk[out:])
+
+    if top is None or depth != 0 or in_string:
+        raise ValueError("The uploaded JSON file is incomplete.")
+    if top == b"[" and jobs == 0:
+        raise ValueError("The uploaded JSON file does not contain any job.")
@@ -6,6 +6,7 @@ from pydantic import ValidationError
 
 from app.alphafold3.validation import Job
 from app.alphafold3.v1_submission import save_input_config, run_alphafold3_prediction, save_json_input, save_ccd_file
+from app.shared.uploads import create_upload, get_upload, write_upload_chunk, remove_upload, UPLOAD_CHUNK_SIZE
 import logging
 
 
@@ -18,16 +19,23 @@ def submit_af3_job(current_user):
     """ Submit an AlphaFold3 job using advanced configuration."""
     try:
         data = json.loads(request.form["data"])
+    except Exception as e:
+        logging.error(f"Error occurred while submitting AlphaFold3 job: {e}")
+        return jsonify({"error": str(e)}), 400
+
+    return submit_alphafold3_job(data, current_user, request.files.get("userCCDFile"))
+
+
+def submit_alphafold3_job(data, user, userCCDFile=None):
+    """Validate and submit the AlphaFold3 job of the user, returns the response."""
+    try:
         validated_data = Job(**data)
         ## Turn the validated data into a json
         validated_data = validated_data.model_dump(exclude_none=True)
         
         # Save the CCD file if provided
         if "userCCDPath" in validated_data and validated_data["userCCDPath"]:
-
-            userCCDFile = request.files.get("userCCDFile")
-   
-            save_ccd = save_ccd_file(userCCDFile, data['name'], current_user)
+            save_ccd = save_ccd_file(userCCDFile, data['name'], user, data.get("userCCDUploadId"))
             if save_ccd:
                 logging.error(f"Error saving CCD file: {save_ccd}")
                 return save_ccd
@@ -36,12 +44,12 @@ def submit_af3_job(current_user):
             validated_data["userCCDPath"] = f"{data['name']}-ccd.cif"
 
         # Save the JSON configuration
-        save_input = save_input_config(validated_data, current_user)
+        save_input = save_input_config(validated_data, user)
         if save_input:
             return save_input
       
         # Run the AlphaFold3 prediction
-        prediction_message = run_alphafold3_prediction(data, current_user)
+        prediction_message = run_alphafold3_prediction(data, user)
         return prediction_message
     
     except ValidationError as e:
@@ -59,7 +67,7 @@ def submit_af3_job_json(current_user):
         computation_config = json.loads(request.form["data"])
         json_file = request.files.get("jsonFile")
 
-        save_json = save_json_input(json_file, computation_config, current_user)
+        save_json = save_json_input(json_file, computation_config, current_user, computation_config.get("jsonUploadId"))
         if save_json:
             return save_json
         
@@ -69,4 +77,46 @@ def submit_af3_job_json(current_user):
             
     except Exception as e:
         logging.error(f"Error occurred while submitting AlphaFold3 job with JSON: {e}")
-        return jsonify({"error": f"JSON file error occurred: {str(e)}"}), 400
\ No newline at end of file
+        return jsonify({"error": f"JSON file error occurred: {str(e)}"}), 400
+
+@alphafold3.route('/v1/upload', methods=["POST"])
+@token_required
+def start_upload(current_user):
+    """Start a resumable chunked upload of a CCD or JSON input file, sent by PUT requests before the job is submitted."""
+    data = request.get_json(silent=True) or {}
+    upload_id, error = create_upload(current_user, data.get("kind"), data.get("size"), data.get("sha256"))
+    if error:
+        return error
+    return jsonify({"uploadId": upload_id, "received": 0, "chunkSize": UPLOAD_CHUNK_SIZE}), 201
+
+@alphafold3.route('/v1/upload/<upload_id>', methods=["GET"])
+@token_required
+def get_upload_status(current_user, upload_id):
+    """Return the number of bytes received, where an interrupted upload resumes."""
+    upload = get_upload(current_user, upload_id)
+    if upload is None:
+        return jsonify({"error": "Upload not found."}), 404
+    return jsonify({"uploadId": upload_id, "received": upload["received"], "size": upload["size"]}), 200
+
+@alphafold3.route('/v1/upload/<upload_id>', methods=["PUT"])
+@token_required
+def put_upload_chunk(current_user, upload_id):
+    """Append the raw request body to the upload at the offset given by the Upload-Offset header."""
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"error": "Missing or invalid Upload-Offset header."}), 400
+
+    received, error = write_upload_chunk(current_user, upload_id, offset, request.stream)
+    if error:
+        return error
+    return jsonify({"uploadId": upload_id, "received": received}), 200
+
+@alphafold3.route('/v1/upload/<upload_id>', methods=["DELETE"])
+@token_required
+def cancel_upload(current_user, upload_id):
+    """Cancel the upload and remove its data."""
+    if get_upload(current_user, upload_id) is None:
+        return jsonify({"error": "Upload not found."}), 404
+    remove_upload(current_user, upload_id)
+    return jsonify({"message": "Upload cancelled."}), 200
@@ -2,21 +2,33 @@ import shutil
 from flask import jsonify
 import json
 import os
+import tempfile
 import random
 import string
 from app.shared.common import get_input_path, get_working_directory, get_output_path
-from app.shared.common import NAMESPACE
 from kubernetes import client
-from app.shared.kubernetes import connect_to_k8s
+from app.shared.kubernetes import get_batch_api
+from app.shared.placement import select_target, ALPHAFOLD3_PVCS
 from app.shared.job_submitting import create_k8s_job
+from app.shared.images import resolve_image, get_image_pull_policy
+from app.shared.job_events import EVENT_FUNCTION_CMD, event_cmd, outcome_event_cmd, failure_mail_cmd, get_event_env
+from app.shared.msa_store import (AF3_MSA_PUBLISH_SCRIPT, msa_store_enabled, use_stored_af3_msas,
+                                  get_af3_msa_publish_command)
 from config import Config
-from app.shared.job_submitting import check_same_job_name
+from app.shared.job_names import reserve_job_name, commit_job_name
+from app.alphafold3.json_input import rewrite_job_name
+from app.shared.uploads import complete_upload, commit_upload, remove_upload, save_stream_atomic
+from app.shared.submissions import save_job_submission
+from app.shared.blob_store import write_input_file, save_input_file
+from app.shared.job_runner import RUNNER_CMD, job_runner_enabled, get_runner_config, get_runner_env
 import shutil
 from config import Config
 
 import logging
 
-batchApi = connect_to_k8s()
+# Settings of the computation which are not part of the AlphaFold 3 input JSON
+COMPUTATION_SETTINGS = ["email", "public", "largeInput", "forceComputation", "precomputedMSA", "precomputedTemplates",
+                        "numberOfTemplates"]
 
 def clean_input_data(data):
     """Remove unnecessary data from the input JSON."""
@@ -62,11 +74,15 @@ def save_input_config(data, user):
     if not os.path.exists(path):
         logging.info(f"Creating directory for new user: {path}")
         os.makedirs(path)
-    
-    if os.path.exists(json_path):
-        if data["forceComputation"] is False:
+
+    # Reserve the name, concurrent submissions of the same name cannot both pass the check
+    reservation, exists = reserve_job_name(data["name"], user, data["forceComputation"], public=data["public"] is True)
+    if reservation is None:
+        if exists:
             return jsonify({"error": "Job with this name already exists. Please choose a different name."}), 400
-        
+        return jsonify({"error": "A job with this name is being submitted right now. Please choose a different name."}), 409
+
+    if os.path.exists(json_path):
         try:
             # Remove the public symlink if it exists
             for path in (public_json_path, public_output_path):
@@ -84,10 +100,10 @@ def save_input_config(data, user):
     # clean up the input data
     prediction_input = clean_input_data(data)
     try:
-        with open(json_path, "w") as json_file:
-            json_file.write(json.dumps(prediction_input, indent=4))
+        write_input_file(json_path, json.dumps(prediction_input, indent=4))
     except Exception as e:
         return jsonify({"error": f"Error saving input file: {e}"}), 400
+    commit_job_name(data["name"], user, reservation)
     
     if data["public"]:
         public_json_path = get_input_path(data["name"], "json", "public")
@@ -101,19 +117,26 @@ def save_input_config(data, user):
     
     return None
             
-def create_job_object(data, user):
-    """Create a Kubernetes job object from the input data."""
+def create_job_object(data, user, target, stored_msas=False):
+    """
+    Create a Kubernetes job object from the input data for the chosen target.
+
+    With stored_msas, all the protein chains of the input JSON have their MSAs from the MSA store
+    and the MMseqs2 step is skipped.
+    """
 
     salt=''.join(random.choice(string.ascii_letters + string.digits) for i in range(64))
     output_dir = f"/mnt/output/{user}/{data['name']}"
     input_json = f"/mnt/input/{user}/{data['name']}.json"
     stdout_log = f"{output_dir}/stdout"
-    use_precomputed = data.get("precomputedMSA") or "precomputedTemplates" in data
+    use_precomputed = (data.get("precomputedMSA") or "precomputedTemplates" in data) and not stored_msas
     sanitised_name = data["name"].lower()
 
     mkdir_cmd = f"mkdir -p {output_dir}"
     if use_precomputed:
+        # The MMseqs2 step rewrites the input JSON in place, it gets its own copy first as jobs share identical inputs
         mmseqs2_cmd = (
+            f"cp {input_json} {input_json}.tmp && mv -f {input_json}.tmp {input_json} && "
             f"python af3_mmseqs_scripts/add_mmseqs_msa.py "
             f"--input_json {input_json} --output_json {input_json}"
         )
@@ -136,9 +159,11 @@ def create_job_object(data, user):
         f'zip -0 -r {data["name"]}.zip {data["name"]}; '
         f'mv {data["name"]}.zip {data["name"]}/download-{salt}.zip'
     )
+    publish_msas_cmd = get_af3_msa_publish_command(data, output_dir)
+    inference_event_cmd = outcome_event_cmd(f'[ -s "{output_dir}/{sanitised_name}/{sanitised_name}_ranking_scores.csv" ]')
     create_done_file_cmd = (
         f'if [ -s "{output_dir}/{sanitised_name}/{sanitised_name}_ranking_scores.csv" ] ; '
-        f'then touch "{output_dir}/alphafold3.done"; fi'
+        f'then touch "{output_dir}/alphafold3.done"; {event_cmd("archived")}; fi'
     )
     email_notification_cmd = (
         f'if [ ! -z "{data["email"]}" ]; '
@@ -151,28 +176,47 @@ def create_job_object(data, user):
         f'"To:{data["email"]}\nFrom:{Config.EMAIL_FROM}\n'
         f'Subject:AlphaFold 3 computation has failed\n\n'
         f'Your AlphaFold 3 computation \"{data["name"]}\" has failed.\n" '
-        f'| cat - /mnt/output/{user}/{data["name"]}/stdout | ssmtp -t; exit 1; '
+        f'| cat - {output_dir}/stdout | {failure_mail_cmd(output_dir)}; exit 1; '
         f' fi; fi'
     )
     
+    # The post-processing runs in the Python runner of the job pod when it is enabled
+    runner_config = None
+    if job_runner_enabled():
+        runner_config = get_runner_config(user, data["name"], data["name"], "AlphaFold 3", "alphafold3.done",
+                                          f"{sanitised_name}/{sanitised_name}_ranking_scores.csv", data["public"] is True,
+                                          data["email"], salt)
+        public_symlink_cmd, compression_cmd, create_done_file_cmd, email_notification_cmd = RUNNER_CMD, "", "", ""
+
     if mmseqs2_cmd != "":
-        af3Args = " && ".join([mkdir_cmd, mmseqs2_cmd, run_cmd, public_symlink_cmd, compression_cmd, create_done_file_cmd, email_notification_cmd])
+        af3Commands = [EVENT_FUNCTION_CMD, mkdir_cmd, event_cmd("started"), mmseqs2_cmd, event_cmd("msa_done"), run_cmd, inference_event_cmd, publish_msas_cmd, public_symlink_cmd, compression_cmd, create_done_file_cmd, email_notification_cmd]
     else:
-        af3Args = " && ".join([mkdir_cmd, run_cmd, public_symlink_cmd, compression_cmd, create_done_file_cmd, email_notification_cmd])
+        af3Commands = [EVENT_FUNCTION_CMD, mkdir_cmd, event_cmd("started"), run_cmd, inference_event_cmd, publish_msas_cmd, public_symlink_cmd, compression_cmd, create_done_file_cmd, email_notification_cmd]
+    af3Args = " && ".join([cmd for cmd in af3Commands if cmd])
 
     # Unique job name with random lowercase letters
     unique_job_name = data["name"] + "-" + ''.join(random.choice(string.ascii_lowercase) for _ in range(5))
     unique_job_name = unique_job_name.lower()
 
+    pvcs = target["pvcs"]
+    image = resolve_image(Config.ALPHAFOLD3_IMAGE)
+
         # Environment variables for separate cpu and gpu computation
     env_vars = [
         client.V1EnvVar(name="RUN_K8S_JOBS", value="1"),
-        client.V1EnvVar(name="K8S_NAMESPACE", value=NAMESPACE),
+        client.V1EnvVar(name="K8S_NAMESPACE", value=target["namespace"]),
         client.V1EnvVar(name="K8S_SERVICE_ACCOUNT", value="alphafold-jobs"),
-        client.V1EnvVar(name="K8S_IMAGE", value=Config.ALPHAFOLD3_IMAGE),
-        client.V1EnvVar(name="K8S_PVC_MOUNTS", value=f"{Config.PVC_VOL1_ALPHAFOLD3}:/data,{Config.PVC_VOL2}:/mnt,{Config.PVC_TMP}:/tmp"),
+        client.V1EnvVar(name="K8S_IMAGE", value=image),
+        client.V1EnvVar(name="K8S_PVC_MOUNTS", value=f"{pvcs['PVC_VOL1_ALPHAFOLD3']}:/data,{pvcs['PVC_VOL2']}:/mnt,{pvcs['PVC_TMP']}:/tmp"),
         client.V1EnvVar(name="K8S_JOB_NAME", value=unique_job_name),
-    ]
+    ] + get_event_env(target, user, data["name"], unique_job_name)
+
+    if runner_config:
+        env_vars += get_runner_env(runner_config)
+
+    # Script publishing the MSAs of the job to the MSA store
+    if msa_store_enabled():
+        env_vars.append(client.V1EnvVar(name="FOLDIFY_MSA_SCRIPT", value=AF3_MSA_PUBLISH_SCRIPT))
 
         # Environment variables for unified memory computation
     if data["largeInput"]:
@@ -186,7 +230,7 @@ def create_job_object(data, user):
         api_version="batch/v1",
         kind="Job",
         metadata=client.V1ObjectMeta(
-            annotations={"user": user, "simplename": data["name"], "public": str(data["public"])},
+            annotations={"user": user, "simplename": data["name"], "public": str(data["public"]), "target": target["name"], "service": "AlphaFold3"},
             name=unique_job_name,
             labels={"job-name": unique_job_name}),
         spec=client.V1JobSpec(
@@ -205,8 +249,8 @@ def create_job_object(data, user):
                     ),
                     containers=[
                         client.V1Container(
-                            image=Config.ALPHAFOLD3_IMAGE,
-                            image_pull_policy="Always",
+                            image=image,
+                            image_pull_policy=get_image_pull_policy(image, "Always"),
                             name="alphafold3",
                             command=["bash"],
                             args=["-c",
@@ -229,11 +273,11 @@ def create_job_object(data, user):
                             env=env_vars,
                         )
                     ],
-                    volumes=[client.V1Volume(name="vol-1", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_VOL1_ALPHAFOLD3)),
-                             client.V1Volume(name="vol-2", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_VOL2)),
+                    volumes=[client.V1Volume(name="vol-1", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=pvcs["PVC_VOL1_ALPHAFOLD3"])),
+                             client.V1Volume(name="vol-2", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=pvcs["PVC_VOL2"])),
                              client.V1Volume(name="dshm", empty_dir=client.V1EmptyDirVolumeSource(medium="Memory", size_limit="120Gi")),
-                             client.V1Volume(name="storage", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_STORAGE)),
-                             client.V1Volume(name="tmp", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_TMP))
+                             client.V1Volume(name="storage", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=pvcs["PVC_STORAGE"])),
+                             client.V1Volume(name="tmp", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=pvcs["PVC_TMP"]))
                              ],
                 ),
                 
@@ -243,12 +287,26 @@ def create_job_object(data, user):
     )
     return job
 
-def run_alphafold3_prediction(data, user):
-    """Run the prediction job on the Kubernetes cluster."""
+def run_alphafold3_prediction(data, user, reuse_msas=False):
+    """
+    Run the prediction job on the Kubernetes cluster.
+    With reuse_msas, the input JSON already holds the MSAs and templates of all the chains (clones).
+    """
 
     try:
-        job = create_job_object(data, user)
-        create_k8s_job(batchApi, NAMESPACE, job)
+        target = select_target(ALPHAFOLD3_PVCS)
+        if target is None:
+            return jsonify({"error": "No Kubernetes cluster is available for AlphaFold 3."}), 503
+
+        stored_msas = reuse_msas or use_stored_af3_msas(data, user)
+        job = create_job_object(data, user, target, stored_msas)
+        create_k8s_job(get_batch_api(target), target["namespace"], job)
+
+        try:
+            save_job_submission(data["name"], user, "AlphaFold3",
+                                {key: data[key] for key in COMPUTATION_SETTINGS if key in data})
+        except Exception as e:
+            logging.error(f"Failed to record the submission of job {data['name']}: {e}")
         return jsonify({"message": f"Job {data['name']} created successfully."}), 200
     except Exception as e:
         logging.error(f"Error creating job: {e}")
@@ -261,33 +319,21 @@ def validate_json_name(json_object):
 
     return json_object
 
-def save_json_input(json_file, computation_config, user):
-    """Save the JSON file to the server."""
-    if json_file:
-        json_object = json.load(json_file)
-    else:
+def save_json_input(json_file, computation_config, user, upload_id=None):
+    """
+    Save the JSON file, uploaded with the request or by a finished chunked upload, to the server.
+    The name of the job is rewritten while the file is streamed, the MSAs it carries are copied as they are.
+    """
+    if upload_id:
+        upload_path, upload_error = complete_upload(user, upload_id, "json")
+        if upload_error:
+            return upload_error
+    elif not json_file:
         return jsonify({"error": "No JSON file provided."}), 400
 
     logging.info(f"Computation config: {computation_config}")
     job_name = computation_config["name"]
 
-    # Check if the alphafoldserver format contains only one job
-    if isinstance(json_object, list):
-        if len(json_object) > 1:
-            return jsonify({"error": "The uploaded JSON file contains multiple jobs. Please submit each job separately."}), 400
-        if len(json_object) == 0:
-            return jsonify({"error": "The uploaded JSON file does not contain any job."}), 400
-
-        # Change the name in the JSON to match the job name
-        json_object[0]["name"] = job_name
-        logging.info(f"Updated job name in JSON to: {json_object[0]['name']}")
-    elif isinstance(json_object, dict):
-        # Change the name in the JSON to match the job name
-        json_object["name"] = job_name
-        logging.info(f"Updated job name in JSON to: {json_object['name']}")
-    else:
-        return jsonify({"error": "The uploaded JSON file is not in a supported format. Please upload a JSON object or a list containing a single job."}), 400
-
     # Check if user has input directory
     base_dir = get_working_directory()
     path = os.path.join(base_dir, "input", user)
@@ -296,32 +342,56 @@ def save_json_input(json_file, computation_config, user):
         logging.info(f"Creating directory for new user: {path}")
         os.makedirs(path)
 
-    # Check job name uniqueness
-    if check_same_job_name(job_name, user):
-        if computation_config["forceComputation"] is False:
+    # Change the name in the JSON to match the job name, into a temporary file the job never reads
+    fd, tmp_path = tempfile.mkstemp(dir=path, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            if upload_id:
+                with open(upload_path, "rb") as f:
+                    rewrite_job_name(f, file, job_name)
+            else:
+                rewrite_job_name(json_file.stream, file, job_name)
+        logging.info(f"Updated job name in JSON to: {job_name}")
+    except ValueError as e:
+        os.remove(tmp_path)
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        os.remove(tmp_path)
+        return jsonify({"error": f"Failed to save JSON file: {str(e)}"}), 500
+
+    # Check job name uniqueness, the name is reserved so concurrent submissions of the same name cannot both pass
+    reservation, exists = reserve_job_name(job_name, user, computation_config["forceComputation"],
+                                         public=computation_config["public"] is True)
+    if reservation is None:
+        os.remove(tmp_path)
+        if exists:
             return jsonify({"error": f'Job with name "{job_name}" already exists. If you still want to run the computation, please check the Force Computation box in the form. This will delete all the previously computed data.'}), 400
-        else:
-            # Force computation: delete previous output files
-            try:
-                shutil.rmtree(get_output_path(job_name, user))
-                logging.info(f"Deleted output files for {job_name}")
-            except FileNotFoundError:
-                logging.error(f"Output files for {job_name} do not exist.")
-            except OSError as e:
-                logging.error(f"Error deleting output files for {job_name}: {e}")
+        return jsonify({"error": f'A job with name "{job_name}" is being submitted right now. Please choose a different name.'}), 409
+    if exists:
+        # Force computation: delete previous output files
+        try:
+            shutil.rmtree(get_output_path(job_name, user))
+            logging.info(f"Deleted output files for {job_name}")
+        except FileNotFoundError:
+            logging.error(f"Output files for {job_name} do not exist.")
+        except OSError as e:
+            logging.error(f"Error deleting output files for {job_name}: {e}")
 
 
     # Define the input and output paths
     json_path = get_input_path(job_name, "json", user)
     public_json_path = os.path.join(job_name, "json", "public")
-    # Save the JSON file    
+    # Save the JSON file
     try:
-        with open(json_path, "w") as file:
-            file.write(json.dumps(json_object, indent=4))
+        save_input_file(tmp_path, json_path)
     except Exception as e:
-        if os.path.exists(json_path):
-            os.remove(json_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return jsonify({"error": f"Failed to save JSON file: {str(e)}"}), 500
+    commit_job_name(job_name, user, reservation)
+
+    if upload_id:
+        remove_upload(user, upload_id)
     
     # Create symlink to the public directory for the public files
     if computation_config["public"] is True:
@@ -335,14 +405,19 @@ def save_json_input(json_file, computation_config, user):
 
     return None
 
-def save_ccd_file(file, job_name, user):
-    """Save the CCD file to the server."""
-    if file:
-        ccd_path = get_input_path(job_name+"-ccd", "cif", user)
+def save_ccd_file(file, job_name, user, upload_id=None):
+    """Save the CCD file, uploaded with the request or by a finished chunked upload, to the server."""
+    ccd_path = get_input_path(job_name+"-ccd", "cif", user)
+    if upload_id:
+        logging.info(f"Moving uploaded CCD file {upload_id} to {ccd_path}")
+        try:
+            return commit_upload(user, upload_id, "ccd", ccd_path)
+        except Exception as e:
+            return jsonify({"error": f"Failed to save CCD file: {str(e)}"}), 500
+    elif file:
         logging.info(f"Saving CCD file to {ccd_path}")
         try:
-            with open(ccd_path, "wb") as f:
-                f.write(file.read())
+            return save_stream_atomic(file.stream, ccd_path)
         except Exception as e:
             return jsonify({"error": f"Failed to save CCD file: {str(e)}"}), 500
     else:
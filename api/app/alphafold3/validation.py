@@ -5,6 +5,11 @@ import re
 import json
 import logging
 
+from app.shared.input_validation import find_invalid_residues, get_sequence_limit
+
+# Heavy atoms of a SMILES string, bracket atoms and the organic subset (two-letter elements first)
+SMILES_ATOM_RE = re.compile(r"\[[^\]]+\]|Br|Cl|[BCNOPSFI]|[bcnops]")
+
 # Define TypedDict for each sequence variant
 class ProteinDict(TypedDict):
     protein: "Protein"
@@ -84,6 +89,32 @@ class Job(BaseModel):
             raise ValueError("Model seeds must be positive integers")
         return v
     
+    @validator("sequences")
+    def validate_sequences(cls, v):
+        """Reject invalid residues and inputs over the token budget before the job waits for a GPU."""
+        tokens = 0
+        for item in v:
+            molecule, entity = next(iter(item.items()))
+            ids = entity.id if isinstance(entity.id, list) else [entity.id]
+            if molecule == "ligand":
+                if entity.smiles:
+                    tokens += len(SMILES_ATOM_RE.findall(entity.smiles)) * len(ids)
+                else:
+                    tokens += len(entity.ccdCodes or []) * len(ids)
+                continue
+
+            invalid = find_invalid_residues(entity.sequence, molecule)
+            if invalid:
+                raise ValueError(f"Invalid characters in the {molecule} sequence: {' '.join(invalid[:10])}")
+            if not entity.sequence.strip():
+                raise ValueError(f"Empty {molecule} sequence")
+            tokens += len("".join(entity.sequence.split())) * len(ids)
+
+        limit = get_sequence_limit("AlphaFold3")
+        if limit and tokens > limit:
+            raise ValueError(f"The input is too long for AlphaFold 3: {tokens} tokens, the limit is {limit}")
+        return v
+
     @validator("dialect")
     def validate_dialect(cls, v):
         if v != "alphafold3":
@@ -7,27 +7,15 @@ import logging
 from app.shared.input_validation import (
     validate_job_name,
     validate_sequence,
+    validate_sequence_length,
     validate_email)
 from app.shared.job_submitting import create_simple_name, generate_random_suffix
+from app.shared.fasta import split_sequence_input
+from app.shared.images import resolve_image, get_image_pull_policy
+from app.shared.job_events import EVENT_FUNCTION_CMD, event_cmd, outcome_event_cmd, failure_mail_cmd, get_event_env
+from app.shared.job_runner import RUNNER_CMD, job_runner_enabled, get_runner_config, get_runner_env
 from config import Config
 
-def split_sequence_input(sequence_input):
-    """Split the sequence input into individual sequences by '>' character."""
-    try:
-        sequences = sequence_input.split(">")
-    except AttributeError:
-        return None
-
-    formatted_sequences = []
-    for seq in sequences:
-        if seq == "":
-            continue
-        else:
-            seq = ">" + seq
-            formatted_sequences.append(seq)
-    
-    return formatted_sequences
-
 def validate_protein_input(sequence):
     """Validate the protein sequence input accroding to chosen model preset by the user."""
     
@@ -35,8 +23,9 @@ def validate_protein_input(sequence):
     if sequences is None:
         return jsonify({"error": "Invalid sequence input"}), 400
     for seq in sequences:
-        if validate_sequence(seq):
-            return validate_sequence(seq)
+        validation_error = validate_sequence(seq, allow_chain_separator=True)
+        if validation_error:
+            return validation_error
     
     return None
 
@@ -73,6 +62,11 @@ def validate_input(data):
     validateProteinInputError = validate_protein_input(data["proteinSequence"])
     if validateProteinInputError:
         return validateProteinInputError
+
+    # ColabFold predicts every record of the input separately
+    sequenceLengthError = validate_sequence_length(data["proteinSequence"], "ColabFold", per_record=True)
+    if sequenceLengthError:
+        return sequenceLengthError
     
     if int(data["numRelax"]) not in [0, 1, 5]:
         return jsonify({"error": "numRelax must be 0, 1, or 5."}), 400
@@ -115,6 +109,9 @@ def validate_input(data):
     
     if data["makeResultsPublic"] not in [True, False]:
         return jsonify({"error": "Make results public must be True or False."}), 400
+
+    if data.get("allowReuse", False) not in [True, False]:
+        return jsonify({"error": "Allow reuse must be True or False."}), 400
     
     if data["useDropout"] not in [True, False]:
         return jsonify({"error": "Use dropout must be True or False."}), 400
@@ -142,7 +139,9 @@ def create_job_config(data, user):
         "version": data["version"],
         "forceComputation": data["forceComputation"],
         "makeResultsPublic": str(data["makeResultsPublic"]).lower(),
+        "allowReuse": str(data.get("allowReuse", False)).lower(),
         "service": "ColabFold",
+        "submission": dict(data),
 
         "container": Config.COLABFOLD_IMAGE,
         "nodeselector": "",
@@ -198,15 +197,35 @@ def create_file_config(jobConfig):
         "num_seeds": jobConfig["numSeeds"],
         "recycle_early_stop_tolerance": jobConfig["recycleTolerance"],
         "public": jobConfig["makeResultsPublic"],
+        "allowReuse": jobConfig["allowReuse"],
         "service": jobConfig["service"]
     }
 
     return fileConfig
 
-def create_job_object(jobConfig, user):
-    """Create a Kubernetes Job object."""
+def create_job_object(jobConfig, user, target):
+    """Create a Kubernetes Job object for the chosen target."""
     salt=''.join(random.choice(string.ascii_letters + string.digits) for i in range(64))
-    cfArgs = f'mkdir -p /mnt/output/{user}/{jobConfig["simplename"]} && /opt/conda/bin/colabfold_batch {jobConfig["input"]} /mnt/output/{user}/{jobConfig["simplename"]} --model-type {jobConfig["modelPreset"]} --use-gpu-relax --num-relax {jobConfig["numRelax"]} {jobConfig["templateMode"]} --msa-mode {jobConfig["msaMode"]} {jobConfig["maxMSA"]} --pair-mode {jobConfig["pairMode"]} {jobConfig["useDropout"]} --recycle-early-stop-tolerance {jobConfig["recycleTolerance"]} --num-recycle {jobConfig["numRecycles"]} --num-models {jobConfig["numModels"]} --num-seeds {jobConfig["numSeeds"]} --host-url http://colabsearch.colabsearch-ns.svc.cluster.local 2>&1 | tee /mnt/output/{user}/{jobConfig["simplename"]}/stdout && if [ "{jobConfig["makeResultsPublic"]}" == "true" ] ; then ln -sfr /mnt/output/{user}/{jobConfig["simplename"]} /mnt/output/public/{jobConfig["simplename"]} ; fi ; cd /mnt/output/{user} ; cp -r {jobConfig["simplename"]} /storage ; zip -0 -r {jobConfig["simplename"]}.zip {jobConfig["simplename"]}; mv {jobConfig["simplename"]}.zip {jobConfig["simplename"]}/download-{salt}.zip ; cd "/mnt/output/{user}/{jobConfig["simplename"]}"; if ls *.done.txt ; then touch "/mnt/output/{user}/{jobConfig["simplename"]}/colabfold.done"; fi; if [ ! -z "{jobConfig["email"]}" ]; then cd "/mnt/output/{user}/{jobConfig["simplename"]}"; if ls *.done.txt ; then echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:ColabFold computation has finished\n\nYour ColabFold computation \"{jobConfig["simplename"]}\" has finished, please visit {Config.BASE_URL}/result/{jobConfig["simplename"]} to view the result of your computation\n" | ssmtp -t; else echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:Colabfold computation has failed\n\nYour ColabFold computation \"{jobConfig["simplename"]}\" has failed.\n" | cat - /mnt/output/{user}/{jobConfig["simplename"]}/stdout | ssmtp -t;  fi; fi'
+    failureMailCmd = failure_mail_cmd(f'/mnt/output/{user}/{jobConfig["simplename"]}')
+    inferenceEventCmd = outcome_event_cmd(f'ls /mnt/output/{user}/{jobConfig["simplename"]}/*.done.txt >/dev/null 2>&1')
+    # A clone predicts from the MSAs of the job it was cloned from, ColabFold skips the search for .a3m inputs
+    cfInput = jobConfig["input"]
+    restoreMsasCmd = ""
+    if jobConfig.get("msaSource"):
+        sourceDir = f'/mnt/output/{user}/{jobConfig["msaSource"]}'
+        msaDir = f'/mnt/output/{user}/{jobConfig["simplename"]}/msas'
+        cfInput = "$cf_input"
+        restoreMsasCmd = f'cf_input={jobConfig["input"]} && {{ if ls {sourceDir}/*.a3m >/dev/null 2>&1 && mkdir -p {msaDir} && ( cp -l {sourceDir}/*.a3m {msaDir}/ || cp {sourceDir}/*.a3m {msaDir}/ ) ; then cf_input={msaDir} ; fi ; }} && '
+    # The post-processing runs in the Python runner of the job pod when it is enabled
+    runnerConfig = None
+    if job_runner_enabled():
+        runnerConfig = get_runner_config(user, jobConfig["simplename"], jobConfig["simplename"], "ColabFold", "colabfold.done", "*.done.txt",
+                                         jobConfig["makeResultsPublic"] == "true", jobConfig["email"], salt, result_non_empty=False)
+    cfArgs = f'{EVENT_FUNCTION_CMD} && mkdir -p /mnt/output/{user}/{jobConfig["simplename"]} && {restoreMsasCmd}{event_cmd("started")} && /opt/conda/bin/colabfold_batch {cfInput} /mnt/output/{user}/{jobConfig["simplename"]} --model-type {jobConfig["modelPreset"]} --use-gpu-relax --num-relax {jobConfig["numRelax"]} {jobConfig["templateMode"]} --msa-mode {jobConfig["msaMode"]} {jobConfig["maxMSA"]} --pair-mode {jobConfig["pairMode"]} {jobConfig["useDropout"]} --recycle-early-stop-tolerance {jobConfig["recycleTolerance"]} --num-recycle {jobConfig["numRecycles"]} --num-models {jobConfig["numModels"]} --num-seeds {jobConfig["numSeeds"]} --host-url http://colabsearch.colabsearch-ns.svc.cluster.local 2>&1 | tee /mnt/output/{user}/{jobConfig["simplename"]}/stdout && {inferenceEventCmd}'
+    if runnerConfig:
+        cfArgs += f' && {RUNNER_CMD}'
+    else:
+        cfArgs += f' && if [ "{jobConfig["makeResultsPublic"]}" == "true" ] ; then ln -sfr /mnt/output/{user}/{jobConfig["simplename"]} /mnt/output/public/{jobConfig["simplename"]} ; fi ; cd /mnt/output/{user} ; cp -r {jobConfig["simplename"]} /storage ; zip -0 -r {jobConfig["simplename"]}.zip {jobConfig["simplename"]}; mv {jobConfig["simplename"]}.zip {jobConfig["simplename"]}/download-{salt}.zip ; cd "/mnt/output/{user}/{jobConfig["simplename"]}"; if ls *.done.txt ; then touch "/mnt/output/{user}/{jobConfig["simplename"]}/colabfold.done"; {event_cmd("archived")}; fi; if [ ! -z "{jobConfig["email"]}" ]; then cd "/mnt/output/{user}/{jobConfig["simplename"]}"; if ls *.done.txt ; then echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:ColabFold computation has finished\n\nYour ColabFold computation \"{jobConfig["simplename"]}\" has finished, please visit {Config.BASE_URL}/result/{jobConfig["simplename"]} to view the result of your computation\n" | ssmtp -t; else echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:Colabfold computation has failed\n\nYour ColabFold computation \"{jobConfig["simplename"]}\" has failed.\n" | cat - /mnt/output/{user}/{jobConfig["simplename"]}/stdout | {failureMailCmd};  fi; fi'
 
     if len(jobConfig['proteinSequence']) > 5000:
         logging.info(f"Large sequence detected ({len(jobConfig['proteinSequence'])} residues), allocating more resources.")
@@ -216,12 +235,14 @@ def create_job_object(jobConfig, user):
         memory_limit = "128Gi"
         cpu_limit = "4"
 
+    image = resolve_image(jobConfig["container"])
+
     job = client.V1Job(
         api_version="batch/v1",
         kind="Job",
         metadata=client.V1ObjectMeta(
             name=jobConfig["uniquename"],
-            annotations={"user": jobConfig["user"], "simplename": jobConfig["simplename"], "public": jobConfig["makeResultsPublic"]}),
+            annotations={"user": jobConfig["user"], "simplename": jobConfig["simplename"], "public": jobConfig["makeResultsPublic"], "target": target["name"], "service": jobConfig["service"]}),
         spec=client.V1JobSpec(
             ttl_seconds_after_finished=100,
             backoff_limit=0,
@@ -236,13 +257,15 @@ def create_job_object(jobConfig, user):
                     containers=[
                         client.V1Container(
                             name=jobConfig["uniquename"],
-                            image=jobConfig["container"],
-                            image_pull_policy="IfNotPresent",
+                            image=image,
+                            image_pull_policy=get_image_pull_policy(image),
                             command=["bash"],
                             args=["-c", 
                                   cfArgs],
                             env=[client.V1EnvVar(name="TF_FORCE_UNIFIED_MEMORY", value="1"), 
-                                 client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")],
+                                 client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")]
+                                + get_event_env(target, user, jobConfig["simplename"], jobConfig["uniquename"])
+                                + (get_runner_env(runnerConfig) if runnerConfig else []),
                             security_context=client.V1SecurityContext(
                                 run_as_user=1000,
                                 run_as_group=1000,
@@ -261,10 +284,10 @@ def create_job_object(jobConfig, user):
                                             ],
                         )
                     ],
-                    volumes=[client.V1Volume(name="vol-1", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_VOL1_ALPHAFOLD)),
-                             client.V1Volume(name="vol-2", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_VOL2)),
+                    volumes=[client.V1Volume(name="vol-1", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=target["pvcs"]["PVC_VOL1_ALPHAFOLD"])),
+                             client.V1Volume(name="vol-2", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=target["pvcs"]["PVC_VOL2"])),
                              client.V1Volume(name="dshm", empty_dir=client.V1EmptyDirVolumeSource(medium="Memory", size_limit="120Gi")),
-                             client.V1Volume(name="storage", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=Config.PVC_STORAGE))
+                             client.V1Volume(name="storage", persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(claim_name=target["pvcs"]["PVC_STORAGE"]))
                              ],
                 )
             )
@@ -0,0 +1,201 @@
+import glob
+import io
+import json
+import logging
+import os
+
+from flask import jsonify
+from werkzeug.datastructures import FileStorage
+
+from app.alphafold.job_config import create_alphafold2_job_config
+from app.alphafold.routes import submit_alphafold2_job
+from app.alphafold3.v1_submission import COMPUTATION_SETTINGS, save_json_input, run_alphafold3_prediction
+from app.colabfold.routes import submit_colabfold_job
+from app.esmfold.routes import submit_esmfold_job
+from app.omegafold.routes import submit_omegafold_job
+from app.shared.common import get_input_path, get_output_path
+from app.shared.input_validation import validate_job_name, validate_email
+from app.shared.msa_store import get_af2_variant
+from app.shared.sequence_index import get_canonical_chains
+from app.shared.submissions import get_job_submission
+
+# Settings a clone cannot change: the name is given separately and uploads belong to the original submission
+PROTECTED_SETTINGS = ["jobName", "name", "userCCDUploadId", "jsonUploadId"]
+# Settings of AlphaFold 2 and ColabFold which change the MSAs of the job
+COLABFOLD_MSA_SETTINGS = ["msaMode", "pairMode", "modelPreset"]
+# Settings of AlphaFold 3 which change the MSAs and templates of the job
+AF3_MSA_SETTINGS = ["precomputedMSA", "precomputedTemplates", "numberOfTemplates"]
+# Settings of the AlphaFold 3 input JSON a clone can change
+AF3_JOB_SETTINGS = ["modelSeeds"]
+
+
+def same_chains(source_data, data):
+    """Check if the clone predicts the same chains as the job it was cloned from."""
+    return get_canonical_chains(source_data["proteinSequence"]) == get_canonical_chains(data["proteinSequence"])
+
+
+def get_alphafold2_msa_source(source_job, source_data, data, user):
+    """Return the job whose MSAs the AlphaFold 2 clone can use: the same chains searched in the same databases."""
+    if not os.path.isdir(os.path.join(get_output_path(source_job, user), "msas")) or not same_chains(source_data, data):
+        return None
+    # The template date only filters the template hits, they are found again only with other databases
+    source_variant = get_af2_variant(create_alphafold2_job_config(dict(source_data), user))
+    if get_af2_variant(create_alphafold2_job_config(dict(data), user)) != source_variant:
+        return None
+    return source_job
+
+
+def get_colabfold_msa_source(source_job, source_data, data, user):
+    """Return the job whose MSAs the ColabFold clone can use: the same chains with the same MSA and pairing modes."""
+    if not glob.glob(os.path.join(glob.escape(get_output_path(source_job, user)), "*.a3m")) or not same_chains(source_data, data):
+        return None
+    if any(source_data.get(key) != data.get(key) for key in COLABFOLD_MSA_SETTINGS):
+        return None
+    return source_job
+
+
+def validate_alphafold3_settings(settings):
+    """Validate the settings an AlphaFold 3 clone changes, the input JSON of the job is not validated again."""
+    for key in settings:
+        if key not in COMPUTATION_SETTINGS + AF3_JOB_SETTINGS:
+            return jsonify({"error": f"Setting {key} cannot be changed in a clone of an AlphaFold 3 job."}), 400
+    if "modelSeeds" in settings:
+        seeds = settings["modelSeeds"]
+        if not isinstance(seeds, list) or not seeds or not all(isinstance(seed, int) and not isinstance(seed, bool) and seed > 0 for seed in seeds):
+            return jsonify({"error": "Model seeds must be positive integers."}), 400
+    if "numberOfTemplates" in settings:
+        number = settings["numberOfTemplates"]
+        if not isinstance(number, int) or isinstance(number, bool) or number < 0:
+            return jsonify({"error": "Number of templates must be a non-negative integer."}), 400
+    for key in ["public", "largeInput", "forceComputation", "precomputedMSA"]:
+        if key in settings and settings[key] not in [True, False]:
+            return jsonify({"error": f"Setting {key} must be True or False."}), 400
+    if "email" in settings:
+        if not isinstance(settings["email"], str):
+            return jsonify({"error": "Invalid email address."}), 400
+        return validate_email(settings["email"])
+    return None
+
+
+def link_ccd_file(source_job, job_name, user):
+    """Give the clone the CCD file of the job it was cloned from, as a hard link when the storage allows it."""
+    source_path = get_input_path(source_job + "-ccd", "cif", user)
+    ccd_path = get_input_path(job_name + "-ccd", "cif", user)
+    tmp_path = f"{ccd_path}.clone-{os.getpid()}"
+    try:
+        os.link(source_path, tmp_path)
+    except OSError:
+        with open(source_path, "rb") as source, open(tmp_path, "wb") as target:
+            while chunk := source.read(1024 * 1024):
+                target.write(chunk)
+    os.replace(tmp_path, ccd_path)
+
+
+def clone_alphafold3_job(source_job, source_settings, job_name, settings, user):
+    """
+    Submit the clone of an AlphaFold 3 job. When its chains and MSA settings do not change, the clone is submitted
+    from the data JSON of the finished job, which holds the MSAs and templates of all the chains, so only the
+    inference runs. Otherwise the clone is submitted from the input JSON of the job.
+    """
+    validation_error = validate_alphafold3_settings(settings)
+    if validation_error:
+        return validation_error
+
+    computation = dict(source_settings, forceComputation=False)
+    computation.update({key: value for key, value in settings.items() if key in COMPUTATION_SETTINGS})
+    computation["name"] = job_name
+
+    sanitised_name = source_job.lower()
+    data_json = os.path.join(get_output_path(source_job, user), sanitised_name, f"{sanitised_name}_data.json")
+    reuse_msas = os.path.isfile(data_json) and all(computation.get(key) == source_settings.get(key)
+                                                   for key in AF3_MSA_SETTINGS)
+
+    try:
+        with open(data_json if reuse_msas else get_input_path(source_job, "json", user)) as f:
+            job_input = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logging.error(f"Cannot read the input of job {source_job} to clone it: {e}")
+        return jsonify({"error": f"The input of job {source_job} cannot be read."}), 404
+
+    # The AlphaFold Server format is a list with the job
+    job = job_input[0] if isinstance(job_input, list) and job_input else job_input
+    if not isinstance(job, dict):
+        return jsonify({"error": f"The input of job {source_job} cannot be cloned."}), 400
+    job.update({key: value for key, value in settings.items() if key in AF3_JOB_SETTINGS})
+    ccd_file = job.get("userCCDPath")
+    if ccd_file:
+        job["userCCDPath"] = f"{job_name}-ccd.cif"
+
+    json_file = FileStorage(stream=io.BytesIO(json.dumps(job_input, separators=(",", ":")).encode()),
+                            filename=f"{job_name}.json")
+    save_error = save_json_input(json_file, computation, user)
+    if save_error:
+        return save_error
+
+    if ccd_file:
+        try:
+            link_ccd_file(source_job, job_name, user)
+        except OSError as e:
+            logging.error(f"Cannot copy the CCD file of job {source_job} to its clone {job_name}: {e}")
+            return jsonify({"error": f"The CCD file of job {source_job} cannot be copied."}), 500
+
+    if reuse_msas:
+        logging.info(f"Clone {job_name} of job {source_job} of user {user} reuses its MSAs and templates.")
+    return run_alphafold3_prediction(computation, user, reuse_msas)
+
+
+def clone_job(source_job, job_name, settings, user):
+    """
+    Submit a copy of the user's job under a new name, with the settings changed by the given settings.
+
+    The clone is submitted from the settings recorded when the job was submitted and from its stored inputs.
+    When the settings the MSAs depend on do not change, the MSAs (and templates) of the job are reused
+    and the clone only runs the changed stages. Returns the response of the submission.
+    """
+    if not isinstance(job_name, str) or not job_name:
+        return jsonify({"error": "Missing jobName parameter."}), 400
+    validation_error = validate_job_name(job_name)
+    if validation_error:
+        return validation_error
+    if not isinstance(settings, dict):
+        return jsonify({"error": "Settings must be a JSON object."}), 400
+    protected = [key for key in settings if key in PROTECTED_SETTINGS]
+    if protected:
+        return jsonify({"error": f"Setting {', '.join(protected)} cannot be changed in a clone."}), 400
+
+    submission = get_job_submission(source_job, user)
+    if submission is None:
+        if os.path.exists(get_input_path(source_job, "json", user)):
+            return jsonify({"error": f"Job {source_job} was submitted before clones were supported, please submit it again."}), 409
+        return jsonify({"error": f"Job {source_job} not found."}), 404
+
+    service = submission["service"]
+    if service == "AlphaFold3":
+        return clone_alphafold3_job(source_job, submission["data"], job_name, settings, user)
+
+    # A clone replaces an existing job only when asked to
+    data = dict(submission["data"], forceComputation=False)
+    data.update(settings)
+    data["jobName"] = job_name
+
+    msa_source = None
+    try:
+        if service == "AlphaFold":
+            msa_source = get_alphafold2_msa_source(source_job, submission["data"], data, user)
+        elif service == "ColabFold":
+            msa_source = get_colabfold_msa_source(source_job, submission["data"], data, user)
+    except (KeyError, TypeError, AttributeError) as e:
+        # Invalid settings are rejected by the validation of the tool
+        logging.info(f"MSAs of job {source_job} are not reused by its clone {job_name}: {e}")
+    if msa_source:
+        logging.info(f"Clone {job_name} of job {source_job} of user {user} reuses its MSAs.")
+
+    if service == "AlphaFold":
+        return submit_alphafold2_job(data, user, msa_source)
+    if service == "ColabFold":
+        return submit_colabfold_job(data, user, msa_source)
+    if service == "ESMFold":
+        return submit_esmfold_job(data, user)
+    if service == "OmegaFold":
+        return submit_omegafold_job(data, user)
+    return jsonify({"error": f"Jobs of {service} cannot be cloned."}), 400
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.shared.common import get_user_jobs, get_public_jobs
 from app.shared.job_info import get_start, get_result, get_service, get_publicity
 from app.result.utilities import get_model_path
@@ -6,6 +6,7 @@ from app.result.utilities import get_model_path
 from app.wrappers import token_required
 from app.shared.kubernetes import get_running_jobs
 from app.shared.delete import delete_job_files
+from app.dashboard.clone import clone_job
 import logging
 
 dashboard = Blueprint("dashboard", __name__)
@@ -17,8 +18,11 @@ def get_jobs_of_user(current_user):
     user_jobs_array = []
     running_jobs_array = []
     
-    # Get running jobs once and create lookup dictionary
-    running_jobs_dict = {job[0]: job[2] for job in get_running_jobs(current_user)}  # job_name: status
+    # Get running jobs once and create lookup dictionary, unfinished jobs are not reported failed when it fails
+    try:
+        running_jobs_dict = {job[0]: job[2] for job in get_running_jobs(current_user)}  # job_name: status
+    except Exception:
+        return jsonify({"error": "The running jobs could not be listed, please try again later."}), 503
     
     # Get the status of each job
     for job in get_user_jobs(current_user):
@@ -70,8 +74,11 @@ def get_jobs_of_public(current_user):
     """Get the list of jobs for the user."""
     user_jobs_array = []
 
-    # Get running jobs once and create lookup dictionary
-    running_jobs_dict = {job[0]: job[1] for job in get_running_jobs(current_user)}  # job_name: status
+    # Get running jobs once and create lookup dictionary, unfinished jobs are not reported failed when it fails
+    try:
+        running_jobs_dict = {job[0]: job[1] for job in get_running_jobs(current_user)}  # job_name: status
+    except Exception:
+        return jsonify({"error": "The running jobs could not be listed, please try again later."}), 503
 
     # Get the status of each job
     for job in get_public_jobs():
@@ -137,3 +144,17 @@ def delete_multiple_jobs(current_user, job_names):
         return jsonify({"error": delete_errors}), 500
 
     return jsonify({"message": "Jobs have been deleted successfully."})
+
+
+@dashboard.route("clone/<string:job_name>", methods=["POST"])
+@token_required
+def clone_job_route(current_user, job_name):
+    """
+    Submit a copy of the job under a new name with some of its settings changed, e.g. more seeds or relaxation.
+    The stored inputs of the job are reused, and its MSAs too when the changed settings do not affect them.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request must be a JSON object."}), 400
+
+    return clone_job(job_name, data.get("jobName"), data.get("settings", {}), current_user)
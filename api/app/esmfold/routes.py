@@ -2,8 +2,8 @@ from flask import jsonify, request, Blueprint
 from app.wrappers import token_required
 from kubernetes import client
 
-from app.shared.common import NAMESPACE
-from app.shared.kubernetes import connect_to_k8s
+from app.shared.kubernetes import get_batch_api
+from app.shared.placement import select_target, ALPHAFOLD_PVCS
 from app.esmfold.utilities import (
     validate_input,
     create_job_config, 
@@ -12,19 +12,24 @@ from app.esmfold.utilities import (
 from app.shared.job_submitting import (
     check_job_uniqueness, 
     create_k8s_job, create_input_files)
+from app.shared.result_cache import find_cached_result, link_cached_result
+from app.shared.inflight import claim_inflight_job, follow_inflight_job
 
 esmfold = Blueprint("esmfold", __name__)
 
-# Connect to kubernetes cluster
-batchApi = connect_to_k8s()
-
 @esmfold.route("/submit", methods=["POST"])
 @token_required
 def submit_job(current_user):
     """Submit a new ESMFold job to the Kubernetes cluster."""
+    return submit_esmfold_job(request.json, current_user)
+
 
+def submit_esmfold_job(data, user, sequence_hash=None):
+    """
+    Validate and submit the ESMFold job of the user, returns the response.
+    With sequence_hash, the canonical hash of the sequence computed by the caller is not computed again.
+    """
     try:
-        data = request.json
 
         # Validate the request data
         validation_error = validate_input(data)
@@ -32,24 +37,50 @@ def submit_job(current_user):
             return validation_error
         
         # Create job configuration from the request data
-        jobConfig = create_job_config(data, current_user)
+        jobConfig = create_job_config(data, user)
+        # The copies of the sequence are a different input
+        if sequence_hash and jobConfig["proteinSequence"] == data["proteinSequence"]:
+            jobConfig["sequenceHash"] = sequence_hash
 
         # Create file configuration
         fileConfig = create_file_config(jobConfig)
 
         # Check the job uniqueness
-        job_uniqueness_error = check_job_uniqueness(jobConfig, fileConfig, current_user)
+        job_uniqueness_error = check_job_uniqueness(jobConfig, fileConfig, user)
         if job_uniqueness_error:
             return job_uniqueness_error
         
+        # Reuse the result of an identical finished job instead of computing it again
+        cached_result = find_cached_result(jobConfig, fileConfig, user)
+        if cached_result:
+            input_files_error = create_input_files(jobConfig, fileConfig, user)
+            if input_files_error:
+                return input_files_error
+            link_cached_result(cached_result, jobConfig, user)
+            return jsonify({"message": f'Job "{jobConfig["simplename"]}" created successfully from the result of an identical job.'}), 200
+
+        # Wait for the result of an identical job being computed instead of computing it again
+        leader = claim_inflight_job(jobConfig, fileConfig, user)
+        if leader:
+            input_files_error = create_input_files(jobConfig, fileConfig, user)
+            if input_files_error:
+                return input_files_error
+            follow_inflight_job(leader, jobConfig, user)
+            return jsonify({"message": f'Job "{jobConfig["simplename"]}" created successfully, it gets the result of an identical job being computed.'}), 200
+
+        # Choose the Kubernetes target for the job
+        target = select_target(ALPHAFOLD_PVCS)
+        if target is None:
+            return jsonify({"error": "No Kubernetes cluster is available for this tool."}), 503
+
         # Create Kubernetes Job Object
-        job = create_job_object(jobConfig, current_user)
+        job = create_job_object(jobConfig, user, target)
 
         # Submit Job to Kubernetes Cluster
-        create_k8s_job(batchApi, NAMESPACE, job)
+        create_k8s_job(get_batch_api(target), target["namespace"], job)
 
         # Create Input Files
-        input_files_error = create_input_files(jobConfig, fileConfig, current_user)
+        input_files_error = create_input_files(jobConfig, fileConfig, user)
         if input_files_error:
             return input_files_error
 
@@ -6,9 +6,14 @@ from kubernetes import client
 from app.shared.input_validation import (
     validate_job_name,
     validate_sequence,
+    validate_sequence_length,
     validate_numeric_input,
     validate_email)
 from app.shared.job_submitting import generate_random_suffix, create_simple_name
+from app.shared.gpu_profiles import select_gpu_resource
+from app.shared.images import resolve_image, get_image_pull_policy
+from app.shared.job_events import EVENT_FUNCTION_CMD, event_cmd, outcome_event_cmd, failure_mail_cmd, get_event_env
+from app.shared.job_runner import RUNNER_CMD, job_runner_enabled, get_runner_config, get_runner_env
 from config import Config
 
 
@@ -32,12 +37,18 @@ def validate_input(data):
     if validate_job_name(data["jobName"]):
         return validate_job_name(data["jobName"])
 
-    if validate_sequence(data["proteinSequence"]):
-        return validate_sequence(data["proteinSequence"])
+    sequenceError = validate_sequence(data["proteinSequence"], allow_chain_separator=True)
+    if sequenceError:
+        return sequenceError
 
     if validate_numeric_input(data["numCopies"]):
         return validate_numeric_input(data["numCopies"])
 
+    # The copies of the sequence are predicted as one complex
+    sequenceLengthError = validate_sequence_length(data["proteinSequence"], "ESMFold", copies=max(int(float(data["numCopies"])), 1))
+    if sequenceLengthError:
+        return sequenceLengthError
+
     if data["numRecycles"] not in ["0", "1", "3", "6", "12", "24"]:
         return jsonify({"error": "Number of recycles must be one of 0, 1, 3, 6, 12, or 24."}), 400
 
@@ -50,6 +61,9 @@ def validate_input(data):
     if data["makeResultsPublic"] not in [True, False]:
         return jsonify({"error": "Make results public flag must be a boolean."}), 400
 
+    if data.get("allowReuse", False) not in [True, False]:
+        return jsonify({"error": "Allow reuse flag must be a boolean."}), 400
+
     return None
 
 
@@ -68,8 +82,10 @@ def create_job_config(data, user):
         "numCopies": data["numCopies"],
         "numRecycles": data["numRecycles"],
         "makeResultsPublic": str(data["makeResultsPublic"]).lower(),
+        "allowReuse": str(data.get("allowReuse", False)).lower(),
         "email": data["email"],
         "service": "ESMFold",
+        "submission": dict(data),
         "forceComputation": data["forceComputation"],
 
         "container": Config.ESMFOLD_IMAGE,
@@ -94,6 +110,7 @@ def create_file_config(jobConfig):
         "name": jobConfig["simplename"],
         "num_recycles": jobConfig["numRecycles"],
         "public": jobConfig["makeResultsPublic"],
+        "allowReuse": jobConfig["allowReuse"],
         "copies": jobConfig["numCopies"],
         "service": jobConfig["service"]
     }
@@ -101,10 +118,24 @@ def create_file_config(jobConfig):
     return fileConfig
 
 
-def create_job_object(jobConfig, user):
-    """Create Kubernetes Job Object."""
+def create_job_object(jobConfig, user, target):
+    """Create Kubernetes Job Object for the chosen target."""
     salt = ''.join(random.choice(string.ascii_letters + string.digits) for i in range(64))
-    esmfArgs = f'mkdir -p /mnt/output/{user}/{jobConfig["outputDir"]} && /usr/bin/esm-fold -i {jobConfig["input"]} -o /mnt/output/{user}/{jobConfig["outputDir"]} --num-recycles {jobConfig["numRecycles"]} -m /data/esmfold 2>&1 | tee /mnt/output/{user}/{jobConfig["outputDir"]}/stdout && if [ "{jobConfig["makeResultsPublic"]}" == "true" ] ; then ln -sfr /mnt/output/{user}/{jobConfig["outputDir"]} /mnt/output/public/{jobConfig["outputDir"]} ; fi ; cd /mnt/output/{user} ; cp -r {jobConfig["outputDir"]} /storage ; zip -0 -r {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}; mv {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}/download-{salt}.zip ; if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then touch "/mnt/output/{user}/{jobConfig["outputDir"]}/esmfold.done"; fi; if [ ! -z "{jobConfig["email"]}" ]; then if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:ESMFold computation has finished\n\nYour ESMFold computation \"{jobConfig["simplename"]}\" has finished, please visit {Config.BASE_URL}/result/{jobConfig["simplename"]} to view the result of your computation\n" | ssmtp -t; else echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:ESMFold computation has failed\n\nYour ESMFold computation \"{jobConfig["simplename"]}\" has failed.\n" | cat - /mnt/output/{user}/{jobConfig["outputDir"]}/stdout | ssmtp -t;  fi; fi'
+    failureMailCmd = failure_mail_cmd(f'/mnt/output/{user}/{jobConfig["outputDir"]}')
+    inferenceEventCmd = outcome_event_cmd(f'[ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ]')
+    # The post-processing runs in the Python runner of the job pod when it is enabled
+    runnerConfig = None
+    if job_runner_enabled():
+        runnerConfig = get_runner_config(user, jobConfig["outputDir"], jobConfig["simplename"], "ESMFold", "esmfold.done", "*.pdb",
+                                         jobConfig["makeResultsPublic"] == "true", jobConfig["email"], salt)
+    esmfArgs = f'{EVENT_FUNCTION_CMD} && mkdir -p /mnt/output/{user}/{jobConfig["outputDir"]} && {event_cmd("started")} && /usr/bin/esm-fold -i {jobConfig["input"]} -o /mnt/output/{user}/{jobConfig["outputDir"]} --num-recycles {jobConfig["numRecycles"]} -m /data/esmfold 2>&1 | tee /mnt/output/{user}/{jobConfig["outputDir"]}/stdout && {inferenceEventCmd}'
+    if runnerConfig:
+        esmfArgs += f' && {RUNNER_CMD}'
+    else:
+        esmfArgs += f' && if [ "{jobConfig["makeResultsPublic"]}" == "true" ] ; then ln -sfr /mnt/output/{user}/{jobConfig["outputDir"]} /mnt/output/public/{jobConfig["outputDir"]} ; fi ; cd /mnt/output/{user} ; cp -r {jobConfig["outputDir"]} /storage ; zip -0 -r {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}; mv {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}/download-{salt}.zip ; if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then touch "/mnt/output/{user}/{jobConfig["outputDir"]}/esmfold.done"; {event_cmd("archived")}; fi; if [ ! -z "{jobConfig["email"]}" ]; then if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:ESMFold computation has finished\n\nYour ESMFold computation \"{jobConfig["simplename"]}\" has finished, please visit {Config.BASE_URL}/result/{jobConfig["simplename"]} to view the result of your computation\n" | ssmtp -t; else echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:ESMFold computation has failed\n\nYour ESMFold computation \"{jobConfig["simplename"]}\" has failed.\n" | cat - /mnt/output/{user}/{jobConfig["outputDir"]}/stdout | {failureMailCmd};  fi; fi'
+
+    image = resolve_image(jobConfig["container"])
+    gpuResource = select_gpu_resource(jobConfig["service"], jobConfig["proteinSequence"], target)
 
     job = client.V1Job(
         api_version="batch/v1",
@@ -112,7 +143,7 @@ def create_job_object(jobConfig, user):
         metadata=client.V1ObjectMeta(
             name=jobConfig["uniquename"],
             annotations={"user": jobConfig["user"], "simplename": jobConfig["simplename"],
-                         "public": jobConfig["makeResultsPublic"]}),
+                         "public": jobConfig["makeResultsPublic"], "target": target["name"], "service": jobConfig["service"]}),
         spec=client.V1JobSpec(
             ttl_seconds_after_finished=100,
             backoff_limit=0,
@@ -129,15 +160,16 @@ def create_job_object(jobConfig, user):
                     containers=[
                         client.V1Container(
                             name=jobConfig["uniquename"],
-                            image=jobConfig["container"],
-                            image_pull_policy="IfNotPresent",
+                            image=image,
+                            image_pull_policy=get_image_pull_policy(image),
                             command=["bash"],
                             args=["-c",
                                   esmfArgs],
                             env=[
                                 client.V1EnvVar(name="TF_FORCE_UNIFIED_MEMORY", value="1"),
-                                client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0"),
-                            ],
+                                client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")
+                            ] + get_event_env(target, user, jobConfig["simplename"], jobConfig["uniquename"])
+                                + (get_runner_env(runnerConfig) if runnerConfig else []),
                             security_context=client.V1SecurityContext(
                                 run_as_user=1000,
                                 run_as_group=1000,
@@ -147,8 +179,8 @@ def create_job_object(jobConfig, user):
                                 ),
                             ),
                             resources=client.V1ResourceRequirements(
-                                requests={"cpu": "4", "memory": "64Gi", "nvidia.com/gpu": "1"},
-                                limits={"cpu": "4", "memory": "128Gi", "nvidia.com/gpu": "1"}
+                                requests={"cpu": "4", "memory": "64Gi", gpuResource: "1"},
+                                limits={"cpu": "4", "memory": "128Gi", gpuResource: "1"}
                             ),
                             volume_mounts=[client.V1VolumeMount(name="vol-1", mount_path="/data"),
                                            client.V1VolumeMount(name="vol-2", mount_path="/mnt"),
@@ -159,15 +191,15 @@ def create_job_object(jobConfig, user):
                     ],
                     volumes=[client.V1Volume(name="vol-1",
                                              persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                                 claim_name=Config.PVC_VOL1_ALPHAFOLD)),
+                                                 claim_name=target["pvcs"]["PVC_VOL1_ALPHAFOLD"])),
                              client.V1Volume(name="vol-2",
                                              persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                                 claim_name=Config.PVC_VOL2)),
+                                                 claim_name=target["pvcs"]["PVC_VOL2"])),
                              client.V1Volume(name="dshm", empty_dir=client.V1EmptyDirVolumeSource(medium="Memory",
                                                                                                   size_limit="120Gi")),
                              client.V1Volume(name="storage",
                                              persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                                 claim_name=Config.PVC_STORAGE))
+                                                 claim_name=target["pvcs"]["PVC_STORAGE"]))
                              ],
                 )
             )
@@ -0,0 +1,43 @@
+from flask import Blueprint, jsonify, request
+import logging
+
+from app.wrappers import job_event_token_required
+from app.shared.job_events import EVENT_STAGES
+from app.shared.job_state import record_job_event
+
+events = Blueprint("events", __name__)
+
+# Metadata fields accepted from the job pods and their maximum length
+EVENT_FIELDS = {"host": 253, "job": 63}
+
+
+@events.route("/<string:user>/<string:job_name>", methods=["POST"])
+@job_event_token_required
+def post_job_event(user, job_name):
+    """Record a stage of the job reported by its pod."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Event must be a JSON object."}), 400
+
+    stage = data.get("stage")
+    if stage not in EVENT_STAGES:
+        return jsonify({"error": f"Invalid event stage: {stage}"}), 400
+
+    event = {"stage": stage}
+    if isinstance(data.get("time"), (int, float)):
+        event["time"] = data["time"]
+    for field, max_length in EVENT_FIELDS.items():
+        if isinstance(data.get(field), str) and data[field]:
+            event[field] = data[field][:max_length]
+
+    try:
+        state = record_job_event(job_name, user, event)
+    except Exception as e:
+        logging.error(f"Error recording {stage} event of job {job_name}: {e}")
+        return jsonify({"error": f"Error recording job event: {e}"}), 500
+
+    if state is None:
+        return jsonify({"message": f"Ignored {stage} event of a previous run of job {job_name}."}), 200
+
+    logging.info(f"Job {job_name} of user {user} reached stage {stage}.")
+    return jsonify({"message": f"Recorded {stage} event of job {job_name}."}), 200
@@ -0,0 +1,54 @@
+from flask import Blueprint, jsonify, Response
+import logging
+
+from app.wrappers import token_required, internal_token_required
+from app.shared.kubernetes import list_calls
+from app.shared.gpu_capacity import get_gpu_capacity
+from app.shared.job_view import get_job_views
+from app.shared.metrics import render_metrics
+from app.shared.pod_timeline import startup_latency
+
+monitoring = Blueprint("monitoring", __name__)
+
+
+@monitoring.route("/cache_stats", methods=["GET"])
+@token_required
+def get_cache_stats(current_user):
+    """Get the hit and miss counters of the Kubernetes list cache of this worker."""
+    return jsonify({"k8sListCache": list_calls.stats()})
+
+
+@monitoring.route("/gpu_capacity", methods=["GET"])
+@token_required
+def get_gpu_availability(current_user):
+    """Get the allocatable, requested and free GPUs of every target grouped by GPU product."""
+    try:
+        return jsonify({"targets": get_gpu_capacity()})
+    except Exception as e:
+        logging.error(f"Error getting GPU capacity: {e}")
+        return jsonify({"error": f"Error getting GPU capacity: {e}"}), 500
+
+
+@monitoring.route("/startup_latency", methods=["GET"])
+@token_required
+def get_startup_latency(current_user):
+    """Get the scheduling, image pull and container start latency of the job pods per tool and per node."""
+    try:
+        get_job_views()
+        return jsonify(startup_latency.summary())
+    except Exception as e:
+        logging.error(f"Error getting startup latency: {e}")
+        return jsonify({"error": f"Error getting startup latency: {e}"}), 500
+
+
+@monitoring.route("/metrics", methods=["GET"])
+@internal_token_required
+def get_metrics():
+    """Get the queue-depth and pending GPU demand gauges in the Prometheus text format."""
+    try:
+        metrics = render_metrics(get_job_views(), list_calls.stats())
+    except Exception as e:
+        logging.error(f"Error rendering metrics: {e}")
+        return jsonify({"error": f"Error rendering metrics: {e}"}), 500
+
+    return Response(metrics, mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+from flask import Blueprint, current_app, jsonify, request
+
+from app.wrappers import token_required
+from app.alphafold.routes import submit_alphafold2_job
+from app.alphafold3.routes import submit_alphafold3_job
+from app.colabfold.routes import submit_colabfold_job
+from app.esmfold.routes import submit_esmfold_job
+from app.omegafold.routes import submit_omegafold_job
+from app.shared.input_validation import validate_job_name, validate_sequence, validate_email
+from app.shared.job_groups import MEMBER_STATUSES, create_job_group, get_job_group, get_job_group_status
+from app.shared.job_names import release_pending_job_names
+from app.shared.inflight import release_pending_inflight_claims
+from app.shared.job_submitting import get_response_error
+from app.shared.sequence_index import get_canonical_chains, get_sequence_hash
+from app.result.utilities import get_aligned_multifold_structures
+
+# Define the Flask Blueprint
+multifold = Blueprint('multifold', __name__)
+
+# Tools of a MultiFold submission: the suffix of their job name and their submission function
+MULTIFOLD_TOOLS = {
+    "alphafold3": ("AF3", submit_alphafold3_job),
+    "alphafold2": ("AF2", submit_alphafold2_job),
+    "colabfold": ("CBF", submit_colabfold_job),
+    "esmfold": ("EMF", submit_esmfold_job),
+    "omegafold": ("OMF", submit_omegafold_job),
+}
+# Longest wait for the readiness of a group in one status request, and how often the group is checked meanwhile
+GROUP_WAIT_LIMIT = 25
+GROUP_POLL_INTERVAL = 1
+
+
+def get_multifold_name(job_name):
+    """Return the name of the MultiFold group, its jobs are recognized by the MULTIFOLD prefix."""
+    return job_name if job_name.startswith("MULTIFOLD-") else f"MULTIFOLD-{job_name}"
+
+
+def validate_multifold_input(data):
+    """Validate the settings shared by the tools once, the tools validate their own settings."""
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request must be a JSON object."}), 400
+    if "jobName" not in data or "sequence" not in data or "email" not in data or "tools" not in data:
+        return jsonify({"error": "Missing required fields"}), 400
+
+    tools = data["tools"]
+    if not isinstance(tools, dict) or not tools:
+        return jsonify({"error": "Select at least one tool."}), 400
+    unknown = [tool for tool in tools if tool not in MULTIFOLD_TOOLS]
+    if unknown:
+        return jsonify({"error": f"Unknown tool: {', '.join(unknown)}"}), 400
+    if not all(isinstance(settings, dict) for settings in tools.values()):
+        return jsonify({"error": "Tool settings must be JSON objects."}), 400
+
+    if not isinstance(data["jobName"], str):
+        return jsonify({"error": "Job name must be a string."}), 400
+    name = get_multifold_name(data["jobName"])
+    for tool in tools:
+        validation_error = validate_job_name(f"{name}-{MULTIFOLD_TOOLS[tool][0]}")
+        if validation_error:
+            return validation_error
+
+    if not isinstance(data["sequence"], str):
+        return jsonify({"error": "Sequence must be a string."}), 400
+    validation_error = validate_sequence(get_multifold_fasta(data["sequence"], name))
+    if validation_error:
+        return validation_error
+    if len(get_canonical_chains(data["sequence"])) != 1:
+        return jsonify({"error": "MultiFold predicts a single protein sequence."}), 400
+
+    if not isinstance(data["email"], str):
+        return jsonify({"error": "Invalid email address."}), 400
+    return validate_email(data["email"])
+
+
+def get_multifold_fasta(sequence, name):
+    """Return the FASTA input of the sequence, a plain sequence gets a header with the group name."""
+    if sequence.startswith(">"):
+        return sequence
+    return f">{name}\n{sequence}"
+
+
+def create_member_data(tool, data):
+    """Create the submission of one tool from the shared settings and the settings of the tool."""
+    name = f"{get_multifold_name(data['jobName'])}-{MULTIFOLD_TOOLS[tool][0]}"
+    settings = data["tools"][tool]
+    chain = get_canonical_chains(data["sequence"])[0]
+
+    if tool == "alphafold3":
+        return dict(settings,
+                    name=name,
+                    sequences=[{"protein": {"id": ["A"], "sequence": chain}}],
+                    dialect=settings.get("dialect", "alphafold3"),
+                    version=settings.get("version", 1),
+                    largeInput=settings.get("largeInput", False),
+                    email=data["email"],
+                    forceComputation=data.get("forceComputation", False),
+                    public=data.get("makeResultsPublic", False))
+
+    return dict(settings,
+                jobName=name,
+                proteinSequence=f">{name}\n{chain}\n",
+                email=data["email"],
+                forceComputation=data.get("forceComputation", False),
+                makeResultsPublic=data.get("makeResultsPublic", False))
+
+
+def submit_member(app, tool, member_data, user, sequence_hash):
+    """
+    Submit the job of one tool in its own application context, returns the result of the submission.
+    The tools indexing the sequence get its hash, computed once for the group.
+    """
+    name = member_data.get("name") or member_data.get("jobName")
+    with app.app_context():
+        try:
+            if tool == "alphafold3":
+                response = MULTIFOLD_TOOLS[tool][1](member_data, user)
+            else:
+                response = MULTIFOLD_TOOLS[tool][1](member_data, user, sequence_hash=sequence_hash)
+        except Exception as e:
+            logging.error(f"Error submitting MultiFold job {name}: {e}")
+            return {"tool": tool, "jobName": name, "success": False, "error": f"An unexpected error occurred: {str(e)}"}
+        finally:
+            # The context ends with the thread, not with the request
+            release_pending_job_names()
+            release_pending_inflight_claims()
+
+        if response is None or response[1] < 400:
+            message = response[0].get_json(silent=True).get("message") if response else None
+            return {"tool": tool, "jobName": name, "success": True, "message": message}
+        return {"tool": tool, "jobName": name, "success": False, "error": get_response_error(response)}
+
+
+@multifold.route("/submit", methods=["POST"])
+@token_required
+def submit_multifold(current_user):
+    """
+    Submit the sequence to all the selected tools at once, in parallel, and group their jobs.
+    The sequence and the shared settings are validated once, the tools only validate their own settings.
+    """
+    data = request.get_json(silent=True)
+    validation_error = validate_multifold_input(data)
+    if validation_error:
+        return validation_error
+
+    app = current_app._get_current_object()
+    sequence_hash = get_sequence_hash(data["sequence"])
+    with ThreadPoolExecutor(max_workers=len(data["tools"])) as executor:
+        futures = [executor.submit(submit_member, app, tool, create_member_data(tool, data), current_user, sequence_hash)
+                   for tool in data["tools"]]
+        results = [future.result() for future in futures]
+
+    submitted = [{"tool": result["tool"], "job": result["jobName"]} for result in results if result["success"]]
+    if not submitted:
+        return jsonify({"error": "No MultiFold job was submitted.", "jobs": results}), 400
+
+    group_id = create_job_group(get_multifold_name(data["jobName"]), submitted, current_user)
+    logging.info(f"MultiFold group {group_id} of user {current_user}: {len(submitted)} of {len(results)} jobs submitted.")
+    return jsonify({"groupId": group_id, "jobs": results}), 200
+
+
+@multifold.route("/group/<string:group_id>")
+@token_required
+def get_group_status(group_id, current_user):
+    """
+    Get the status of the jobs of the group and their counts in one call.
+    With ?wait=<seconds> the request waits until all the jobs finished (at most GROUP_WAIT_LIMIT seconds),
+    so clients learn about the readiness of the group without polling every job.
+    """
+    group = get_job_group(group_id, current_user)
+    if group is None:
+        return jsonify({"error": f"Job group {group_id} not found."}), 404
+
+    status = get_job_group_status(group, current_user)
+    wait = min(request.args.get("wait", default=0, type=float), GROUP_WAIT_LIMIT)
+    if status["ready"] or wait <= 0:
+        return jsonify(status)
+
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(GROUP_POLL_INTERVAL)
+        group = get_job_group(group_id, current_user)
+        if group is None:
+            return jsonify({"error": f"Job group {group_id} not found."}), 404
+        if group.get("readyAt"):
+            break
+
+    return jsonify(get_job_group_status(group, current_user))
+
+
+@multifold.route("/group/<string:group_id>/models")
+@token_required
+def get_group_models(group_id, current_user):
+    """Get the aligned models of the finished jobs of the group, the jobs still running are listed as pending."""
+    group = get_job_group(group_id, current_user)
+    if group is None:
+        return jsonify({"error": f"Job group {group_id} not found."}), 404
+
+    status = get_job_group_status(group, current_user)
+    members = {member_status: [member["job"] for member in status["members"] if member["status"] == member_status]
+               for member_status in MEMBER_STATUSES}
+
+    models = {}
+    if members["done"]:
+        models = get_aligned_multifold_structures(members["done"], current_user)
+        if not models:
+            logging.error(f"Error aligning models of job group {group_id}")
+            return jsonify({"error": f"Error aligning models of job group: {group['name']}"}), 500
+
+    return jsonify({"name": group["name"], "ready": status["ready"], "models": models,
+                    "pending": members["running"], "failed": members["failed"]})
@@ -6,9 +6,15 @@ from kubernetes import client
 from app.shared.input_validation import (
     validate_job_name,
     validate_sequence,
+    validate_sequence_length,
     validate_numeric_input,
     validate_email)
 from app.shared.job_submitting import generate_random_suffix, create_simple_name
+from app.shared.gpu_profiles import select_gpu_resource, get_allowed_gpu_products
+from app.shared.gpu_capacity import set_required_gpu_products
+from app.shared.images import resolve_image, get_image_pull_policy
+from app.shared.job_events import EVENT_FUNCTION_CMD, event_cmd, outcome_event_cmd, failure_mail_cmd, get_event_env
+from app.shared.job_runner import RUNNER_CMD, job_runner_enabled, get_runner_config, get_runner_env
 from config import Config
 
 
@@ -35,8 +41,14 @@ def validate_input(data):
     if validate_job_name(data["jobName"]):
         return validate_job_name(data["jobName"])
 
-    if validate_sequence(data["proteinSequence"]):
-        return validate_sequence(data["proteinSequence"])
+    sequenceError = validate_sequence(data["proteinSequence"], allow_chain_separator=True)
+    if sequenceError:
+        return sequenceError
+
+    # OmegaFold predicts every record of the input separately
+    sequenceLengthError = validate_sequence_length(data["proteinSequence"], "OmegaFold", per_record=True)
+    if sequenceLengthError:
+        return sequenceLengthError
 
     if data["numCycle"] not in ["1", "2", "4", "8", "16", "32"]:
         return jsonify({"message": "Invalid number of cycles."}), 400
@@ -50,6 +62,9 @@ def validate_input(data):
     if data["forceComputation"] not in [True, False]:
         return jsonify({"message": "Invalid force computation flag."}), 400
 
+    if data.get("allowReuse", False) not in [True, False]:
+        return jsonify({"message": "Invalid allow reuse flag."}), 400
+
     if validate_email(data["email"]):
         return jsonify({"message": "Invalid email address."}), 400
 
@@ -81,8 +96,10 @@ def create_job_config(data, user):
         "weights_file": "/data/omegafold/1.1.0/release1.pt",
         "forceComputation": data["forceComputation"],
         "makeResultsPublic": str(data["makeResultsPublic"]).lower(),
+        "allowReuse": str(data.get("allowReuse", False)).lower(),
         "email": data["email"],
         "service": "OmegaFold",
+        "submission": dict(data),
 
         "container": Config.OMEGAFOLD_IMAGE,
         "nodeselector": "",
@@ -107,16 +124,31 @@ def create_file_config(jobConfig):
         "msa_mask_rate": jobConfig["pseudoMsaMask"],
         "num_msa": jobConfig["numPseudoMSAs"],
         "public": jobConfig["makeResultsPublic"],
+        "allowReuse": jobConfig["allowReuse"],
         "service": jobConfig["service"]
     }
 
     return fileConfig
 
 
-def create_job_object(jobConfig, user):
-    """Create Kubernetes Job Object."""
+def create_job_object(jobConfig, user, target):
+    """Create Kubernetes Job Object for the chosen target."""
     salt = ''.join(random.choice(string.ascii_letters + string.digits) for i in range(64))
-    ofArgs = f'mkdir -p /mnt/output/{user}/{jobConfig["outputDir"]} && /usr/local/bin/omegafold {jobConfig["input"]} /mnt/output/{user}/{jobConfig["outputDir"]} --num_cycle {jobConfig["numCycle"]} --subbatch_size {jobConfig["subbatchSize"]}  --weights_file {jobConfig["weights_file"]} --pseudo_msa_mask_rate {jobConfig["pseudoMsaMask"]} --num_pseudo_msa {jobConfig["numPseudoMSAs"]} 2>&1 | tee /mnt/output/{user}/{jobConfig["outputDir"]}/stdout && if [ "{jobConfig["makeResultsPublic"]}" == "true" ] ; then ln -sfr /mnt/output/{user}/{jobConfig["outputDir"]} /mnt/output/public/{jobConfig["outputDir"]} ; fi ; cd /mnt/output/{user} ; cp -r {jobConfig["outputDir"]} /storage ; zip -0 -r {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}; mv {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}/download-{salt}.zip ; if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then touch "/mnt/output/{user}/{jobConfig["outputDir"]}/omegafold.done"; fi; if [ ! -z "{jobConfig["email"]}" ]; then if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:OmegaFold computation has finished\n\nYour OmegaFold computation "\"{jobConfig["simplename"]}\"" has finished, please visit {Config.BASE_URL}/result/{jobConfig["simplename"]} to view the result of your computation\n" | ssmtp -t; else echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:Omegafold computation has failed\n\nYour omegafold computation "\"{jobConfig["simplename"]}\"" has failed.\n" | cat - /mnt/output/{user}/{jobConfig["outputDir"]}/stdout | ssmtp -t;  fi; fi'
+    failureMailCmd = failure_mail_cmd(f'/mnt/output/{user}/{jobConfig["outputDir"]}')
+    inferenceEventCmd = outcome_event_cmd(f'[ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ]')
+    # The post-processing runs in the Python runner of the job pod when it is enabled
+    runnerConfig = None
+    if job_runner_enabled():
+        runnerConfig = get_runner_config(user, jobConfig["outputDir"], jobConfig["simplename"], "OmegaFold", "omegafold.done", "*.pdb",
+                                         jobConfig["makeResultsPublic"] == "true", jobConfig["email"], salt)
+    ofArgs = f'{EVENT_FUNCTION_CMD} && mkdir -p /mnt/output/{user}/{jobConfig["outputDir"]} && {event_cmd("started")} && /usr/local/bin/omegafold {jobConfig["input"]} /mnt/output/{user}/{jobConfig["outputDir"]} --num_cycle {jobConfig["numCycle"]} --subbatch_size {jobConfig["subbatchSize"]}  --weights_file {jobConfig["weights_file"]} --pseudo_msa_mask_rate {jobConfig["pseudoMsaMask"]} --num_pseudo_msa {jobConfig["numPseudoMSAs"]} 2>&1 | tee /mnt/output/{user}/{jobConfig["outputDir"]}/stdout && {inferenceEventCmd}'
+    if runnerConfig:
+        ofArgs += f' && {RUNNER_CMD}'
+    else:
+        ofArgs += f' && if [ "{jobConfig["makeResultsPublic"]}" == "true" ] ; then ln -sfr /mnt/output/{user}/{jobConfig["outputDir"]} /mnt/output/public/{jobConfig["outputDir"]} ; fi ; cd /mnt/output/{user} ; cp -r {jobConfig["outputDir"]} /storage ; zip -0 -r {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}; mv {jobConfig["outputDir"]}.zip {jobConfig["outputDir"]}/download-{salt}.zip ; if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then touch "/mnt/output/{user}/{jobConfig["outputDir"]}/omegafold.done"; {event_cmd("archived")}; fi; if [ ! -z "{jobConfig["email"]}" ]; then if [ -s "/mnt/output/{user}/{jobConfig["outputDir"]}/"*.pdb ] ; then echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:OmegaFold computation has finished\n\nYour OmegaFold computation "\"{jobConfig["simplename"]}\"" has finished, please visit {Config.BASE_URL}/result/{jobConfig["simplename"]} to view the result of your computation\n" | ssmtp -t; else echo -e "To:{jobConfig["email"]}\nFrom:{Config.EMAIL_FROM}\nSubject:Omegafold computation has failed\n\nYour omegafold computation "\"{jobConfig["simplename"]}\"" has failed.\n" | cat - /mnt/output/{user}/{jobConfig["outputDir"]}/stdout | {failureMailCmd};  fi; fi'
+
+    image = resolve_image(jobConfig["container"])
+    gpuResource = select_gpu_resource(jobConfig["service"], jobConfig["proteinSequence"], target)
 
     job = client.V1Job(
         api_version="batch/v1",
@@ -124,26 +156,13 @@ def create_job_object(jobConfig, user):
         metadata=client.V1ObjectMeta(
             name=jobConfig["uniquename"],
             annotations={"user": jobConfig["user"], "simplename": jobConfig["simplename"],
-                         "public": jobConfig["makeResultsPublic"]}),
+                         "public": jobConfig["makeResultsPublic"], "target": target["name"], "service": jobConfig["service"]}),
         spec=client.V1JobSpec(
             ttl_seconds_after_finished=100,
             backoff_limit=0,
             template=client.V1PodTemplateSpec(
                 spec=client.V1PodSpec(
                     restart_policy="Never",
-                    affinity=client.V1Affinity(
-                        node_affinity=client.V1NodeAffinity(
-                            required_during_scheduling_ignored_during_execution=client.V1NodeSelector(
-                                node_selector_terms=[client.V1NodeSelectorTerm(
-                                    match_expressions=[client.V1NodeSelectorRequirement(
-                                        key="nvidia.com/gpu.product",
-                                        operator="In",
-                                        values=['NVIDIA-A100-80GB-PCIe', 'NVIDIA-H100-PCIe']
-                                    )]
-                                )]
-                            )
-                        )
-                    ),
                     security_context=client.V1PodSecurityContext(
                         run_as_non_root=True,
                         seccomp_profile=client.V1SeccompProfile(type="RuntimeDefault"),
@@ -152,13 +171,15 @@ def create_job_object(jobConfig, user):
                     containers=[
                         client.V1Container(
                             name=jobConfig["uniquename"],
-                            image=jobConfig["container"],
-                            image_pull_policy="IfNotPresent",
+                            image=image,
+                            image_pull_policy=get_image_pull_policy(image),
                             command=["bash"],
                             args=["-c",
                                   ofArgs],
                             env=[client.V1EnvVar(name="TF_FORCE_UNIFIED_MEMORY", value="1"),
-                                 client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")],
+                                 client.V1EnvVar(name="XLA_PYTHON_CLIENT_MEM_FRACTION", value="4.0")]
+                                + get_event_env(target, user, jobConfig["simplename"], jobConfig["uniquename"])
+                                + (get_runner_env(runnerConfig) if runnerConfig else []),
                             security_context=client.V1SecurityContext(
                                 run_as_user=1000,
                                 run_as_group=1000,
@@ -166,8 +187,8 @@ def create_job_object(jobConfig, user):
                                 capabilities=client.V1Capabilities(drop=["ALL"]),
                             ),
                             resources=client.V1ResourceRequirements(
-                                requests={"cpu": "4", "memory": "64Gi", "nvidia.com/gpu": "1"},
-                                limits={"cpu": "4", "memory": "128Gi", "nvidia.com/gpu": "1"}
+                                requests={"cpu": "4", "memory": "64Gi", gpuResource: "1"},
+                                limits={"cpu": "4", "memory": "128Gi", gpuResource: "1"}
                             ),
                             volume_mounts=[client.V1VolumeMount(name="vol-1", mount_path="/data"),
                                            client.V1VolumeMount(name="vol-2", mount_path="/mnt"),
@@ -178,19 +199,24 @@ def create_job_object(jobConfig, user):
                     ],
                     volumes=[client.V1Volume(name="vol-1",
                                              persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                                 claim_name=Config.PVC_VOL1_ALPHAFOLD)),
+                                                 claim_name=target["pvcs"]["PVC_VOL1_ALPHAFOLD"])),
                              client.V1Volume(name="vol-2",
                                              persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                                 claim_name=Config.PVC_VOL2)),
+                                                 claim_name=target["pvcs"]["PVC_VOL2"])),
                              client.V1Volume(name="dshm", empty_dir=client.V1EmptyDirVolumeSource(medium="Memory",
                                                                                                   size_limit="120Gi")),
                              client.V1Volume(name="storage",
                                              persistent_volume_claim=client.V1PersistentVolumeClaimVolumeSource(
-                                                 claim_name=Config.PVC_STORAGE))
+                                                 claim_name=target["pvcs"]["PVC_STORAGE"]))
                              ],
                 )
             )
         )
     )
 
+    # Full GPUs only on the products with enough memory, the fractional GPUs were sized for the sequence length
+    gpuProducts = get_allowed_gpu_products(jobConfig["service"], gpuResource)
+    if gpuProducts:
+        set_required_gpu_products(job.spec.template.spec, gpuProducts)
+
     return job
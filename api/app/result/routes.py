@@ -1,7 +1,7 @@
 import os
-from flask import jsonify, Blueprint
+from flask import jsonify, Blueprint, request
 
-from app.shared.job_info import job_done, get_start, get_service, get_publicity, set_publicity
+from app.shared.job_info import job_done, get_start, get_service, get_publicity, set_publicity, set_jobs_publicity
 from app.shared.common import get_input_path, get_output_path, get_input_dir
 from app.result.utilities import load_json_data, read_file_content, create_molstar_url, get_plddt_data, get_model_path, get_output_files, get_input_files, get_aligned_multifold_structures, parse_af3_json
 from app.wrappers import token_required
@@ -11,6 +11,9 @@ result = Blueprint("result", __name__)
 
 import logging
 
+# Most jobs whose publicity is changed by one request
+MAX_PUBLICITY_JOBS = 1000
+
 @result.route("/<string:job_name>")
 @token_required
 def get_result(job_name, current_user):
@@ -146,6 +149,38 @@ def switch_publicity(job_name, current_user):
         logging.error(f"Error switching publicity for job {job_name}: {str(e)}")
         return jsonify({"error": f"Internal server error while switching publicity for job: {job_name}"}), 500
 
+@result.route("/switch_publicity", methods=["POST"])
+@token_required
+def switch_jobs_publicity(current_user):
+    """
+    Set the publicity of several jobs of the user at once, e.g. {"jobs": ["job1", "job2"], "publicity": "Public"}.
+
+    The ownership of the jobs is checked in one pass and their symlinks are changed concurrently.
+    Returns the result of each job, the jobs which are not owned by the user or fail do not stop the others.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request must be a JSON object."}), 400
+
+    jobs = data.get("jobs")
+    publicity = data.get("publicity")
+    if not isinstance(jobs, list) or not jobs or not all(isinstance(job, str) and job for job in jobs):
+        return jsonify({"error": "Jobs must be a non-empty list of job names."}), 400
+    if len(jobs) > MAX_PUBLICITY_JOBS:
+        return jsonify({"error": f"At most {MAX_PUBLICITY_JOBS} jobs can be changed at once."}), 400
+    if publicity not in ["Public", "Private"]:
+        return jsonify({"error": "Publicity must be Public or Private."}), 400
+
+    try:
+        results = set_jobs_publicity(list(dict.fromkeys(jobs)), current_user, publicity)
+    except Exception as e:
+        logging.error(f"Error setting the publicity of jobs of user {current_user}: {e}")
+        return jsonify({"error": "Internal server error while setting the publicity of the jobs."}), 500
+
+    failed = sum(1 for job_result in results.values() if "error" in job_result)
+    logging.info(f"User {current_user} set {len(results) - failed} jobs {publicity}, {failed} failed.")
+    return jsonify({"publicity": publicity, "jobs": results, "failed": failed})
+
 @result.route("/<string:job_name>/sequence")
 @token_required
 def get_sequence(job_name, current_user):
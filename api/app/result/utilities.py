@@ -444,7 +444,7 @@ def get_aligned_multifold_structures(job_list, user):
         model_path = get_model_path(job_name, user)
         if not model_path:
             logging.error(f"Error loading model file for job: {job_name}")
-            return jsonify({"error": f"Error loading model file for job: {job_name}"}), 404
+            return None
         
         try:
             with open(model_path, "r") as f:
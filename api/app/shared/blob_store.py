@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+import stat
+import tempfile
+
+from app.shared.common import get_blob_store_path
+from config import Config
+
+# Block size of the reads hashing an input file
+DIGEST_BLOCK_SIZE = 1024 * 1024
+
+
+def blob_store_enabled():
+    """Check if the input files of the jobs are stored once per content and linked to the jobs."""
+    return getattr(Config, "INPUT_BLOB_STORE", False)
+
+
+def get_file_digest(path):
+    """Return the sha256 digest of the file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DIGEST_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_blob_path(digest):
+    """Return the path of the stored input content with the digest."""
+    return get_blob_store_path(digest[:2], digest)
+
+
+def get_sole_blob(path):
+    """Return the stored content the input file is the only job file of, or None."""
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISREG(st.st_mode) or st.st_nlink != 2:
+        return None
+
+    blob_path = get_blob_path(get_file_digest(path))
+    try:
+        return blob_path if os.path.samefile(blob_path, path) else None
+    except FileNotFoundError:
+        return None
+
+
+def remove_orphan_blob(blob_path):
+    """Remove the stored content when no job file links to it anymore."""
+    try:
+        if os.stat(blob_path).st_nlink == 1:
+            os.remove(blob_path)
+    except FileNotFoundError:
+        pass
+
+
+def link_blob(tmp_path, path):
+    """Store the content of the temporary file once and replace the path by a hard link to it, consumes the temporary file."""
+    blob_path = get_blob_path(get_file_digest(tmp_path))
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    try:
+        # New content, the temporary file becomes the stored content
+        os.link(tmp_path, blob_path)
+    except FileExistsError:
+        link_path = f"{tmp_path}.link"
+        os.link(blob_path, link_path)
+        os.replace(link_path, path)
+        os.remove(tmp_path)
+        return
+    os.replace(tmp_path, path)
+
+
+def save_input_file(tmp_path, path):
+    """
+    Move the written temporary file to the input path atomically, a job never reads a partial file
+    and the file is never modified in place, which would change the inputs of the jobs sharing it.
+    With the blob store, identical inputs of all the jobs are one hard link each to the same stored file.
+    """
+    previous_blob = get_sole_blob(path)
+    if blob_store_enabled():
+        try:
+            link_blob(tmp_path, path)
+            tmp_path = None
+        except OSError as e:
+            # E.g. the store on another filesystem or too many links, the job gets its own copy
+            logging.warning(f"Input file {path} is not linked to the blob store: {e}")
+    if tmp_path is not None:
+        os.replace(tmp_path, path)
+
+    if previous_blob:
+        remove_orphan_blob(previous_blob)
+
+
+def write_input_file(path, content):
+    """Write the content (text or bytes) to the input path of a job, see save_input_file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".input-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content.encode() if isinstance(content, str) else content)
+        save_input_file(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def release_input_file(path):
+    """Remove the input file of a job, and its stored content when no other job links to it."""
+    blob_path = get_sole_blob(path)
+    os.remove(path)
+    if blob_path:
+        remove_orphan_blob(blob_path)
@@ -72,6 +72,27 @@ def get_output_path(job_name, user="public"):
     return os.path.join(base_dir, "output", user, job_name)
 
 
+def get_index_path(*parts):
+    """Return the path in the directory of the API's own indexes and job state, next to the input and output directories."""
+    base_dir = get_working_directory()
+
+    return os.path.join(base_dir, "index", *parts)
+
+
+def get_msa_store_path(*parts):
+    """Return the path in the MSA store shared by the jobs, next to the input and output directories."""
+    base_dir = get_working_directory()
+
+    return os.path.join(base_dir, "msa", *parts)
+
+
+def get_blob_store_path(*parts):
+    """Return the path in the store of the job input files, each content stored once, next to the input directory."""
+    base_dir = get_working_directory()
+
+    return os.path.join(base_dir, "blobs", *parts)
+
+
 def get_user_jobs(user):
     """Return the list of jobs based on the .fasta files in the user's input directory."""
     user_jobs = []
@@ -3,14 +3,22 @@ import os
 import shutil
 from flask import jsonify
 from app.shared.common import get_output_path, get_input_path
+from app.shared.job_state import clear_job_state
+from app.shared.job_names import release_job_name
+from app.shared.inflight import remove_inflight_job
+from app.shared.job_groups import remove_job_group_member
+from app.shared.submissions import remove_job_submission
+from app.shared.sequence_index import remove_job_sequence
+from app.shared.result_cache import remove_job_result
+from app.shared.blob_store import release_input_file
 
 def delete_path(path, is_dir=False):
-    """Delete a path."""
+    """Delete a path, an input file also from the blob store when no other job links to it."""
     try:
         if is_dir:
             shutil.rmtree(path)
         else:
-            os.remove(path)
+            release_input_file(path)
     except FileNotFoundError:
         logging.info(f"Path {path} not found, skipping deletion.")
         pass
@@ -39,6 +47,7 @@ def delete_job_files(job_name, user):
         {"path": get_output_path(job_name, user), "is_dir": True},
         {"path": get_input_path(job_name, "fasta", user), "is_dir": False},
         {"path": get_input_path(job_name, "json", user), "is_dir": False},
+        {"path": get_input_path(job_name + "-ccd", "cif", user), "is_dir": False},
         {"path": get_input_path(job_name, "fasta", "public"), "is_dir": False},
         {"path": get_input_path(job_name, "json", "public"), "is_dir": False}
     ]
@@ -58,4 +67,12 @@ def delete_job_files(job_name, user):
         if result:
             return jsonify({"message": f"Error deleting symlinks for {job_name}."}), 500
 
+    clear_job_state(job_name, user)
+    release_job_name(job_name, user)
+    remove_job_sequence(job_name, user)
+    remove_job_result(job_name, user)
+    remove_inflight_job(job_name, user)
+    remove_job_group_member(job_name, user)
+    remove_job_submission(job_name, user)
+
     return None
@@ -0,0 +1,48 @@
+def split_sequence_input(sequence_input):
+    """Split the sequence input into individual sequences by '>' character."""
+    try:
+        sequences = sequence_input.split(">")
+    except AttributeError:
+        return None
+
+    formatted_sequences = []
+    for seq in sequences:
+        if seq == "":
+            continue
+        else:
+            seq = ">" + seq
+            formatted_sequences.append(seq)
+
+    return formatted_sequences
+
+
+def iter_fasta_records(lines):
+    """
+    Parse FASTA records from an iterable of lines (str or bytes, e.g. an uploaded file stream) one record at a time.
+
+    Yields (header, sequence) pairs, the header without '>' and the sequence without whitespace.
+    Lines before the first header are yielded as a record with the header None.
+    Only the record being parsed is held in memory.
+    """
+    header, parts = None, []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith(">"):
+            if header is not None or parts:
+                yield header, "".join(parts)
+            header, parts = line[1:].strip(), []
+        else:
+            parts.append("".join(line.split()))
+
+    if header is not None or parts:
+        yield header, "".join(parts)
+
+
+def format_fasta_record(header, sequence):
+    """Return the FASTA text of one record."""
+    return f">{header}\n{sequence}\n"
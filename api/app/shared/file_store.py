@@ -0,0 +1,42 @@
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+def write_json_atomic(path, data):
+    """Write the JSON data to the path atomically, readers see either the old or the new content."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_json(path, default=None):
+    """Read the JSON data from the path, return the default if the file does not exist or is invalid."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on the lock file next to the path, for read-modify-write updates."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,294 @@
+import logging
+import threading
+import time
+from kubernetes import client
+
+from app.shared.kubernetes import get_core_api, follow_resource, namespaced_list_fn
+from app.shared.targets import load_targets
+
+GPU_PRODUCT_LABEL = "nvidia.com/gpu.product"
+UNKNOWN_PRODUCT = "unknown"
+
+# Seconds a request waits for the first node and pod lists of a monitor started on demand
+SYNC_TIMEOUT = 5
+
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def is_gpu_resource(resource):
+    """Check if the resource name is a GPU resource (full, MIG or time-sliced GPU)."""
+    return resource.startswith("nvidia.com/gpu") or resource.startswith("nvidia.com/mig-")
+
+
+def parse_quantity(value):
+    """Parse an integer resource quantity, extended resources like GPUs are always whole numbers."""
+    try:
+        return int(str(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_node_gpus(node):
+    """Return the GPU product and the allocatable GPU resources of the node."""
+    labels = node.metadata.labels or {}
+    allocatable = (node.status.allocatable or {}) if node.status else {}
+    gpus = {resource: parse_quantity(value) for resource, value in allocatable.items() if is_gpu_resource(resource)}
+
+    return {
+        "product": labels.get(GPU_PRODUCT_LABEL, UNKNOWN_PRODUCT),
+        "schedulable": not (node.spec and node.spec.unschedulable),
+        "allocatable": {resource: count for resource, count in gpus.items() if count > 0},
+    }
+
+
+def get_pod_gpu_requests(pod):
+    """Return the GPU resources requested by the containers of the pod."""
+    requests = {}
+    for container in pod.spec.containers or []:
+        resources = container.resources
+        if not resources:
+            continue
+        # Extended resources must have requests equal to limits, the limits are used when requests are missing
+        values = resources.requests or resources.limits or {}
+        for resource, value in values.items():
+            if is_gpu_resource(resource):
+                requests[resource] = requests.get(resource, 0) + parse_quantity(value)
+    return requests
+
+
+def pod_holds_gpus(pod):
+    """Check if the pod still holds (or waits for) its GPUs."""
+    return pod.status is None or pod.status.phase not in ["Succeeded", "Failed"]
+
+
+def get_required_gpu_products(pod_spec):
+    """Return the GPU products the pod is restricted to by its node affinity, None if it is not restricted."""
+    affinity = pod_spec.affinity.node_affinity if pod_spec.affinity else None
+    required = affinity.required_during_scheduling_ignored_during_execution if affinity else None
+    for term in (required.node_selector_terms or []) if required else []:
+        for expression in term.match_expressions or []:
+            if expression.key == GPU_PRODUCT_LABEL and expression.operator == "In":
+                return list(expression.values)
+    return None
+
+
+def set_required_gpu_products(pod_spec, products):
+    """Restrict the pod to nodes with one of the GPU products, replacing any previous GPU product restriction."""
+    expression = client.V1NodeSelectorRequirement(key=GPU_PRODUCT_LABEL, operator="In", values=list(products))
+    if pod_spec.affinity is None:
+        pod_spec.affinity = client.V1Affinity()
+    if pod_spec.affinity.node_affinity is None:
+        pod_spec.affinity.node_affinity = client.V1NodeAffinity()
+    node_affinity = pod_spec.affinity.node_affinity
+    if node_affinity.required_during_scheduling_ignored_during_execution is None:
+        node_affinity.required_during_scheduling_ignored_during_execution = client.V1NodeSelector(
+            node_selector_terms=[client.V1NodeSelectorTerm(match_expressions=[])])
+
+    # Node selector terms are ORed, every term gets the restriction
+    for term in node_affinity.required_during_scheduling_ignored_during_execution.node_selector_terms:
+        expressions = [item for item in term.match_expressions or [] if item.key != GPU_PRODUCT_LABEL]
+        term.match_expressions = expressions + [expression]
+
+
+class GpuCapacityMonitor:
+    """
+    Cached view of the allocatable and requested GPUs of one target, kept up to date by node and pod watches.
+
+    Nodes and pods are listed once and then followed by watches running in daemon threads. When the API
+    does not allow to watch the pods of the whole cluster, only the pods of the target namespace are counted.
+    When it does not allow to list the nodes (the foldify-gpu-capacity-reader ClusterRole is missing), the
+    monitor logs a warning, reports the error in its snapshot and its capacity stays unknown.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._lock = threading.Lock()
+        self._nodes = {}  # node name: node GPU info
+        self._pods = {}  # pod uid: {"node": node name, "requests": GPU requests}
+        self._cluster_scope = True
+        self._updated = None
+        self._started = False
+        self._listed = set()
+        self._synced = threading.Event()
+        self._error = None
+
+    def start(self):
+        """List the nodes and pods and start following their changes."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        core_api = get_core_api(self.target)
+        try:
+            core_api.list_node(limit=1)
+        except client.exceptions.ApiException as e:
+            if e.status in [401, 403]:
+                logging.warning(f"GPU capacity of target {self.target['name']} is not available, the service account "
+                                f"cannot list the nodes (apply the foldify-gpu-capacity-reader ClusterRole): {e.reason}")
+                self._error = "The nodes of the cluster cannot be listed."
+                self._synced.set()
+                return
+        except Exception as e:
+            logging.warning(f"Cannot list the nodes of target {self.target['name']}, the watch retries: {e}")
+
+        followers = [
+            ("nodes", core_api.list_node, self.set_nodes, self.on_node_event),
+            ("pods", self._get_pod_list_fn(core_api), self.set_pods, self.on_pod_event),
+        ]
+        for name, list_fn, on_list, on_event in followers:
+            description = f"{name} of target {self.target['name']}"
+            thread = threading.Thread(target=follow_resource, args=(description, list_fn, on_list, on_event),
+                                      name=f"gpu-monitor-{self.target['name']}-{name}", daemon=True)
+            thread.start()
+
+    def _get_pod_list_fn(self, core_api):
+        """Return the list call for the pods of the cluster, or of the target namespace when cluster-wide access is denied."""
+        try:
+            core_api.list_pod_for_all_namespaces(limit=1)
+            self._cluster_scope = True
+            return core_api.list_pod_for_all_namespaces
+        except Exception as e:
+            logging.warning(f"Cannot list pods of the whole cluster, counting namespace {self.target['namespace']} only: {e}")
+            self._cluster_scope = False
+
+        return namespaced_list_fn(core_api.list_namespaced_pod, self.target["namespace"])
+
+    def _set_listed(self, name):
+        """Record the first list of the nodes or pods, the monitor is synced once both were listed."""
+        self._listed.add(name)
+        if self._listed == {"nodes", "pods"}:
+            self._synced.set()
+
+    def wait_synced(self, timeout):
+        """Wait until the nodes and pods were listed (or the nodes cannot be listed), returns whether they were."""
+        return self._synced.wait(timeout)
+
+    def set_nodes(self, nodes):
+        """Replace the cached nodes with a fresh list."""
+        with self._lock:
+            self._nodes = {node.metadata.name: get_node_gpus(node) for node in nodes}
+            self._updated = time.time()
+            self._set_listed("nodes")
+
+    def on_node_event(self, event_type, node):
+        """Update the cached node from a watch event."""
+        with self._lock:
+            if event_type == "DELETED":
+                self._nodes.pop(node.metadata.name, None)
+            else:
+                self._nodes[node.metadata.name] = get_node_gpus(node)
+            self._updated = time.time()
+
+    def set_pods(self, pods):
+        """Replace the cached pod GPU requests with a fresh list."""
+        gpu_pods = {}
+        for pod in pods:
+            self._store_pod(gpu_pods, pod)
+        with self._lock:
+            self._pods = gpu_pods
+            self._updated = time.time()
+            self._set_listed("pods")
+
+    def on_pod_event(self, event_type, pod):
+        """Update the cached pod GPU requests from a watch event."""
+        with self._lock:
+            self._store_pod(self._pods, pod, event_type)
+            self._updated = time.time()
+
+    def refresh(self, core_api):
+        """Replace the cached nodes and pods with fresh lists, without watching them."""
+        self.set_nodes(core_api.list_node().items)
+        self.set_pods(self._get_pod_list_fn(core_api)().items)
+
+    def _store_pod(self, pods, pod, event_type="ADDED"):
+        """Store or drop the pod GPU requests according to the watch event."""
+        uid = pod.metadata.uid
+        requests = get_pod_gpu_requests(pod)
+        if event_type == "DELETED" or not requests or not pod_holds_gpus(pod):
+            pods.pop(uid, None)
+        else:
+            pods[uid] = {"node": pod.spec.node_name, "requests": requests}
+
+    def get_node_product(self, node_name):
+        """Return the GPU product of the node, None if the node is not known."""
+        with self._lock:
+            node = self._nodes.get(node_name)
+        return node["product"] if node else None
+
+    def snapshot(self):
+        """Return the allocatable, requested and free GPUs grouped by GPU product and GPU resource."""
+        with self._lock:
+            nodes = dict(self._nodes)
+            pods = list(self._pods.values())
+            updated = self._updated
+
+        products = {}
+        for node in nodes.values():
+            if not node["allocatable"]:
+                continue
+            product = products.setdefault(node["product"], {"nodes": 0, "resources": {}})
+            product["nodes"] += 1
+            for resource, count in node["allocatable"].items():
+                totals = product["resources"].setdefault(resource, {"allocatable": 0, "requested": 0, "free": 0})
+                if node["schedulable"]:
+                    totals["allocatable"] += count
+
+        pending = {}
+        for pod in pods:
+            node = nodes.get(pod["node"]) if pod["node"] else None
+            for resource, count in pod["requests"].items():
+                if node is None:
+                    pending[resource] = pending.get(resource, 0) + count
+                    continue
+                totals = products.setdefault(node["product"], {"nodes": 0, "resources": {}})["resources"] \
+                    .setdefault(resource, {"allocatable": 0, "requested": 0, "free": 0})
+                totals["requested"] += count
+
+        for product in products.values():
+            for totals in product["resources"].values():
+                totals["free"] = max(totals["allocatable"] - totals["requested"], 0)
+
+        return {
+            "target": self.target["name"],
+            "scope": "cluster" if self._cluster_scope else "namespace",
+            "updated": updated,
+            "error": self._error,
+            "products": products,
+            "pending": pending,
+        }
+
+    def free_gpus(self, resource="nvidia.com/gpu", products=None):
+        """Return the number of free GPUs of the resource, optionally only on the given GPU products."""
+        snapshot = self.snapshot()
+        return sum(
+            product["resources"].get(resource, {}).get("free", 0)
+            for name, product in snapshot["products"].items()
+            if products is None or name in products
+        )
+
+
+def get_gpu_monitor(target):
+    """Return the started GPU capacity monitor of the target, created on first use."""
+    with _monitors_lock:
+        monitor = _monitors.get(target["name"])
+        if monitor is None:
+            monitor = GpuCapacityMonitor(target)
+            _monitors[target["name"]] = monitor
+    monitor.start()
+    return monitor
+
+
+def get_gpu_monitors():
+    """Return the started GPU capacity monitors of all the configured targets."""
+    return [get_gpu_monitor(target) for target in load_targets()]
+
+
+def get_gpu_capacity():
+    """Return the GPU capacity snapshots of all the configured targets, waiting for the first lists of new monitors."""
+    monitors = get_gpu_monitors()
+    deadline = time.monotonic() + SYNC_TIMEOUT
+    for monitor in monitors:
+        monitor.wait_synced(max(deadline - time.monotonic(), 0))
+    return [monitor.snapshot() for monitor in monitors]
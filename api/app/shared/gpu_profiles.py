@@ -0,0 +1,112 @@
+import json
+import logging
+
+from app.shared.gpu_capacity import get_gpu_monitor
+from config import Config
+
+FULL_GPU_RESOURCE = "nvidia.com/gpu"
+
+# GPU products (nvidia.com/gpu.product node label values) the tools are restricted to on full GPUs,
+# the jobs on fractional GPUs run on any product exposing the resource
+FULL_GPU_PRODUCTS = {"OmegaFold": ["NVIDIA-A100-80GB-PCIe", "NVIDIA-H100-PCIe"]}
+
+_profiles = None
+
+
+def parse_gpu_profiles(raw_profiles):
+    """
+    Parse the FRACTIONAL_GPU_PROFILES configuration value.
+
+    The value is a JSON list of fractional GPU resources (MIG profiles or time-sliced GPUs), smallest first,
+    with the longest sequence every tool can predict within the GPU memory of the resource, e.g.:
+    [{"resource": "nvidia.com/mig-1g.10gb", "maxLength": {"ESMFold": 400, "OmegaFold": 300}},
+     {"resource": "nvidia.com/mig-3g.40gb", "maxLength": {"ESMFold": 1200, "OmegaFold": 900}}]
+
+    Returns an empty list, i.e. full GPUs for all the jobs, if the value is empty or invalid.
+    """
+    if not raw_profiles:
+        return []
+
+    try:
+        parsed = json.loads(raw_profiles)
+    except json.JSONDecodeError as e:
+        logging.error(f"Invalid FRACTIONAL_GPU_PROFILES configuration, using full GPUs: {e}")
+        return []
+
+    if not isinstance(parsed, list):
+        logging.error("FRACTIONAL_GPU_PROFILES must be a JSON list, using full GPUs.")
+        return []
+
+    profiles = []
+    for item in parsed:
+        if not isinstance(item, dict) or not item.get("resource") or not isinstance(item.get("maxLength"), dict):
+            logging.error(f"Skipping FRACTIONAL_GPU_PROFILES entry without resource or maxLength: {item}")
+            continue
+        profiles.append({"resource": item["resource"],
+                         "maxLength": {tool: int(length) for tool, length in item["maxLength"].items()}})
+
+    return profiles
+
+
+def load_gpu_profiles():
+    """Return the configured fractional GPU profiles, parsed once per process."""
+    global _profiles
+    if _profiles is None:
+        _profiles = parse_gpu_profiles(getattr(Config, "FRACTIONAL_GPU_PROFILES", ""))
+    return _profiles
+
+
+def get_sequence_length(sequence):
+    """Return the number of residues of the sequence input, without FASTA headers, chain separators and whitespace."""
+    return sum(
+        len("".join(line.split()).replace(":", ""))
+        for line in sequence.splitlines()
+        if not line.startswith(">")
+    )
+
+
+def get_allowed_gpu_products(tool, resource):
+    """Return the GPU products the job of the tool may run on with the GPU resource, None for any product."""
+    if is_fractional_gpu_resource(resource):
+        return None
+    return FULL_GPU_PRODUCTS.get(tool)
+
+
+def has_free_gpus(target, resource, products=None):
+    """
+    Check if the target has a free GPU of the resource on the given GPU products (any product for None),
+    True when the GPU capacity is not known.
+    """
+    try:
+        monitor = get_gpu_monitor(target)
+        snapshot = monitor.snapshot()
+        if snapshot["updated"] is None or snapshot.get("error"):
+            return True
+        return monitor.free_gpus(resource, products) > 0
+    except Exception as e:
+        logging.warning(f"Cannot check the free {resource} of target {target['name']}: {e}")
+        return True
+
+
+def select_gpu_resource(tool, sequence, target):
+    """
+    Return the GPU resource the job requests: the smallest fractional GPU whose memory envelope fits the tool
+    and the sequence length, preferring fractional GPUs that are free, or a full GPU if none fits.
+    """
+    length = get_sequence_length(sequence)
+    fitting = [profile["resource"] for profile in load_gpu_profiles()
+               if length <= profile["maxLength"].get(tool, 0)]
+    if not fitting:
+        return FULL_GPU_RESOURCE
+
+    for resource in fitting:
+        if has_free_gpus(target, resource, get_allowed_gpu_products(tool, resource)):
+            return resource
+    # All the fitting fractional GPUs are busy, the job waits for one and leaves the full GPUs to the large jobs
+    return fitting[0]
+
+
+def is_fractional_gpu_resource(resource):
+    """Check if the GPU resource is a fractional GPU."""
+    return resource in [profile["resource"] for profile in load_gpu_profiles()]
+
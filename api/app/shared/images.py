@@ -0,0 +1,126 @@
+import json
+import logging
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from config import Config
+
+DOCKER_HUB_REGISTRY = "registry-1.docker.io"
+REGISTRY_TIMEOUT = 10
+# Seconds the tags of a registry which failed to answer are used without asking it again
+REGISTRY_FAILURE_TTL = 60
+
+# Manifest types the registry may answer with, the digest of a multi-architecture index is preferred
+MANIFEST_TYPES = [
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+]
+
+_resolved = {}  # image reference: image pinned to its digest
+_failed_registries = {}  # registry: monotonic time until which its tags are not resolved
+_resolved_lock = threading.Lock()
+
+
+def digest_resolution_enabled():
+    """Check if the configured image tags are pinned to digests."""
+    return bool(getattr(Config, "RESOLVE_IMAGE_DIGESTS", False))
+
+
+def parse_image_reference(image):
+    """Split an image reference into the registry, the repository and the tag."""
+    name, tag = image, "latest"
+    last_part = image.rsplit("/", 1)[-1]
+    if ":" in last_part:
+        name, tag = image.rsplit(":", 1)
+
+    parts = name.split("/", 1)
+    if len(parts) == 2 and ("." in parts[0] or ":" in parts[0] or parts[0] == "localhost"):
+        registry, repository = parts
+    else:
+        registry, repository = DOCKER_HUB_REGISTRY, name
+        if "/" not in repository:
+            repository = f"library/{repository}"
+
+    return registry, repository, tag
+
+
+def parse_auth_challenge(header):
+    """Parse the parameters of a Bearer WWW-Authenticate challenge."""
+    if not header or not header.lower().startswith("bearer "):
+        return None
+    return dict(re.findall(r'(\w+)="([^"]*)"', header))
+
+
+def get_registry_token(challenge):
+    """Get an anonymous pull token from the token service of the registry."""
+    params = {key: challenge[key] for key in ["service", "scope"] if key in challenge}
+    url = f"{challenge['realm']}?{urllib.parse.urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=REGISTRY_TIMEOUT) as response:
+        data = json.load(response)
+    return data.get("token") or data.get("access_token")
+
+
+def fetch_image_digest(image):
+    """Return the digest of the image tag from the registry (Docker Registry HTTP API v2)."""
+    registry, repository, tag = parse_image_reference(image)
+    url = f"https://{registry}/v2/{repository}/manifests/{tag}"
+    headers = {"Accept": ", ".join(MANIFEST_TYPES)}
+
+    for attempt in range(2):
+        request = urllib.request.Request(url, headers=headers, method="HEAD")
+        try:
+            with urllib.request.urlopen(request, timeout=REGISTRY_TIMEOUT) as response:
+                digest = response.headers.get("Docker-Content-Digest")
+                if not digest:
+                    raise ValueError(f"Registry {registry} did not return the digest of {image}")
+                return digest
+        except urllib.error.HTTPError as e:
+            challenge = parse_auth_challenge(e.headers.get("WWW-Authenticate"))
+            if e.code != 401 or challenge is None or attempt > 0:
+                raise
+            headers["Authorization"] = f"Bearer {get_registry_token(challenge)}"
+
+
+def resolve_image(image):
+    """
+    Return the image pinned to the digest of its tag when RESOLVE_IMAGE_DIGESTS is enabled.
+
+    Each tag is resolved once per process, so a moved tag is picked up after a restart of the API.
+    When the registry cannot be reached the tag is used as it is, and the jobs submitted within
+    REGISTRY_FAILURE_TTL seconds use their tags right away instead of waiting for the registry again.
+    """
+    if not image or "@" in image or not digest_resolution_enabled():
+        return image
+
+    registry = parse_image_reference(image)[0]
+    with _resolved_lock:
+        if image in _resolved:
+            return _resolved[image]
+        if _failed_registries.get(registry, 0) > time.monotonic():
+            return image
+
+    try:
+        digest = fetch_image_digest(image)
+    except Exception as e:
+        logging.warning(f"Failed to resolve the digest of image {image}, using the tag for {REGISTRY_FAILURE_TTL} s: {e}")
+        with _resolved_lock:
+            _failed_registries[registry] = time.monotonic() + REGISTRY_FAILURE_TTL
+        return image
+
+    pinned = f"{image}@{digest}"
+    with _resolved_lock:
+        _resolved[image] = pinned
+        _failed_registries.pop(registry, None)
+    logging.info(f"Resolved image {image} to {digest}")
+    return pinned
+
+
+def get_image_pull_policy(image, default="IfNotPresent"):
+    """Return the pull policy of the image, an image pinned to a digest never needs to be pulled again."""
+    return "IfNotPresent" if "@" in image else default
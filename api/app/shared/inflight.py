@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import shutil
+import time
+
+from flask import g, has_app_context
+
+from app.shared.common import get_index_path
+from app.shared.file_store import read_json, write_json_atomic
+from app.shared.job_events import get_event_url
+from app.shared.job_names import take_over_entry
+from app.shared.job_state import add_event_listener, get_job_state, record_job_event
+from app.shared.result_cache import get_job_result_key, link_cached_result, result_cache_enabled
+from app.shared.targets import load_targets
+
+# Stages after which the leader computes nothing more for its followers
+TERMINAL_STAGES = ["archived", "failed"]
+# Claims of submissions which did not reach the cluster in time (e.g. the worker was restarted) are taken over
+CLAIM_TTL = 10 * 60
+# Leaders which did not report any event for this long are not followed (e.g. their events were lost)
+LEADER_TTL = 7 * 24 * 60 * 60
+
+
+def get_leader_path(result_key):
+    """Return the path of the claim of the job computing the result key, created exclusively by its submission."""
+    return get_index_path("inflight", "leaders", result_key[:2], result_key)
+
+
+def get_leading_path(job_name, user):
+    """Return the path holding the result key claimed by the job."""
+    return get_index_path("inflight", "leading", user, job_name)
+
+
+def get_followers_dir(job_name, user):
+    """Return the directory of the jobs waiting for the outputs of the job, one file per follower."""
+    return get_index_path("inflight", "followers", user, job_name)
+
+
+def get_following_path(job_name, user):
+    """Return the path holding the leader the job waits for."""
+    return get_index_path("inflight", "following", user, job_name)
+
+
+def is_leader_active(leader, claim_path):
+    """Check if the claimed job is still computing: queued or running, or being submitted."""
+    state = get_job_state(leader["job"], leader["user"])
+    if state is None:
+        try:
+            return time.time() - os.path.getmtime(claim_path) < CLAIM_TTL
+        except FileNotFoundError:
+            return False
+    return state.get("stage") not in TERMINAL_STAGES and time.time() - state.get("updated", 0) < LEADER_TTL
+
+
+def inflight_enabled(job_name, user):
+    """
+    Check if the job can wait for an identical job being computed. The followers only finish with the events of
+    the leader's pods, so the target of the leader, chosen after the claim, must post them to the API.
+    """
+    return result_cache_enabled() and all(get_event_url(target, user, job_name) is not None for target in load_targets())
+
+
+def claim_inflight_job(jobConfig, fileConfig, user):
+    """
+    Claim the computation of the job's result, or find the identical job already computing it.
+
+    Returns the (owner, job name) of the queued or running job with the same tool, version, sequence and settings
+    the job can follow instead of running: the user's own job or a job its owner shares. Otherwise the job claims
+    the result (the claim is released at the end of the request unless the job is submitted) and None is returned.
+    Nothing is claimed when the job pods do not post their events.
+    """
+    job_name = jobConfig["simplename"]
+    if jobConfig["forceComputation"] or not inflight_enabled(job_name, user):
+        return None
+
+    result_key = get_job_result_key(jobConfig, fileConfig)
+    claim_path = get_leader_path(result_key)
+    os.makedirs(os.path.dirname(claim_path), exist_ok=True)
+
+    for _ in range(2):
+        try:
+            fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            leader = read_json(claim_path)
+            if leader is None:
+                # The claim is being written, the job runs on its own
+                return None
+            if is_leader_active(leader, claim_path):
+                if leader["user"] == user or leader["shared"]:
+                    return leader["user"], leader["job"]
+                return None
+            take_over_entry(claim_path)
+            continue
+
+        shared = fileConfig.get("public") == "true" or fileConfig.get("allowReuse") == "true"
+        with os.fdopen(fd, "w") as f:
+            json.dump({"user": user, "job": job_name, "shared": shared}, f)
+        write_json_atomic(get_leading_path(job_name, user), {"resultKey": result_key})
+        if has_app_context():
+            g.setdefault("inflight_claims", []).append((job_name, user))
+        return None
+
+    return None
+
+
+def confirm_inflight_claim(job_name, user):
+    """Keep the claim of the job once it is submitted."""
+    if has_app_context():
+        g.inflight_claims = [claim for claim in g.get("inflight_claims", []) if claim != (job_name, user)]
+
+
+def release_inflight_claim(job_name, user, stage="failed"):
+    """Release the claim of the job and end the wait of its followers, with the given stage if they did not get the outputs."""
+    leading = read_json(get_leading_path(job_name, user))
+    if leading:
+        claim_path = get_leader_path(leading["resultKey"])
+        claim = read_json(claim_path) or {}
+        if (claim.get("user"), claim.get("job")) == (user, job_name):
+            take_over_entry(claim_path)
+        try:
+            os.remove(get_leading_path(job_name, user))
+        except FileNotFoundError:
+            pass
+
+    if stage == "failed":
+        for follower_job, follower_user in get_followers(job_name, user):
+            record_job_event(follower_job, follower_user, {"stage": "failed"})
+            remove_follower(job_name, user, follower_job, follower_user)
+
+
+def release_pending_inflight_claims(exception=None):
+    """Release the claims of the jobs the request did not submit, their followers fail."""
+    for job_name, user in g.pop("inflight_claims", []):
+        logging.info(f"Releasing the in-flight claim of job {job_name} of user {user}.")
+        release_inflight_claim(job_name, user)
+
+
+def get_followers(job_name, user):
+    """Return the (job name, user) of the jobs following the job."""
+    followers = []
+    followers_dir = get_followers_dir(job_name, user)
+    if not os.path.isdir(followers_dir):
+        return followers
+    for follower_user in sorted(os.listdir(followers_dir)):
+        for follower_job in sorted(os.listdir(os.path.join(followers_dir, follower_user))):
+            followers.append((follower_job, follower_user))
+    return followers
+
+
+def remove_follower(leader_job, owner, job_name, user):
+    """Stop the job following the leader."""
+    for path in [os.path.join(get_followers_dir(leader_job, owner), user, job_name), get_following_path(job_name, user)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def link_leader_outputs(leader_job, owner, job_name, user):
+    """Create the outputs of the follower from the outputs of its finished leader and mark it archived."""
+    follower = read_json(os.path.join(get_followers_dir(leader_job, owner), user, job_name))
+    if follower is None:
+        return
+
+    link_cached_result((owner, leader_job), {"simplename": job_name, "makeResultsPublic": follower["public"]}, user)
+    remove_follower(leader_job, owner, job_name, user)
+    record_job_event(job_name, user, {"stage": "archived"})
+
+
+def follow_inflight_job(leader, jobConfig, user):
+    """
+    Register the submitted job as a follower of the identical job, its outputs are linked when the leader finishes
+    and the events of the leader's pods are recorded to its state meanwhile. Call it once the input files are written.
+    """
+    owner, leader_job = leader
+    job_name = jobConfig["simplename"]
+    leader_state = get_job_state(leader_job, owner) or {}
+
+    write_json_atomic(os.path.join(get_followers_dir(leader_job, owner), user, job_name),
+                      {"public": jobConfig["makeResultsPublic"], "time": time.time()})
+    write_json_atomic(get_following_path(job_name, user), {"user": owner, "job": leader_job})
+    record_job_event(job_name, user, {"stage": "submitted", "job": leader_state.get("k8sJob"),
+                                      "target": leader_state.get("target"), "service": jobConfig["service"]})
+    logging.info(f"Job {job_name} of user {user} follows the identical job {leader_job} of user {owner}.")
+
+    # The leader finished before the follower was registered
+    leader_state = get_job_state(leader_job, owner) or {}
+    if leader_state.get("stage") == "archived":
+        link_leader_outputs(leader_job, owner, job_name, user)
+    elif leader_state.get("stage") == "failed":
+        record_job_event(job_name, user, {"stage": "failed"})
+
+
+def remove_inflight_job(job_name, user):
+    """Remove the deleted job from the in-flight computations, as a leader or a follower."""
+    release_inflight_claim(job_name, user)
+    following = read_json(get_following_path(job_name, user))
+    if following:
+        remove_follower(following["job"], following["user"], job_name, user)
+    shutil.rmtree(get_followers_dir(job_name, user), ignore_errors=True)
+
+
+def on_job_event(job_name, user, event, state):
+    """Record the events of the leader to its followers, link the outputs to them once it is archived."""
+    if event["stage"] in TERMINAL_STAGES and os.path.exists(get_leading_path(job_name, user)):
+        # Failed followers stay registered, an automatic resubmission of the leader may still compute the result
+        release_inflight_claim(job_name, user, stage=None)
+
+    for follower_job, follower_user in get_followers(job_name, user):
+        try:
+            if event["stage"] == "archived":
+                link_leader_outputs(job_name, user, follower_job, follower_user)
+            else:
+                record_job_event(follower_job, follower_user, {key: value for key, value in event.items() if key != "received"})
+        except Exception as e:
+            logging.error(f"Error updating follower {follower_job} of user {follower_user} of job {job_name}: {e}")
+
+
+add_event_listener(on_job_event)
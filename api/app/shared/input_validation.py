@@ -1,7 +1,30 @@
 from flask import jsonify
+import json
 import re
 from datetime import datetime
 import logging
+from config import Config
+
+# Residue alphabets of the molecule types (IUPAC one-letter codes, including the ambiguous ones)
+RESIDUE_ALPHABETS = {
+    "protein": b"ACDEFGHIKLMNPQRSTVWYBJOUXZ",
+    "dna": b"ACGTN",
+    "rna": b"ACGUN",
+}
+WHITESPACE = b" \t\r\n"
+# Separator of the chains of a complex in ColabFold, ESMFold and OmegaFold inputs
+CHAIN_SEPARATOR = b":"
+
+# Longest input (residues, tokens for AlphaFold 3) every tool can predict, SEQUENCE_LIMITS overrides them
+DEFAULT_SEQUENCE_LIMITS = {
+    "AlphaFold": 4000,
+    "AlphaFold3": 5120,
+    "ColabFold": 4000,
+    "ESMFold": 3000,
+    "OmegaFold": 4000,
+}
+
+_sequence_limits = None
 
 def validate_job_name(job_name):
     """Validate the job name."""
@@ -13,8 +36,71 @@ def validate_job_name(job_name):
         return jsonify({"error": "Job name must consist of alphanumeric characters or '-'."}), 400
     return None
 
-def validate_sequence(input_sequence):
-    """Validate the sequence."""
+def find_invalid_residues(sequence, molecule="protein", allowed=b""):
+    """
+    Return the characters of the sequence outside the residue alphabet of the molecule type (case-insensitive).
+
+    The characters of the alphabet are deleted by a byte translation, which runs at memory speed for megabase inputs.
+    """
+    raw = sequence.encode("ascii", errors="replace") if isinstance(sequence, str) else sequence
+    invalid = raw.upper().translate(None, RESIDUE_ALPHABETS[molecule] + WHITESPACE + allowed)
+    return sorted(set(invalid.decode("ascii", errors="replace")))
+
+
+def get_record_chain_lengths(sequence):
+    """Return the lengths of the chains of every record of the FASTA input, chains separated by ':'."""
+    records, chains = [], None
+    for line in sequence.splitlines():
+        line = line.strip()
+        if line.startswith(">"):
+            if chains is not None:
+                records.append(chains)
+            chains = [0]
+            continue
+        if not line:
+            continue
+        if chains is None:
+            chains = [0]
+        parts = line.split(":")
+        chains[-1] += len("".join(parts[0].split()))
+        chains.extend(len("".join(part.split())) for part in parts[1:])
+
+    if chains is not None:
+        records.append(chains)
+    return records
+
+
+def get_sequence_limit(tool):
+    """Return the longest input the tool can predict, None if it has no limit."""
+    global _sequence_limits
+    if _sequence_limits is None:
+        limits = dict(DEFAULT_SEQUENCE_LIMITS)
+        try:
+            limits.update(json.loads(getattr(Config, "SEQUENCE_LIMITS", "") or "{}"))
+        except (json.JSONDecodeError, TypeError, ValueError) as e:
+            logging.error(f"Invalid SEQUENCE_LIMITS configuration, using the default limits: {e}")
+        _sequence_limits = limits
+    return _sequence_limits.get(tool)
+
+
+def validate_sequence_length(input_sequence, tool, copies=1, per_record=False):
+    """
+    Validate that the input is not too long for the tool, before it waits for a GPU.
+    The records are predicted separately with per_record, otherwise they are one complex.
+    """
+    limit = get_sequence_limit(tool)
+    records = get_record_chain_lengths(input_sequence)
+    if not limit or not records:
+        return None
+
+    lengths = [sum(chains) * copies for chains in records] if per_record else [sum(map(sum, records)) * copies]
+    if max(lengths) > limit:
+        return jsonify({"error": f"The input is too long for {tool}: {max(lengths)} residues, the limit is {limit}."}), 400
+    return None
+
+
+def validate_sequence(input_sequence, allow_chain_separator=False):
+    """Validate the sequence: the FASTA format, the amino acid alphabet and the chains not being empty."""
     if not input_sequence.startswith(">"):
         return jsonify({"error": "FASTA format error: Missing header line starting with '>'."}), 400
 
@@ -25,7 +111,15 @@ def validate_sequence(input_sequence):
 
     if len(lines) < 2:
         return jsonify({"error": "FASTA format error: Missing sequence."}), 400
-    
+
+    residues = "\n".join(line for line in lines if not line.startswith(">"))
+    invalid = find_invalid_residues(residues, "protein", CHAIN_SEPARATOR if allow_chain_separator else b"")
+    if invalid:
+        return jsonify({"error": f"Invalid characters in the protein sequence: {' '.join(invalid[:10])}. Use one-letter amino acid codes."}), 400
+
+    if any(0 in chains for chains in get_record_chain_lengths(input_sequence)):
+        return jsonify({"error": "FASTA format error: Every sequence and chain must contain residues."}), 400
+
     return None
 
 def validate_date(date):
@@ -0,0 +1,87 @@
+import hashlib
+import hmac
+import os
+from kubernetes import client
+
+from config import Config
+
+# Stages reported by the job pods, in the order they happen
+EVENT_STAGES = ["started", "msa_done", "inference_done", "archived", "failed"]
+
+# Bash functions of the job commands. foldify_event posts a job event to the API, it never fails the job and does
+# nothing when events are disabled. Uses curl when the image has it, the python of the image otherwise.
+EVENT_FUNCTION_CMD = (
+    'foldify_event() { '
+    '[ -z "$FOLDIFY_EVENT_URL" ] && return 0; '
+    'body="{\\"stage\\":\\"$1\\",\\"time\\":$(date +%s),\\"host\\":\\"$HOSTNAME\\",\\"job\\":\\"$FOLDIFY_K8S_JOB\\"}"; '
+    'if command -v curl >/dev/null 2>&1; '
+    'then curl -fsS -m 10 -X POST -H "Authorization: Bearer $FOLDIFY_EVENT_TOKEN" '
+    '-H "Content-Type: application/json" -d "$body" "$FOLDIFY_EVENT_URL" >/dev/null 2>&1; '
+    'else python3 -c \'import os, sys, urllib.request as r; r.urlopen(r.Request(os.environ["FOLDIFY_EVENT_URL"], '
+    'sys.argv[1].encode(), {"Authorization": "Bearer " + os.environ["FOLDIFY_EVENT_TOKEN"], '
+    '"Content-Type": "application/json"}), timeout=10)\' "$body" >/dev/null 2>&1; fi; '
+    'return 0; }; '
+    # Sends the failure email read from stdin unless the API resubmitted this Kubernetes job after it ran
+    # out of memory (the retry marker in the output directory given as the argument), the last attempt sends it
+    'foldify_failure_mail() { '
+    'if [ -n "$FOLDIFY_K8S_JOB" ] && [ -e "$1/.retry-$FOLDIFY_K8S_JOB" ]; '
+    'then cat >/dev/null; echo "The job was resubmitted, no failure email is sent."; '
+    'else ssmtp -t; fi; }'
+)
+
+# Prefix of the marker the API writes to the output directory of a resubmitted job, followed by the failed job name
+RETRY_MARKER_PREFIX = ".retry-"
+
+
+def get_internal_token():
+    """Return the internal API token, empty when the internal endpoints are disabled."""
+    return os.getenv("INTERNAL_API_TOKEN", Config.INTERNAL_API_TOKEN)
+
+
+def get_event_token(user, job_name):
+    """Return the token a job pod uses to post the events of this job only."""
+    message = f"{user}/{job_name}".encode()
+    return hmac.new(get_internal_token().encode(), message, hashlib.sha256).hexdigest()
+
+
+def check_event_token(user, job_name, token):
+    """Check the token of a job event."""
+    if not get_internal_token() or not token:
+        return False
+    return hmac.compare_digest(token, get_event_token(user, job_name))
+
+
+def get_event_url(target, user, job_name):
+    """Return the URL the job pods of the target post their events to, None when events are disabled."""
+    api_url = target.get("apiUrl") or getattr(Config, "INTERNAL_API_URL", "")
+    if not api_url or not get_internal_token():
+        return None
+    return f"{api_url.rstrip('/')}/api/flask/events/{user}/{job_name}"
+
+
+def get_event_env(target, user, job_name, k8s_job_name):
+    """Return the environment variables of the job container used by the event commands."""
+    url = get_event_url(target, user, job_name)
+    if url is None:
+        return []
+
+    return [
+        client.V1EnvVar(name="FOLDIFY_EVENT_URL", value=url),
+        client.V1EnvVar(name="FOLDIFY_EVENT_TOKEN", value=get_event_token(user, job_name)),
+        client.V1EnvVar(name="FOLDIFY_K8S_JOB", value=k8s_job_name),
+    ]
+
+
+def event_cmd(stage):
+    """Return the command posting the stage of the job."""
+    return f"foldify_event {stage}"
+
+
+def failure_mail_cmd(output_dir):
+    """Return the command sending the failure email piped to it, unless the job was resubmitted."""
+    return f'foldify_failure_mail "{output_dir}"'
+
+
+def outcome_event_cmd(success_test, stage="inference_done"):
+    """Return the command posting the stage if the success test passes and the failure otherwise."""
+    return f"if {success_test} ; then {event_cmd(stage)} ; else {event_cmd('failed')} ; fi"
@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import time
+import uuid
+
+from app.shared.common import get_index_path, get_input_path
+from app.shared.file_store import locked, read_json, write_json_atomic
+from app.shared.inflight import get_following_path
+from app.shared.job_info import job_done
+from app.shared.job_state import add_event_listener, get_job_state, has_pod_events
+from app.shared.kubernetes import get_running_jobs
+
+GROUP_ID_RE = re.compile(r"^[0-9a-f]{16}$")
+# Statuses of the group members, counted by the group status
+MEMBER_STATUSES = ["done", "running", "failed"]
+# Jobs submitted this recently may not be listed yet, the list calls of the other workers are cached
+LISTING_GRACE = 60
+
+
+def get_job_group_path(group_id, user):
+    """Return the path of the record of the job group."""
+    return get_index_path("groups", user, f"{group_id}.json")
+
+
+def get_group_member_path(job_name, user):
+    """Return the path holding the group of the job."""
+    return get_index_path("groups", user, "jobs", job_name)
+
+
+def create_job_group(name, members, user):
+    """Store the group of jobs submitted together (MultiFold), members are dicts with the tool and the job name."""
+    group_id = uuid.uuid4().hex[:16]
+    write_json_atomic(get_job_group_path(group_id, user), {
+        "id": group_id,
+        "name": name,
+        "created": time.time(),
+        "readyAt": None,
+        "members": members,
+    })
+    for member in members:
+        write_json_atomic(get_group_member_path(member["job"], user), {"group": group_id})
+    return group_id
+
+
+def get_job_group(group_id, user):
+    """Return the record of the user's job group, None if it does not exist."""
+    if not isinstance(group_id, str) or not GROUP_ID_RE.match(group_id):
+        return None
+    return read_json(get_job_group_path(group_id, user))
+
+
+def submitted_recently(job_name, user, state):
+    """Check if the job was submitted less than LISTING_GRACE ago, from its state or its input file."""
+    submitted = (state or {}).get("updated")
+    if submitted is None:
+        try:
+            submitted = os.path.getmtime(get_input_path(job_name, "json", user))
+        except FileNotFoundError:
+            return False
+    return time.time() - submitted < LISTING_GRACE
+
+
+def get_member_status(job_name, user, running_jobs=None):
+    """
+    Return the status of a group member: done, running (or queued) or failed.
+
+    The state pushed by the pods is used when the job reports its events. Otherwise the outputs and the running
+    jobs are looked up, running_jobs is a callable returning them (None when they could not be listed) so
+    Kubernetes is asked at most once per group. A job is only failed when Kubernetes reports it failed or does not
+    list it a while after its submission, a job following an identical job (in-flight) runs until its leader ends.
+    Returns None when the status is only known from Kubernetes and running_jobs is not given.
+    """
+    state = get_job_state(job_name, user)
+    if has_pod_events(state):
+        if state["stage"] == "archived":
+            return "done"
+        return "failed" if state["stage"] == "failed" else "running"
+
+    if job_done(job_name, user):
+        return "done"
+    if os.path.exists(get_following_path(job_name, user)):
+        return "running"
+    if running_jobs is None:
+        return None
+    jobs = running_jobs()
+    if jobs is None:
+        return "running"
+    for job in jobs:
+        if job[0] == job_name:  # job[0] is the job name
+            return "failed" if job[2] == "Failed" else "running"  # job[2] is the pod status
+    return "running" if submitted_recently(job_name, user, state) else "failed"
+
+
+def get_job_group_status(group, user):
+    """Return the status of every member of the group, their counts and whether all of them finished."""
+    cached_running_jobs = []
+
+    def running_jobs():
+        if not cached_running_jobs:
+            try:
+                cached_running_jobs.append(get_running_jobs(user))
+            except Exception as e:
+                # The members which are not finished stay running, the group is not ready
+                logging.error(f"Error getting running jobs of user {user}: {e}")
+                cached_running_jobs.append(None)
+        return cached_running_jobs[0]
+
+    members = [dict(member, status=get_member_status(member["job"], user, running_jobs))
+               for member in group["members"]]
+    counts = {status: sum(member["status"] == status for member in members) for status in MEMBER_STATUSES}
+    ready = counts["running"] == 0
+    if ready and not group.get("readyAt"):
+        mark_job_group_ready(group["id"], user)
+
+    return {"id": group["id"], "name": group["name"], "created": group["created"], "ready": ready,
+            "counts": counts, "members": members}
+
+
+def mark_job_group_ready(group_id, user):
+    """Record the time all the members of the group finished, waiting clients are woken up by it."""
+    path = get_job_group_path(group_id, user)
+    with locked(path):
+        group = read_json(path)
+        if group is None or group.get("readyAt"):
+            return
+        group["readyAt"] = time.time()
+        write_json_atomic(path, group)
+    logging.info(f"All jobs of group {group_id} of user {user} finished.")
+
+
+def remove_job_group_member(job_name, user):
+    """Remove the deleted job from its group, the group is removed with its last member."""
+    member_path = get_group_member_path(job_name, user)
+    member = read_json(member_path)
+    if member is None:
+        return
+
+    path = get_job_group_path(member["group"], user)
+    stale_paths = [member_path]
+    with locked(path):
+        group = read_json(path)
+        if group is not None:
+            group["members"] = [item for item in group["members"] if item["job"] != job_name]
+            if group["members"]:
+                write_json_atomic(path, group)
+            else:
+                os.remove(path)
+                stale_paths.append(f"{path}.lock")
+    for stale_path in stale_paths:
+        try:
+            os.remove(stale_path)
+        except FileNotFoundError:
+            pass
+
+
+def on_job_event(job_name, user, event, state):
+    """Mark the group of the job ready once its last member finished."""
+    if event["stage"] not in ["archived", "failed"]:
+        return
+    member = read_json(get_group_member_path(job_name, user))
+    if member is None:
+        return
+    group = get_job_group(member["group"], user)
+    if group is None or group.get("readyAt"):
+        return
+
+    statuses = [get_member_status(item["job"], user) for item in group["members"]]
+    if all(status in ["done", "failed"] for status in statuses):
+        mark_job_group_ready(group["id"], user)
+
+
+add_event_listener(on_job_event)
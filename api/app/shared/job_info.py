@@ -2,13 +2,26 @@ import os
 import json
 import datetime
 import pytz
-from app.shared.common import get_input_path, get_output_path
+from concurrent.futures import ThreadPoolExecutor
+from app.shared.common import get_input_path, get_output_path, get_input_dir
+from app.shared.job_state import find_job_state, has_pod_events, get_event_time
+from app.shared.result_cache import update_job_result_sharing
 from flask import jsonify
 
 import logging
 
+# Jobs whose public symlinks are changed at once by a bulk publicity change
+PUBLICITY_WORKERS = 16
+
 def job_done(job, user):
     """Check if the job is done and return the service used, if any"""
+    # Jobs reporting their events do not need to be looked up in the output files
+    state = find_job_state(job, user)
+    if has_pod_events(state):
+        if state["stage"] == "archived" and state.get("service"):
+            return state["service"].capitalize()
+        return None
+
     output_path  = get_output_path(job, user)
     public_output_path = get_output_path(job, "public")
    
@@ -104,6 +117,11 @@ def get_start(job, user):
 
 def get_result(job, user):
     """Get the end time of the job"""
+    state = find_job_state(job, user)
+    if has_pod_events(state):
+        archived = get_event_time(state, "archived")
+        return convertToCEST(archived) if archived and state["stage"] == "archived" else None
+
     done_files = ["alphafold.done", "alphafold3.done", "colabfold.done", "omegafold.done", "esmfold.done"]
     output_path = get_output_path(job, user)
     public_output_path = get_output_path(job, "public")
@@ -157,6 +175,77 @@ def check_job_ownership(job, user):
     
     return user_files_exist
 
+def get_owned_jobs(user):
+    """Return the names of the jobs the user owns, from one listing of their input and output directories."""
+    owned = set()
+    try:
+        owned.update(os.path.splitext(file)[0] for file in os.listdir(get_input_dir(user)) if file.endswith((".json", ".fasta")))
+    except FileNotFoundError:
+        pass
+    try:
+        owned.update(os.listdir(get_output_path("", user)))
+    except FileNotFoundError:
+        pass
+    return owned
+
+def update_public_links(job, user, publicity):
+    """
+    Create or remove the public symlinks of the user's job and list or unlist it in the result cache.
+    Returns None, or an error message.
+    """
+    input_json_path = get_input_path(job, "json", user)
+    public_json_path = get_input_path(job, "json", "public")
+    input_fasta_path = get_input_path(job, "fasta", user)
+    public_fasta_path = get_input_path(job, "fasta", "public")
+    output_path = get_output_path(job, user)
+    public_output_path = get_output_path(job, "public")
+
+    if publicity == "Public":
+        # Ensure public directory exists
+        os.makedirs(os.path.dirname(public_json_path), exist_ok=True)
+        os.makedirs(os.path.dirname(public_fasta_path), exist_ok=True)
+        os.makedirs(os.path.dirname(public_output_path), exist_ok=True)
+
+        # Remove existing symlinks if they exist (to prevent errors)
+        for path in [public_json_path, public_fasta_path, public_output_path]:
+            if os.path.islink(path):
+                os.unlink(path)
+                logging.info(f"Removed existing symlink at: {path}")
+            elif os.path.exists(path):
+                logging.warning(f"Non-symlink file exists at public path: {path}")
+                return f"Cannot set to Public, non-symlink file exists at: {path}"
+
+        # Create symlinks only if source files exist
+        if os.path.exists(input_json_path):
+            os.symlink(input_json_path, public_json_path)
+            logging.info(f"Created symlink from {input_json_path} to {public_json_path}")
+        else:
+            logging.warning(f"Source file does not exist: {input_json_path}")
+
+        if os.path.exists(input_fasta_path):
+            os.symlink(input_fasta_path, public_fasta_path)
+            logging.info(f"Created symlink from {input_fasta_path} to {public_fasta_path}")
+        else:
+            logging.warning(f"Source file does not exist: {input_fasta_path}")
+
+        if os.path.exists(output_path):
+            os.symlink(output_path, public_output_path)
+            logging.info(f"Created symlink from {output_path} to {public_output_path}")
+        else:
+            logging.warning(f"Source directory does not exist: {output_path}")
+
+    else:
+        # Remove symlinks from public directory (check if they are actually symlinks)
+        for path in [public_json_path, public_fasta_path, public_output_path]:
+            if os.path.islink(path):
+                os.unlink(path)
+            elif os.path.exists(path):
+                logging.warning(f"Non-symlink file exists at public path, not removing: {path}")
+
+    # Other users reuse the result of the job only while it is shared
+    update_job_result_sharing(job, user)
+    return None
+
 def set_publicity(job, user, publicity):
     """Set the publicity of the job"""
 
@@ -164,67 +253,41 @@ def set_publicity(job, user, publicity):
         logging.warning(f"User {user} does not own job {job}")
         return jsonify({"error": f"Permission denied. Cannot change publicity of job {job}. User is not the owner of the resource."}), 403
 
+    if publicity not in ["Public", "Private"]:
+        logging.error(f"Invalid publicity value: {publicity}")
+        return jsonify({"error": f"Invalid publicity value: {publicity}"}), 400
+
     try:
-        input_json_path = get_input_path(job, "json", user)
-        public_json_path = get_input_path(job, "json", "public")
-        input_fasta_path = get_input_path(job, "fasta", user)
-        public_fasta_path = get_input_path(job, "fasta", "public")
-        output_path = get_output_path(job, user)
-        public_output_path = get_output_path(job, "public")
-
-        if publicity == "Public":
-            # Ensure public directory exists
-            os.makedirs(os.path.dirname(public_json_path), exist_ok=True)
-            os.makedirs(os.path.dirname(public_fasta_path), exist_ok=True)
-            os.makedirs(os.path.dirname(public_output_path), exist_ok=True)
-            
-            # Remove existing symlinks if they exist (to prevent errors)
-            for path in [public_json_path, public_fasta_path, public_output_path]:
-                if os.path.islink(path):
-                    os.unlink(path)
-                    logging.info(f"Removed existing symlink at: {path}")
-                elif os.path.exists(path):
-                    logging.warning(f"Non-symlink file exists at public path: {path}")
-                    return jsonify({"error": f"Cannot set to Public, non-symlink file exists at: {path}"}), 500
-            
-            # Create symlinks only if source files exist
-            if os.path.exists(input_json_path):
-                os.symlink(input_json_path, public_json_path)
-                logging.info(f"Created symlink from {input_json_path} to {public_json_path}")
-            else:
-                logging.warning(f"Source file does not exist: {input_json_path}")
-                
-            if os.path.exists(input_fasta_path):
-                os.symlink(input_fasta_path, public_fasta_path)
-                logging.info(f"Created symlink from {input_fasta_path} to {public_fasta_path}")
-            else:
-                logging.warning(f"Source file does not exist: {input_fasta_path}")
-                
-            if os.path.exists(output_path):
-                os.symlink(output_path, public_output_path)
-                logging.info(f"Created symlink from {output_path} to {public_output_path}")
-            else:
-                logging.warning(f"Source directory does not exist: {output_path}")
-            
-            return True
-            
-        elif publicity == "Private":
-            # Remove symlinks from public directory (check if they are actually symlinks)
-            for path in [public_json_path, public_fasta_path, public_output_path]:
-                if os.path.islink(path):
-                    os.unlink(path)
-                elif os.path.exists(path):
-                    logging.warning(f"Non-symlink file exists at public path, not removing: {path}")
-            
-            return True
-            
-        else:
-            logging.error(f"Invalid publicity value: {publicity}")
-            return jsonify({"error": f"Invalid publicity value: {publicity}"}), 400
+        link_error = update_public_links(job, user, publicity)
+        if link_error:
+            return jsonify({"error": link_error}), 500
+        return True
 
     except OSError as e:
         logging.error(f"OS error in set_publicity: {e}")
         return jsonify({"error": f"OS error in set_publicity: {e}"}), 500
     except Exception as e:
         logging.error(f"Unexpected error in set_publicity: {e}")
-        return jsonify({"error": f"Unexpected error in set_publicity: {e}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Unexpected error in set_publicity: {e}"}), 500
+
+def set_jobs_publicity(jobs, user, publicity):
+    """
+    Set the publicity of the user's jobs, their symlinks are changed concurrently.
+    Returns the result of each job: {"publicity": <publicity>} or {"error": <message>}.
+    """
+    owned = get_owned_jobs(user)
+    results = {job: {"error": f"Permission denied. User is not the owner of job {job}."} for job in jobs if job not in owned}
+
+    def update_job(job):
+        try:
+            link_error = update_public_links(job, user, publicity)
+        except OSError as e:
+            logging.error(f"OS error setting the publicity of job {job}: {e}")
+            link_error = f"OS error while setting the publicity: {e}"
+        return job, {"error": link_error} if link_error else {"publicity": publicity}
+
+    owned_jobs = [job for job in jobs if job in owned]
+    if owned_jobs:
+        with ThreadPoolExecutor(max_workers=min(PUBLICITY_WORKERS, len(owned_jobs))) as executor:
+            results.update(executor.map(update_job, owned_jobs))
+    return results
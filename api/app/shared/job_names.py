@@ -0,0 +1,184 @@
+import logging
+import os
+import time
+import uuid
+
+from flask import g, has_app_context
+
+from app.shared.common import get_index_path, get_input_path
+from app.shared.file_store import read_json, write_json_atomic
+
+# Reservations of submissions which did not finish in time (e.g. the worker was restarted) can be taken over
+RESERVATION_TTL = 10 * 60
+# Namespace of the registry with the names of the public jobs, which are shared by all users
+PUBLIC_NAMESPACE = "public"
+
+
+def get_job_name_path(name, user):
+    """Return the path of the registry entry of the job name, created exclusively by the submission reserving it."""
+    return get_index_path("names", user, name)
+
+
+def job_name_exists(name, user):
+    """Check if the user has a job with the name or a public job has it, without listing the directories."""
+    return os.path.exists(get_input_path(name, "json", user)) or \
+        os.path.lexists(get_input_path(name, "json", "public"))
+
+
+def get_public_name_owner(name):
+    """Return the user whose job has the public name, from the link of its public input, None if unknown."""
+    path = get_input_path(name, "json", PUBLIC_NAMESPACE)
+    if not os.path.islink(path):
+        return None
+    return os.path.basename(os.path.dirname(os.path.realpath(path)))
+
+
+def is_reservation_active(path, name, user):
+    """Check if the registry entry still holds the name: a recent reservation or a committed job which exists."""
+    entry = read_json(path)
+    if entry is None or entry.get("state") == "reserved":
+        # An entry without content was just created and is being written
+        try:
+            return time.time() - os.path.getmtime(path) < RESERVATION_TTL
+        except FileNotFoundError:
+            return False
+    return job_name_exists(name, user)
+
+
+def take_over_entry(path):
+    """Remove the registry entry, only one of the concurrent submissions taking it over succeeds."""
+    stale_path = f"{path}.stale-{uuid.uuid4().hex}"
+    try:
+        os.rename(path, stale_path)
+    except FileNotFoundError:
+        return
+    os.remove(stale_path)
+
+
+def reserve_public_name(name, user, token):
+    """
+    Reserve the name of a public job in the public namespace with an exclusive create of its registry entry.
+
+    The name of the user's own public job is taken over, the user's reservation decided about it already.
+    Returns (reserved, exists): exists tells if a public job of another user has the name.
+    """
+    path = get_job_name_path(name, PUBLIC_NAMESPACE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            entry = read_json(path) or {}
+            if entry.get("user") != user and is_reservation_active(path, name, PUBLIC_NAMESPACE):
+                return False, entry.get("state") == "committed"
+            take_over_entry(path)
+            continue
+
+        os.close(fd)
+        owner = get_public_name_owner(name)
+        if owner != user and job_name_exists(name, PUBLIC_NAMESPACE):
+            # Public jobs submitted before the registry get their entry on the first check
+            write_json_atomic(path, {"state": "committed", "user": owner, "token": None, "time": time.time()})
+            return False, True
+
+        write_json_atomic(path, {"state": "reserved", "user": user, "token": token, "time": time.time()})
+        return True, False
+
+    return False, False
+
+
+def reserve_job_name(name, user, force=False, public=False):
+    """
+    Reserve the job name for a submission with an exclusive create of its registry entry.
+
+    An existing job keeps its name unless force is set (Force Computation), a name being submitted by another
+    request is never reserved. The name of a public job is also reserved in the public namespace, as public
+    names are shared by all users. Returns (token, exists): the token is None if the name was not reserved,
+    exists tells if a job with the name exists. Reservations not committed are released at the end of the request.
+    """
+    path = get_job_name_path(name, user)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = uuid.uuid4().hex
+
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            entry = read_json(path) or {}
+            if is_reservation_active(path, name, user):
+                if entry.get("state") != "committed":
+                    return None, False
+                if not force:
+                    return None, True
+            take_over_entry(path)
+            continue
+
+        os.close(fd)
+        exists = job_name_exists(name, user)
+        if exists and not force:
+            # Jobs submitted before the registry get their entry on the first check
+            write_json_atomic(path, {"state": "committed", "token": token, "time": time.time()})
+            return None, True
+
+        write_json_atomic(path, {"state": "reserved", "token": token, "time": time.time()})
+        if public:
+            reserved, public_exists = reserve_public_name(name, user, token)
+            if not reserved:
+                release_job_name(name, user, token)
+                return None, public_exists
+
+        if has_app_context():
+            g.setdefault("job_name_reservations", []).append((name, user, token))
+        return token, exists
+
+    return None, False
+
+
+def commit_job_name(name, user, token=None):
+    """Mark the name as taken by the submitted job, once its input files are written."""
+    path = get_job_name_path(name, user)
+    entry = read_json(path) or {}
+    if token is not None and entry.get("token") != token:
+        logging.warning(f"Reservation of job name {name} of user {user} was taken over before it was committed.")
+        return False
+
+    write_json_atomic(path, {"state": "committed", "token": token or entry.get("token"), "time": time.time()})
+    public_path = get_job_name_path(name, PUBLIC_NAMESPACE)
+    if token is not None and (read_json(public_path) or {}).get("token") == token:
+        write_json_atomic(public_path, {"state": "committed", "user": user, "token": token, "time": time.time()})
+    if has_app_context():
+        reservations = g.get("job_name_reservations", [])
+        g.job_name_reservations = [reservation for reservation in reservations if reservation[2] != token]
+    return True
+
+
+def remove_entry(path):
+    """Remove the registry entry if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def release_job_name(name, user, token=None):
+    """
+    Release the reservation of the job name, any entry of the name if no token is given (deleted jobs).
+    The entry in the public namespace is released with it when it belongs to the reservation or to the user.
+    """
+    public_path = get_job_name_path(name, PUBLIC_NAMESPACE)
+    public_entry = read_json(public_path) or {}
+    if (public_entry.get("token") == token) if token is not None else (public_entry.get("user") == user):
+        remove_entry(public_path)
+
+    path = get_job_name_path(name, user)
+    if token is not None and (read_json(path) or {}).get("token") != token:
+        return
+    remove_entry(path)
+
+
+def release_pending_job_names(exception=None):
+    """Release the reservations the request did not commit, e.g. because the submission failed."""
+    for name, user, token in g.pop("job_name_reservations", []):
+        logging.info(f"Releasing the reservation of job name {name} of user {user}.")
+        release_job_name(name, user, token)
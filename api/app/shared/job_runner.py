@@ -0,0 +1,65 @@
+import json
+import os
+
+from kubernetes import client
+
+from config import Config
+
+# Source of the post-processing runner of the job pods, passed to them in an environment variable
+with open(os.path.join(os.path.dirname(__file__), "job_runner_script.py")) as f:
+    JOB_RUNNER_SCRIPT = f.read()
+
+# Runs the runner with the python of the image, whichever name it has
+RUNNER_CMD = '"$(command -v python3 || command -v python)" -c "$FOLDIFY_RUNNER_SCRIPT"'
+
+
+def job_runner_enabled():
+    """Check if the job pods run their post-processing with the Python runner instead of the bash commands."""
+    return getattr(Config, "JOB_RUNNER", False)
+
+
+def get_runner_config(user, output_name, job_name, tool, done_file, result_pattern, public, email, salt,
+                      result_non_empty=True):
+    """
+    Return the configuration of the runner of the job.
+
+    Parameters:
+    - output_name: The name of the output directory of the job.
+    - tool: The name of the tool in the email notifications, e.g. "AlphaFold 3".
+    - done_file: The file created when the job has a result, e.g. "alphafold.done".
+    - result_pattern: Glob of the result files, relative to the output directory, the job has a result if it matches.
+    - result_non_empty: Whether a matching file must be non-empty.
+    """
+    config = {
+        "name": job_name,
+        "outputDir": f"/mnt/output/{user}/{output_name}",
+        "publicDir": "/mnt/output/public",
+        "storageDir": "/storage",
+        "public": public,
+        "salt": salt,
+        "doneFile": done_file,
+        "result": {"pattern": result_pattern, "nonEmpty": result_non_empty},
+        "email": None,
+    }
+    if email:
+        config["email"] = {
+            "to": email,
+            "from": Config.EMAIL_FROM,
+            "finished": {
+                "subject": f"{tool} computation has finished",
+                "body": f'Your {tool} computation "{job_name}" has finished, please visit {Config.BASE_URL}/result/{job_name} to view the result of your computation',
+            },
+            "failed": {
+                "subject": f"{tool} computation has failed",
+                "body": f'Your {tool} computation "{job_name}" has failed.',
+            },
+        }
+    return config
+
+
+def get_runner_env(config):
+    """Return the environment variables of the job container with the runner and its configuration."""
+    return [
+        client.V1EnvVar(name="FOLDIFY_RUNNER_SCRIPT", value=JOB_RUNNER_SCRIPT),
+        client.V1EnvVar(name="FOLDIFY_RUNNER_CONFIG", value=json.dumps(config)),
+    ]
@@ -0,0 +1,210 @@
+"""
+Post-processing of a prediction in the job pod, after the inference: the public symlink, the copy of the outputs
+to the storage, the archive for download, the done file and the email notification.
+
+Runs in the images of the tools, so it only uses the standard library (Python 3.6+). The API passes its source in
+the FOLDIFY_RUNNER_SCRIPT environment variable and its configuration as JSON in FOLDIFY_RUNNER_CONFIG (or as the
+first argument), see app/shared/job_runner.py. The copy and the archive read the outputs concurrently.
+
+Writes the result manifest (runner.json) with the output files and the time of each stage to the output directory.
+Exits with 0 when the job has a result, 1 when the inference produced none and 2 when a required stage failed.
+"""
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = "runner.json"
+# Marker the API writes to the output directory of a job it resubmitted, see RETRY_MARKER_PREFIX in job_events.py
+RETRY_MARKER_PREFIX = ".retry-"
+EXIT_OK, EXIT_NO_RESULT, EXIT_STAGE_FAILED = 0, 1, 2
+COPY_WORKERS = 8
+
+
+def log(message):
+    print(f"[foldify-runner] {message}", file=sys.stderr, flush=True)
+
+
+def post_event(stage):
+    """Post the stage of the job to the API, like the foldify_event function of the bash commands, never fails."""
+    url = os.environ.get("FOLDIFY_EVENT_URL")
+    if not url:
+        return
+    body = json.dumps({"stage": stage, "time": int(time.time()), "host": os.environ.get("HOSTNAME", ""),
+                       "job": os.environ.get("FOLDIFY_K8S_JOB", "")}).encode()
+    headers = {"Authorization": "Bearer " + os.environ.get("FOLDIFY_EVENT_TOKEN", ""), "Content-Type": "application/json"}
+    try:
+        urllib.request.urlopen(urllib.request.Request(url, body, headers), timeout=10)
+    except Exception as e:
+        log(f"Event {stage} was not posted: {e}")
+
+
+def has_result(config):
+    """Check if the inference produced the result files of the tool."""
+    paths = glob.glob(os.path.join(config["outputDir"], config["result"]["pattern"]))
+    if config["result"].get("nonEmpty"):
+        return any(os.path.isfile(path) and os.path.getsize(path) > 0 for path in paths)
+    return bool(paths)
+
+
+def link_public(config):
+    """Link the outputs to the public directory (relative link, replaced if it exists)."""
+    public_path = os.path.join(config["publicDir"], os.path.basename(config["outputDir"]))
+    os.makedirs(config["publicDir"], exist_ok=True)
+    tmp_path = f"{public_path}.runner-{os.getpid()}"
+    os.symlink(os.path.relpath(config["outputDir"], config["publicDir"]), tmp_path)
+    os.replace(tmp_path, public_path)
+
+
+def copy_to_storage(config):
+    """
+    Copy the outputs to the storage, the files are copied concurrently and symlinks are kept as symlinks.
+    The download archive, created at the same time, is not copied.
+    """
+    source = config["outputDir"]
+    target = os.path.join(config["storageDir"], os.path.basename(source))
+    archive_name = f"download-{config['salt']}.zip"
+    copies = []
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+        for directory, dirs, files in os.walk(source):
+            target_dir = os.path.join(target, os.path.relpath(directory, source))
+            os.makedirs(target_dir, exist_ok=True)
+            for name in dirs + files:
+                path = os.path.join(directory, name)
+                if os.path.islink(path):
+                    link_path = os.path.join(target_dir, name)
+                    if os.path.lexists(link_path):
+                        os.remove(link_path)
+                    os.symlink(os.readlink(path), link_path)
+                elif name in files and not (directory == source and name == archive_name):
+                    copies.append(executor.submit(shutil.copy2, path, os.path.join(target_dir, name)))
+            dirs[:] = [name for name in dirs if not os.path.islink(os.path.join(directory, name))]
+        for copy in copies:
+            copy.result()
+
+
+def create_archive(config):
+    """Store the outputs uncompressed (like zip -0) in the download archive, written next to them and moved in."""
+    source = config["outputDir"]
+    parent, name = os.path.split(source)
+    archive_path = os.path.join(source, f"download-{config['salt']}.zip")
+    tmp_path = os.path.join(parent, f".{name}-{config['salt']}.zip")
+    try:
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for directory, dirs, files in os.walk(source):
+                dirs.sort()
+                archive.write(directory, os.path.relpath(directory, parent))
+                for file in sorted(files):
+                    path = os.path.join(directory, file)
+                    if os.path.exists(path):
+                        archive.write(path, os.path.relpath(path, parent))
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def mark_done(config):
+    """Create the done file the API reads the service of the job from and report the archived job."""
+    open(os.path.join(config["outputDir"], config["doneFile"]), "a").close()
+    post_event("archived")
+
+
+def send_email(config, success):
+    """Send the notification of the finished or failed job with ssmtp, the failure carries the log of the job."""
+    email = config["email"]
+    message = email["finished"] if success else email["failed"]
+    text = f"To:{email['to']}\nFrom:{email['from']}\nSubject:{message['subject']}\n\n{message['body']}\n"
+    if not success:
+        try:
+            with open(os.path.join(config["outputDir"], "stdout"), errors="replace") as f:
+                text += f.read()
+        except OSError:
+            pass
+    subprocess.run(["ssmtp", "-t"], input=text.encode(), check=True, timeout=120)
+
+
+def is_resubmitted(config):
+    """Check if the API resubmitted this Kubernetes job after it ran out of memory, the next attempt reports the result."""
+    job = os.environ.get("FOLDIFY_K8S_JOB")
+    return bool(job) and os.path.exists(os.path.join(config["outputDir"], RETRY_MARKER_PREFIX + job))
+
+
+def run_stage(stages, name, function, *args, required=False):
+    """Run the stage and record its time and outcome, a failed stage does not stop the next ones."""
+    start = time.monotonic()
+    error = None
+    try:
+        function(*args)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        log(f"Stage {name} failed: {error}")
+    stage = {"name": name, "seconds": round(time.monotonic() - start, 3), "required": required, "error": error}
+    log(f"Stage {name} took {stage['seconds']} s")
+    stages.append(stage)
+    return error is None
+
+
+def list_outputs(config):
+    """Return the output files of the job with their sizes, relative to the output directory."""
+    outputs = []
+    for directory, dirs, files in os.walk(config["outputDir"]):
+        for file in sorted(files):
+            path = os.path.join(directory, file)
+            if os.path.isfile(path):
+                outputs.append({"path": os.path.relpath(path, config["outputDir"]), "size": os.path.getsize(path)})
+    return outputs
+
+
+def run(config):
+    """Run the post-processing stages of the job, returns the exit code."""
+    stages = []
+    success = has_result(config)
+
+    if config.get("public"):
+        run_stage(stages, "public_link", link_public, config)
+
+    # The copy and the archive only read the outputs, they run concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        copy_stages, archive_stages = [], []
+        copied = executor.submit(run_stage, copy_stages, "storage_copy", copy_to_storage, config)
+        archived = executor.submit(run_stage, archive_stages, "archive", create_archive, config, required=True)
+        copied.result(), archived.result()
+    stages += copy_stages + archive_stages
+
+    if success:
+        run_stage(stages, "done", mark_done, config, required=True)
+    if config.get("email") and (success or not is_resubmitted(config)):
+        run_stage(stages, "email", send_email, config, success)
+
+    if not success:
+        exit_code = EXIT_NO_RESULT
+    elif any(stage["required"] and stage["error"] for stage in stages):
+        exit_code = EXIT_STAGE_FAILED
+    else:
+        exit_code = EXIT_OK
+
+    manifest = {"job": config["name"], "success": success, "exitCode": exit_code,
+                "archive": f"download-{config['salt']}.zip", "stages": stages, "files": list_outputs(config)}
+    try:
+        with open(os.path.join(config["outputDir"], MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=1)
+    except OSError as e:
+        log(f"Result manifest was not written: {e}")
+    return exit_code
+
+
+def main(argv):
+    config = json.loads(argv[0] if argv else os.environ["FOLDIFY_RUNNER_CONFIG"])
+    return run(config)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,132 @@
+import logging
+import os
+import time
+
+from app.shared.common import get_index_path, get_output_path
+from app.shared.file_store import locked, read_json, write_json_atomic
+
+# Events kept in the state file of a job
+MAX_STATE_EVENTS = 50
+
+_event_listeners = []
+
+
+def get_job_state_path(job_name, user):
+    """Return the path of the state file of the job."""
+    return get_index_path("state", user, f"{job_name}.json")
+
+
+def add_event_listener(listener):
+    """Register a function called with (job name, user, event, state) after every recorded job event."""
+    _event_listeners.append(listener)
+
+
+def get_job_state(job_name, user):
+    """Return the state of the job pushed by its pods, None if the job has no state."""
+    return read_json(get_job_state_path(job_name, user))
+
+
+def get_public_job_owner(job_name):
+    """Return the owner of a public job from its public output symlink, None if the job is not public."""
+    public_output_path = get_output_path(job_name, "public")
+    if not os.path.islink(public_output_path):
+        return None
+    return os.path.basename(os.path.dirname(os.path.realpath(public_output_path)))
+
+
+def find_job_state(job_name, user):
+    """Return the state of the user's job, or of the public job with the same name."""
+    state = get_job_state(job_name, user)
+    if state is not None:
+        return state
+
+    owner = get_public_job_owner(job_name)
+    if owner and owner != user:
+        return get_job_state(job_name, owner)
+    return None
+
+
+def has_pod_events(state):
+    """Check if the pods of the job reported any event, the state is only trusted then."""
+    return bool(state) and state.get("stage") != "submitted"
+
+
+def record_job_event(job_name, user, event):
+    """
+    Record an event of the job in its state file and notify the event listeners.
+
+    A "submitted" event starts a new state, so a recomputed job does not keep the events of the previous run
+    (an automatic resubmission, with an "attempt" number, keeps the previous attempts).
+    Events posted by another Kubernetes job than the last submitted one (e.g. an older run) are ignored.
+    Returns the new state, or None if the event was ignored.
+    """
+    path = get_job_state_path(job_name, user)
+    event = dict(event, received=time.time())
+
+    with locked(path):
+        state = read_json(path, {})
+        if event["stage"] == "submitted":
+            # A resubmission of the job keeps the record of the previous attempts
+            attempts = state.get("attempts", []) if event.get("attempt") else []
+            state = {"k8sJob": event.get("job"), "target": event.get("target"), "service": event.get("service"),
+                     "events": [], "attempts": attempts}
+        elif state.get("k8sJob") and event.get("job") and event["job"] != state["k8sJob"]:
+            logging.warning(f"Ignoring {event['stage']} event of job {job_name} from stale Kubernetes job {event['job']}.")
+            return None
+
+        state["stage"] = event["stage"]
+        state["updated"] = event["received"]
+        state["events"] = (state.get("events", []) + [event])[-MAX_STATE_EVENTS:]
+        write_json_atomic(path, state)
+
+    for listener in list(_event_listeners):
+        try:
+            listener(job_name, user, event, state)
+        except Exception as e:
+            logging.error(f"Job event listener {listener.__name__} failed for job {job_name}: {e}")
+
+    return state
+
+
+def record_pod_timeline(job_name, user, k8s_job, pod_name, timeline):
+    """Store the timeline of a pod of the job, pods of other runs of the job are ignored."""
+    path = get_job_state_path(job_name, user)
+    if not os.path.exists(path):
+        return
+
+    with locked(path):
+        state = read_json(path, {})
+        if state.get("k8sJob") != k8s_job:
+            return
+        pods = state.setdefault("pods", {})
+        if pods.get(pod_name) == timeline:
+            return
+        pods[pod_name] = timeline
+        write_json_atomic(path, state)
+
+
+def record_job_attempt(job_name, user, attempt):
+    """Append an automatic resubmission of the job to its state."""
+    path = get_job_state_path(job_name, user)
+    with locked(path):
+        state = read_json(path, {})
+        state.setdefault("attempts", []).append(attempt)
+        write_json_atomic(path, state)
+
+
+def get_event_time(state, stage):
+    """Return the time the job reached the stage, None if it did not."""
+    for event in reversed(state.get("events", [])):
+        if event["stage"] == stage:
+            return event.get("received")
+    return None
+
+
+def clear_job_state(job_name, user):
+    """Delete the state of the job."""
+    path = get_job_state_path(job_name, user)
+    for state_path in [path, f"{path}.lock"]:
+        try:
+            os.remove(state_path)
+        except FileNotFoundError:
+            pass
@@ -8,8 +8,16 @@ from kubernetes import client
 import logging
 import shutil
 
-from app.shared.common import get_input_path, get_jobs_list, get_working_directory, get_output_path, get_input_dir
-from app.shared.kubernetes import get_running_jobs
+from app.shared.common import get_input_path, get_working_directory, get_output_path, get_input_dir
+from app.shared.job_names import job_name_exists, reserve_job_name, commit_job_name
+from app.shared.inflight import confirm_inflight_claim
+from app.shared.kubernetes import get_running_jobs, invalidate_list_cache
+from app.shared.job_state import record_job_event
+from app.shared.sequence_index import add_job_sequence, find_jobs_with_sequence, get_job_sequence_hash, set_job_sequence_entry
+from app.shared.settings_fingerprint import get_settings_fingerprint, is_current_fingerprint
+from app.shared.result_cache import register_job_result
+from app.shared.submissions import save_job_submission
+from app.shared.blob_store import write_input_file
 
 
 def generate_salt(length=64):
@@ -27,78 +35,66 @@ def generate_random_suffix(length=5):
     return ''.join(random.choice(string.ascii_lowercase) for _ in range(length))
 
 
-def check_same_job_name(name, user):
-    """Check if the job name already exists."""
-    for job in get_jobs_list(user):
-        if job == name:
-            return True
-
-    return False
+def get_response_error(response):
+    """Return the error message of an error response returned by the submission helpers."""
+    body = response[0].get_json(silent=True) or {}
+    return body.get("error") or body.get("message") or "Unknown error."
 
 
-def check_same_job_sequence(sequence, user):
-    """Check if another job with the same protein sequence exists in the input files."""
+def check_same_job_name(name, user):
+    """Check if the job name already exists."""
+    return job_name_exists(name, user)
 
-    original_sequence = sequence.split("\n")
 
-    input_dir_path = get_input_dir(user)
-    if not os.path.exists(input_dir_path):
+def check_same_job_sequence(sequence, user, sequence_hash=None):
+    """
+    Check if other jobs with the same protein sequence exist, looked up in the sequence index.
+    Returns the matching jobs with their settings fingerprints.
+    """
+    try:
+        matching_sequence_jobs = find_jobs_with_sequence(sequence, user, sequence_hash)
+    except Exception as e:
+        logging.error(f"Error looking up the sequence index of user {user}: {e}")
         return None
 
-    matching_sequence_jobs = []
-
-    for file in os.listdir(input_dir_path):
-        if file.endswith(".fasta"):
-            fasta_file_path = os.path.join(input_dir_path, file)
-            try:
-                with open(fasta_file_path, "r") as f:
-                    file_sequence = f.read()
-                    file_sequence = file_sequence.split("\n")
-
-                    if len(original_sequence) != len(file_sequence):
-                        continue
-
-                    if len(original_sequence) > 1 and len(original_sequence) % 2 == 0:
-                        for i in range(1, len(original_sequence), 2):
-                            if original_sequence[i].strip() != file_sequence[i].strip():
-                                break
-                        else:
-                            matching_sequence_jobs.append(file[:-6])
-                    else:
-                        if original_sequence[1].strip() == file_sequence[1].strip():
-                            matching_sequence_jobs.append(file[:-6])
-
-            except Exception as e:
-                logging.error(f"Error reading fasta file {fasta_file_path}: {e}")
-
     if matching_sequence_jobs:
         return matching_sequence_jobs
 
     return None
 
 
-def check_same_job_settings(input_config, matching_sequence_jobs, user):
-    """Check if another job with the same settings exists in the input files."""
+def get_job_settings_fingerprint(job, user):
+    """Compute the settings fingerprint of a job from its config file and store it in the sequence index."""
+    job_config_path = get_input_path(job, "json", user)
 
-    input_config_copy = input_config.copy()
-    input_config_copy.pop("name")
+    try:
+        with open(job_config_path) as f:
+            fingerprint = get_settings_fingerprint(json.load(f))
+    except FileNotFoundError:
+        logging.error(f"Job config file not found for job {job} at path {job_config_path}.")
+        return None
+    except json.JSONDecodeError as e:
+        logging.error(f"Invalid job config file of job {job} at path {job_config_path}: {e}")
+        return None
 
-    matching_settings_jobs = []
+    set_job_sequence_entry(job, user, fingerprint)
+    return fingerprint
 
-    for job in matching_sequence_jobs:
-        job_config_path = get_input_path(job, "json", user)
 
-        try:
-            with open(job_config_path) as f:
-                job_config = json.load(f)
-                job_config.pop("name")
+def check_same_job_settings(input_config, matching_sequence_jobs, user):
+    """Check if another job with the same settings exists, comparing the settings fingerprints."""
 
-            if job_config == input_config_copy:
-                matching_settings_jobs.append(job)
+    input_fingerprint = get_settings_fingerprint(input_config)
 
-        except FileNotFoundError:
-            logging.error(f"Job config file not found for job {job} at path {job_config_path}.")
-            continue
+    matching_settings_jobs = []
+
+    for job, fingerprint in matching_sequence_jobs.items():
+        # Jobs indexed before the fingerprints or by an older normalization
+        if not is_current_fingerprint(fingerprint):
+            fingerprint = get_job_settings_fingerprint(job, user)
+
+        if fingerprint == input_fingerprint:
+            matching_settings_jobs.append(job)
 
     if matching_settings_jobs:
         return matching_settings_jobs
@@ -122,7 +118,19 @@ def check_job_uniqueness(jobConfig, fileConfig, user):
     job_name = jobConfig["simplename"]
     force_computation = jobConfig["forceComputation"]
     sequence = jobConfig["proteinSequence"]
-    same_name = check_same_job_name(job_name, user)
+
+    # Reserve the name, concurrent submissions of the same name cannot both pass the check
+    reservation, same_name = reserve_job_name(job_name, user, force_computation,
+                                             public=jobConfig["makeResultsPublic"] == "true")
+    if reservation is None and not same_name:
+        logging.info(f'Job name {job_name} is being submitted by another request of user {user}.')
+        return jsonify({
+            "error": f"A job with the name **{job_name}** is being submitted right now. Please choose a different name."}), 409
+    if reservation is None and force_computation:
+        logging.info(f'Job name {job_name} is taken by a public job of another user than {user}.')
+        return jsonify({
+            "error": f"A public job with the name **{job_name}** already exists. Please choose a different name."}), 400
+    jobConfig["nameReservation"] = reservation
 
     if same_name and not force_computation:
         logging.info(f'Job name {job_name} already exists for user {user}. User did not request force computation.')
@@ -155,7 +163,7 @@ def check_job_uniqueness(jobConfig, fileConfig, user):
         logging.info(f'Job {job_name} is a MULTIFOLD job. Skipping sequence and settings uniqueness checks.')
         return None
 
-    matching_sequence_jobs = check_same_job_sequence(sequence, user)
+    matching_sequence_jobs = check_same_job_sequence(sequence, user, get_job_sequence_hash(jobConfig))
     if not matching_sequence_jobs:
         return None
 
@@ -177,17 +185,44 @@ def check_job_uniqueness(jobConfig, fileConfig, user):
     return None
 
 
+def record_submitted_job(job):
+    """Start the state of the submitted job, the events of its pods are recorded to it."""
+    annotations = job.metadata.annotations or {}
+    try:
+        record_job_event(annotations["simplename"], annotations["user"], {
+            "stage": "submitted",
+            "job": job.metadata.name,
+            "target": annotations.get("target"),
+            "service": annotations.get("service"),
+            "attempt": int(annotations.get("attempt", 0)),
+        })
+    except Exception as e:
+        logging.error(f"Failed to record the state of job {job.metadata.name}: {e}")
+
+
 def create_k8s_job(batchApi, namespace, job):
     """Submit the job to the Kubernetes cluster."""
     try:
         batchApi.create_namespaced_job(namespace, job)
         logging.info(f"Job {job.metadata.name} successfully deployed.")
+        invalidate_list_cache()
+        record_submitted_job(job)
     except client.exceptions.ApiException as e:
         raise e
     except Exception as e:
         raise Exception(f"Kubernetes job deployment failure: {str(e)}")
 
 
+def record_job_submission(jobConfig, user):
+    """Record the submitted settings of the job, kept in the job configuration, for its clones."""
+    if "submission" not in jobConfig:
+        return
+    try:
+        save_job_submission(jobConfig["simplename"], user, jobConfig["service"], jobConfig["submission"])
+    except Exception as e:
+        logging.error(f'Failed to record the submission of job {jobConfig["simplename"]}: {e}')
+
+
 def create_input_files(jobConfig, fileConfig, user):
     fasta_path = get_input_path(jobConfig["simplename"], "fasta", user)
     json_path = get_input_path(jobConfig["simplename"], "json", user)
@@ -210,6 +245,8 @@ def create_input_files(jobConfig, fileConfig, user):
             try:
                 shutil.rmtree(get_output_path(jobConfig["simplename"], user))
                 logging.info(f'Deleted output files for {jobConfig["simplename"]}')
+                commit_job_name(jobConfig["simplename"], user, jobConfig.get("nameReservation"))
+                record_job_submission(jobConfig, user)
                 return None
             except FileNotFoundError:
                 logging.error(f'Output files for {jobConfig["simplename"]} do not exist.')
@@ -217,15 +254,28 @@ def create_input_files(jobConfig, fileConfig, user):
                 logging.error(f'Error deleting output files for {jobConfig["simplename"]}: {e}')
 
     try:
-        with open(fasta_path, "w") as f:
-            f.write(f"{jobConfig['proteinSequence']}")
+        write_input_file(fasta_path, f"{jobConfig['proteinSequence']}")
 
-        with open(json_path, "w") as f:
-            f.write(json.dumps(fileConfig, indent=4))
+        write_input_file(json_path, json.dumps(fileConfig, indent=4))
 
     except Exception as e:
         return jsonify({"error": f"Failed to create input files: {str(e)}"}), 500
 
+    commit_job_name(jobConfig["simplename"], user, jobConfig.get("nameReservation"))
+    confirm_inflight_claim(jobConfig["simplename"], user)
+    record_job_submission(jobConfig, user)
+
+    try:
+        add_job_sequence(jobConfig["simplename"], user, jobConfig["proteinSequence"],
+                         get_settings_fingerprint(fileConfig), get_job_sequence_hash(jobConfig))
+    except Exception as e:
+        logging.error(f'Failed to add job {jobConfig["simplename"]} to the sequence index: {e}')
+
+    try:
+        register_job_result(jobConfig, fileConfig, user)
+    except Exception as e:
+        logging.error(f'Failed to add job {jobConfig["simplename"]} to the result cache: {e}')
+
     # Create symlink to the public directory for the public files
     if jobConfig["makeResultsPublic"] == "true":
         public_fasta_path = get_input_path(jobConfig["simplename"], "fasta", "public")
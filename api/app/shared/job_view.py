@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+
+from app.shared.kubernetes import get_batch_api, get_core_api, follow_resource, namespaced_list_fn
+from app.shared.targets import load_targets
+from app.shared.pod_timeline import TimelineRecorder
+from app.shared.oom_retry import OomWatcher
+from config import Config
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+class JobView:
+    """
+    Cached view of the jobs and pods in the namespace of one target, kept up to date by watches.
+
+    Listeners registered with add_pod_listener are called with the event type and the pod
+    for every pod change, so other components can react to pods without polling the API.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self._lock = threading.Lock()
+        self._jobs = {}  # job name: V1Job
+        self._pods = {}  # pod name: V1Pod
+        self._pod_listeners = []
+        self._updated = None
+        self._started = False
+        self._listed = set()
+
+    def start(self):
+        """List the jobs and pods and start following their changes."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        namespace = self.target["namespace"]
+        followers = [
+            ("jobs", namespaced_list_fn(get_batch_api(self.target).list_namespaced_job, namespace),
+             self.set_jobs, self.on_job_event),
+            ("pods", namespaced_list_fn(get_core_api(self.target).list_namespaced_pod, namespace),
+             self.set_pods, self.on_pod_event),
+        ]
+        for name, list_fn, on_list, on_event in followers:
+            description = f"{name} of target {self.target['name']}"
+            thread = threading.Thread(target=follow_resource, args=(description, list_fn, on_list, on_event),
+                                      name=f"job-view-{self.target['name']}-{name}", daemon=True)
+            thread.start()
+
+    def add_pod_listener(self, listener):
+        """Register a function called with (event type, pod) for every pod change."""
+        with self._lock:
+            self._pod_listeners.append(listener)
+
+    def set_jobs(self, jobs):
+        """Replace the cached jobs with a fresh list."""
+        with self._lock:
+            self._jobs = {job.metadata.name: job for job in jobs}
+            self._updated = time.time()
+            self._listed.add("jobs")
+
+    def on_job_event(self, event_type, job):
+        """Update the cached job from a watch event."""
+        with self._lock:
+            if event_type == "DELETED":
+                self._jobs.pop(job.metadata.name, None)
+            else:
+                self._jobs[job.metadata.name] = job
+            self._updated = time.time()
+
+    def set_pods(self, pods):
+        """Replace the cached pods with a fresh list."""
+        with self._lock:
+            self._pods = {pod.metadata.name: pod for pod in pods}
+            self._updated = time.time()
+            self._listed.add("pods")
+            listeners = list(self._pod_listeners)
+        for pod in pods:
+            self._notify(listeners, "ADDED", pod)
+
+    def on_pod_event(self, event_type, pod):
+        """Update the cached pod from a watch event."""
+        with self._lock:
+            if event_type == "DELETED":
+                self._pods.pop(pod.metadata.name, None)
+            else:
+                self._pods[pod.metadata.name] = pod
+            self._updated = time.time()
+            listeners = list(self._pod_listeners)
+        self._notify(listeners, event_type, pod)
+
+    def _notify(self, listeners, event_type, pod):
+        """Call the pod listeners, a failing listener does not stop the others or the watch."""
+        for listener in listeners:
+            try:
+                listener(event_type, pod)
+            except Exception as e:
+                logging.error(f"Pod listener {listener.__name__} failed for pod {pod.metadata.name}: {e}")
+
+    def jobs(self):
+        """Return the cached jobs."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get_job(self, name):
+        """Return the cached job with the given name, None if it is not known."""
+        with self._lock:
+            return self._jobs.get(name)
+
+    def pods(self):
+        """Return the cached pods."""
+        with self._lock:
+            return list(self._pods.values())
+
+    def synced(self):
+        """Check if the jobs and the pods were listed, the view is empty or partial before."""
+        with self._lock:
+            return self._listed == {"jobs", "pods"}
+
+    def updated(self):
+        """Return the time of the last change of the view, None before the first list."""
+        return self._updated
+
+
+def get_job_view(target):
+    """
+    Return the started job view of the target, created on first use. The jobs that ran out of memory are only
+    resubmitted when the views are started with the API (WATCH_JOBS), not by a view the monitoring routes start.
+    """
+    with _views_lock:
+        view = _views.get(target["name"])
+        if view is None:
+            view = JobView(target)
+            view.add_pod_listener(TimelineRecorder(view))
+            if getattr(Config, "WATCH_JOBS", False):
+                view.add_pod_listener(OomWatcher(view))
+            _views[target["name"]] = view
+    view.start()
+    return view
+
+
+def get_job_views():
+    """Return the started job views of all the configured targets."""
+    return [get_job_view(target) for target in load_targets()]
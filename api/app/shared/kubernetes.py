@@ -1,9 +1,22 @@
 import os
-from kubernetes import client, config
+import time
+from kubernetes import client, config, watch
 
-from app.shared.common import NAMESPACE
+from app.shared.targets import load_targets
+from app.shared.singleflight import SingleFlight
+from config import Config
 import logging
 
+# API clients of the targets with their own credentials, created once per process
+_api_clients = {}
+
+# Namespace-wide list calls shared by concurrent requests of this worker
+list_calls = SingleFlight(ttl=float(getattr(Config, "K8S_LIST_CACHE_TTL", 2)))
+
+# Seconds a watch stays open before it is renewed, and the pause after a failed watch
+WATCH_TIMEOUT = 300
+WATCH_RETRY_DELAY = 10
+
 def connect_to_k8s():
     """Connect to kubernetes cluster"""
     try:
@@ -20,6 +33,76 @@ def connect_to_k8s():
     batchApi = client.BatchV1Api()
     return batchApi
 
+def get_api_client(target):
+    """Return the API client for the target, None for the target using the default configuration."""
+    if not target.get("kubeconfig") and not target.get("context"):
+        return None
+
+    if target["name"] not in _api_clients:
+        _api_clients[target["name"]] = config.new_client_from_config(
+            config_file=target.get("kubeconfig"), context=target.get("context"))
+    return _api_clients[target["name"]]
+
+def get_batch_api(target):
+    """Return the Batch API for the target."""
+    api_client = get_api_client(target)
+    if api_client is None:
+        return connect_to_k8s()
+    return client.BatchV1Api(api_client)
+
+def get_core_api(target):
+    """Return the Core API for the target."""
+    api_client = get_api_client(target)
+    if api_client is None:
+        return client.CoreV1Api()
+    return client.CoreV1Api(api_client)
+
+def list_jobs(target):
+    """List the jobs in the target namespace, coalesced with concurrent callers and cached for a short TTL."""
+    return list_calls.do(
+        ("jobs", target["name"]),
+        lambda: get_batch_api(target).list_namespaced_job(target["namespace"]).items)
+
+def list_pods(target):
+    """List the pods in the target namespace, coalesced with concurrent callers and cached for a short TTL."""
+    return list_calls.do(
+        ("pods", target["name"]),
+        lambda: get_core_api(target).list_namespaced_pod(target["namespace"]).items)
+
+def invalidate_list_cache():
+    """Forget the cached list results, e.g. after a job was created."""
+    list_calls.invalidate()
+
+def namespaced_list_fn(list_fn, namespace):
+    """Bind a namespaced list call to the namespace, keeping the docstring the watch reads the return type from."""
+    def list_namespaced(**kwargs):
+        return list_fn(namespace, **kwargs)
+    list_namespaced.__doc__ = list_fn.__doc__
+    return list_namespaced
+
+def follow_resource(description, list_fn, on_list, on_event):
+    """
+    List the resources and follow their changes forever, meant to run in a daemon thread.
+
+    on_list receives the listed items, on_event the type and object of every watch event.
+    Whenever the watch breaks (e.g. its resource version expired), the resources are listed again.
+    """
+    while True:
+        try:
+            resource_list = list_fn()
+            on_list(resource_list.items)
+            resource_version = resource_list.metadata.resource_version
+            while True:
+                for event in watch.Watch().stream(list_fn, resource_version=resource_version,
+                                                  timeout_seconds=WATCH_TIMEOUT):
+                    if event["type"] == "ERROR":
+                        raise Exception(f"Watch error: {event['raw_object']}")
+                    resource_version = event["object"].metadata.resource_version
+                    on_event(event["type"], event["object"])
+        except Exception as e:
+            logging.warning(f"Watch of {description} failed: {e}")
+            time.sleep(WATCH_RETRY_DELAY)
+
 def get_job_status(job):
     """Determine the status of the job."""
     if job.status.active is not None and job.status.active > 0:
@@ -38,18 +121,25 @@ def get_pod_status(pods, job_name):
     return "Waiting..."
 
 def get_running_jobs(current_user):
-    """Get the list of running jobs for the user."""
+    """
+    Get the list of running jobs for the user, merged from all the configured targets.
+    Raises the error of a target that could not be listed, its jobs are unknown rather than finished.
+    """
+    running_jobs_array = []
 
-    # Initialize the Kubernetes API
-    batchApi = connect_to_k8s()
-    podApi = client.CoreV1Api()
-    
+    for target in load_targets():
+        running_jobs_array.extend(get_target_running_jobs(target, current_user))
+
+    return running_jobs_array
+
+def get_target_running_jobs(target, current_user):
+    """Get the list of running jobs for the user in one target."""
     running_jobs_array = []
 
     try:
         # Get all jobs and pods in the namespace
-        jobs = batchApi.list_namespaced_job(NAMESPACE).items
-        pods = podApi.list_namespaced_pod(NAMESPACE).items
+        jobs = list_jobs(target)
+        pods = list_pods(target)
 
         # Filter the jobs for the current user
         for job in jobs:
@@ -59,13 +149,27 @@ def get_running_jobs(current_user):
                 pod_status = get_pod_status(pods, job.metadata.name)
                 if pod_status == "Pending":
                     pod_status = "Queued"
-            
+
                 if job_status == "Failed":
                     pod_status = "Failed"
-            
+
                 running_jobs_array.append([job_name, job_status, pod_status])
     except Exception as e:
-        logging.error(f"Failed to list jobs: {e}")
-        return []
+        logging.error(f"Failed to list jobs of target {target['name']}: {e}")
+        raise
+
+    return running_jobs_array
+
+def count_active_jobs(target):
+    """Count the Foldify jobs that are not finished yet in the target."""
+    try:
+        jobs = list_jobs(target)
+    except Exception as e:
+        logging.error(f"Failed to list jobs of target {target['name']}: {e}")
+        return None
 
-    return running_jobs_array
\ No newline at end of file
+    return sum(
+        1 for job in jobs
+        if job.metadata.annotations and job.metadata.annotations.get("user")
+        and get_job_status(job) in ["Running", "Waiting..."]
+    )
@@ -0,0 +1,137 @@
+import time
+
+from app.shared.gpu_capacity import get_pod_gpu_requests
+from app.shared.kubernetes import get_job_status
+
+TOOLS = ["AlphaFold", "AlphaFold3", "ColabFold", "ESMFold", "OmegaFold"]
+UNKNOWN_TOOL = "unknown"
+
+
+def get_job_tool(job):
+    """Return the tool of the job from its annotations."""
+    return (job.metadata.annotations or {}).get("service", UNKNOWN_TOOL)
+
+
+def is_foldify_job(job):
+    """Check if the job was submitted by Foldify (and not e.g. by the AlphaFold 3 launcher)."""
+    return bool((job.metadata.annotations or {}).get("user"))
+
+
+def get_pod_job_name(pod):
+    """Return the name of the job owning the pod."""
+    return (pod.metadata.labels or {}).get("job-name")
+
+
+def get_template_gpu_requests(job):
+    """Return the GPU resources requested by the pod template of the job."""
+    return get_pod_gpu_requests(job.spec.template)
+
+
+def collect_queue_metrics(view, now=None):
+    """
+    Compute the queue gauges of one target from its cached job view.
+
+    Returns the pending and running job counts, the requested GPUs and the oldest pending age per tool,
+    and the counts of the CPU-stage and GPU-stage pods started by the AlphaFold 3 launcher jobs. The GPUs
+    of the AlphaFold 3 jobs are requested by their stage pods, they are counted in the state of the pod.
+    """
+    now = now or time.time()
+    pods_by_job = {}
+    for pod in view.pods():
+        pods_by_job.setdefault(get_pod_job_name(pod), []).append(pod)
+
+    tools = {tool: {"pending": 0, "running": 0, "pending_gpus": 0, "running_gpus": 0, "oldest_pending": 0}
+             for tool in TOOLS}
+    af3_stages = {(stage, state): 0 for stage in ["cpu", "gpu"] for state in ["pending", "running"]}
+    af3_launchers = []
+
+    for job in view.jobs():
+        if not is_foldify_job(job) or get_job_status(job) in ["Success", "Failed"]:
+            continue
+
+        tool = get_job_tool(job)
+        if tool == "AlphaFold3":
+            af3_launchers.append(job.metadata.name)
+
+        pods = pods_by_job.get(job.metadata.name, [])
+        state = "running" if any(pod.status and pod.status.phase == "Running" for pod in pods) else "pending"
+        gpus = sum(get_template_gpu_requests(job).values())
+
+        totals = tools.setdefault(tool, {"pending": 0, "running": 0, "pending_gpus": 0, "running_gpus": 0,
+                                         "oldest_pending": 0})
+        totals[state] += 1
+        totals[f"{state}_gpus"] += gpus
+        if state == "pending" and job.metadata.creation_timestamp:
+            age = now - job.metadata.creation_timestamp.timestamp()
+            totals["oldest_pending"] = max(totals["oldest_pending"], age)
+
+    # The AlphaFold 3 launcher runs the data pipeline and the inference as separate jobs named after it
+    for job_name, pods in pods_by_job.items():
+        if not job_name or job_name in af3_launchers:
+            continue
+        if not any(job_name.startswith(f"{launcher}-") for launcher in af3_launchers):
+            continue
+        for pod in pods:
+            phase = pod.status.phase if pod.status else "Pending"
+            if phase not in ["Pending", "Running"]:
+                continue
+            gpus = sum(get_pod_gpu_requests(pod).values())
+            stage = "gpu" if gpus else "cpu"
+            af3_stages[(stage, phase.lower())] += 1
+            tools["AlphaFold3"][f"{phase.lower()}_gpus"] += gpus
+
+    return {"tools": tools, "af3_stages": af3_stages, "updated": view.updated()}
+
+
+def format_labels(labels):
+    """Format the labels of a Prometheus sample."""
+    return ",".join(f'{key}="{str(value)}"' for key, value in labels.items())
+
+
+def render_metrics(views, cache_stats):
+    """Render the queue gauges of all the job views in the Prometheus text exposition format."""
+    now = time.time()
+    families = {
+        "foldify_jobs": ("gauge", "Unfinished Foldify jobs by tool and state.", []),
+        "foldify_requested_gpus": ("gauge", "GPUs requested by unfinished Foldify jobs by tool and state.", []),
+        "foldify_oldest_pending_job_age_seconds": ("gauge", "Age of the oldest pending Foldify job by tool.", []),
+        "foldify_alphafold3_stage_pods": ("gauge", "Pods of the AlphaFold 3 data pipeline (cpu) and inference (gpu) stages.", []),
+        "foldify_job_view_synced": ("gauge", "Whether the job view listed the jobs and pods, the other gauges of the target are not reported before.", []),
+        "foldify_job_view_age_seconds": ("gauge", "Seconds since the cached job view last changed.", []),
+        "foldify_k8s_list_cache_requests_total": ("counter", "Kubernetes list calls served by this worker by result.", []),
+    }
+
+    for view in views:
+        target = view.target["name"]
+        synced = view.synced()
+        families["foldify_job_view_synced"][2].append(({"target": target}, int(synced)))
+        if not synced:
+            # An empty view would report an empty queue until the first lists finish
+            continue
+
+        metrics = collect_queue_metrics(view, now)
+        for tool, totals in metrics["tools"].items():
+            for state in ["pending", "running"]:
+                labels = {"target": target, "tool": tool, "state": state}
+                families["foldify_jobs"][2].append((labels, totals[state]))
+                families["foldify_requested_gpus"][2].append((labels, totals[f"{state}_gpus"]))
+            families["foldify_oldest_pending_job_age_seconds"][2].append(
+                ({"target": target, "tool": tool}, round(totals["oldest_pending"], 3)))
+        for (stage, state), count in metrics["af3_stages"].items():
+            families["foldify_alphafold3_stage_pods"][2].append(
+                ({"target": target, "stage": stage, "state": state}, count))
+        if metrics["updated"] is not None:
+            families["foldify_job_view_age_seconds"][2].append(
+                ({"target": target}, round(now - metrics["updated"], 3)))
+
+    for result in ["hits", "misses", "coalesced", "errors"]:
+        families["foldify_k8s_list_cache_requests_total"][2].append(({"result": result}, cache_stats[result]))
+
+    lines = []
+    for name, (metric_type, description, samples) in families.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{{{format_labels(labels)}}} {value}")
+
+    return "\n".join(lines) + "\n"
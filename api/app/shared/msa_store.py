@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+
+from app.shared.common import get_input_path, get_msa_store_path
+from app.shared.blob_store import write_input_file
+from app.shared.sequence_index import get_canonical_chains
+from config import Config
+
+# The MSA store as mounted in the job pods
+MSA_STORE_MOUNT = "/mnt/msa"
+
+# Chain IDs AlphaFold 2 gives to the sequences of a multimer FASTA file, in their order
+PDB_CHAIN_IDS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+# Fields of an AlphaFold 3 protein chain holding its MSAs and templates
+AF3_MSA_KEYS = ["unpairedMsa", "pairedMsa", "templates"]
+
+# Publishes the MSAs and templates of the protein chains of an AlphaFold 3 data JSON to the store,
+# run in the job pod as: python -c "$FOLDIFY_MSA_SCRIPT" <data JSON> <store directory>
+AF3_MSA_PUBLISH_SCRIPT = """
+import hashlib, json, os, sys
+data_path, store_dir = sys.argv[1], sys.argv[2]
+with open(data_path) as f:
+    data = json.load(f)
+for sequence in data.get("sequences", []):
+    protein = sequence.get("protein")
+    if not protein or protein.get("unpairedMsa") is None:
+        continue
+    chain_hash = hashlib.sha256("".join(protein["sequence"].split()).upper().encode()).hexdigest()
+    path = os.path.join(store_dir, chain_hash[:2], chain_hash + ".json")
+    if os.path.exists(path):
+        continue
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + "." + str(os.getpid()) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({key: protein.get(key) for key in %s}, f)
+    os.replace(tmp_path, path)
+""" % AF3_MSA_KEYS
+
+
+def msa_store_enabled():
+    """Check if the jobs reuse and publish the MSAs of their chains."""
+    return getattr(Config, "MSA_STORE", False)
+
+
+def get_chain_hash(chain):
+    """Return the hash of the canonical chain sequence."""
+    return hashlib.sha256("".join(chain.split()).upper().encode()).hexdigest()
+
+
+def get_store_dir(tool, variant):
+    """Return the store directory of the tool and pipeline variant, relative to the store root."""
+    return os.path.join(tool, getattr(Config, "MSA_DATABASE_VERSION", "1"), variant)
+
+
+def get_af2_variant(jobConfig):
+    """
+    Return the AlphaFold 2 pipeline variant of the job: the databases it searches and whether it runs as a monomer
+    or a multimer (which searches UniProt and the PDB seqres instead of PDB70 for the templates).
+    """
+    databases = [jobConfig["uniref90"], jobConfig["mgnify"], jobConfig["reduced"], jobConfig["full"],
+                 jobConfig["uniclust"], jobConfig["pdbdb"], jobConfig["pdbseq"], jobConfig["uniprot"]]
+    model = "multimer" if jobConfig["modelPreset"] == "multimer" else "monomer"
+    return f'{model}-{jobConfig["dbPreset"]}-{hashlib.sha256(" ".join(databases).encode()).hexdigest()[:12]}'
+
+
+def get_af2_msa_dirs(jobConfig):
+    """
+    Return the MSA directories AlphaFold 2 creates for the job, relative to its msas directory, with their chain hashes.
+
+    A monomer writes its MSAs to the msas directory, a multimer to a directory per unique sequence
+    named after the chain ID of its first occurrence.
+    """
+    chains = get_canonical_chains(jobConfig["proteinSequence"])
+    if jobConfig["modelPreset"] != "multimer":
+        return [("", get_chain_hash(chains[0]))] if chains else []
+
+    msa_dirs, seen = [], set()
+    for chain_id, chain in zip(PDB_CHAIN_IDS, chains):
+        if chain not in seen:
+            seen.add(chain)
+            msa_dirs.append((chain_id, get_chain_hash(chain)))
+    return msa_dirs
+
+
+def get_af2_msa_commands(jobConfig, output_dir):
+    """
+    Return the commands restoring the stored MSAs of the job before AlphaFold 2 runs and publishing its new MSAs
+    after it, and whether any MSAs were restored (AlphaFold 2 then has to use precomputed MSAs).
+
+    The commands never fail, a missing or incomplete store entry only makes AlphaFold 2 search again.
+    """
+    if not msa_store_enabled():
+        return None, None, False
+
+    store_dir = get_store_dir("alphafold2", get_af2_variant(jobConfig))
+    restore, publish = [], []
+    for msa_dir, chain_hash in get_af2_msa_dirs(jobConfig):
+        entry = os.path.join(store_dir, chain_hash[:2], chain_hash)
+        source = os.path.join(output_dir, "msas", msa_dir)
+        if os.path.isdir(get_msa_store_path(entry)):
+            restore.append(f'mkdir -p {source} && cp -r {MSA_STORE_MOUNT}/{entry}/. {source}/')
+        else:
+            target = f'{MSA_STORE_MOUNT}/{entry}'
+            publish.append(
+                f'if [ -d {source} ] && [ ! -e {target} ] ; then mkdir -p {os.path.dirname(target)} && '
+                f'cp -r {source} {target}.tmp.$$ && mv -T {target}.tmp.$$ {target} || rm -rf {target}.tmp.$$ ; fi'
+            )
+
+    restore_cmd = f'{{ ( {" && ".join(restore)} ) || true; }}' if restore else None
+    publish_cmd = (f'{{ ( if [ -s "{output_dir}/ranking_debug.json" ] ; then {" ; ".join(publish)} ; fi ) || true; }}'
+                   if publish else None)
+    return restore_cmd, publish_cmd, bool(restore)
+
+
+def get_af3_variant(data):
+    """Return the AlphaFold 3 pipeline variant of the job: where its MSAs and templates come from."""
+    variant = "mmseqs2" if data.get("precomputedMSA") else "jackhmmer"
+    if "precomputedTemplates" in data:
+        variant += f'-templates{data.get("numberOfTemplates")}'
+    return variant
+
+
+def use_stored_af3_msas(data, user):
+    """
+    Add the stored MSAs and templates to the protein chains of the job input JSON, chains with their own are kept.
+
+    The MMseqs2 step of the precomputed MSAs runs for all the chains, so its MSAs are only added if all the protein
+    chains are stored. Returns True if all the protein chains have their MSAs, the MMseqs2 step is then skipped.
+    """
+    if not msa_store_enabled():
+        return False
+
+    json_path = get_input_path(data["name"], "json", user)
+    try:
+        with open(json_path) as f:
+            job_input = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logging.error(f"Cannot read the input of job {data['name']} for the MSA store: {e}")
+        return False
+
+    # The AlphaFold Server format has no MSA fields
+    if not isinstance(job_input, dict):
+        return False
+
+    store_dir = get_store_dir("alphafold3", get_af3_variant(data))
+    proteins = [sequence["protein"] for sequence in job_input.get("sequences", []) if "protein" in sequence]
+    missing = [protein for protein in proteins if not any(key in protein for key in AF3_MSA_KEYS)]
+
+    stored = []
+    for protein in missing:
+        chain_hash = get_chain_hash(protein["sequence"])
+        try:
+            with open(get_msa_store_path(store_dir, chain_hash[:2], f"{chain_hash}.json")) as f:
+                stored.append((protein, json.load(f)))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+
+    if not stored or (data.get("precomputedMSA") and len(stored) < len(missing)):
+        return False
+
+    for protein, msas in stored:
+        protein.update(msas)
+    write_input_file(json_path, json.dumps(job_input, separators=(",", ":")))
+
+    logging.info(f"Job {data['name']} uses the stored MSAs of {len(stored)} of its {len(proteins)} protein chains.")
+    return len(stored) == len(missing)
+
+
+def get_af3_msa_publish_command(data, output_dir):
+    """Return the command publishing the MSAs of the AlphaFold 3 job to the store, it never fails."""
+    if not msa_store_enabled():
+        return None
+
+    sanitised_name = data["name"].lower()
+    data_json = f"{output_dir}/{sanitised_name}/{sanitised_name}_data.json"
+    store_dir = f'{MSA_STORE_MOUNT}/{get_store_dir("alphafold3", get_af3_variant(data))}'
+    return f'{{ ( if [ -s "{data_json}" ] ; then python -c "$FOLDIFY_MSA_SCRIPT" {data_json} {store_dir} ; fi ) || true; }}'
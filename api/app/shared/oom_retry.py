@@ -0,0 +1,410 @@
+import copy
+import glob
+import logging
+import os
+import re
+import time
+from kubernetes import client
+
+from app.shared.common import get_output_path
+from app.shared.file_store import write_json_atomic
+from app.shared.gpu_capacity import get_gpu_monitor, get_required_gpu_products, set_required_gpu_products
+from app.shared.gpu_profiles import FULL_GPU_RESOURCE, is_fractional_gpu_resource, get_allowed_gpu_products
+from app.shared.job_events import RETRY_MARKER_PREFIX
+from app.shared.job_state import add_event_listener, get_job_state, record_job_attempt
+from app.shared.job_submitting import create_k8s_job
+from app.shared.kubernetes import get_batch_api
+from app.shared.targets import get_target, load_targets
+from config import Config
+
+# Bytes of the end of the job stdout searched for out-of-memory signatures
+STDOUT_TAIL_SIZE = 64 * 1024
+
+# Out-of-memory messages of the tools (JAX/XLA, TensorFlow, PyTorch, CUDA) and of the host memory allocation
+OOM_SIGNATURES = {
+    "gpu": re.compile(r"RESOURCE_EXHAUSTED: Out of memory|CUDA out of memory|CUDA_ERROR_OUT_OF_MEMORY|"
+                      r"OutOfMemoryError|cudaErrorMemoryAllocation|Failed to allocate .* bytes on device"),
+    "memory": re.compile(r"MemoryError|std::bad_alloc|Cannot allocate memory"),
+}
+
+# Environment of the unified memory computation, GPU memory can spill over to the host memory
+UNIFIED_MEMORY_ENV = {
+    "XLA_PYTHON_CLIENT_PREALLOCATE": "false",
+    "TF_FORCE_UNIFIED_MEMORY": "true",
+    "XLA_CLIENT_MEM_FRACTION": "3.2",
+}
+
+# Labels added by Kubernetes to jobs and their pods, they must not be copied to a new job
+SYSTEM_LABELS = ["controller-uid", "batch.kubernetes.io/controller-uid", "batch.kubernetes.io/job-name"]
+
+# Environment variables holding the name of the Kubernetes job
+JOB_NAME_ENV = ["FOLDIFY_K8S_JOB", "K8S_JOB_NAME"]
+
+# Tools whose job only launches the stage pods running the tool, their resources are set by the launcher
+STAGE_LAUNCHER_TOOLS = ["AlphaFold3"]
+
+MEMORY_UNITS = {"Ki": 2 ** 10, "Mi": 2 ** 20, "Gi": 2 ** 30, "Ti": 2 ** 40, "K": 10 ** 3, "M": 10 ** 6, "G": 10 ** 9, "T": 10 ** 12}
+
+
+def get_max_retries():
+    """Return the number of automatic resubmissions of a job, 0 disables them."""
+    return int(getattr(Config, "OOM_MAX_RETRIES", 0))
+
+
+def get_memory_tiers():
+    """Return the memory limits a job is escalated through, smallest first."""
+    tiers = getattr(Config, "OOM_MEMORY_TIERS", "") or ""
+    return sorted((tier.strip() for tier in tiers.split(",") if tier.strip()), key=parse_memory)
+
+
+def get_gpu_product_ladder():
+    """Return the GPU products a job is escalated through, smallest GPU memory first."""
+    products = getattr(Config, "OOM_GPU_PRODUCTS", "") or ""
+    return [product.strip() for product in products.split(",") if product.strip()]
+
+
+def parse_memory(value):
+    """Parse a memory quantity to bytes."""
+    if not value:
+        return 0
+    match = re.fullmatch(r"([0-9.]+)([A-Za-z]*)", str(value))
+    if not match:
+        return 0
+    return int(float(match.group(1)) * MEMORY_UNITS.get(match.group(2), 1))
+
+
+def get_oom_killed_container(pod):
+    """Return the name of the container of the pod killed for exceeding its memory limit, None if there is none."""
+    for status in (pod.status.container_statuses or []) if pod.status else []:
+        terminated = status.state.terminated if status.state else None
+        if terminated and terminated.reason == "OOMKilled":
+            return status.name
+    return None
+
+
+def get_pod_oom_kind(pod):
+    """Return "memory" if a container of the pod was killed for exceeding its memory limit, None otherwise."""
+    return "memory" if get_oom_killed_container(pod) is not None else None
+
+
+def get_stdout_oom_kind(job_name, user):
+    """Return the kind of the out-of-memory failure found at the end of the job stdout, None if there is none."""
+    stdout_path = os.path.join(get_output_path(job_name, user), "stdout")
+    try:
+        with open(stdout_path, "rb") as f:
+            f.seek(max(os.path.getsize(stdout_path) - STDOUT_TAIL_SIZE, 0))
+            tail = f.read().decode(errors="replace")
+    except OSError:
+        return None
+
+    for kind, signature in OOM_SIGNATURES.items():
+        if signature.search(tail):
+            return kind
+    return None
+
+
+def get_job_container(job):
+    """Return the container of the job running the tool."""
+    return job.spec.template.spec.containers[0]
+
+
+def launches_stage_pods(job):
+    """Check if the job only launches the stage pods running the tool (AlphaFold 3)."""
+    return (job.metadata.annotations or {}).get("service") in STAGE_LAUNCHER_TOOLS
+
+
+def get_oom_container(job, failure):
+    """
+    Return the container of the job that ran out of memory: the OOMKilled container, or the tool container
+    for a failure found in the stdout. None when the tool ran in a stage pod, whose resources the job does not set.
+    """
+    containers = job.spec.template.spec.containers
+    if failure.get("container"):
+        return next((container for container in containers if container.name == failure["container"]), None)
+    if launches_stage_pods(job):
+        return None
+    return containers[0]
+
+
+def raise_memory_limit(job, state, target, failure):
+    """Raise the memory limit of the container that ran out of memory to the next memory tier."""
+    container = get_oom_container(job, failure)
+    if container is None:
+        return None
+    limits = container.resources.limits or {}
+    current = limits.get("memory")
+    for tier in get_memory_tiers():
+        if parse_memory(tier) > parse_memory(current):
+            limits["memory"] = tier
+            container.resources.limits = limits
+            return f"memory limit {current} -> {tier}"
+    return None
+
+
+def use_full_gpu(job, state, target, failure):
+    """Replace the fractional GPU of the job with a full GPU."""
+    resources = get_job_container(job).resources
+    fractional = [resource for resource in resources.limits or {} if is_fractional_gpu_resource(resource)]
+    if not fractional:
+        return None
+
+    for values in [resources.requests, resources.limits]:
+        for resource in fractional:
+            if values and resource in values:
+                values[FULL_GPU_RESOURCE] = values.pop(resource)
+
+    products = get_allowed_gpu_products((job.metadata.annotations or {}).get("service"), FULL_GPU_RESOURCE)
+    if products:
+        set_required_gpu_products(job.spec.template.spec, products)
+    return f"full GPU instead of {fractional[0]}"
+
+
+def enable_unified_memory(job, state, target, failure):
+    """
+    Let the GPU memory of the job spill over to the host memory, the AlphaFold 3 launcher passes
+    the setting to its stage pods. Most tools always run with unified memory, there it changes nothing.
+    """
+    container = get_job_container(job)
+    env = container.env or []
+    if any(item.name == "TF_FORCE_UNIFIED_MEMORY" and str(item.value).lower() in ["1", "true"] for item in env):
+        return None
+
+    env = [item for item in env if item.name not in UNIFIED_MEMORY_ENV]
+    container.env = env + [client.V1EnvVar(name=name, value=value) for name, value in UNIFIED_MEMORY_ENV.items()]
+    return "unified memory enabled"
+
+
+def get_last_gpu_product(job, state, target):
+    """Return the GPU product the job was restricted to or ran on, None if it is not known."""
+    products = get_required_gpu_products(job.spec.template.spec)
+    if products:
+        return products[0]
+
+    nodes = [pod.get("node") for pod in (state.get("pods") or {}).values() if pod.get("node")]
+    if not nodes:
+        return None
+    return get_gpu_monitor(target).get_node_product(nodes[-1])
+
+
+def use_larger_gpu(job, state, target, failure):
+    """Restrict the job to the GPU products with more memory than the one it ran on, only with OOM_GPU_PRODUCTS."""
+    ladder = get_gpu_product_ladder()
+    if not ladder:
+        return None
+
+    current = get_last_gpu_product(job, state, target)
+    larger = ladder[ladder.index(current) + 1:] if current in ladder else ladder[-1:]
+    if not larger or get_required_gpu_products(job.spec.template.spec) == larger:
+        return None
+
+    set_required_gpu_products(job.spec.template.spec, larger)
+    return f"GPU products {', '.join(larger)}"
+
+
+# Escalations tried in order for every kind of out-of-memory failure, one escalation per attempt.
+# An escalation returns None when it cannot change the job, the job is not resubmitted if none can.
+ESCALATIONS = {
+    "memory": [raise_memory_limit],
+    "gpu": [use_full_gpu, enable_unified_memory, use_larger_gpu],
+}
+
+
+def get_retry_job_name(job_name, attempt):
+    """Return the deterministic name of the attempt, so concurrent resubmissions of the same attempt conflict."""
+    base = re.sub(r"-r\d+$", "", job_name)
+    suffix = f"-r{attempt}"
+    return f"{base[:63 - len(suffix)].rstrip('-')}{suffix}"
+
+
+def strip_system_labels(labels, name):
+    """Return the labels without the ones added by Kubernetes, the job-name label is set to the new name."""
+    labels = {key: value for key, value in (labels or {}).items() if key not in SYSTEM_LABELS}
+    if "job-name" in labels:
+        labels["job-name"] = name
+    return labels or None
+
+
+def create_retry_job(job, name, attempt):
+    """Return a copy of the job that can be submitted again under the new name."""
+    retry_job = copy.deepcopy(job)
+    retry_job.api_version = "batch/v1"
+    retry_job.kind = "Job"
+    retry_job.status = None
+    retry_job.metadata = client.V1ObjectMeta(
+        name=name,
+        annotations=dict(job.metadata.annotations or {}, attempt=str(attempt)),
+        labels=strip_system_labels(job.metadata.labels, name),
+    )
+    retry_job.spec.selector = None
+    retry_job.spec.manual_selector = None
+
+    template_metadata = retry_job.spec.template.metadata
+    if template_metadata is not None:
+        retry_job.spec.template.metadata = client.V1ObjectMeta(
+            labels=strip_system_labels(template_metadata.labels, name),
+            annotations=template_metadata.annotations,
+        )
+
+    for item in get_job_container(retry_job).env or []:
+        if item.name in JOB_NAME_ENV:
+            item.value = name
+
+    return retry_job
+
+
+def escalate_job(job, kind, state, target, attempt, container=None):
+    """
+    Return the resubmitted job with the first escalation applicable to the failure, or None if there is none left.
+    The container is the OOMKilled container of the job, None for a failure of a stage pod or found in the stdout.
+    """
+    name = get_retry_job_name(job.metadata.name, attempt)
+    retry_job = create_retry_job(job, name, attempt)
+    failure = {"kind": kind, "container": container}
+    for escalation in ESCALATIONS.get(kind, []):
+        change = escalation(retry_job, state, target, failure)
+        if change:
+            return retry_job, change
+    return None, None
+
+
+def remove_failed_archives(job_name, user):
+    """Remove the download archives of the failed attempt, the next attempt creates its own."""
+    for archive in glob.glob(os.path.join(get_output_path(job_name, user), "download-*.zip")):
+        try:
+            os.remove(archive)
+        except OSError as e:
+            logging.warning(f"Failed to remove archive {archive} of failed job {job_name}: {e}")
+
+
+def write_retry_marker(job_name, user, k8s_job_name):
+    """
+    Mark the failed Kubernetes job as resubmitted in the output directory, its pod then does not send
+    the failure email (see FAILURE_MAIL_FUNCTION_CMD), the last attempt sends it.
+    """
+    output_path = get_output_path(job_name, user)
+    for marker in glob.glob(os.path.join(output_path, f"{RETRY_MARKER_PREFIX}*")):
+        try:
+            os.remove(marker)
+        except OSError:
+            pass
+    try:
+        write_json_atomic(os.path.join(output_path, f"{RETRY_MARKER_PREFIX}{k8s_job_name}"), {"time": time.time()})
+    except OSError as e:
+        logging.warning(f"Failed to mark job {job_name} as resubmitted, its failure email is sent: {e}")
+
+
+def read_job(target, k8s_job_name, view=None):
+    """Return the Kubernetes job from the job view, or from the API when the view does not have it."""
+    job = view.get_job(k8s_job_name) if view is not None else None
+    if job is not None:
+        return job
+    return get_batch_api(target).read_namespaced_job(k8s_job_name, target["namespace"])
+
+
+def resubmit_after_oom(job_name, user, k8s_job_name, kind, reason, view=None, container=None):
+    """
+    Resubmit the job that ran out of memory with escalated resources, up to OOM_MAX_RETRIES times.
+
+    Every API worker may detect the same failure, the attempt gets a deterministic name so only
+    the first resubmission is created and the others are rejected by Kubernetes as conflicts.
+    The failed job is marked as resubmitted before its pod sends the failure email.
+    Returns the name of the new Kubernetes job, or None if the job was not resubmitted.
+    """
+    max_retries = get_max_retries()
+    state = get_job_state(job_name, user)
+    if max_retries <= 0 or not state or state.get("k8sJob") != k8s_job_name:
+        return None
+
+    attempts = state.get("attempts", [])
+    if len(attempts) >= max_retries:
+        logging.info(f"Job {job_name} of user {user} ran out of memory ({kind}) after {len(attempts)} resubmissions, giving up.")
+        return None
+
+    target = get_target(state.get("target")) or load_targets()[0]
+    job = read_job(target, k8s_job_name, view)
+    retry_job, change = escalate_job(job, kind, state, target, len(attempts) + 1, container)
+    if retry_job is None:
+        logging.info(f"Job {job_name} of user {user} ran out of memory ({kind}), no escalation left.")
+        return None
+
+    remove_failed_archives(job_name, user)
+    try:
+        create_k8s_job(get_batch_api(target), target["namespace"], retry_job)
+    except client.exceptions.ApiException as e:
+        if e.status == 409:
+            logging.info(f"Attempt {retry_job.metadata.name} of job {job_name} was already submitted.")
+            write_retry_marker(job_name, user, k8s_job_name)
+            return None
+        raise
+
+    write_retry_marker(job_name, user, k8s_job_name)
+    record_job_attempt(job_name, user, {
+        "attempt": len(attempts) + 1,
+        "failedJob": k8s_job_name,
+        "job": retry_job.metadata.name,
+        "kind": kind,
+        "reason": reason,
+        "change": change,
+        "time": time.time(),
+    })
+    logging.info(f"Resubmitted job {job_name} of user {user} as {retry_job.metadata.name} after {reason}: {change}.")
+    return retry_job.metadata.name
+
+
+def on_job_event(job_name, user, event, state):
+    """Look for an out-of-memory failure in the stdout of a failed job."""
+    if event["stage"] != "failed" or get_max_retries() <= 0:
+        return
+
+    kind = get_stdout_oom_kind(job_name, user)
+    if kind is not None:
+        resubmit_after_oom(job_name, user, state.get("k8sJob"), kind, f"{kind} out-of-memory message in stdout")
+
+
+add_event_listener(on_job_event)
+
+
+class OomWatcher:
+    """
+    Pod listener of a job view resubmitting the jobs whose pods were OOMKilled.
+
+    An OOMKilled stage pod of the AlphaFold 3 launcher is attributed to the launcher job, whose name
+    prefixes the names of the stage jobs.
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.__name__ = f"OOM watcher of target {view.target['name']}"
+        self._handled = set()  # uids of the OOMKilled pods already handled
+
+    def __call__(self, event_type, pod):
+        if event_type == "DELETED":
+            self._handled.discard(pod.metadata.uid)
+            return
+        container = get_oom_killed_container(pod)
+        if get_max_retries() <= 0 or pod.metadata.uid in self._handled or container is None:
+            return
+        self._handled.add(pod.metadata.uid)
+
+        job_name = (pod.metadata.labels or {}).get("job-name")
+        job = self.view.get_job(job_name)
+        if job is None or not (job.metadata.annotations or {}).get("user"):
+            # Not a pod of a Foldify job, maybe a stage pod of an AlphaFold 3 launcher
+            job, container = self.get_stage_launcher(job_name), None
+            if job is None:
+                return
+
+        annotations = job.metadata.annotations
+        resubmit_after_oom(annotations["simplename"], annotations["user"], job.metadata.name, "memory",
+                           f"pod {pod.metadata.name} OOMKilled", self.view, container)
+
+    def get_stage_launcher(self, job_name):
+        """Return the launcher job of the stage job, None if the job is not a stage of a Foldify job."""
+        if not job_name:
+            return None
+        launchers = [
+            job for job in self.view.jobs()
+            if (job.metadata.annotations or {}).get("user") and launches_stage_pods(job)
+            and job_name.startswith(f"{job.metadata.name}-")
+        ]
+        return max(launchers, key=lambda job: len(job.metadata.name), default=None)
@@ -0,0 +1,57 @@
+import logging
+
+from app.shared.targets import load_targets, target_can_mount
+from app.shared.kubernetes import count_active_jobs
+
+# PVCs each tool has to mount
+ALPHAFOLD_PVCS = ["PVC_VOL1_ALPHAFOLD", "PVC_VOL2", "PVC_STORAGE"]
+ALPHAFOLD3_PVCS = ["PVC_VOL1_ALPHAFOLD3", "PVC_VOL2", "PVC_STORAGE", "PVC_TMP"]
+
+
+def get_target_load(target):
+    """Return the load of the target as the ratio of active jobs to its capacity."""
+    active_jobs = count_active_jobs(target)
+    if active_jobs is None:
+        return None
+
+    return active_jobs / target["capacity"]
+
+
+def select_target(required_pvcs):
+    """
+    Choose the least-loaded target that can mount all the required PVCs.
+
+    Targets with capacity 0 are drained and get no jobs, targets that cannot be reached are skipped.
+    When every reachable target is full, the least-loaded one is still returned, the job then waits in its queue.
+    Returns None if no target can run the job.
+    """
+    candidates = [target for target in load_targets() if target_can_mount(target, required_pvcs)]
+    if not candidates:
+        logging.error(f"No Kubernetes target can mount the required PVCs: {required_pvcs}")
+        return None
+
+    candidates = [target for target in candidates if target["capacity"] > 0]
+    if not candidates:
+        logging.error(f"Every Kubernetes target that can mount the required PVCs is drained (capacity 0): {required_pvcs}")
+        return None
+
+    if len(candidates) == 1:
+        return candidates[0]
+
+    best_target = None
+    best_load = None
+    for target in candidates:
+        load = get_target_load(target)
+        if load is None:
+            logging.warning(f"Skipping unreachable target {target['name']} in job placement.")
+            continue
+        if best_load is None or load < best_load:
+            best_target = target
+            best_load = load
+
+    if best_target is None:
+        logging.error("None of the Kubernetes targets could be reached, using the first candidate.")
+        return candidates[0]
+
+    logging.info(f"Job placed on target {best_target['name']} with load {best_load:.2f}")
+    return best_target
@@ -0,0 +1,177 @@
+import threading
+from collections import deque
+
+from app.shared.job_state import record_pod_timeline
+
+UNKNOWN = "unknown"
+
+# Completed pod startups kept for the latency aggregates, per API worker
+MAX_LATENCY_SAMPLES = 1000
+
+# Phases of the startup, measured between two points of the timeline (the first known start point is used)
+STARTUP_PHASES = {
+    "scheduling": (["created"], "scheduled"),
+    "pull": (["sandboxReady", "initialized", "scheduled"], "started"),
+    "startup": (["created"], "started"),
+}
+
+
+def to_timestamp(value):
+    """Convert a Kubernetes time to a timestamp."""
+    return value.timestamp() if value else None
+
+
+def get_condition_time(pod, condition_type):
+    """Return the time the pod condition became true, None if it is not true."""
+    for condition in (pod.status.conditions or []) if pod.status else []:
+        if condition.type == condition_type and condition.status == "True":
+            return to_timestamp(condition.last_transition_time)
+    return None
+
+
+def get_pod_timeline(pod):
+    """
+    Return the timeline of the pod from its conditions and container statuses.
+
+    The image pull is not reported by the pod status, it lies between the sandbox of the pod being ready
+    (or the pod being initialized on older clusters) and the start of the container.
+    """
+    timeline = {
+        "node": pod.spec.node_name if pod.spec else None,
+        "created": to_timestamp(pod.metadata.creation_timestamp),
+        "scheduled": get_condition_time(pod, "PodScheduled"),
+        "sandboxReady": get_condition_time(pod, "PodReadyToStartContainers"),
+        "initialized": get_condition_time(pod, "Initialized"),
+    }
+
+    statuses = (pod.status.container_statuses or []) if pod.status else []
+    started, finished = [], []
+    for status in statuses:
+        state = status.state
+        if state and state.running and state.running.started_at:
+            started.append(to_timestamp(state.running.started_at))
+        elif state and state.terminated:
+            if state.terminated.started_at:
+                started.append(to_timestamp(state.terminated.started_at))
+            if state.terminated.finished_at:
+                finished.append(to_timestamp(state.terminated.finished_at))
+            timeline["reason"] = state.terminated.reason
+            timeline["exitCode"] = state.terminated.exit_code
+
+    timeline["started"] = min(started) if started else None
+    # The pod is finished only when all its containers are
+    timeline["finished"] = max(finished) if statuses and len(finished) == len(statuses) else None
+
+    return {key: value for key, value in timeline.items() if value is not None}
+
+
+def get_timeline_durations(timeline):
+    """Return the durations of the startup phases known from the timeline."""
+    durations = {}
+    for phase, (start_points, end_point) in STARTUP_PHASES.items():
+        start = next((timeline[point] for point in start_points if point in timeline), None)
+        if start is not None and end_point in timeline:
+            durations[phase] = max(timeline[end_point] - start, 0)
+    return durations
+
+
+def percentile(values, fraction):
+    """Return the percentile of the sorted values (nearest rank)."""
+    index = min(int(round(fraction * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def summarize(samples):
+    """Return the count and the median, 95th percentile and maximum of every startup phase."""
+    summary = {"count": len(samples)}
+    for phase in STARTUP_PHASES:
+        values = sorted(sample[phase] for sample in samples if phase in sample)
+        if values:
+            summary[phase] = {"p50": round(percentile(values, 0.5), 3), "p95": round(percentile(values, 0.95), 3),
+                              "max": round(values[-1], 3)}
+    return summary
+
+
+class StartupLatency:
+    """Rolling window of the startup phase durations of the job pods."""
+
+    def __init__(self, max_samples=MAX_LATENCY_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples)  # (tool, node, durations)
+
+    def add(self, tool, node, durations):
+        """Add the startup of one pod."""
+        with self._lock:
+            self._samples.append((tool, node, durations))
+
+    def summary(self):
+        """Return the startup latency aggregated per tool and per node."""
+        with self._lock:
+            samples = list(self._samples)
+
+        by_tool, by_node = {}, {}
+        for tool, node, durations in samples:
+            by_tool.setdefault(tool, []).append(durations)
+            by_node.setdefault(node, []).append(durations)
+
+        return {
+            "samples": len(samples),
+            "tools": {tool: summarize(values) for tool, values in by_tool.items()},
+            "nodes": {node: summarize(values) for node, values in by_node.items()},
+        }
+
+
+startup_latency = StartupLatency()
+
+
+def find_owner_job(view, job_name):
+    """Return the Foldify job owning the pods of the Kubernetes job, including the stage jobs of the AlphaFold 3 launcher."""
+    job = view.get_job(job_name) if job_name else None
+    if job is not None and (job.metadata.annotations or {}).get("user"):
+        return job
+
+    if not job_name:
+        return None
+    for candidate in view.jobs():
+        annotations = candidate.metadata.annotations or {}
+        if annotations.get("service") == "AlphaFold3" and job_name.startswith(f"{candidate.metadata.name}-"):
+            return candidate
+    return None
+
+
+class TimelineRecorder:
+    """
+    Pod listener of a job view recording the timeline of every job pod into the state of its job
+    and the startup of every started pod into the startup latency aggregates.
+    """
+
+    def __init__(self, view, latency=startup_latency):
+        self.view = view
+        self.latency = latency
+        self.__name__ = f"timeline recorder of target {view.target['name']}"
+        self._timelines = {}  # pod uid: last recorded timeline
+        self._counted = set()  # uids of the pods added to the latency aggregates
+
+    def __call__(self, event_type, pod):
+        uid = pod.metadata.uid
+        if event_type == "DELETED":
+            self._timelines.pop(uid, None)
+            self._counted.discard(uid)
+            return
+
+        job = find_owner_job(self.view, (pod.metadata.labels or {}).get("job-name"))
+        if job is None:
+            return
+
+        timeline = get_pod_timeline(pod)
+        if self._timelines.get(uid) == timeline:
+            return
+        self._timelines[uid] = timeline
+
+        annotations = job.metadata.annotations
+        record_pod_timeline(annotations["simplename"], annotations["user"], job.metadata.name, pod.metadata.name, timeline)
+
+        if "started" in timeline and uid not in self._counted:
+            self._counted.add(uid)
+            self.latency.add(annotations.get("service", UNKNOWN), timeline.get("node", UNKNOWN),
+                             get_timeline_durations(timeline))
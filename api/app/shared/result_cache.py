@@ -0,0 +1,229 @@
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import string
+
+from app.shared.common import get_index_path, get_input_path, get_output_path
+from app.shared.job_runner_script import MANIFEST_NAME, RETRY_MARKER_PREFIX, create_archive
+from app.shared.job_state import get_job_state, has_pod_events
+from app.shared.sequence_index import get_job_sequence_hash, get_sequence_hash
+from app.shared.settings_fingerprint import normalize_settings
+from config import Config
+
+# File configuration keys that do not change the result of the prediction
+NON_RESULT_SETTINGS = ["user", "name", "public", "allowReuse", "email"]
+
+
+def result_cache_enabled():
+    """Check if the submissions can be satisfied by the results of identical jobs."""
+    return getattr(Config, "RESULT_CACHE", False)
+
+
+def get_result_key(service, version, sequence, fileConfig, sequence_hash=None):
+    """Return the key of the result of the job: the tool, its version, the canonical sequence and the settings."""
+    key = {
+        "tool": service,
+        "version": version,
+        "sequence": sequence_hash or get_sequence_hash(sequence),
+        "settings": normalize_settings(fileConfig, NON_RESULT_SETTINGS),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def get_job_result_key(jobConfig, fileConfig):
+    """Return the result key of the job configuration."""
+    return get_result_key(jobConfig["service"], jobConfig.get("container"), jobConfig["proteinSequence"], fileConfig,
+                          get_job_sequence_hash(jobConfig))
+
+
+def get_result_dir(result_key):
+    """Return the index directory of the jobs with the result key."""
+    return get_index_path("results", result_key[:2], result_key)
+
+
+def get_job_result_path(job_name, user):
+    """Return the path of the file holding the result key of the job, to remove the job from the cache."""
+    return get_index_path("results", "jobs", user, job_name)
+
+
+def is_public(job_name, user):
+    """Check if the job is public now, i.e. its public symlink leads to the user's input or output."""
+    for extension in ["json", "fasta", None]:
+        if extension:
+            path, public_path = get_input_path(job_name, extension, user), get_input_path(job_name, extension, "public")
+        else:
+            path, public_path = get_output_path(job_name, user), get_output_path(job_name, "public")
+        if os.path.islink(public_path) and os.path.realpath(public_path) == os.path.realpath(path):
+            return True
+    return False
+
+
+def allows_reuse(job_name, user):
+    """Check if the owner explicitly allowed other users to reuse the result of the job."""
+    try:
+        with open(get_input_path(job_name, "json", user)) as f:
+            fileConfig = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return fileConfig.get("allowReuse") == "true"
+
+
+def is_shared(job_name, user):
+    """
+    Check if the owner shares the job now: it is public (the "public" setting of the input only
+    records the publicity at submission, the owner may have changed it since) or allows the reuse.
+    """
+    return is_public(job_name, user) or allows_reuse(job_name, user)
+
+
+def is_result_done(job_name, user):
+    """Check if the job of the user finished successfully, its public namesake is not considered."""
+    state = get_job_state(job_name, user)
+    if has_pod_events(state):
+        return state["stage"] == "archived"
+
+    output_path = get_output_path(job_name, user)
+    return any(os.path.exists(os.path.join(output_path, f"{service}.done"))
+               for service in ["alphafold", "colabfold", "esmfold", "omegafold"])
+
+
+def read_job_result_key(job_name, user):
+    """Return the result key of the submitted job, None if the job was not registered."""
+    try:
+        with open(get_job_result_path(job_name, user)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def add_result_entry(result_key, job_name, user):
+    """List the job under its result key, other submissions then look for it."""
+    user_dir = os.path.join(get_result_dir(result_key), user)
+    os.makedirs(user_dir, exist_ok=True)
+    open(os.path.join(user_dir, job_name), "a").close()
+
+
+def remove_result_entry(result_key, job_name, user):
+    """Remove the job from the list of its result key."""
+    try:
+        os.remove(os.path.join(get_result_dir(result_key), user, job_name))
+    except FileNotFoundError:
+        pass
+
+
+def remove_job_result(job_name, user):
+    """Remove the job from the result cache."""
+    result_key = read_job_result_key(job_name, user)
+    if result_key is None:
+        return
+
+    remove_result_entry(result_key, job_name, user)
+    try:
+        os.remove(get_job_result_path(job_name, user))
+    except FileNotFoundError:
+        pass
+
+
+def update_job_result_sharing(job_name, user):
+    """List or unlist the job under its result key after its owner changed its publicity."""
+    result_key = read_job_result_key(job_name, user)
+    if result_key is None:
+        return
+
+    if is_shared(job_name, user):
+        add_result_entry(result_key, job_name, user)
+    else:
+        remove_result_entry(result_key, job_name, user)
+
+
+def register_job_result(jobConfig, fileConfig, user):
+    """
+    Record the result key of the submitted job and list the job under it if its owner shares it, its result
+    is reused once it is done. The key is kept for unshared jobs, they are listed when made public later.
+    """
+    job_name = jobConfig["simplename"]
+    remove_job_result(job_name, user)
+
+    result_key = get_job_result_key(jobConfig, fileConfig)
+    job_result_path = get_job_result_path(job_name, user)
+    os.makedirs(os.path.dirname(job_result_path), exist_ok=True)
+    with open(job_result_path, "w") as f:
+        f.write(result_key)
+
+    if fileConfig.get("public") != "true" and fileConfig.get("allowReuse") != "true":
+        return None
+    add_result_entry(result_key, job_name, user)
+    return result_key
+
+
+def find_cached_result(jobConfig, fileConfig, user):
+    """
+    Return the (owner, job name) of a finished job with the same tool, version, sequence and settings,
+    None if there is none or the cache is disabled. Jobs still shared by their owners are considered only,
+    their sharing is checked when they are found.
+    """
+    if not result_cache_enabled() or jobConfig["forceComputation"]:
+        return None
+
+    result_dir = get_result_dir(get_job_result_key(jobConfig, fileConfig))
+    try:
+        owners = sorted(os.listdir(result_dir))
+    except FileNotFoundError:
+        return None
+
+    # The user's own jobs first, they do not need to be shared
+    for owner in sorted(owners, key=lambda owner: owner != user):
+        for job_name in sorted(os.listdir(os.path.join(result_dir, owner))):
+            if (owner, job_name) == (user, jobConfig["simplename"]):
+                continue
+            if not os.path.exists(get_input_path(job_name, "json", owner)):
+                remove_job_result(job_name, owner)
+                continue
+            if (owner == user or is_shared(job_name, owner)) and is_result_done(job_name, owner):
+                return owner, job_name
+
+    return None
+
+
+def ignore_job_files(directory, names):
+    """Return the files of the cached job which belong to that job, not to its result, for copytree."""
+    patterns = ["stdout", MANIFEST_NAME, "download-*.zip", f"{RETRY_MARKER_PREFIX}*"]
+    return [name for name in names if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+
+def link_or_copy(source, destination):
+    """Hard link the file, or copy it where hard links are not possible."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def link_cached_result(cached_result, jobConfig, user):
+    """
+    Create the outputs of the job from the outputs of the cached job, hard linked where possible.
+    The log, the runner manifest and the download archive of the cached job are not copied, the job gets
+    its own archive named with its own salt.
+    """
+    owner, source_job = cached_result
+    job_name = jobConfig["simplename"]
+
+    output_path = get_output_path(job_name, user)
+    source_path = get_output_path(source_job, owner)
+    shutil.copytree(source_path, output_path, symlinks=True, copy_function=link_or_copy, dirs_exist_ok=True,
+                    ignore=lambda directory, names: ignore_job_files(directory, names) if directory == source_path else [])
+    salt = ''.join(random.choice(string.ascii_letters + string.digits) for i in range(64))
+    create_archive({"outputDir": output_path, "salt": salt})
+
+    if jobConfig["makeResultsPublic"] == "true":
+        public_output_path = get_output_path(job_name, "public")
+        try:
+            os.symlink(os.path.relpath(output_path, os.path.dirname(public_output_path)), public_output_path)
+        except FileExistsError:
+            pass
+
+    logging.info(f"Job {job_name} of user {user} reused the result of job {source_job} of user {owner}.")
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+
+from app.shared.common import get_index_path, get_input_dir, get_input_path
+
+# Marker of a user whose existing jobs were added to the index
+BACKFILL_MARKER = ".backfilled"
+
+
+def get_canonical_chains(sequence):
+    """
+    Return the chains of the sequence input in their order, with the whitespace, the line wrapping and the case normalized.
+
+    Chains are separated by FASTA headers (which are not part of the sequence) or by ':' (ESMFold, OmegaFold).
+    """
+    chains = []
+    current = []
+    for line in sequence.splitlines():
+        if line.startswith(">"):
+            chains.append("".join(current))
+            current = []
+            continue
+        for index, part in enumerate(line.split(":")):
+            if index > 0:
+                chains.append("".join(current))
+                current = []
+            current.append("".join(part.split()).upper())
+    chains.append("".join(current))
+
+    return [chain for chain in chains if chain]
+
+
+def get_sequence_hash(sequence):
+    """Return the canonical hash of the sequence input, equal for differently formatted inputs of the same chains."""
+    chains = get_canonical_chains(sequence)
+    return hashlib.sha256("\n".join(chains).encode()).hexdigest()
+
+
+def get_job_sequence_hash(jobConfig):
+    """
+    Return the canonical hash of the job's sequence, computed once per job and kept in its configuration.
+    A submission of several jobs of one sequence (MultiFold) computes it once and passes it to the jobs.
+    """
+    if not jobConfig.get("sequenceHash"):
+        jobConfig["sequenceHash"] = get_sequence_hash(jobConfig["proteinSequence"])
+    return jobConfig["sequenceHash"]
+
+
+def get_sequence_dir(user, sequence_hash):
+    """Return the index directory of the jobs of the user with the sequence hash."""
+    return get_index_path("sequence", user, sequence_hash[:2], sequence_hash)
+
+
+def get_job_sequence_path(job_name, user):
+    """Return the path of the file holding the sequence hash of the job, to remove the job from the index."""
+    return get_index_path("sequence", user, "jobs", job_name)
+
+
+def add_job_sequence(job_name, user, sequence, entry="", sequence_hash=None):
+    """Add the job to the sequence index of the user, replacing its previous sequence."""
+    sequence_hash = sequence_hash or get_sequence_hash(sequence)
+    remove_job_sequence(job_name, user)
+
+    sequence_dir = get_sequence_dir(user, sequence_hash)
+    os.makedirs(sequence_dir, exist_ok=True)
+    with open(os.path.join(sequence_dir, job_name), "w") as f:
+        f.write(entry)
+
+    job_sequence_path = get_job_sequence_path(job_name, user)
+    os.makedirs(os.path.dirname(job_sequence_path), exist_ok=True)
+    with open(job_sequence_path, "w") as f:
+        f.write(sequence_hash)
+
+    return sequence_hash
+
+
+def set_job_sequence_entry(job_name, user, entry):
+    """Replace the index entry of the job, e.g. its settings fingerprint."""
+    try:
+        with open(get_job_sequence_path(job_name, user)) as f:
+            sequence_hash = f.read().strip()
+    except FileNotFoundError:
+        return
+
+    marker = os.path.join(get_sequence_dir(user, sequence_hash), job_name)
+    if os.path.exists(marker):
+        with open(marker, "w") as f:
+            f.write(entry)
+
+
+def remove_job_sequence(job_name, user):
+    """Remove the job from the sequence index of the user."""
+    job_sequence_path = get_job_sequence_path(job_name, user)
+    try:
+        with open(job_sequence_path) as f:
+            sequence_hash = f.read().strip()
+    except FileNotFoundError:
+        return
+
+    for path in [os.path.join(get_sequence_dir(user, sequence_hash), job_name), job_sequence_path]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def backfill_sequence_index(user):
+    """Add the jobs submitted before the index existed, once per user."""
+    marker = get_index_path("sequence", user, BACKFILL_MARKER)
+    if os.path.exists(marker):
+        return
+
+    input_dir = get_input_dir(user)
+    if os.path.exists(input_dir):
+        for file in os.listdir(input_dir):
+            if not file.endswith(".fasta"):
+                continue
+            job_name = file[:-len(".fasta")]
+            if os.path.exists(get_job_sequence_path(job_name, user)):
+                continue
+            try:
+                with open(os.path.join(input_dir, file)) as f:
+                    add_job_sequence(job_name, user, f.read())
+            except Exception as e:
+                logging.error(f"Error adding job {job_name} of user {user} to the sequence index: {e}")
+
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    open(marker, "a").close()
+    logging.info(f"Sequence index of user {user} backfilled.")
+
+
+def find_jobs_with_sequence(sequence, user, sequence_hash=None):
+    """Return the user's jobs with the same canonical sequence, with their index entries."""
+    backfill_sequence_index(user)
+
+    sequence_dir = get_sequence_dir(user, sequence_hash or get_sequence_hash(sequence))
+    try:
+        job_names = os.listdir(sequence_dir)
+    except FileNotFoundError:
+        return {}
+
+    jobs = {}
+    for job_name in sorted(job_names):
+        # Jobs removed outside of the API are dropped from the index
+        if not os.path.exists(get_input_path(job_name, "fasta", user)):
+            remove_job_sequence(job_name, user)
+            continue
+        try:
+            with open(os.path.join(sequence_dir, job_name)) as f:
+                jobs[job_name] = f.read()
+        except FileNotFoundError:
+            continue
+    return jobs
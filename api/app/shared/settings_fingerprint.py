@@ -0,0 +1,67 @@
+import hashlib
+import json
+
+# Version of the normalization, fingerprints of other versions are computed again from the job config
+SETTINGS_FINGERPRINT_VERSION = 2
+
+# File configuration keys not compared by the duplicate settings check
+IGNORED_SETTINGS = ["name", "allowReuse"]
+
+# Settings holding a number, their values are compared as numbers ("5", 5, "5.0"). The other strings are compared
+# as they are, "1.10" and "1.1" are different values of e.g. a version setting.
+NUMERIC_SETTINGS = [
+    "num_recycles", "copies", "predictions", "num_relax", "num_models", "num_seeds", "recycle_early_stop_tolerance",
+    "subbatch_size", "num_cycle", "msa_mask_rate", "num_msa",
+]
+
+
+def normalize_number(value):
+    """Return the canonical form of a number or of its string, the string itself if it is not a number."""
+    text = str(value).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    if number.is_integer():
+        return str(int(number))
+    return repr(number)
+
+
+def normalize_setting_value(value, numeric=False):
+    """
+    Return the canonical form of a setting value, the same for equivalent values:
+    booleans and their strings ("true", True, "True"), numbers of the numeric settings and their strings
+    (5, "5", 5.0, "5.0"). Nested values of a dictionary are numeric if their key is in NUMERIC_SETTINGS.
+    """
+    if isinstance(value, dict):
+        return {str(key): normalize_setting_value(item, key in NUMERIC_SETTINGS) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_setting_value(item, numeric) for item in value]
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return ""
+    if numeric or isinstance(value, (int, float)):
+        return normalize_number(value)
+
+    text = str(value).strip()
+    if text.lower() in ["true", "false"]:
+        return text.lower()
+    return text
+
+
+def normalize_settings(fileConfig, ignored=IGNORED_SETTINGS):
+    """Return the normalized settings of the job without the ignored keys."""
+    return {key: normalize_setting_value(value, key in NUMERIC_SETTINGS)
+            for key, value in fileConfig.items() if key not in ignored}
+
+
+def get_settings_fingerprint(fileConfig):
+    """Return the versioned fingerprint of the job settings, equal for equivalent settings."""
+    settings = json.dumps(normalize_settings(fileConfig), sort_keys=True)
+    return f"v{SETTINGS_FINGERPRINT_VERSION}:{hashlib.sha256(settings.encode()).hexdigest()}"
+
+
+def is_current_fingerprint(fingerprint):
+    """Check if the fingerprint was computed by the current normalization."""
+    return bool(fingerprint) and fingerprint.startswith(f"v{SETTINGS_FINGERPRINT_VERSION}:")
@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class _Call:
+    """A call in flight, waited on by the callers that arrive while it runs."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.invalidated = False
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into a single call and keep its result for a short TTL.
+
+    Callers arriving while a call is in flight wait for it and share its result (or its exception).
+    Results are cached only on success, failures are never cached. A call in flight during invalidate() is
+    detached: later callers start a new call and its result, computed from the older state, is not cached.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results = {}  # key: (expires_at, value)
+        self._calls = {}  # key: _Call
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key, fn):
+        """Return the cached result for the key or run fn, sharing the call with concurrent callers."""
+        with self._lock:
+            cached = self._results.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.hits += 1
+                return cached[1]
+
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                is_leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.misses += 1
+                is_leader = True
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            with self._lock:
+                if self.ttl > 0 and not call.invalidated:
+                    self._results[key] = (time.monotonic() + self.ttl, call.value)
+            return call.value
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+
+    def invalidate(self, key=None):
+        """Drop the cached result for the key, or all the cached results, and detach the calls in flight."""
+        with self._lock:
+            if key is None:
+                self._results.clear()
+                calls = list(self._calls.values())
+                self._calls.clear()
+            else:
+                self._results.pop(key, None)
+                calls = [self._calls.pop(key)] if key in self._calls else []
+            for call in calls:
+                call.invalidated = True
+
+    def stats(self):
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "cached_keys": len(self._results),
+                "in_flight": len(self._calls),
+            }
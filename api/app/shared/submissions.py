@@ -0,0 +1,31 @@
+import os
+import time
+
+from app.shared.common import get_index_path
+from app.shared.file_store import read_json, write_json_atomic
+
+
+def get_job_submission_path(job_name, user):
+    """Return the path of the submission record of the job."""
+    return get_index_path("submissions", user, f"{job_name}.json")
+
+
+def save_job_submission(job_name, user, service, data):
+    """
+    Record the submitted settings of the job as the tool received them, a clone of the job is submitted from them.
+    The stored input files only hold the settings in the form the job runs with.
+    """
+    write_json_atomic(get_job_submission_path(job_name, user), {"service": service, "data": data, "time": time.time()})
+
+
+def get_job_submission(job_name, user):
+    """Return the submission record of the job, None for jobs submitted before the records were kept."""
+    return read_json(get_job_submission_path(job_name, user))
+
+
+def remove_job_submission(job_name, user):
+    """Delete the submission record of the job."""
+    try:
+        os.remove(get_job_submission_path(job_name, user))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,117 @@
+import json
+import logging
+from config import Config
+
+from app.shared.common import NAMESPACE
+
+# PVC configuration keys every target can override
+PVC_KEYS = ["PVC_VOL1_ALPHAFOLD", "PVC_VOL1_ALPHAFOLD3", "PVC_VOL2", "PVC_STORAGE", "PVC_TMP"]
+
+DEFAULT_TARGET_NAME = "default"
+DEFAULT_TARGET_CAPACITY = 10
+
+_targets = None
+
+
+def get_default_target():
+    """Return the target described by the single-cluster configuration (NAMESPACE and PVC_* values)."""
+    return {
+        "name": DEFAULT_TARGET_NAME,
+        "namespace": NAMESPACE,
+        "kubeconfig": None,
+        "context": None,
+        "capacity": DEFAULT_TARGET_CAPACITY,
+        "apiUrl": None,
+        "pvcs": {key: getattr(Config, key, None) for key in PVC_KEYS},
+    }
+
+
+def parse_capacity(item):
+    """Return the capacity of a K8S_TARGETS entry as a non-negative integer, None (logged) if it is invalid."""
+    capacity = item.get("capacity", DEFAULT_TARGET_CAPACITY)
+    try:
+        if isinstance(capacity, bool) or isinstance(capacity, float) and not capacity.is_integer():
+            raise ValueError
+        capacity = int(capacity)
+    except (TypeError, ValueError):
+        logging.error(f"Skipping K8S_TARGETS entry {item['name']!r}: capacity must be an integer, got {capacity!r}")
+        return None
+
+    if capacity < 0:
+        logging.error(f"Skipping K8S_TARGETS entry {item['name']!r}: capacity must not be negative, got {capacity}")
+        return None
+    return capacity
+
+
+def parse_targets(raw_targets):
+    """
+    Parse the K8S_TARGETS configuration value.
+
+    The value is a JSON list of objects, e.g.:
+    [{"name": "cluster-a", "namespace": "foldify", "kubeconfig": "/etc/foldify/a.yaml", "context": "a",
+      "capacity": 20, "pvcs": {"PVC_VOL1_ALPHAFOLD": "...", "PVC_VOL2": "...", "PVC_STORAGE": "..."}}]
+
+    Targets without a PVC for a given database cannot run the tools that need it. The optional "apiUrl"
+    overrides INTERNAL_API_URL for the job pods of targets that reach this API by another address.
+    Returns the list with the default single-cluster target if the value is empty or invalid.
+    """
+    if not raw_targets:
+        return [get_default_target()]
+
+    try:
+        parsed = json.loads(raw_targets)
+    except json.JSONDecodeError as e:
+        logging.error(f"Invalid K8S_TARGETS configuration, using the default target: {e}")
+        return [get_default_target()]
+
+    if not isinstance(parsed, list) or not parsed:
+        logging.error("K8S_TARGETS must be a non-empty JSON list, using the default target.")
+        return [get_default_target()]
+
+    targets = []
+    for item in parsed:
+        if not isinstance(item, dict) or not item.get("name") or not item.get("namespace"):
+            logging.error(f"Skipping K8S_TARGETS entry without name or namespace: {item}")
+            continue
+
+        capacity = parse_capacity(item)
+        if capacity is None:
+            continue
+
+        pvcs = item.get("pvcs") or {}
+        targets.append({
+            "name": item["name"],
+            "namespace": item["namespace"],
+            "kubeconfig": item.get("kubeconfig"),
+            "context": item.get("context"),
+            "capacity": capacity,
+            "apiUrl": item.get("apiUrl"),
+            "pvcs": {key: pvcs.get(key) for key in PVC_KEYS},
+        })
+
+    if not targets:
+        return [get_default_target()]
+
+    return targets
+
+
+def load_targets():
+    """Return the configured Kubernetes targets, parsed once per process."""
+    global _targets
+    if _targets is None:
+        _targets = parse_targets(getattr(Config, "K8S_TARGETS", ""))
+        logging.info(f"Kubernetes targets: {[target['name'] for target in _targets]}")
+    return _targets
+
+
+def get_target(name):
+    """Return the target with the given name, or None if it is not configured."""
+    for target in load_targets():
+        if target["name"] == name:
+            return target
+    return None
+
+
+def target_can_mount(target, required_pvcs):
+    """Check if the target has all the PVCs (databases and storage) required by a tool."""
+    return all(target["pvcs"].get(key) for key in required_pvcs)
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from flask import jsonify
+
+from app.shared.common import get_index_path
+from app.shared.file_store import locked, read_json, write_json_atomic
+from app.shared.blob_store import save_input_file
+from config import Config
+
+# Files which can be uploaded in chunks before the submission of the job
+UPLOAD_KINDS = ["ccd", "json"]
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+CHECKSUM_RE = re.compile(r"^[0-9a-f]{64}$")
+# Unfinished uploads are removed after a day without a chunk
+UPLOAD_TTL = 24 * 60 * 60
+
+
+def get_max_upload_size():
+    """Return the largest file which can be uploaded, in bytes."""
+    return getattr(Config, "MAX_UPLOAD_SIZE", 2 * 1024 ** 3)
+
+
+def get_upload_dir(user, upload_id=""):
+    """Return the directory of the upload, kept on the PVC so it can be moved to the input directory atomically."""
+    return get_index_path("uploads", user, upload_id)
+
+
+def get_upload_part_path(user, upload_id):
+    """Return the path of the data received so far."""
+    return os.path.join(get_upload_dir(user, upload_id), "data.part")
+
+
+def get_upload_meta_path(user, upload_id):
+    """Return the path of the upload metadata: the kind, the size and the checksum of the file."""
+    return os.path.join(get_upload_dir(user, upload_id), "meta.json")
+
+
+def get_upload_activity(user, upload_id):
+    """
+    Return the time of the last activity of the upload: its creation or its last chunk. Appending a chunk
+    changes the data file only, not the upload directory.
+    """
+    times = [os.path.getmtime(get_upload_dir(user, upload_id))]
+    for path in [get_upload_part_path(user, upload_id), get_upload_meta_path(user, upload_id)]:
+        try:
+            times.append(os.path.getmtime(path))
+        except FileNotFoundError:
+            pass
+    return max(times)
+
+
+def remove_stale_uploads(user):
+    """Remove the uploads of the user which had no activity for UPLOAD_TTL."""
+    upload_dir = get_upload_dir(user)
+    if not os.path.isdir(upload_dir):
+        return
+
+    deadline = time.time() - UPLOAD_TTL
+    for upload_id in os.listdir(upload_dir):
+        path = os.path.join(upload_dir, upload_id)
+        try:
+            if os.path.isdir(path) and get_upload_activity(user, upload_id) < deadline:
+                shutil.rmtree(path)
+                logging.info(f"Removed stale upload {upload_id} of {user}")
+        except OSError as e:
+            logging.error(f"Error removing stale upload {upload_id} of {user}: {e}")
+
+
+def create_upload(user, kind, size, checksum):
+    """
+    Start a resumable upload of a file of the given size and sha256 checksum.
+    Returns (upload_id, None) or (None, error response).
+    """
+    if kind not in UPLOAD_KINDS:
+        return None, (jsonify({"error": f"Invalid upload kind, expected one of {', '.join(UPLOAD_KINDS)}."}), 400)
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return None, (jsonify({"error": "Upload size must be a positive integer."}), 400)
+    if size > get_max_upload_size():
+        return None, (jsonify({"error": f"The file is too large, the limit is {get_max_upload_size()} bytes."}), 413)
+    if not isinstance(checksum, str) or not CHECKSUM_RE.match(checksum.lower()):
+        return None, (jsonify({"error": "Upload checksum must be a hex encoded sha256 digest."}), 400)
+
+    remove_stale_uploads(user)
+
+    upload_id = uuid.uuid4().hex
+    write_json_atomic(get_upload_meta_path(user, upload_id), {"kind": kind, "size": size, "sha256": checksum.lower()})
+    open(get_upload_part_path(user, upload_id), "wb").close()
+    return upload_id, None
+
+
+def get_upload(user, upload_id):
+    """Return the metadata of the upload with the number of bytes received so far, None if it does not exist."""
+    if not isinstance(upload_id, str) or not UPLOAD_ID_RE.match(upload_id):
+        return None
+
+    meta = read_json(get_upload_meta_path(user, upload_id))
+    if meta is None:
+        return None
+    try:
+        meta["received"] = os.path.getsize(get_upload_part_path(user, upload_id))
+    except FileNotFoundError:
+        return None
+    return meta
+
+
+def write_upload_chunk(user, upload_id, offset, stream):
+    """
+    Append the chunk read from the stream to the upload, at the offset the client resumes from.
+    The chunk is copied in blocks, so it is never held in memory. Returns (received, None) or (None, error response).
+    """
+    meta = get_upload(user, upload_id)
+    if meta is None:
+        return None, (jsonify({"error": "Upload not found."}), 404)
+
+    part_path = get_upload_part_path(user, upload_id)
+    with locked(part_path):
+        received = os.path.getsize(part_path)
+        if offset != received:
+            return None, (jsonify({"error": "Upload offset does not match the received data.", "received": received}), 409)
+
+        with open(part_path, "ab") as part:
+            while True:
+                block = stream.read(UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                if received + len(block) > meta["size"]:
+                    part.truncate(offset)
+                    return None, (jsonify({"error": "The data exceeds the declared upload size.", "received": offset}), 413)
+                part.write(block)
+                received += len(block)
+
+    return received, None
+
+
+def get_file_checksum(path):
+    """Return the sha256 digest of the file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(user, upload_id, kind):
+    """
+    Verify the upload is complete and matches its checksum.
+    Returns (path of the uploaded data, None) or (None, error response), the caller commits the data and removes the upload.
+    """
+    meta = get_upload(user, upload_id)
+    if meta is None or meta["kind"] != kind:
+        return None, (jsonify({"error": "Upload not found."}), 404)
+    if meta["received"] != meta["size"]:
+        return None, (jsonify({"error": "Upload is not complete.", "received": meta["received"]}), 409)
+
+    part_path = get_upload_part_path(user, upload_id)
+    if get_file_checksum(part_path) != meta["sha256"]:
+        return None, (jsonify({"error": "Upload checksum does not match the received data."}), 422)
+    return part_path, None
+
+
+def remove_upload(user, upload_id):
+    """Remove the upload and its data."""
+    if not isinstance(upload_id, str) or not UPLOAD_ID_RE.match(upload_id):
+        return
+    shutil.rmtree(get_upload_dir(user, upload_id), ignore_errors=True)
+
+
+def commit_upload(user, upload_id, kind, path):
+    """Move the verified upload to the input path atomically, readers never see a partial file. Returns an error response or None."""
+    part_path, error = complete_upload(user, upload_id, kind)
+    if error:
+        return error
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_input_file(part_path, path)
+    remove_upload(user, upload_id)
+    return None
+
+
+def save_stream_atomic(stream, path):
+    """
+    Copy the stream (e.g. an uploaded file) to the path in blocks through a temporary file next to it, up to the upload size limit.
+    Returns an error response or None.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as f:
+            for block in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b""):
+                size += len(block)
+                if size > get_max_upload_size():
+                    os.remove(tmp_path)
+                    return jsonify({"error": f"The file is too large, the limit is {get_max_upload_size()} bytes."}), 413
+                f.write(block)
+        save_input_file(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return None
@@ -2,9 +2,11 @@ from functools import wraps
 from flask import current_app as app, jsonify, request
 import logging
 import jwt
+import hmac
 from datetime import datetime, timezone
 import os
 from config import Config
+from app.shared.job_events import get_internal_token, check_event_token
 
 
 def validate_session_token(token):
@@ -64,3 +66,43 @@ def token_required(f):
         return f(current_user=username, *args, **kwargs)
 
     return decorated
+
+
+
+def internal_token_required(f):
+    """Decorator to ensure the request carries the internal API token (metrics scrapers, job pods)."""
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        internal_token = os.getenv('INTERNAL_API_TOKEN', Config.INTERNAL_API_TOKEN)
+        if not internal_token:
+            logging.warning('Internal API token is not configured, internal endpoints are disabled.')
+            return jsonify({'error': 'Internal API is disabled.'}), 403
+
+        auth_header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth_header, f"Bearer {internal_token}"):
+            logging.warning('Invalid internal API token.')
+            return jsonify({'error': 'Invalid internal API token.'}), 401
+
+        return f(*args, **kwargs)
+
+    return decorated
+
+def job_event_token_required(f):
+    """Decorator to ensure the request carries the event token of the job in the URL (job pods)."""
+
+    @wraps(f)
+    def decorated(user, job_name, *args, **kwargs):
+        if not get_internal_token():
+            logging.warning('Internal API token is not configured, job events are disabled.')
+            return jsonify({'error': 'Internal API is disabled.'}), 403
+
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header[len('Bearer '):] if auth_header.startswith('Bearer ') else ''
+        if not check_event_token(user, job_name, token):
+            logging.warning(f'Invalid event token for job {job_name} of user {user}.')
+            return jsonify({'error': 'Invalid job event token.'}), 401
+
+        return f(user, job_name, *args, **kwargs)
+
+    return decorated
@@ -9,12 +9,72 @@ import os
 class Config:
     SESSION_SECRET = os.getenv("SESSION_SECRET", "")
 
+    # Token of the internal endpoints (metrics, job events)
+    # Generate with ```openssl rand -base64 32```, leave empty to disable the internal endpoints
+    INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "")
+
+    # URL of this API reachable from the job pods (e.g. http://flask-service:8080), they post their job events to it
+    # Leave empty to disable the job events, the job state is then read from the output files
+    INTERNAL_API_URL = os.getenv("INTERNAL_API_URL", "")
+
     # Email Configuration
     EMAIL_FROM = os.getenv("EMAIL_FROM", "")
 
     # Namespace
     NAMESPACE = os.getenv("NAMESPACE", "")
 
+    # Kubernetes targets (JSON list of clusters/namespaces with their own credentials, PVCs and capacity)
+    # Leave empty to run all the jobs in NAMESPACE with the PVCs below
+    K8S_TARGETS = os.getenv("K8S_TARGETS", "")
+
+    # Seconds the namespace-wide job and pod lists are shared between requests
+    K8S_LIST_CACHE_TTL = float(os.getenv("K8S_LIST_CACHE_TTL") or "2")
+
+    # Watch the jobs and pods from the start of the API to record the pod timelines of all the jobs and
+    # to report the queue metrics from the first scrape
+    WATCH_JOBS = os.getenv("WATCH_JOBS", "false").lower() == "true"
+
+    # Watch the nodes and GPU pods from the start of the API for the GPU capacity view, needs the
+    # foldify-gpu-capacity-reader ClusterRole (kubernetes-templates/account.yaml)
+    GPU_CAPACITY_MONITOR = os.getenv("GPU_CAPACITY_MONITOR", "false").lower() == "true"
+
+    # Automatic resubmission of the jobs that ran out of memory (needs WATCH_JOBS and the job events), 0 disables it
+    OOM_MAX_RETRIES = int(os.getenv("OOM_MAX_RETRIES", "0"))
+    # Memory limits an OOMKilled job is escalated through
+    OOM_MEMORY_TIERS = os.getenv("OOM_MEMORY_TIERS", "128Gi,256Gi,384Gi")
+    # GPU products (nvidia.com/gpu.product node label values) ordered by GPU memory, a job out of GPU memory
+    # moves to the products after the one it ran on, leave empty to never change the GPU product
+    OOM_GPU_PRODUCTS = os.getenv("OOM_GPU_PRODUCTS", "")
+
+    # Fractional GPUs (MIG profiles, time-sliced GPUs) for short ESMFold and OmegaFold predictions (JSON list), e.g.
+    # [{"resource": "nvidia.com/mig-1g.10gb", "maxLength": {"ESMFold": 400, "OmegaFold": 300}}]
+    # Leave empty to request a full GPU for every job
+    FRACTIONAL_GPU_PROFILES = os.getenv("FRACTIONAL_GPU_PROFILES", "")
+
+    # Satisfy a submission with the outputs of a finished job with the same tool, version, sequence and settings,
+    # only jobs made public or shared by their owners (allowReuse) are reused
+    RESULT_CACHE = os.getenv("RESULT_CACHE", "false").lower() == "true"
+
+    # Records of an uploaded multi-FASTA file submitted by one batch upload
+    MAX_BATCH_RECORDS = int(os.getenv("MAX_BATCH_RECORDS", "1000"))
+
+    # JSON object overriding the longest input per tool (residues, tokens for AlphaFold3), e.g. {"ESMFold": 2500}
+    SEQUENCE_LIMITS = os.getenv("SEQUENCE_LIMITS", "")
+
+    # Largest CCD or JSON file of an AlphaFold 3 job, in bytes, uploaded with the request or in chunks
+    MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(2 * 1024 ** 3)))
+
+    # Store of the MSAs and templates of the AlphaFold 2 and AlphaFold 3 jobs, reused by the jobs with the same chains
+    MSA_STORE = os.getenv("MSA_STORE", "false").lower() == "true"
+    # Version of the sequence databases, change it after updating the databases to stop reusing the stored MSAs
+    MSA_DATABASE_VERSION = os.getenv("MSA_DATABASE_VERSION", "1")
+
+    # Store of the job input files, identical inputs of the jobs are hard links to one stored file
+    INPUT_BLOB_STORE = os.getenv("INPUT_BLOB_STORE", "false").lower() == "true"
+
+    # Post-processing of the job pods (archive, storage copy, notification) by the Python runner instead of bash commands
+    JOB_RUNNER = os.getenv("JOB_RUNNER", "false").lower() == "true"
+
     # Results directory
     PROD_RESULTS_DIRECTORY = os.getenv("PROD_RESULTS_DIRECTORY", "")
 
@@ -29,6 +89,10 @@ class Config:
     OMEGAFOLD_IMAGE = os.getenv("OMEGAFOLD_IMAGE", "")
     COLABFOLD_IMAGE = os.getenv("COLABFOLD_IMAGE", "")
 
+    # Pin the image tags above to their digests once per API process (public registries only),
+    # the job pods then use the IfNotPresent pull policy and do not ask the registry for every job
+    RESOLVE_IMAGE_DIGESTS = os.getenv("RESOLVE_IMAGE_DIGESTS", "false").lower() == "true"
+
     # PVCs
     PVC_VOL1_ALPHAFOLD = os.getenv("PVC_VOL1_ALPHAFOLD")
     PVC_VOL1_ALPHAFOLD3 = os.getenv("PVC_VOL1_ALPHAFOLD3")
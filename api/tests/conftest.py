@@ -23,4 +23,11 @@ def test_client():
 def app():
     app = create_app()  # Ensure your app creation logic is correct
     with app.app_context():
-        yield app
\ No newline at end of file
+        yield app
+
+@pytest.fixture(autouse=True)
+def clear_k8s_list_cache():
+    """Do not share the cached Kubernetes list results between tests."""
+    from app.shared.kubernetes import invalidate_list_cache
+    invalidate_list_cache()
+    yield
@@ -0,0 +1,49 @@
+import os
+from unittest.mock import patch
+
+from app.shared.blob_store import get_blob_path, get_file_digest, write_input_file
+from app.shared.common import get_input_path
+from app.shared.delete import delete_job_files
+
+FASTA = ">job\nMKVLL\n"
+
+
+def test_identical_inputs_share_a_file(tmp_path):
+    """Test that identical inputs of two jobs are one stored file, removed with the last job linking to it."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.blob_store.Config.INPUT_BLOB_STORE", True, create=True):
+        first = get_input_path("first", "fasta", "guest_a")
+        second = get_input_path("second", "fasta", "guest_b")
+        write_input_file(first, FASTA)
+        write_input_file(second, FASTA)
+
+        blob_path = get_blob_path(get_file_digest(first))
+        assert os.stat(first).st_ino == os.stat(second).st_ino == os.stat(blob_path).st_ino
+        assert os.stat(blob_path).st_nlink == 3
+
+        # A rewritten input is a new file, the other job keeps its input
+        write_input_file(first, ">job\nMKVLLA\n")
+        with open(second) as f:
+            assert f.read() == FASTA
+        assert os.stat(blob_path).st_nlink == 2
+
+        assert delete_job_files("second", "guest_b") is None
+        assert not os.path.exists(second) and not os.path.exists(blob_path)
+        rewritten_blob = get_blob_path(get_file_digest(first))
+        assert os.path.exists(rewritten_blob)
+        assert delete_job_files("first", "guest_a") is None
+        assert not os.path.exists(rewritten_blob)
+
+
+def test_inputs_without_blob_store(tmp_path):
+    """Test that without the blob store each job has its own input file, written atomically."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.blob_store.Config.INPUT_BLOB_STORE", False, create=True):
+        first = get_input_path("first", "fasta", "guest_a")
+        second = get_input_path("second", "fasta", "guest_a")
+        write_input_file(first, FASTA)
+        write_input_file(second, FASTA.encode())
+
+        assert os.stat(first).st_ino != os.stat(second).st_ino
+        assert not os.path.exists(os.path.join(tmp_path, "blobs"))
+        assert sorted(os.listdir(os.path.dirname(first))) == ["first.fasta", "second.fasta"]
@@ -0,0 +1,32 @@
+import importlib.util
+import os
+import re
+
+CLIENT_ROUTES_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "..", "client", "foldify_client", "routes.py")
+
+# Routes the users do not call: the events of the job pods and the monitoring behind the internal token
+INTERNAL_PREFIXES = ["/api/flask/events/", "/api/flask/monitoring/"]
+
+
+def load_client_routes():
+    """Load the route table of the client without the client requirements."""
+    spec = importlib.util.spec_from_file_location("foldify_client_routes", CLIENT_ROUTES_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_client_routes_match_api(app):
+    """Test that the client calls the routes of the API and that every user route of the API is in the client."""
+    routes = load_client_routes()
+    api_routes = set()
+    for rule in app.url_map.iter_rules():
+        if not rule.rule.startswith("/api/flask/") or any(rule.rule.startswith(prefix) for prefix in INTERNAL_PREFIXES):
+            continue
+        path = re.sub(r"<(?:[^:<>]+:)?([^<>]+)>", r"{\1}", rule.rule)
+        api_routes.update((method, path) for method in rule.methods - {"HEAD", "OPTIONS"})
+
+    client_routes = {(method, routes.API_PREFIX + path) for method, path in routes.ROUTES.values()}
+    assert client_routes - api_routes == set(), "client routes missing in the API"
+    assert api_routes - client_routes == set(), "API routes missing in the client"
+    assert set(routes.SUBMIT_ROUTES.values()) <= set(routes.ROUTES)
@@ -0,0 +1,108 @@
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+import jwt
+from flask import jsonify
+
+from app.alphafold.job_config import create_alphafold2_job_config
+from app.alphafold.k8s_job import construct_command
+from app.shared.common import get_input_path, get_output_path
+from app.shared.submissions import save_job_submission
+
+COLABFOLD_DATA = {"jobName": "source", "proteinSequence": ">source\nMKVLL\n", "numRelax": "0", "templateMode": "none",
+                  "msaMode": "mmseqs2_uniref_env", "pairMode": "unpaired_paired", "modelPreset": "auto",
+                  "numModels": "5", "numRecycles": "3", "recycleTolerance": "auto", "maxMSA": "auto", "numSeeds": "1",
+                  "useDropout": False, "email": "user@example.com", "version": "Colabfold 1.5.2",
+                  "forceComputation": True, "makeResultsPublic": False}
+
+
+def clone(client, job_name, body):
+    return client.post(f"/api/flask/dashboard/clone/{job_name}", json=body)
+
+
+def test_clone_reuses_msas(app, tmp_path):
+    """Test that a clone is submitted from the recorded settings and reuses the MSAs only when they do not change."""
+    client = app.test_client()
+    submit = MagicMock(side_effect=lambda data, user, msa_source: (jsonify({"message": "Job created."}), 200))
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.dashboard.clone.submit_colabfold_job", submit):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        save_job_submission("source", "guest_session1", "ColabFold", COLABFOLD_DATA)
+        os.makedirs(get_output_path("source", "guest_session1"))
+        with open(os.path.join(get_output_path("source", "guest_session1"), "source.a3m"), "w") as f:
+            f.write(">101\nMKVLL\n")
+
+        assert clone(client, "source", {"jobName": "seeds", "settings": {"numSeeds": "4"}}).status_code == 200
+        data, user, msa_source = submit.call_args[0]
+        assert data["jobName"] == "seeds" and data["numSeeds"] == "4" and user == "guest_session1"
+        assert data["forceComputation"] is False and data["proteinSequence"] == COLABFOLD_DATA["proteinSequence"]
+        assert msa_source == "source"
+
+        assert clone(client, "source", {"jobName": "single", "settings": {"msaMode": "single_sequence"}}).status_code == 200
+        assert submit.call_args[0][2] is None
+
+        assert clone(client, "source", {"jobName": "other", "settings": {"jobName": "x"}}).status_code == 400
+        assert clone(client, "missing", {"jobName": "other"}).status_code == 404
+        os.makedirs(os.path.dirname(get_input_path("legacy", "json", "guest_session1")))
+        with open(get_input_path("legacy", "json", "guest_session1"), "w") as f:
+            f.write("{}")
+        assert clone(client, "legacy", {"jobName": "other"}).status_code == 409
+        assert submit.call_count == 2
+
+
+def test_clone_alphafold3_job(app, tmp_path):
+    """Test that an AlphaFold 3 clone is submitted from the data JSON of the job, with its MSAs, when they do not change."""
+    client = app.test_client()
+    run = MagicMock(side_effect=lambda data, user, reuse_msas: (jsonify({"message": "Job created."}), 200))
+    settings = {"email": "user@example.com", "public": False, "largeInput": False, "forceComputation": False,
+                "precomputedMSA": True}
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.dashboard.clone.run_alphafold3_prediction", run):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        save_job_submission("Source", "guest_session1", "AlphaFold3", settings)
+        job = {"name": "Source", "modelSeeds": [1], "dialect": "alphafold3", "version": 1,
+               "sequences": [{"protein": {"id": ["A"], "sequence": "MKVLL"}}]}
+        os.makedirs(os.path.dirname(get_input_path("Source", "json", "guest_session1")))
+        with open(get_input_path("Source", "json", "guest_session1"), "w") as f:
+            json.dump(job, f)
+        data_dir = os.path.join(get_output_path("Source", "guest_session1"), "source")
+        os.makedirs(data_dir)
+        with open(os.path.join(data_dir, "source_data.json"), "w") as f:
+            json.dump(dict(job, sequences=[{"protein": dict(job["sequences"][0]["protein"], unpairedMsa=">q\nMKVLL\n",
+                                                                            pairedMsa="", templates=[])}]), f)
+
+        assert clone(client, "Source", {"jobName": "seeds", "settings": {"modelSeeds": [1, 2, 3]}}).status_code == 200
+        computation, user, reuse_msas = run.call_args[0]
+        assert computation["name"] == "seeds" and computation["precomputedMSA"] is True and reuse_msas
+        with open(get_input_path("seeds", "json", "guest_session1")) as f:
+            clone_input = json.load(f)
+        assert clone_input["name"] == "seeds" and clone_input["modelSeeds"] == [1, 2, 3]
+        assert clone_input["sequences"][0]["protein"]["unpairedMsa"] == ">q\nMKVLL\n"
+
+        # Other MSAs are searched again from the input of the job
+        assert clone(client, "Source", {"jobName": "jackhmmer", "settings": {"precomputedMSA": False}}).status_code == 200
+        assert not run.call_args[0][2]
+        with open(get_input_path("jackhmmer", "json", "guest_session1")) as f:
+            assert "unpairedMsa" not in json.load(f)["sequences"][0]["protein"]
+
+        assert clone(client, "Source", {"jobName": "other", "settings": {"sequences": []}}).status_code == 400
+
+
+def test_alphafold2_clone_command():
+    """Test that an AlphaFold 2 clone copies the MSAs of the job it was cloned from and uses them."""
+    data = {"jobName": "clone", "proteinSequence": ">clone\nMKVLL\n", "maxTemplateDate": "2022-01-01",
+            "dbPreset": "full_dbs", "modelPreset": "monomer", "reuseMSAs": False, "predictionsPerModel": 1,
+            "runRelax": True, "makeResultsPublic": False, "email": "user@example.com", "version": "Alphafold 2.3.1",
+            "forceComputation": False}
+    jobConfig = create_alphafold2_job_config(data, "guest_a")
+    assert "--use_precomputed_msas=False" in construct_command(jobConfig, "guest_a")
+
+    jobConfig["msaSource"] = "source"
+    command = construct_command(jobConfig, "guest_a")
+    assert "cp -rl /mnt/output/guest_a/source/msas/. /mnt/output/guest_a/clone/msas/" in command
+    assert "--use_precomputed_msas=True" in command
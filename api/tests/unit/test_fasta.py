@@ -0,0 +1,44 @@
+import io
+import json
+import os
+from unittest.mock import patch
+
+import jwt
+
+from app.shared.fasta import iter_fasta_records, split_sequence_input
+
+BATCH_SETTINGS = {"jobName": "batch", "maxTemplateDate": "2022-01-01", "dbPreset": "full_dbs",
+                  "modelPreset": "monomer", "reuseMSAs": False, "predictionsPerModel": "5", "runRelax": True,
+                  "makeResultsPublic": False, "forceComputation": False, "email": "example@mail.com",
+                  "version": "Alphafold 2.3.1"}
+
+
+def test_iter_fasta_records():
+    """Test the parsing of wrapped records, blank lines and a sequence without a header."""
+    lines = io.BytesIO(b"MKV\n>seq1 first\nMKV\r\nLL Q\n\n>seq2\nGG\n>empty\n")
+    assert list(iter_fasta_records(lines)) == [(None, "MKV"), ("seq1 first", "MKVLLQ"), ("seq2", "GG"), ("empty", "")]
+    assert split_sequence_input(">a\nMKV\n>b\nGG") == [">a\nMKV\n", ">b\nGG"]
+
+
+def test_batch_upload(app):
+    """Test that every record of the uploaded file is submitted or reported."""
+    client = app.test_client()
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.alphafold.routes.deploy_alphafold2_job", return_value=None) as deploy:
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        fasta = b">seq1\nMKV\nLL\n>\nGG\n>seq3\nAAA\n"
+        response = client.post("/api/flask/alphafold/submit/batch", content_type="multipart/form-data",
+                               data={"data": json.dumps(BATCH_SETTINGS), "fastaFile": (io.BytesIO(fasta), "batch.fasta")})
+
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert response.mimetype == "application/x-ndjson"
+        assert [line.get("status") for line in lines[:3]] == ["submitted", None, "submitted"]
+        assert "error" in lines[1]
+        assert lines[-1]["submitted"] == 2 and lines[-1]["failed"] == 1
+        submitted = deploy.call_args_list[0][0][0]
+        assert submitted["jobName"] == "batch-batch-1" and submitted["proteinSequence"] == ">seq1\nMKVLL\n"
+
+        response = client.post("/api/flask/alphafold/submit/batch", content_type="multipart/form-data",
+                               data={"data": json.dumps(dict(BATCH_SETTINGS, modelPreset="multimer")),
+                                     "fastaFile": (io.BytesIO(fasta), "batch.fasta")})
+        assert response.status_code == 400
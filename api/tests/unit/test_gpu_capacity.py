@@ -0,0 +1,85 @@
+from unittest.mock import MagicMock, patch
+from kubernetes import client
+
+from app.shared.gpu_capacity import GpuCapacityMonitor, get_pod_gpu_requests
+
+TARGET = {"name": "default", "namespace": "foldify"}
+
+def make_node(name, product, gpus, unschedulable=False):
+    node = MagicMock()
+    node.metadata.name = name
+    node.metadata.labels = {"nvidia.com/gpu.product": product}
+    node.status.allocatable = {"cpu": "64", "nvidia.com/gpu": str(gpus)}
+    node.spec.unschedulable = unschedulable
+    return node
+
+def make_pod(uid, node_name, gpus, phase="Running"):
+    pod = MagicMock()
+    pod.metadata.uid = uid
+    pod.spec.node_name = node_name
+    container = MagicMock()
+    container.resources.requests = {"cpu": "4", "nvidia.com/gpu": str(gpus)}
+    pod.spec.containers = [container]
+    pod.status.phase = phase
+    return pod
+
+def test_get_pod_gpu_requests():
+    """Test counting the GPU requests of a pod."""
+    assert get_pod_gpu_requests(make_pod("a", "node-1", 2)) == {"nvidia.com/gpu": 2}
+
+def test_snapshot():
+    """Test grouping the allocatable and requested GPUs by GPU product."""
+    core_api = MagicMock()
+    core_api.list_node.return_value.items = [
+        make_node("node-1", "NVIDIA-A100-80GB-PCIe", 4),
+        make_node("node-2", "NVIDIA-A100-80GB-PCIe", 4),
+        make_node("node-3", "NVIDIA-H100-PCIe", 2),
+        make_node("node-4", "NVIDIA-H100-PCIe", 2, unschedulable=True),
+    ]
+    core_api.list_pod_for_all_namespaces.return_value.items = [
+        make_pod("a", "node-1", 1),
+        make_pod("b", "node-2", 2),
+        make_pod("c", "node-3", 1, phase="Succeeded"),
+        make_pod("d", None, 1, phase="Pending"),
+    ]
+
+    monitor = GpuCapacityMonitor(TARGET)
+    monitor.refresh(core_api)
+    snapshot = monitor.snapshot()
+
+    assert monitor.wait_synced(0)
+    assert snapshot["scope"] == "cluster" and snapshot["error"] is None
+    assert snapshot["products"]["NVIDIA-A100-80GB-PCIe"]["resources"]["nvidia.com/gpu"] == {"allocatable": 8, "requested": 3, "free": 5}
+    assert snapshot["products"]["NVIDIA-H100-PCIe"]["resources"]["nvidia.com/gpu"] == {"allocatable": 2, "requested": 0, "free": 2}
+    assert snapshot["pending"] == {"nvidia.com/gpu": 1}
+    assert monitor.free_gpus(products=["NVIDIA-H100-PCIe"]) == 2
+    assert monitor.free_gpus() == 7
+
+def test_snapshot_namespace_scope():
+    """Test the fallback to the namespace pods when the cluster pods cannot be listed."""
+    core_api = MagicMock()
+    core_api.list_node.return_value.items = [make_node("node-1", "NVIDIA-A100-80GB-PCIe", 4)]
+    core_api.list_pod_for_all_namespaces.side_effect = Exception("Forbidden")
+    core_api.list_namespaced_pod.return_value.items = [make_pod("a", "node-1", 1)]
+
+    monitor = GpuCapacityMonitor(TARGET)
+    monitor.refresh(core_api)
+
+    assert monitor.snapshot()["scope"] == "namespace"
+    assert monitor.free_gpus() == 3
+    core_api.list_namespaced_pod.assert_called_with("foldify")
+
+def test_nodes_forbidden(caplog):
+    """Test that a monitor without access to the nodes logs a warning, reports the error and watches nothing."""
+    core_api = MagicMock()
+    core_api.list_node.side_effect = client.exceptions.ApiException(status=403, reason="Forbidden")
+
+    monitor = GpuCapacityMonitor(TARGET)
+    with patch("app.shared.gpu_capacity.get_core_api", return_value=core_api), \
+         patch("app.shared.gpu_capacity.threading.Thread") as thread:
+        monitor.start()
+
+    thread.assert_not_called()
+    assert monitor.wait_synced(0)
+    assert monitor.snapshot()["error"] == "The nodes of the cluster cannot be listed."
+    assert "foldify-gpu-capacity-reader" in caplog.text
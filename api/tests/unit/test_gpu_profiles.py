@@ -0,0 +1,96 @@
+from unittest.mock import MagicMock, patch
+
+from app.shared import gpu_profiles
+from app.shared.gpu_capacity import get_required_gpu_products
+from app.shared.gpu_profiles import parse_gpu_profiles, get_sequence_length, select_gpu_resource, has_free_gpus
+from app.omegafold.utilities import create_job_object
+from app.shared.oom_retry import use_full_gpu
+
+PROFILES = parse_gpu_profiles(
+    '[{"resource": "nvidia.com/mig-1g.10gb", "maxLength": {"ESMFold": 400, "OmegaFold": 300}},'
+    ' {"resource": "nvidia.com/mig-3g.40gb", "maxLength": {"ESMFold": 1200}},'
+    ' {"maxLength": {"ESMFold": 10}}]'
+)
+TARGET = {"name": "default", "namespace": "ns"}
+
+
+def test_parse_gpu_profiles():
+    """Test that invalid profiles are skipped and invalid configurations mean full GPUs."""
+    assert [profile["resource"] for profile in PROFILES] == ["nvidia.com/mig-1g.10gb", "nvidia.com/mig-3g.40gb"]
+    assert parse_gpu_profiles("") == []
+    assert parse_gpu_profiles("{not json") == []
+
+
+def test_get_sequence_length():
+    """Test that headers, chain separators and whitespace are not counted."""
+    assert get_sequence_length(">seq1\nMKV\nLLA\n>seq2\nGG") == 8
+    assert get_sequence_length("MKV:MKV") == 6
+
+
+def test_select_gpu_resource():
+    """Test the choice of the smallest fitting fractional GPU, preferring the free ones."""
+    monitor = MagicMock()
+    monitor.snapshot.return_value = {"updated": 1}
+    monitor.free_gpus.side_effect = lambda resource, products: {"nvidia.com/mig-1g.10gb": 0, "nvidia.com/mig-3g.40gb": 2}[resource]
+
+    with patch.object(gpu_profiles, "_profiles", PROFILES), \
+         patch("app.shared.gpu_profiles.get_gpu_monitor", return_value=monitor):
+        assert select_gpu_resource("ESMFold", "M" * 300, TARGET) == "nvidia.com/mig-3g.40gb"
+        assert select_gpu_resource("ESMFold", "M" * 1000, TARGET) == "nvidia.com/mig-3g.40gb"
+        assert select_gpu_resource("ESMFold", "M" * 2000, TARGET) == "nvidia.com/gpu"
+        # Busy fractional GPUs are still preferred over full GPUs
+        assert select_gpu_resource("OmegaFold", "M" * 200, TARGET) == "nvidia.com/mig-1g.10gb"
+        assert select_gpu_resource("AlphaFold", "M" * 10, TARGET) == "nvidia.com/gpu"
+
+
+def test_has_free_gpus_allowed_products():
+    """Test that only the GPUs of the products the job may use are counted."""
+    monitor = MagicMock()
+    monitor.snapshot.return_value = {"updated": 1, "error": None}
+    monitor.free_gpus.side_effect = lambda resource, products: 0 if products == ["NVIDIA-H100-PCIe"] else 3
+
+    with patch("app.shared.gpu_profiles.get_gpu_monitor", return_value=monitor):
+        assert not has_free_gpus(TARGET, "nvidia.com/gpu", ["NVIDIA-H100-PCIe"])
+        assert has_free_gpus(TARGET, "nvidia.com/gpu")
+
+        monitor.snapshot.return_value = {"updated": 1, "error": "The nodes of the cluster cannot be listed."}
+        assert has_free_gpus(TARGET, "nvidia.com/gpu", ["NVIDIA-H100-PCIe"])
+
+
+def test_omegafold_gpu_products():
+    """Test that OmegaFold jobs on full GPUs are restricted to the large GPU products and fractional GPUs are not."""
+    job_config = {"uniquename": "job1-abcde", "simplename": "job1", "outputDir": "job1", "user": "guest_a",
+                  "input": "/mnt/input/guest_a/job1.fasta", "proteinSequence": ">job1\n" + "M" * 200, "numCycle": "10",
+                  "subbatchSize": "448", "weights_file": "/data/model.pt", "pseudoMsaMask": "0.12", "numPseudoMSAs": "15",
+                  "makeResultsPublic": "false", "email": "", "service": "OmegaFold", "container": "omegafold:latest"}
+    target = {"name": "default", "namespace": "ns", "pvcs": {"PVC_VOL1_ALPHAFOLD": "vol1", "PVC_VOL2": "vol2",
+                                                             "PVC_STORAGE": "storage"}}
+
+    with patch.object(gpu_profiles, "_profiles", PROFILES), \
+         patch("app.shared.gpu_profiles.has_free_gpus", return_value=True):
+        fractional_job = create_job_object(job_config, "guest_a", target)
+        full_job = create_job_object(dict(job_config, proteinSequence="M" * 500), "guest_a", target)
+
+    assert "nvidia.com/mig-1g.10gb" in fractional_job.spec.template.spec.containers[0].resources.limits
+    assert get_required_gpu_products(fractional_job.spec.template.spec) is None
+    assert get_required_gpu_products(full_job.spec.template.spec) == ["NVIDIA-A100-80GB-PCIe", "NVIDIA-H100-PCIe"]
+
+    # Moved to a full GPU after running out of GPU memory, the job gets the product restriction back
+    with patch.object(gpu_profiles, "_profiles", PROFILES):
+        assert use_full_gpu(fractional_job, {}, TARGET, {"kind": "gpu", "container": None})
+    assert get_required_gpu_products(fractional_job.spec.template.spec) == ["NVIDIA-A100-80GB-PCIe", "NVIDIA-H100-PCIe"]
+
+
+def test_use_full_gpu():
+    """Test that a job out of GPU memory on a fractional GPU is moved to a full GPU."""
+    job = MagicMock()
+    job.metadata.annotations = {"service": "ESMFold"}
+    resources = job.spec.template.spec.containers[0].resources
+    resources.requests = {"cpu": "4", "nvidia.com/mig-1g.10gb": "1"}
+    resources.limits = {"cpu": "4", "nvidia.com/mig-1g.10gb": "1"}
+
+    with patch.object(gpu_profiles, "_profiles", PROFILES):
+        assert use_full_gpu(job, {}, TARGET, {"kind": "gpu", "container": None}) == "full GPU instead of nvidia.com/mig-1g.10gb"
+        assert resources.requests == {"cpu": "4", "nvidia.com/gpu": "1"}
+        assert resources.limits == {"cpu": "4", "nvidia.com/gpu": "1"}
+        assert use_full_gpu(job, {}, TARGET, {"kind": "gpu", "container": None}) is None
@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+from app.shared import images
+from app.shared.images import parse_image_reference, parse_auth_challenge, resolve_image, get_image_pull_policy
+
+
+def test_parse_image_reference():
+    """Test the registry, repository and tag of image references."""
+    assert parse_image_reference("ubuntu") == ("registry-1.docker.io", "library/ubuntu", "latest")
+    assert parse_image_reference("user/image:1.0") == ("registry-1.docker.io", "user/image", "1.0")
+    assert parse_image_reference("cerit.io/foldify/af3:v3") == ("cerit.io", "foldify/af3", "v3")
+    assert parse_image_reference("localhost:5000/image") == ("localhost:5000", "image", "latest")
+
+
+def test_parse_auth_challenge():
+    """Test the parsing of the registry token challenge."""
+    challenge = parse_auth_challenge('Bearer realm="https://auth.example.org/token",service="registry",scope="repository:a/b:pull"')
+    assert challenge == {"realm": "https://auth.example.org/token", "service": "registry", "scope": "repository:a/b:pull"}
+    assert parse_auth_challenge('Basic realm="x"') is None
+
+
+def test_resolve_image():
+    """Test that the tags are resolved once and kept when the registry fails."""
+    digest = "sha256:" + "a" * 64
+    with patch.object(images.Config, "RESOLVE_IMAGE_DIGESTS", True, create=True), \
+         patch.dict(images._resolved, clear=True), patch.dict(images._failed_registries, clear=True), \
+         patch("app.shared.images.fetch_image_digest", return_value=digest) as fetch:
+        assert resolve_image("cerit.io/foldify/af3:v3") == f"cerit.io/foldify/af3:v3@{digest}"
+        assert resolve_image("cerit.io/foldify/af3:v3") == f"cerit.io/foldify/af3:v3@{digest}"
+        assert fetch.call_count == 1
+
+        fetch.side_effect = OSError("unreachable")
+        assert resolve_image("cerit.io/foldify/esm:v1") == "cerit.io/foldify/esm:v1"
+        # The failed registry is not asked again for a while, not even for other tags
+        assert resolve_image("cerit.io/foldify/omega:v1") == "cerit.io/foldify/omega:v1"
+        assert fetch.call_count == 2
+
+        images._failed_registries["cerit.io"] = 0
+        fetch.side_effect = None
+        assert resolve_image("cerit.io/foldify/esm:v1") == f"cerit.io/foldify/esm:v1@{digest}"
+        assert images._failed_registries == {}
+
+    with patch.object(images.Config, "RESOLVE_IMAGE_DIGESTS", False, create=True):
+        assert resolve_image("cerit.io/foldify/af3:v3") == "cerit.io/foldify/af3:v3"
+
+    assert get_image_pull_policy(f"cerit.io/foldify/af3:v3@{digest}", "Always") == "IfNotPresent"
+    assert get_image_pull_policy("cerit.io/foldify/af3:v3", "Always") == "Always"
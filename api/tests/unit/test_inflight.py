@@ -0,0 +1,76 @@
+import os
+from unittest.mock import patch
+
+from app.shared.common import get_output_path
+from app.shared.inflight import (claim_inflight_job, follow_inflight_job, release_pending_inflight_claims,
+                                 get_followers)
+from app.shared.job_state import get_job_state, record_job_event
+from config import Config
+
+
+def make_job(job_name, user, public="false", allow_reuse="false"):
+    jobConfig = {"simplename": job_name, "user": user, "service": "ESMFold", "container": "esmfold:1",
+                 "proteinSequence": ">job\nMKVLL", "makeResultsPublic": public, "forceComputation": False}
+    fileConfig = {"user": user, "name": job_name, "num_recycles": "3", "public": public,
+                  "allowReuse": allow_reuse, "copies": "1", "service": "ESMFold"}
+    return jobConfig, fileConfig
+
+
+def test_follow_inflight_job(tmp_path):
+    """Test that an identical submission follows the running job and gets its outputs when it is archived."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.inflight.inflight_enabled", return_value=True):
+        leader_config, leader_file = make_job("leader", "guest_a", allow_reuse="true")
+        assert claim_inflight_job(leader_config, leader_file, "guest_a") is None
+        record_job_event("leader", "guest_a", {"stage": "submitted", "job": "leader-abcde"})
+
+        follower_config, follower_file = make_job("follower", "guest_b")
+        leader = claim_inflight_job(follower_config, follower_file, "guest_b")
+        assert leader == ("guest_a", "leader")
+        follow_inflight_job(leader, follower_config, "guest_b")
+        assert get_followers("leader", "guest_a") == [("follower", "guest_b")]
+
+        record_job_event("leader", "guest_a", {"stage": "started", "job": "leader-abcde"})
+        assert get_job_state("follower", "guest_b")["stage"] == "started"
+
+        os.makedirs(get_output_path("leader", "guest_a"))
+        for name in ["job.pdb", "stdout", "download-secret.zip"]:
+            with open(os.path.join(get_output_path("leader", "guest_a"), name), "w") as f:
+                f.write("ATOM")
+        record_job_event("leader", "guest_a", {"stage": "archived", "job": "leader-abcde"})
+
+        assert get_job_state("follower", "guest_b")["stage"] == "archived"
+        follower_files = os.listdir(get_output_path("follower", "guest_b"))
+        assert "job.pdb" in follower_files and "stdout" not in follower_files and "download-secret.zip" not in follower_files
+        assert get_followers("leader", "guest_a") == []
+
+        # The result is claimed again once the leader finished
+        assert claim_inflight_job(*make_job("next", "guest_b")[:2], "guest_b") is None
+
+
+def test_inflight_claims_of_other_users(app, tmp_path):
+    """Test that jobs not shared by their owners are not followed and that claims of failed submissions are released."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.inflight.inflight_enabled", return_value=True), app.test_request_context():
+        assert claim_inflight_job(*make_job("private", "guest_a")[:2], "guest_a") is None
+        assert claim_inflight_job(*make_job("other", "guest_b")[:2], "guest_b") is None
+        assert claim_inflight_job(*make_job("own", "guest_a")[:2], "guest_a") == ("guest_a", "private")
+
+        follow_inflight_job(("guest_a", "private"), make_job("own", "guest_a")[0], "guest_a")
+        release_pending_inflight_claims()
+        assert get_job_state("own", "guest_a")["stage"] == "failed"
+        assert claim_inflight_job(*make_job("retry", "guest_b")[:2], "guest_b") is None
+
+
+def test_inflight_needs_events(tmp_path):
+    """Test that identical jobs do not wait for each other when the job pods do not post their events."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.inflight.result_cache_enabled", return_value=True), \
+            patch.object(Config, "INTERNAL_API_URL", "http://foldify-api"), \
+            patch.dict(os.environ, {"INTERNAL_API_TOKEN": ""}):
+        assert claim_inflight_job(*make_job("first", "guest_a")[:2], "guest_a") is None
+        assert claim_inflight_job(*make_job("second", "guest_a")[:2], "guest_a") is None
+
+        with patch.dict(os.environ, {"INTERNAL_API_TOKEN": "secret"}):
+            assert claim_inflight_job(*make_job("first", "guest_a")[:2], "guest_a") is None
+            assert claim_inflight_job(*make_job("second", "guest_a")[:2], "guest_a") == ("guest_a", "first")
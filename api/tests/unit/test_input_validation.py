@@ -3,7 +3,9 @@ from unittest.mock import patch
 import re
 from flask import Flask, jsonify
 from tests.conftest import app
-from app.shared.input_validation import validate_job_name, validate_sequence, validate_date, validate_numeric_input, validate_email
+from app.shared.input_validation import validate_job_name, validate_sequence, validate_date, validate_numeric_input, validate_email, \
+    validate_sequence_length, find_invalid_residues
+from app.alphafold3.validation import Job
 
 def test_validate_job_name(app):
     """Test the validate_job_name function."""
@@ -94,4 +96,52 @@ def test_validate_email(app):
     response, status_code = validate_email("example@muni")  # Missing domain
     assert status_code == 400
     assert "Invalid email address" in response.json["error"]
-    
+
+
+def test_validate_sequence_residues(app):
+    """Test that validate_sequence rejects invalid characters and empty chains."""
+    assert find_invalid_residues("acdx") == []
+    assert find_invalid_residues("AC1*", "protein") == ["*", "1"]
+    assert find_invalid_residues("ACGU", "dna") == ["U"]
+
+    response, status_code = validate_sequence(">Header\nSEQ1ENCE")
+    assert status_code == 400
+    assert "Invalid characters" in response.json["error"]
+
+    response, status_code = validate_sequence(">Header\nSEQ:ENCE")  # Separator not allowed
+    assert status_code == 400
+    assert validate_sequence(">Header\nSEQ:ENCE", allow_chain_separator=True) is None
+
+    response, status_code = validate_sequence(">Header\nSEQ::ENCE", allow_chain_separator=True)  # Empty chain
+    assert status_code == 400
+    assert "must contain residues" in response.json["error"]
+
+
+def test_validate_sequence_length(app):
+    """Test the validate_sequence_length function against the per-tool limits."""
+    with patch("app.shared.input_validation._sequence_limits", {"ESMFold": 10}):
+        assert validate_sequence_length(">A\nAAAAA:AAAAA", "ESMFold") is None
+        response, status_code = validate_sequence_length(">A\nAAAAA:AAAAA", "ESMFold", copies=2)
+        assert status_code == 400
+        assert "too long for ESMFold" in response.json["error"]
+
+        records = ">A\nAAAAAAAA\n>B\nAAAAAAAA"
+        assert validate_sequence_length(records, "ESMFold", per_record=True) is None
+        assert validate_sequence_length(records, "ESMFold")[1] == 400
+        assert validate_sequence_length(records, "OmegaFold") is None  # No limit configured
+
+
+def test_alphafold3_sequences(app):
+    """Test the residue and token budget validation of AlphaFold 3 inputs."""
+    job = {"name": "job", "modelSeeds": [1], "public": False, "email": "user@example.com",
+           "largeInput": False, "forceComputation": False}
+
+    with patch("app.shared.input_validation._sequence_limits", {"AlphaFold3": 20}):
+        Job(**job, sequences=[{"protein": {"id": ["A", "B"], "sequence": "ACDEF"}},
+                              {"ligand": {"id": "C", "smiles": "CC(=O)[O-]"}}])
+
+        with pytest.raises(ValueError, match="Invalid characters in the rna sequence"):
+            Job(**job, sequences=[{"rna": {"id": "A", "sequence": "ACGT"}}])
+
+        with pytest.raises(ValueError, match="too long for AlphaFold 3"):
+            Job(**job, sequences=[{"protein": {"id": ["A", "B", "C"], "sequence": "ACDEFGH"}}])
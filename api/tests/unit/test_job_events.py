@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+from app.shared.job_events import EVENT_FUNCTION_CMD, get_event_token, check_event_token, outcome_event_cmd
+from app.shared.job_state import record_job_event, get_job_state, find_job_state, clear_job_state
+from app.shared.job_info import job_done
+
+
+def test_event_token():
+    """Test that the event token is bound to the user and the job."""
+    with patch.dict(os.environ, {"INTERNAL_API_TOKEN": "secret"}):
+        token = get_event_token("guest_a", "job1")
+        assert check_event_token("guest_a", "job1", token)
+        assert not check_event_token("guest_a", "job2", token)
+        assert not check_event_token("guest_b", "job1", token)
+        assert not check_event_token("guest_a", "job1", "")
+
+    with patch.dict(os.environ, {"INTERNAL_API_TOKEN": ""}):
+        assert not check_event_token("guest_a", "job1", token)
+
+
+def test_record_job_event(tmp_path):
+    """Test the job state built from the submitted and pod events."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        record_job_event("job1", "guest_a", {"stage": "submitted", "job": "job1-abcde", "service": "ESMFold"})
+        assert job_done("job1", "guest_a") is None
+
+        record_job_event("job1", "guest_a", {"stage": "started", "job": "job1-abcde"})
+        assert record_job_event("job1", "guest_a", {"stage": "archived", "job": "job1-old"}) is None
+        assert get_job_state("job1", "guest_a")["stage"] == "started"
+        assert job_done("job1", "guest_a") is None
+
+        record_job_event("job1", "guest_a", {"stage": "archived", "job": "job1-abcde"})
+        state = get_job_state("job1", "guest_a")
+        assert [event["stage"] for event in state["events"]] == ["submitted", "started", "archived"]
+        assert job_done("job1", "guest_a") == "Esmfold"
+
+        # A recomputation starts a new state
+        record_job_event("job1", "guest_a", {"stage": "submitted", "job": "job1-fghij", "service": "ESMFold"})
+        assert [event["stage"] for event in get_job_state("job1", "guest_a")["events"]] == ["submitted"]
+
+        clear_job_state("job1", "guest_a")
+        assert get_job_state("job1", "guest_a") is None
+
+
+def test_find_public_job_state(tmp_path):
+    """Test that the state of a public job is found from the public output symlink."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        (tmp_path / "output" / "guest_a" / "job1").mkdir(parents=True)
+        (tmp_path / "output" / "public").mkdir(parents=True)
+        (tmp_path / "output" / "public" / "job1").symlink_to(tmp_path / "output" / "guest_a" / "job1")
+        record_job_event("job1", "guest_a", {"stage": "submitted", "job": "job1-abcde", "service": "ColabFold"})
+
+        assert find_job_state("job1", "guest_b")["service"] == "ColabFold"
+        assert find_job_state("job2", "guest_b") is None
+
+
+def test_post_job_event(app, tmp_path):
+    """Test the authentication and validation of the job event endpoint."""
+    client = app.test_client()
+    url = "/api/flask/events/guest_a/job1"
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+         patch.dict(os.environ, {"INTERNAL_API_TOKEN": "secret"}):
+        headers = {"Authorization": f"Bearer {get_event_token('guest_a', 'job1')}"}
+
+        assert client.post(url, json={"stage": "started"}).status_code == 401
+        assert client.post("/api/flask/events/guest_a/job2", json={"stage": "started"}, headers=headers).status_code == 401
+        assert client.post(url, json={"stage": "unknown"}, headers=headers).status_code == 400
+
+        response = client.post(url, json={"stage": "started", "host": "node-1", "extra": "x"}, headers=headers)
+        assert response.status_code == 200
+        event = get_job_state("job1", "guest_a")["events"][-1]
+        assert event["host"] == "node-1" and "extra" not in event
+
+    with patch.dict(os.environ, {"INTERNAL_API_TOKEN": ""}):
+        assert client.post(url, json={"stage": "started"}, headers=headers).status_code == 403
+
+
+def test_event_function_posts_event():
+    """Test that the bash event function posts the stage and never fails the job."""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.headers["Authorization"], json.loads(body)))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    env = {
+        "PATH": "/usr/bin:/bin",
+        "FOLDIFY_EVENT_URL": f"http://127.0.0.1:{server.server_port}/api/flask/events/guest_a/job1",
+        "FOLDIFY_EVENT_TOKEN": "token",
+        "FOLDIFY_K8S_JOB": "job1-abcde",
+    }
+    try:
+        command = f"{EVENT_FUNCTION_CMD} && {outcome_event_cmd('[ -s /nonexistent ]')} && echo done"
+        result = subprocess.run(["bash", "-c", command], env=env, capture_output=True, text=True, timeout=30)
+    finally:
+        server.shutdown()
+
+    assert result.stdout.strip() == "done"
+    assert received[0][0] == "Bearer token"
+    assert received[0][1]["stage"] == "failed"
+    assert received[0][1]["job"] == "job1-abcde"
+
+    # Without the event URL the function does nothing
+    result = subprocess.run(["bash", "-c", f"{EVENT_FUNCTION_CMD} && foldify_event started && echo done"],
+                            env={"PATH": "/usr/bin:/bin"}, capture_output=True, text=True, timeout=30)
+    assert result.stdout.strip() == "done"
@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from app.shared.common import get_input_path
+from app.shared.job_names import (get_job_name_path, reserve_job_name, commit_job_name, release_job_name,
+                                  release_pending_job_names)
+
+
+def write_input(job_name, user):
+    path = get_input_path(job_name, "json", user)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("{}")
+
+
+def test_concurrent_reservations(tmp_path):
+    """Test that only one of the concurrent submissions of a name reserves it."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: reserve_job_name("job", "guest_a"), range(16)))
+
+        tokens = [token for token, _ in results if token]
+        assert len(tokens) == 1
+        assert all(not exists for _, exists in results)
+
+        # The name stays taken once the job is submitted
+        write_input("job", "guest_a")
+        assert commit_job_name("job", "guest_a", tokens[0])
+        assert reserve_job_name("job", "guest_a") == (None, True)
+
+        token, exists = reserve_job_name("job", "guest_a", force=True)
+        assert token and exists
+        assert reserve_job_name("job", "guest_a", force=True) == (None, False)
+
+
+def test_registry_recovers(tmp_path):
+    """Test the jobs submitted before the registry, deleted jobs and abandoned reservations."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        write_input("old", "guest_a")
+        assert reserve_job_name("old", "guest_a") == (None, True)
+        write_input("shared", "public")
+        assert reserve_job_name("shared", "guest_b") == (None, True)
+
+        # The input of a committed job was removed
+        os.remove(get_input_path("old", "json", "guest_a"))
+        token, exists = reserve_job_name("old", "guest_a")
+        assert token and not exists
+
+        # The submission holding the reservation did not finish in time
+        stale = time.time() - 3600
+        os.utime(get_job_name_path("old", "guest_a"), (stale, stale))
+        assert reserve_job_name("old", "guest_a")[0] not in [None, token]
+
+        release_job_name("old", "guest_a")
+        assert not os.path.exists(get_job_name_path("old", "guest_a"))
+
+
+def test_release_pending_job_names(app, tmp_path):
+    """Test that the reservations not committed by the request are released when it ends."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), app.test_request_context():
+        committed, _ = reserve_job_name("committed", "guest_a")
+        reserve_job_name("failed", "guest_a")
+        commit_job_name("committed", "guest_a", committed)
+
+        release_pending_job_names()
+        assert os.path.exists(get_job_name_path("committed", "guest_a"))
+        assert not os.path.exists(get_job_name_path("failed", "guest_a"))
+
+
+def test_public_name_reservations(tmp_path):
+    """Test that the names of public jobs are reserved across users and private jobs keep their own names."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        token, exists = reserve_job_name("shared", "guest_a", public=True)
+        assert token and not exists
+        assert reserve_job_name("shared", "guest_b", public=True) == (None, False)
+        assert not os.path.exists(get_job_name_path("shared", "guest_b"))
+        private, _ = reserve_job_name("shared", "guest_c")
+        assert private
+
+        write_input("shared", "guest_a")
+        os.makedirs(os.path.dirname(get_input_path("shared", "json", "public")), exist_ok=True)
+        os.symlink(get_input_path("shared", "json", "guest_a"), get_input_path("shared", "json", "public"))
+        assert commit_job_name("shared", "guest_a", token)
+        assert reserve_job_name("shared", "guest_b", public=True, force=True) == (None, True)
+
+        # The owner can recompute the public job
+        token, exists = reserve_job_name("shared", "guest_a", public=True, force=True)
+        assert token and exists
+        release_job_name("shared", "guest_a", token)
+        assert not os.path.exists(get_job_name_path("shared", "public"))
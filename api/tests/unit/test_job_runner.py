@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+from app.alphafold.job_config import create_alphafold2_job_config
+from app.alphafold.k8s_job import construct_command
+from app.shared.job_runner import JOB_RUNNER_SCRIPT, RUNNER_CMD, get_runner_config
+
+
+def create_config(tmp_path, public=True):
+    """Return the runner configuration of a job with its output, public and storage directories in tmp_path."""
+    config = get_runner_config("guest_a", "job", "job", "ESMFold", "esmfold.done", "*.pdb", public, "", "salt")
+    config.update({"outputDir": str(tmp_path / "output" / "guest_a" / "job"), "publicDir": str(tmp_path / "output" / "public"),
+                   "storageDir": str(tmp_path / "storage")})
+    os.makedirs(config["outputDir"])
+    with open(os.path.join(config["outputDir"], "stdout"), "w") as f:
+        f.write("log\n")
+    return config
+
+
+def run_script(config):
+    """Run the runner as in the job pod, from its source with the configuration in the environment."""
+    env = dict(os.environ, FOLDIFY_RUNNER_CONFIG=json.dumps(config))
+    env.pop("FOLDIFY_EVENT_URL", None)
+    return subprocess.run([sys.executable, "-c", JOB_RUNNER_SCRIPT], env=env, capture_output=True, timeout=60)
+
+
+def test_runner_post_processes_result(tmp_path):
+    """Test that the runner links, copies, archives and marks the result done, and writes the result manifest."""
+    config = create_config(tmp_path)
+    os.makedirs(os.path.join(config["outputDir"], "models"))
+    with open(os.path.join(config["outputDir"], "job.pdb"), "w") as f:
+        f.write("ATOM\n")
+    with open(os.path.join(config["outputDir"], "models", "model_1.pdb"), "w") as f:
+        f.write("ATOM\n")
+
+    assert run_script(config).returncode == 0
+
+    assert os.path.realpath(os.path.join(config["publicDir"], "job")) == config["outputDir"]
+    assert os.path.isfile(os.path.join(config["storageDir"], "job", "models", "model_1.pdb"))
+    assert not os.path.exists(os.path.join(config["storageDir"], "job", "download-salt.zip"))
+    with zipfile.ZipFile(os.path.join(config["outputDir"], "download-salt.zip")) as archive:
+        assert {"job/job.pdb", "job/stdout", "job/models/model_1.pdb"} <= set(archive.namelist())
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    assert os.path.exists(os.path.join(config["outputDir"], "esmfold.done"))
+
+    with open(os.path.join(config["outputDir"], "runner.json")) as f:
+        manifest = json.load(f)
+    assert manifest["success"] and manifest["exitCode"] == 0
+    assert [stage["name"] for stage in manifest["stages"]] == ["public_link", "storage_copy", "archive", "done"]
+    assert {"path": "job.pdb", "size": 5} in manifest["files"]
+
+
+def test_runner_skips_email_of_resubmitted_job(tmp_path):
+    """Test that the failure email is not sent when the API resubmitted the job, the last attempt sends it."""
+    config = create_config(tmp_path, public=False)
+    config["email"] = {"to": "user@example.org", "from": "foldify@example.org",
+                       "failed": {"subject": "failed", "body": "failed"}}
+    open(os.path.join(config["outputDir"], ".retry-job-abcde"), "w").close()
+
+    env = dict(os.environ, FOLDIFY_RUNNER_CONFIG=json.dumps(config), FOLDIFY_K8S_JOB="job-abcde")
+    env.pop("FOLDIFY_EVENT_URL", None)
+    assert subprocess.run([sys.executable, "-c", JOB_RUNNER_SCRIPT], env=env, capture_output=True, timeout=60).returncode == 1
+
+    with open(os.path.join(config["outputDir"], "runner.json")) as f:
+        assert "email" not in [stage["name"] for stage in json.load(f)["stages"]]
+
+
+def test_runner_without_result(tmp_path):
+    """Test that a job without a result is archived but not marked done and the runner fails."""
+    config = create_config(tmp_path, public=False)
+
+    assert run_script(config).returncode == 1
+    assert os.path.exists(os.path.join(config["outputDir"], "download-salt.zip"))
+    assert not os.path.exists(os.path.join(config["outputDir"], "esmfold.done"))
+    assert not os.path.lexists(os.path.join(config["publicDir"], "job"))
+
+
+def test_alphafold2_runner_command():
+    """Test that the AlphaFold 2 command runs the post-processing in the runner when it is configured."""
+    data = {"jobName": "job", "proteinSequence": ">job\nMKVLL\n", "maxTemplateDate": "2022-01-01",
+            "dbPreset": "full_dbs", "modelPreset": "monomer", "reuseMSAs": False, "predictionsPerModel": 1,
+            "runRelax": True, "makeResultsPublic": False, "email": "", "version": "Alphafold 2.3.1",
+            "forceComputation": False}
+    jobConfig = create_alphafold2_job_config(data, "guest_a")
+    assert "zip -0" in construct_command(jobConfig, "guest_a")
+
+    runner_config = get_runner_config("guest_a", "job", "job", "AlphaFold", "alphafold.done", "ranking_debug.json",
+                                      False, "", "salt")
+    command = construct_command(jobConfig, "guest_a", runner_config)
+    assert command.endswith(RUNNER_CMD) and "zip -0" not in command and "Subject:" not in command
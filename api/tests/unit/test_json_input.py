@@ -0,0 +1,58 @@
+import io
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.alphafold3.json_input import rewrite_job_name
+from app.alphafold3.v1_submission import save_json_input
+from app.shared.common import get_input_path
+
+
+def rewrite(document, name="new", chunk_size=4):
+    output = io.BytesIO()
+    rewrite_job_name(io.BytesIO(document.encode()), output, name, chunk_size)
+    return output.getvalue().decode()
+
+
+def test_rewrite_job_name():
+    """Test that only the name of the job is changed, across chunk boundaries and escapes."""
+    msa = '>query\\nMKV\\"LL\\\\'
+    document = '{"name":"old","sequences":[{"protein":{"id":"A","sequence":"MKV","unpairedMsa":"%s"}}],"x":{"name":"keep"}}' % msa
+    assert rewrite(document) == document.replace('"old"', '"new"')
+    assert rewrite(document, chunk_size=1) == document.replace('"old"', '"new"')
+
+    assert rewrite('[ {"sequences": [], "name" : {"a": [1]} } ]') == '[ {"sequences": [], "name" :"new"} ]'
+    assert json.loads(rewrite('{"sequences":[]}')) == {"sequences": [], "name": "new"}
+
+
+@pytest.mark.parametrize("document, error", [
+    ("[]", "does not contain any job"),
+    ('[{"sequences":[]},{"sequences":[]}]', "multiple jobs"),
+    ('{"name":"job"}', "does not contain any sequences"),
+    ('"job"', "not in a supported format"),
+    ('{"sequences":[]} {}', "data after the job"),
+    ('{"sequences":["MKV', "incomplete"),
+])
+def test_rewrite_invalid_job(document, error):
+    """Test the validation of the top-level structure."""
+    with pytest.raises(ValueError, match=error):
+        rewrite(document)
+
+
+def test_save_json_input(app, tmp_path):
+    """Test that the saved input keeps the encoding of the uploaded file."""
+    document = b'{"name":"old","sequences":[{"protein":{"id":"A","sequence":"MKV","pairedMsa":""}}]}'
+    config = {"name": "job", "forceComputation": False, "public": False}
+
+    with patch("app.alphafold3.v1_submission.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        assert save_json_input(FileStorage(io.BytesIO(document), filename="job.json"), config, "guest_a") is None
+        with open(get_input_path("job", "json", "guest_a"), "rb") as f:
+            assert f.read() == document.replace(b'"old"', b'"job"')
+
+        response, status_code = save_json_input(FileStorage(io.BytesIO(b"[]"), filename="job.json"), config, "guest_a")
+        assert status_code == 400
+        assert os.listdir(tmp_path / "input" / "guest_a") == ["job.json"]
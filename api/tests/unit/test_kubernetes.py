@@ -113,11 +113,11 @@ def test_get_running_jobs_no_jobs(mock_k8s_client):
     assert jobs == []
 
 def test_get_running_jobs_exception(mock_k8s_client):
-    """Test exception handling in get_running_jobs."""
+    """Test that a failed listing is logged and raised, the running jobs are unknown rather than none."""
     mock_batch, mock_core = mock_k8s_client
     mock_batch.list_namespaced_job.side_effect = Exception("API failure")
 
     with patch("app.shared.kubernetes.logging.error") as mock_log:
-        jobs = get_running_jobs("test_user")
-        assert jobs == []
-        mock_log.assert_called_with("Failed to list jobs: API failure")
+        with pytest.raises(Exception, match="API failure"):
+            get_running_jobs("test_user")
+        mock_log.assert_called_with("Failed to list jobs of target default: API failure")
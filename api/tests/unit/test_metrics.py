@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+from app.shared.metrics import collect_queue_metrics, render_metrics
+
+NOW = 1_700_000_000
+
+def make_job(name, service, created_ago, active=None, succeeded=None, gpus=1, user="test_user"):
+    job = MagicMock()
+    job.metadata.name = name
+    job.metadata.annotations = {"user": user, "service": service} if user else {}
+    job.metadata.creation_timestamp = datetime.fromtimestamp(NOW - created_ago, tz=timezone.utc)
+    job.status.active = active
+    job.status.succeeded = succeeded
+    job.status.failed = None
+    container = MagicMock()
+    container.resources.requests = {"cpu": "4", "nvidia.com/gpu": str(gpus)} if gpus else {"cpu": "1"}
+    job.spec.template.spec.containers = [container]
+    return job
+
+def make_pod(job_name, phase, gpus=0):
+    pod = MagicMock()
+    pod.metadata.name = f"{job_name}-pod"
+    pod.metadata.labels = {"job-name": job_name}
+    pod.status.phase = phase
+    container = MagicMock()
+    container.resources.requests = {"nvidia.com/gpu": str(gpus)} if gpus else {"cpu": "8"}
+    pod.spec.containers = [container]
+    return pod
+
+def make_view(jobs, pods):
+    view = MagicMock()
+    view.target = {"name": "default"}
+    view.jobs.return_value = jobs
+    view.pods.return_value = pods
+    view.updated.return_value = NOW - 5
+    view.synced.return_value = True
+    return view
+
+def test_collect_queue_metrics():
+    """Test the queue gauges computed from the job view."""
+    view = make_view(
+        jobs=[
+            make_job("af2-a", "AlphaFold", 600, active=1),
+            make_job("af2-b", "AlphaFold", 120, active=1),
+            make_job("esm-a", "ESMFold", 60, active=1),
+            make_job("esm-done", "ESMFold", 900, succeeded=1),
+            make_job("af3-a", "AlphaFold3", 300, active=1, gpus=0),
+        ],
+        pods=[
+            make_pod("af2-a", "Running", gpus=1),
+            make_pod("af2-b", "Pending", gpus=1),
+            make_pod("af3-a", "Running"),
+            make_pod("af3-a-data", "Running"),
+            make_pod("af3-a-inference", "Pending", gpus=1),
+        ],
+    )
+
+    metrics = collect_queue_metrics(view, NOW)
+
+    assert metrics["tools"]["AlphaFold"]["running"] == 1
+    assert metrics["tools"]["AlphaFold"]["pending"] == 1
+    assert metrics["tools"]["AlphaFold"]["pending_gpus"] == 1
+    assert metrics["tools"]["AlphaFold"]["oldest_pending"] == 120
+    assert metrics["tools"]["ESMFold"]["pending"] == 1
+    assert metrics["tools"]["AlphaFold3"]["running"] == 1
+    assert metrics["af3_stages"][("cpu", "running")] == 1
+    assert metrics["af3_stages"][("gpu", "pending")] == 1
+    assert metrics["tools"]["AlphaFold3"]["pending_gpus"] == 1
+    assert metrics["tools"]["AlphaFold3"]["running_gpus"] == 0
+
+def test_render_metrics():
+    """Test the Prometheus text format of the gauges."""
+    view = make_view(jobs=[make_job("esm-a", "ESMFold", 60, active=1)], pods=[])
+    stats = {"hits": 3, "misses": 1, "coalesced": 2, "errors": 0}
+
+    text = render_metrics([view], stats)
+
+    assert '# TYPE foldify_jobs gauge' in text
+    assert 'foldify_jobs{target="default",tool="ESMFold",state="pending"} 1' in text
+    assert 'foldify_requested_gpus{target="default",tool="ESMFold",state="pending"} 1' in text
+    assert 'foldify_k8s_list_cache_requests_total{result="hits"} 3' in text
+
+def test_render_metrics_before_sync():
+    """Test that the gauges of a view which did not list the jobs and pods yet are not reported."""
+    view = make_view(jobs=[], pods=[])
+    view.synced.return_value = False
+
+    text = render_metrics([view], {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0})
+
+    assert 'foldify_job_view_synced{target="default"} 0' in text
+    assert "foldify_jobs{" not in text and "foldify_requested_gpus{" not in text
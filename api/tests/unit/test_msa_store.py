@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+from app.shared.common import get_input_path, get_msa_store_path
+from app.shared.msa_store import (AF3_MSA_PUBLISH_SCRIPT, get_chain_hash, get_af2_msa_dirs, get_af2_msa_commands,
+                                  get_af2_variant, get_store_dir, use_stored_af3_msas)
+
+AF2_JOB = {"proteinSequence": ">A\nMKV\n>B\nGGL\n>C\nmkv", "modelPreset": "multimer", "dbPreset": "full_dbs",
+           "uniref90": "u90", "mgnify": "mg", "reduced": "", "full": "f", "uniclust": "uc", "pdbdb": "p70",
+           "pdbseq": "ps", "uniprot": "up"}
+
+
+def test_af2_msa_dirs():
+    """Test the MSA directories of the unique chains of a multimer and of a monomer."""
+    assert get_af2_msa_dirs(AF2_JOB) == [("A", get_chain_hash("MKV")), ("B", get_chain_hash("GGL"))]
+    assert get_af2_msa_dirs(dict(AF2_JOB, modelPreset="monomer_ptm")) == [("", get_chain_hash("MKV"))]
+    assert get_af2_variant(AF2_JOB) != get_af2_variant(dict(AF2_JOB, modelPreset="monomer"))
+
+
+def test_af2_msa_commands(tmp_path):
+    """Test that stored chains are restored and the other chains published."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.msa_store.Config.MSA_STORE", True, create=True):
+        chain_hash = get_chain_hash("MKV")
+        os.makedirs(get_msa_store_path(get_store_dir("alphafold2", get_af2_variant(AF2_JOB)), chain_hash[:2], chain_hash))
+
+        restore_cmd, publish_cmd, restored = get_af2_msa_commands(AF2_JOB, "/mnt/output/guest/job")
+        assert restored
+        assert "/mnt/output/guest/job/msas/A" in restore_cmd and chain_hash in restore_cmd
+        assert "/mnt/output/guest/job/msas/B" in publish_cmd and get_chain_hash("GGL") in publish_cmd
+
+    assert get_af2_msa_commands(AF2_JOB, "/mnt/output/guest/job") == (None, None, False)
+
+
+def test_af3_msas(tmp_path):
+    """Test that the MSAs published by a job are added to the input of the next job with the same chain."""
+    data_json = tmp_path / "data.json"
+    msas = {"unpairedMsa": ">query\nMKV\n", "pairedMsa": "", "templates": []}
+    data_json.write_text(json.dumps({"sequences": [{"protein": dict(id="A", sequence="MKV", **msas)},
+                                                   {"ligand": {"id": "B", "ccdCodes": ["ATP"]}}]}))
+
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.msa_store.Config.MSA_STORE", True, create=True):
+        store_dir = get_msa_store_path(get_store_dir("alphafold3", "jackhmmer"))
+        subprocess.run([sys.executable, "-c", AF3_MSA_PUBLISH_SCRIPT, str(data_json), store_dir], check=True)
+
+        json_path = get_input_path("job2", "json", "guest")
+        os.makedirs(os.path.dirname(json_path))
+        with open(json_path, "w") as f:
+            json.dump({"name": "job2", "sequences": [{"protein": {"id": "A", "sequence": "mkv"}},
+                                                     {"protein": {"id": "B", "sequence": "GGL"}}]}, f)
+
+        # MMseqs2 needs all the chains stored
+        assert not use_stored_af3_msas({"name": "job2", "precomputedMSA": True}, "guest")
+        assert not use_stored_af3_msas({"name": "job2"}, "guest")
+        with open(json_path) as f:
+            sequences = json.load(f)["sequences"]
+        assert sequences[0]["protein"]["unpairedMsa"] == msas["unpairedMsa"]
+        assert "unpairedMsa" not in sequences[1]["protein"]
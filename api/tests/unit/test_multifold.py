@@ -0,0 +1,143 @@
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+import jwt
+from flask import jsonify
+
+from app.multifold.routes import MULTIFOLD_TOOLS
+from app.shared.delete import delete_job_files
+from app.shared.inflight import get_following_path
+from app.shared.job_groups import LISTING_GRACE, create_job_group, get_job_group, get_job_group_status
+from app.shared.job_state import record_job_event
+from app.shared.sequence_index import get_sequence_hash
+
+SUBMIT_URL = "/api/flask/multifold/submit"
+
+
+def test_multifold_submission(app, tmp_path):
+    """Test that the sequence is submitted to every selected tool and the submitted jobs are grouped."""
+    client = app.test_client()
+    esmfold = MagicMock(side_effect=lambda data, user, sequence_hash: (jsonify({"message": "Job submitted successfully."}), 200))
+    omegafold = MagicMock(side_effect=lambda data, user, sequence_hash: (jsonify({"error": "Job name already exists."}), 400))
+    alphafold3 = MagicMock(side_effect=lambda data, user: (jsonify({"message": "Job submitted successfully."}), 200))
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch.dict(MULTIFOLD_TOOLS, {"esmfold": ("EMF", esmfold), "omegafold": ("OMF", omegafold),
+                                         "alphafold3": ("AF3", alphafold3)}):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        response = client.post(SUBMIT_URL, json={
+            "jobName": "test", "sequence": "mkv ll\n", "email": "user@example.com", "makeResultsPublic": True,
+            "tools": {"esmfold": {"numRecycles": 4}, "omegafold": {}, "alphafold3": {"modelSeeds": [1]}},
+        })
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert {job["tool"]: job["success"] for job in body["jobs"]} == \
+            {"esmfold": True, "omegafold": False, "alphafold3": True}
+
+        esmfold_data, user = esmfold.call_args[0]
+        assert user == "guest_session1"
+        assert esmfold_data["jobName"] == "MULTIFOLD-test-EMF"
+        assert esmfold_data["proteinSequence"] == ">MULTIFOLD-test-EMF\nMKVLL\n"
+        assert esmfold_data["numRecycles"] == 4 and esmfold_data["makeResultsPublic"] is True
+        # The hash of the sequence is computed once for the group
+        assert esmfold.call_args[1]["sequence_hash"] == omegafold.call_args[1]["sequence_hash"] == \
+            get_sequence_hash(esmfold_data["proteinSequence"])
+        alphafold3_data = alphafold3.call_args[0][0]
+        assert alphafold3_data["name"] == "MULTIFOLD-test-AF3"
+        assert alphafold3_data["sequences"] == [{"protein": {"id": ["A"], "sequence": "MKVLL"}}]
+        assert alphafold3_data["public"] is True
+
+        group = get_job_group(body["groupId"], "guest_session1")
+        assert group["name"] == "MULTIFOLD-test"
+        assert sorted(member["job"] for member in group["members"]) == ["MULTIFOLD-test-AF3", "MULTIFOLD-test-EMF"]
+
+
+def test_multifold_validation(app, tmp_path):
+    """Test that invalid submissions are rejected before any tool is called."""
+    client = app.test_client()
+    esmfold = MagicMock()
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch.dict(MULTIFOLD_TOOLS, {"esmfold": ("EMF", esmfold)}):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        valid = {"jobName": "test", "sequence": "MKVLL", "email": "user@example.com", "tools": {"esmfold": {}}}
+
+        for invalid in [{"tools": {}}, {"tools": {"rosetta": {}}}, {"sequence": "MKV1L"},
+                        {"sequence": ">a\nMKVLL\n>b\nMKV"}, {"email": "user"}, {"jobName": "test job"}]:
+            response = client.post(SUBMIT_URL, json=dict(valid, **invalid))
+            assert response.status_code == 400, invalid
+        esmfold.assert_not_called()
+
+
+def test_job_group_status(app, tmp_path):
+    """Test the aggregated status of a group, its readiness and the models of the finished jobs."""
+    client = app.test_client()
+    members = [{"tool": "esmfold", "job": "MULTIFOLD-test-EMF"}, {"tool": "omegafold", "job": "MULTIFOLD-test-OMF"},
+               {"tool": "colabfold", "job": "MULTIFOLD-test-CBF"}]
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.job_groups.get_running_jobs", return_value=[["MULTIFOLD-test-CBF", "Running", "Queued"]]), \
+            patch("app.multifold.routes.get_aligned_multifold_structures", return_value={"MULTIFOLD-test-EMF": {}}) as align:
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        group_id = create_job_group("MULTIFOLD-test", members, "guest_session1")
+        for job_name, stage in [("MULTIFOLD-test-EMF", "archived"), ("MULTIFOLD-test-OMF", "failed")]:
+            record_job_event(job_name, "guest_session1", {"stage": "submitted", "job": f"{job_name.lower()}-abcde"})
+            record_job_event(job_name, "guest_session1", {"stage": stage})
+
+        body = client.get(f"/api/flask/multifold/group/{group_id}").get_json()
+        assert body["counts"] == {"done": 1, "running": 1, "failed": 1}
+        assert not body["ready"]
+
+        body = client.get(f"/api/flask/multifold/group/{group_id}/models").get_json()
+        align.assert_called_once_with(["MULTIFOLD-test-EMF"], "guest_session1")
+        assert body["pending"] == ["MULTIFOLD-test-CBF"] and body["failed"] == ["MULTIFOLD-test-OMF"]
+
+        # The group is ready once its last job finished
+        record_job_event("MULTIFOLD-test-CBF", "guest_session1", {"stage": "submitted", "job": "cbf-abcde"})
+        record_job_event("MULTIFOLD-test-CBF", "guest_session1", {"stage": "archived"})
+        assert get_job_group(group_id, "guest_session1")["readyAt"]
+        body = client.get(f"/api/flask/multifold/group/{group_id}?wait=10").get_json()
+        assert body["ready"] and body["counts"] == {"done": 2, "running": 0, "failed": 1}
+
+        delete_job_files("MULTIFOLD-test-OMF", "guest_session1")
+        assert [member["job"] for member in get_job_group(group_id, "guest_session1")["members"]] == \
+            ["MULTIFOLD-test-EMF", "MULTIFOLD-test-CBF"]
+        assert client.get("/api/flask/multifold/group/0123456789abcdef").status_code == 404
+
+
+def test_job_group_status_unknown(app, tmp_path):
+    """Test that members which cannot be found are not failed, so the group is not marked ready."""
+    members = [{"tool": "esmfold", "job": "MULTIFOLD-test-EMF"}, {"tool": "omegafold", "job": "MULTIFOLD-test-OMF"},
+               {"tool": "colabfold", "job": "MULTIFOLD-test-CBF"}]
+
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.job_groups.get_running_jobs", side_effect=Exception("API failure")):
+        group_id = create_job_group("MULTIFOLD-test", members, "guest_session1")
+        record_job_event("MULTIFOLD-test-EMF", "guest_session1", {"stage": "submitted", "job": "emf-abcde"})
+        record_job_event("MULTIFOLD-test-EMF", "guest_session1", {"stage": "archived"})
+        # Submitted just now, not listed yet
+        record_job_event("MULTIFOLD-test-OMF", "guest_session1", {"stage": "submitted", "job": "omf-abcde"})
+
+        status = get_job_group_status(get_job_group(group_id, "guest_session1"), "guest_session1")
+        assert status["counts"] == {"done": 1, "running": 2, "failed": 0} and not status["ready"]
+        assert not get_job_group(group_id, "guest_session1")["readyAt"]
+
+    # Once listed, a job submitted a while ago which is not listed failed, unless it follows an identical job
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.job_groups.get_running_jobs", return_value=[]), \
+            patch("app.shared.job_groups.time.time", return_value=time.time() + LISTING_GRACE + 1):
+        following_path = get_following_path("MULTIFOLD-test-CBF", "guest_session1")
+        os.makedirs(os.path.dirname(following_path))
+        with open(following_path, "w") as f:
+            f.write('{"user": "guest_other", "job": "leader"}')
+        status = get_job_group_status(get_job_group(group_id, "guest_session1"), "guest_session1")
+        assert status["counts"] == {"done": 1, "running": 1, "failed": 1} and not status["ready"]
+
+        os.remove(following_path)
+        status = get_job_group_status(get_job_group(group_id, "guest_session1"), "guest_session1")
+        assert status["counts"] == {"done": 1, "running": 0, "failed": 2} and status["ready"]
@@ -0,0 +1,167 @@
+from unittest.mock import MagicMock, patch
+from kubernetes import client
+
+from app.esmfold.utilities import create_job_object
+from app.shared import job_view, oom_retry
+from app.shared.gpu_capacity import get_required_gpu_products
+from app.shared.job_state import record_job_event, get_job_state
+from app.shared.oom_retry import (get_retry_job_name, get_stdout_oom_kind, escalate_job, resubmit_after_oom,
+                                  parse_memory, OomWatcher)
+
+TARGET = {"name": "default", "namespace": "ns", "pvcs": {"PVC_VOL1_ALPHAFOLD": "vol1", "PVC_VOL2": "vol2",
+                                                         "PVC_STORAGE": "storage"}}
+
+
+def make_esmfold_job(name="job1-abcde"):
+    job_config = {"uniquename": name, "simplename": "job1", "outputDir": "job1", "user": "guest_a",
+                  "input": "/mnt/input/guest_a/job1.fasta", "proteinSequence": ">job1\nMKV", "numRecycles": "3", "makeResultsPublic": "false",
+                  "email": "", "service": "ESMFold", "container": "esmfold:latest"}
+    job = create_job_object(job_config, "guest_a", TARGET)
+    job.metadata.labels = {"controller-uid": "uid", "job-name": name}
+    job.spec.selector = client.V1LabelSelector(match_labels={"controller-uid": "uid"})
+    return job
+
+
+def make_af3_launcher(name="af3-abcde"):
+    container = client.V1Container(name="alphafold3", image="af3:latest",
+                                   resources=client.V1ResourceRequirements(limits={"cpu": "1", "memory": "4Gi"}))
+    return client.V1Job(
+        metadata=client.V1ObjectMeta(name=name, annotations={"user": "guest_a", "simplename": "af3", "service": "AlphaFold3"}),
+        spec=client.V1JobSpec(template=client.V1PodTemplateSpec(spec=client.V1PodSpec(containers=[container]))))
+
+
+def make_oom_killed_pod(job_name, container="main"):
+    terminated = client.V1ContainerStateTerminated(exit_code=137, reason="OOMKilled")
+    status = client.V1ContainerStatus(name=container, image="", image_id="", ready=False, restart_count=0,
+                                      state=client.V1ContainerState(terminated=terminated))
+    return client.V1Pod(metadata=client.V1ObjectMeta(name=f"{job_name}-pod", uid=f"{job_name}-uid", labels={"job-name": job_name}),
+                        status=client.V1PodStatus(phase="Failed", container_statuses=[status]))
+
+
+def test_get_retry_job_name():
+    """Test the deterministic names of the attempts."""
+    assert get_retry_job_name("job1-abcde", 1) == "job1-abcde-r1"
+    assert get_retry_job_name("job1-abcde-r1", 2) == "job1-abcde-r2"
+    assert len(get_retry_job_name("a" * 63, 1)) == 63
+
+
+def test_get_stdout_oom_kind(tmp_path):
+    """Test the out-of-memory signatures of the job stdout."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        output = tmp_path / "output" / "guest_a" / "job1"
+        output.mkdir(parents=True)
+        assert get_stdout_oom_kind("job1", "guest_a") is None
+
+        (output / "stdout").write_text("Predicting...\ntorch.cuda.OutOfMemoryError: CUDA out of memory.\n")
+        assert get_stdout_oom_kind("job1", "guest_a") == "gpu"
+
+        (output / "stdout").write_text("Traceback\nMemoryError\n")
+        assert get_stdout_oom_kind("job1", "guest_a") == "memory"
+
+
+def test_escalate_job():
+    """Test the escalation ladders of the memory and GPU out-of-memory failures."""
+    job = make_esmfold_job()
+    with patch.object(oom_retry.Config, "OOM_MEMORY_TIERS", "128Gi,256Gi", create=True), \
+         patch.object(oom_retry.Config, "OOM_GPU_PRODUCTS", "NVIDIA-A40,NVIDIA-H100", create=True):
+        retry_job, change = escalate_job(job, "memory", {}, TARGET, 1)
+        assert change == "memory limit 128Gi -> 256Gi"
+        assert retry_job.metadata.name == "job1-abcde-r1"
+        assert retry_job.metadata.labels == {"job-name": "job1-abcde-r1"}
+        assert retry_job.metadata.annotations["attempt"] == "1"
+        assert retry_job.spec.selector is None
+        assert job.spec.template.spec.containers[0].resources.limits["memory"] == "128Gi"
+
+        # The 256Gi tier is the last one
+        assert escalate_job(retry_job, "memory", {}, TARGET, 2) == (None, None)
+
+        monitor = MagicMock()
+        monitor.get_node_product.return_value = "NVIDIA-A40"
+        with patch("app.shared.oom_retry.get_gpu_monitor", return_value=monitor):
+            retry_job, change = escalate_job(job, "gpu", {"pods": {"pod": {"node": "node-1"}}}, TARGET, 1)
+        assert get_required_gpu_products(retry_job.spec.template.spec) == ["NVIDIA-H100"]
+        # ESMFold already runs with unified memory and the H100 is the last product
+        assert escalate_job(retry_job, "gpu", {}, TARGET, 2) == (None, None)
+
+    # Without OOM_GPU_PRODUCTS no escalation changes a full GPU job with unified memory
+    with patch.object(oom_retry.Config, "OOM_GPU_PRODUCTS", "", create=True):
+        assert escalate_job(job, "gpu", {}, TARGET, 1) == (None, None)
+
+
+def test_escalate_alphafold3_job():
+    """Test that the AlphaFold 3 launcher is escalated only when it ran out of memory itself."""
+    job = make_af3_launcher()
+    with patch.object(oom_retry.Config, "OOM_MEMORY_TIERS", "128Gi,256Gi", create=True):
+        # A stage pod or a memory error in the stdout, the launcher container did not run out of memory
+        assert escalate_job(job, "memory", {}, TARGET, 1) == (None, None)
+
+        retry_job, change = escalate_job(job, "memory", {}, TARGET, 1, container="alphafold3")
+        assert change == "memory limit 4Gi -> 128Gi"
+
+    # The launcher passes the unified memory to its stage pods
+    retry_job, change = escalate_job(job, "gpu", {}, TARGET, 1)
+    assert change == "unified memory enabled"
+
+
+def test_resubmit_after_oom(tmp_path):
+    """Test that the job is resubmitted once per attempt and up to the retry limit."""
+    job = make_esmfold_job()
+    batch_api = MagicMock()
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+         patch.object(oom_retry.Config, "OOM_MAX_RETRIES", 1, create=True), \
+         patch.object(oom_retry.Config, "OOM_MEMORY_TIERS", "128Gi,256Gi", create=True), \
+         patch("app.shared.oom_retry.get_target", return_value=TARGET), \
+         patch("app.shared.oom_retry.read_job", return_value=job), \
+         patch("app.shared.oom_retry.get_batch_api", return_value=batch_api):
+        record_job_event("job1", "guest_a", {"stage": "submitted", "job": "job1-abcde", "service": "ESMFold"})
+
+        assert resubmit_after_oom("job1", "guest_a", "job1-old", "memory", "OOMKilled") is None
+        assert resubmit_after_oom("job1", "guest_a", "job1-abcde", "memory", "OOMKilled") == "job1-abcde-r1"
+        batch_api.create_namespaced_job.assert_called_once()
+
+        state = get_job_state("job1", "guest_a")
+        assert state["k8sJob"] == "job1-abcde-r1"
+        # The pod of the failed job does not send the failure email
+        assert (tmp_path / "output" / "guest_a" / "job1" / ".retry-job1-abcde").exists()
+        assert state["attempts"][0]["change"] == "memory limit 128Gi -> 256Gi"
+
+        # The retry limit is reached
+        assert resubmit_after_oom("job1", "guest_a", "job1-abcde-r1", "memory", "OOMKilled") is None
+        assert batch_api.create_namespaced_job.call_count == 1
+
+
+def test_parse_memory():
+    """Test the parsing of the memory quantities."""
+    assert parse_memory("131072Mi") == parse_memory("128Gi")
+    assert parse_memory(None) == 0
+
+
+def test_oom_watcher_stage_pod():
+    """Test that an OOMKilled AlphaFold 3 stage pod is attributed to its launcher job."""
+    launcher = make_af3_launcher()
+    view = MagicMock()
+    view.target = TARGET
+    view.get_job.side_effect = lambda name: launcher if name == launcher.metadata.name else None
+    view.jobs.return_value = [launcher]
+    watcher = OomWatcher(view)
+
+    with patch.object(oom_retry.Config, "OOM_MAX_RETRIES", 1, create=True), \
+         patch("app.shared.oom_retry.resubmit_after_oom") as resubmit:
+        watcher("MODIFIED", make_oom_killed_pod("af3-abcde-inference"))
+        resubmit.assert_called_once_with("af3", "guest_a", "af3-abcde", "memory", "pod af3-abcde-inference-pod OOMKilled",
+                                         view, None)
+
+        watcher("MODIFIED", make_oom_killed_pod("af3-abcde", container="alphafold3"))
+        assert resubmit.call_args.args[-1] == "alphafold3"
+
+        watcher("MODIFIED", make_oom_killed_pod("other-job"))
+        assert resubmit.call_count == 2
+
+
+def test_oom_watcher_needs_watch_jobs():
+    """Test that the views started by the monitoring routes do not resubmit jobs unless WATCH_JOBS is set."""
+    for watch_jobs in [False, True]:
+        with patch.object(job_view.Config, "WATCH_JOBS", watch_jobs, create=True), \
+                patch.object(job_view.JobView, "start"), patch.dict(job_view._views, clear=True):
+            view = job_view.get_job_view({"name": "default"})
+        assert any(isinstance(listener, OomWatcher) for listener in view._pod_listeners) is watch_jobs
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from app.shared.job_state import record_job_event, get_job_state
+from app.shared.pod_timeline import get_pod_timeline, get_timeline_durations, StartupLatency, TimelineRecorder
+
+NOW = 1_700_000_000
+
+
+def at(offset):
+    return datetime.fromtimestamp(NOW + offset, tz=timezone.utc)
+
+
+def make_condition(condition_type, offset):
+    condition = MagicMock()
+    condition.type = condition_type
+    condition.status = "True"
+    condition.last_transition_time = at(offset)
+    return condition
+
+
+def make_pod(job_name="job1-abcde", started=None, finished=None, node="gpu-node-1"):
+    pod = MagicMock()
+    pod.metadata.name = f"{job_name}-pod"
+    pod.metadata.uid = f"{job_name}-uid"
+    pod.metadata.labels = {"job-name": job_name}
+    pod.metadata.creation_timestamp = at(0)
+    pod.spec.node_name = node
+    pod.status.conditions = [make_condition("PodScheduled", 5), make_condition("PodReadyToStartContainers", 7)]
+    status = MagicMock()
+    status.state.running = None
+    status.state.terminated = None
+    if finished is not None:
+        status.state.terminated = MagicMock(started_at=at(started), finished_at=at(finished),
+                                            reason="Completed", exit_code=0)
+    elif started is not None:
+        status.state.running = MagicMock(started_at=at(started))
+    pod.status.container_statuses = [status]
+    return pod
+
+
+def make_view(jobs):
+    view = MagicMock()
+    view.target = {"name": "default"}
+    view.jobs.return_value = jobs
+    view.get_job.side_effect = lambda name: next((job for job in jobs if job.metadata.name == name), None)
+    return view
+
+
+def make_job(name, service, user="guest_a", simplename="job1"):
+    job = MagicMock()
+    job.metadata.name = name
+    job.metadata.annotations = {"user": user, "simplename": simplename, "service": service}
+    return job
+
+
+def test_get_pod_timeline():
+    """Test the timeline and the startup phases of a pod."""
+    pending = get_pod_timeline(make_pod())
+    assert pending == {"node": "gpu-node-1", "created": NOW, "scheduled": NOW + 5, "sandboxReady": NOW + 7}
+    assert get_timeline_durations(pending) == {"scheduling": 5}
+
+    finished = get_pod_timeline(make_pod(started=67, finished=600))
+    assert finished["started"] == NOW + 67 and finished["finished"] == NOW + 600
+    assert finished["reason"] == "Completed"
+    assert get_timeline_durations(finished) == {"scheduling": 5, "pull": 60, "startup": 67}
+
+
+def test_startup_latency_summary():
+    """Test the startup latency aggregated per tool and node."""
+    latency = StartupLatency()
+    for pull in [10, 20, 30, 40]:
+        latency.add("ESMFold", "gpu-node-1", {"scheduling": 1, "pull": pull, "startup": pull + 1})
+    latency.add("AlphaFold", "gpu-node-2", {"scheduling": 2})
+
+    summary = latency.summary()
+    assert summary["samples"] == 5
+    assert summary["tools"]["ESMFold"]["count"] == 4
+    assert summary["tools"]["ESMFold"]["pull"] == {"p50": 30, "p95": 40, "max": 40}
+    assert "pull" not in summary["nodes"]["gpu-node-2"]
+
+
+def test_timeline_recorder(tmp_path):
+    """Test that the pod timelines are recorded into the state of the owning job, including AlphaFold 3 stage pods."""
+    launcher = make_job("job1-abcde", "AlphaFold3")
+    view = make_view([launcher])
+    latency = StartupLatency()
+    recorder = TimelineRecorder(view, latency)
+
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        record_job_event("job1", "guest_a", {"stage": "submitted", "job": "job1-abcde", "service": "AlphaFold3"})
+
+        recorder("ADDED", make_pod())
+        recorder("MODIFIED", make_pod(started=67))
+        recorder("MODIFIED", make_pod(job_name="job1-abcde-inference", started=30))
+        recorder("MODIFIED", make_pod(job_name="other-job", started=30))
+
+        pods = get_job_state("job1", "guest_a")["pods"]
+        assert set(pods) == {"job1-abcde-pod", "job1-abcde-inference-pod"}
+        assert pods["job1-abcde-pod"]["started"] == NOW + 67
+
+    summary = latency.summary()
+    assert summary["samples"] == 2
+    assert summary["tools"]["AlphaFold3"]["count"] == 2
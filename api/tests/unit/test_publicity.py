@@ -0,0 +1,46 @@
+import os
+from unittest.mock import patch
+
+import jwt
+
+from app.shared.common import get_input_path, get_output_path
+
+SWITCH_URL = "/api/flask/result/switch_publicity"
+
+
+def create_job(job, user):
+    """Create the input and output files of a job."""
+    os.makedirs(get_output_path(job, user))
+    os.makedirs(os.path.dirname(get_input_path(job, "json", user)), exist_ok=True)
+    for file_type in ["json", "fasta"]:
+        with open(get_input_path(job, file_type, user), "w") as f:
+            f.write("{}")
+
+
+def test_switch_jobs_publicity(app, tmp_path):
+    """Test that the owned jobs of a bulk request are made public and private, the others are reported."""
+    client = app.test_client()
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+        for job in ["first", "second"]:
+            create_job(job, "guest_session1")
+        create_job("foreign", "guest_other")
+
+        response = client.post(SWITCH_URL, json={"jobs": ["first", "second", "foreign", "first"], "publicity": "Public"})
+        assert response.status_code == 200 and response.json["failed"] == 1
+        assert response.json["jobs"]["first"] == {"publicity": "Public"}
+        assert "error" in response.json["jobs"]["foreign"]
+        for job in ["first", "second"]:
+            assert os.path.realpath(get_output_path(job, "public")) == get_output_path(job, "guest_session1")
+            assert os.path.islink(get_input_path(job, "fasta", "public"))
+        assert not os.path.exists(get_output_path("foreign", "public"))
+
+        response = client.post(SWITCH_URL, json={"jobs": ["second"], "publicity": "Private"})
+        assert response.json["failed"] == 0
+        assert not os.path.lexists(get_input_path("second", "json", "public"))
+        assert os.path.islink(get_input_path("first", "json", "public"))
+
+        assert client.post(SWITCH_URL, json={"jobs": ["first"], "publicity": "Shared"}).status_code == 400
+        assert client.post(SWITCH_URL, json={"jobs": [], "publicity": "Public"}).status_code == 400
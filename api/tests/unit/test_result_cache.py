@@ -0,0 +1,102 @@
+import json
+import os
+import zipfile
+from unittest.mock import patch
+
+from app.shared.common import get_input_path, get_output_path
+from app.shared.job_info import set_jobs_publicity
+from app.shared.result_cache import (get_result_key, register_job_result, find_cached_result, link_cached_result,
+                                     remove_job_result)
+
+
+def make_job(job_name, user, sequence=">job\nMKVLL", public="false", allow_reuse="false", recycles="3"):
+    jobConfig = {"simplename": job_name, "user": user, "service": "ESMFold", "container": "esmfold:1",
+                 "proteinSequence": sequence, "makeResultsPublic": public, "forceComputation": False}
+    fileConfig = {"user": user, "name": job_name, "num_recycles": recycles, "public": public,
+                  "allowReuse": allow_reuse, "copies": "1", "service": "ESMFold"}
+    return jobConfig, fileConfig
+
+
+def submit(jobConfig, fileConfig, done=True):
+    """Write the input files and the outputs of a job, as if it ran."""
+    user, job_name = jobConfig["user"], jobConfig["simplename"]
+    json_path = get_input_path(job_name, "json", user)
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    with open(json_path, "w") as f:
+        json.dump(fileConfig, f)
+    register_job_result(jobConfig, fileConfig, user)
+
+    output_path = get_output_path(job_name, user)
+    os.makedirs(output_path, exist_ok=True)
+    with open(os.path.join(output_path, "job.pdb"), "w") as f:
+        f.write("ATOM")
+    if done:
+        open(os.path.join(output_path, "esmfold.done"), "a").close()
+
+
+def test_result_key():
+    """Test that the key ignores the formatting of the sequence and the settings not changing the result."""
+    _, fileConfig = make_job("a", "guest_a", public="true")
+    _, other_fileConfig = make_job("b", "guest_b", allow_reuse="true")
+    assert get_result_key("ESMFold", "esmfold:1", ">a\nMKV\nLL", fileConfig) == \
+        get_result_key("ESMFold", "esmfold:1", "mkvll", other_fileConfig)
+    assert get_result_key("ESMFold", "esmfold:1", "MKVLL", fileConfig) != \
+        get_result_key("ESMFold", "esmfold:2", "MKVLL", fileConfig)
+    assert get_result_key("ESMFold", "esmfold:1", "MKVLL", fileConfig) != \
+        get_result_key("ESMFold", "esmfold:1", "MKVLL", dict(fileConfig, num_recycles="6"))
+
+
+def test_find_cached_result(tmp_path):
+    """Test that only finished jobs shared by their owners are reused."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.result_cache.Config.RESULT_CACHE", True, create=True):
+        submit(*make_job("private", "guest_a"))
+        submit(*make_job("running", "guest_b", public="true"), done=False)
+        request = make_job("mine", "guest_c", sequence="mkvll")
+        assert find_cached_result(*request, "guest_c") is None
+
+        submit(*make_job("shared", "guest_d", allow_reuse="true"))
+        assert find_cached_result(*request, "guest_c") == ("guest_d", "shared")
+        assert find_cached_result(*make_job("mine", "guest_c", recycles="6"), "guest_c") is None
+
+        forced = make_job("mine", "guest_c")
+        forced[0]["forceComputation"] = True
+        assert find_cached_result(*forced, "guest_c") is None
+
+        # The files of the shared job itself are not given to the job reusing its result
+        shared_path = get_output_path("shared", "guest_d")
+        os.makedirs(os.path.join(shared_path, "models"))
+        for name in ["stdout", "runner.json", "download-secret.zip", ".retry-shared-abcde", os.path.join("models", "stdout")]:
+            open(os.path.join(shared_path, name), "w").close()
+
+        link_cached_result(("guest_d", "shared"), request[0], "guest_c")
+        output_path = get_output_path("mine", "guest_c")
+        assert os.path.samefile(os.path.join(output_path, "job.pdb"), os.path.join(shared_path, "job.pdb"))
+        archives = [name for name in os.listdir(output_path) if name.startswith("download-")]
+        assert sorted(set(os.listdir(output_path)) - set(archives)) == ["esmfold.done", "job.pdb", "models"]
+        assert len(archives) == 1 and archives[0] != "download-secret.zip"
+        with zipfile.ZipFile(os.path.join(output_path, archives[0])) as archive:
+            assert {"mine/job.pdb", "mine/models/stdout"} <= set(archive.namelist())
+            assert all(name.startswith("mine/") for name in archive.namelist())
+
+        remove_job_result("shared", "guest_d")
+        assert find_cached_result(*request, "guest_c") is None
+
+
+def test_publicity_changes_sharing(tmp_path):
+    """Test that the result of a job is reused while it is public, whatever its publicity at submission."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.result_cache.Config.RESULT_CACHE", True, create=True):
+        submit(*make_job("private", "guest_a"))
+        request = make_job("mine", "guest_c")
+        assert find_cached_result(*request, "guest_c") is None
+
+        assert set_jobs_publicity(["private"], "guest_a", "Public") == {"private": {"publicity": "Public"}}
+        assert find_cached_result(*request, "guest_c") == ("guest_a", "private")
+
+        set_jobs_publicity(["private"], "guest_a", "Private")
+        assert find_cached_result(*request, "guest_c") is None
+
+        # Submitted as public, made private since then: the public setting of the input is stale
+        submit(*make_job("public", "guest_b", public="true"))
+        assert find_cached_result(*request, "guest_c") is None
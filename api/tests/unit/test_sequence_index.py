@@ -0,0 +1,55 @@
+import os
+from unittest.mock import patch
+
+from app.shared.common import get_input_path
+from app.shared.sequence_index import (get_canonical_chains, get_sequence_hash, get_job_sequence_hash, add_job_sequence,
+                                       remove_job_sequence, find_jobs_with_sequence)
+
+
+def write_fasta(job_name, user, sequence):
+    path = get_input_path(job_name, "fasta", user)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(sequence)
+
+
+def test_canonical_sequence():
+    """Test that the formatting of the input does not change the hash, the chain order does."""
+    assert get_canonical_chains(">a\nMKV\nLL\n>b\nGG") == ["MKVLL", "GG"]
+    assert get_canonical_chains("mkv ll:gg\n") == ["MKVLL", "GG"]
+    assert get_sequence_hash(">job1\nMKVLL\n>job1\nGG\n") == get_sequence_hash(" mkv\nll :GG")
+    assert get_sequence_hash(">a\nMKVLL\n>b\nGG") != get_sequence_hash(">b\nGG\n>a\nMKVLL")
+    assert get_sequence_hash("MKVLLGG") != get_sequence_hash("MKVLL:GG")
+
+    # The hash of a job is computed once, or passed by the submission
+    jobConfig = {"proteinSequence": ">job\nMKVLL"}
+    sequence_hash = get_sequence_hash("MKVLL")
+    with patch("app.shared.sequence_index.get_canonical_chains", wraps=get_canonical_chains) as chains:
+        assert get_job_sequence_hash(jobConfig) == get_job_sequence_hash(jobConfig) == sequence_hash
+        assert get_job_sequence_hash({"proteinSequence": "MKVLL", "sequenceHash": "passed"}) == "passed"
+    assert chains.call_count == 1
+
+
+def test_find_jobs_with_sequence(tmp_path):
+    """Test the lookup of the jobs with the same sequence, including the jobs submitted before the index."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        write_fasta("old", "guest_a", ">old\nMKVLL")
+        write_fasta("new", "guest_a", "mkvll")
+        add_job_sequence("new", "guest_a", "mkvll")
+        write_fasta("other", "guest_b", ">other\nMKVLL")
+        add_job_sequence("other", "guest_b", ">other\nMKVLL")
+
+        assert list(find_jobs_with_sequence(">x\nMKV\nLL", "guest_a")) == ["new", "old"]
+        assert find_jobs_with_sequence(">x\nGG", "guest_a") == {}
+
+        # The recomputed job moves to its new sequence
+        add_job_sequence("new", "guest_a", "GG")
+        assert list(find_jobs_with_sequence("MKVLL", "guest_a")) == ["old"]
+        assert list(find_jobs_with_sequence("GG", "guest_a")) == ["new"]
+
+        remove_job_sequence("new", "guest_a")
+        assert find_jobs_with_sequence("GG", "guest_a") == {}
+
+        # Jobs whose input was removed are dropped
+        os.remove(get_input_path("old", "fasta", "guest_a"))
+        assert find_jobs_with_sequence("MKVLL", "guest_a") == {}
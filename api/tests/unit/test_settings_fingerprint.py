@@ -0,0 +1,50 @@
+import json
+import os
+from unittest.mock import patch
+
+from app.shared.common import get_input_path
+from app.shared.job_submitting import check_same_job_sequence, check_same_job_settings
+from app.shared.sequence_index import add_job_sequence
+from app.shared.settings_fingerprint import get_settings_fingerprint, is_current_fingerprint, normalize_setting_value
+
+
+def write_job(job_name, user, sequence, fileConfig):
+    for file_type, content in [("fasta", sequence), ("json", json.dumps(fileConfig))]:
+        path = get_input_path(job_name, file_type, user)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+
+def test_settings_fingerprint():
+    """Test that equivalent settings have the same fingerprint and the job name is ignored."""
+    fingerprint = get_settings_fingerprint({"name": "a", "num_recycles": "5", "public": "true",
+                                            "recycle_early_stop_tolerance": "0.0"})
+    assert is_current_fingerprint(fingerprint)
+    assert fingerprint == get_settings_fingerprint({"name": "b", "num_recycles": 5, "public": True,
+                                                    "recycle_early_stop_tolerance": 0})
+    assert fingerprint != get_settings_fingerprint({"name": "a", "num_recycles": "6", "public": "true",
+                                                    "recycle_early_stop_tolerance": "0.0"})
+    # Version-like strings of the other settings are not numbers
+    assert get_settings_fingerprint({"version": "1.10"}) != get_settings_fingerprint({"version": "1.1"})
+    assert normalize_setting_value({"num_seeds": "2.0", "modelSeeds": [1, "1.0"]}) == {"num_seeds": "2", "modelSeeds": ["1", "1.0"]}
+    assert not is_current_fingerprint("")
+    assert not is_current_fingerprint("v0:abc")
+
+
+def test_check_same_job_settings(tmp_path):
+    """Test the duplicate check of indexed jobs and of jobs indexed without a fingerprint."""
+    settings = {"user": "guest", "num_recycles": "3", "public": "false", "service": "ESMFold"}
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        write_job("indexed", "guest", ">indexed\nMKV", dict(settings, name="indexed"))
+        add_job_sequence("indexed", "guest", ">indexed\nMKV", get_settings_fingerprint(dict(settings, name="indexed")))
+        write_job("old", "guest", ">old\nMKV", dict(settings, name="old", num_recycles=3))
+
+        matching_sequence_jobs = check_same_job_sequence("MKV", "guest")
+        assert sorted(matching_sequence_jobs) == ["indexed", "old"]
+        assert check_same_job_settings(dict(settings, name="new"), matching_sequence_jobs, "guest") == ["indexed", "old"]
+        assert check_same_job_settings(dict(settings, name="new", num_recycles="6"), matching_sequence_jobs,
+                                       "guest") is None
+
+        # The fingerprint of the old job was stored in the index
+        assert is_current_fingerprint(check_same_job_sequence("MKV", "guest")["old"])
@@ -0,0 +1,89 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from app.shared.singleflight import SingleFlight
+
+
+def test_singleflight_caches_result():
+    """Test that results are reused within the TTL."""
+    flight = SingleFlight(ttl=60)
+    fn = MagicMock(return_value=["job-1"])
+
+    assert flight.do("jobs", fn) == ["job-1"]
+    assert flight.do("jobs", fn) == ["job-1"]
+    assert fn.call_count == 1
+    assert flight.stats()["hits"] == 1
+    assert flight.stats()["misses"] == 1
+
+    flight.invalidate()
+    flight.do("jobs", fn)
+    assert fn.call_count == 2
+
+def test_singleflight_coalesces_concurrent_calls():
+    """Test that concurrent callers share one in-flight call."""
+    flight = SingleFlight(ttl=0)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_list():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["job-1"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("jobs", slow_list)))
+    leader.start()
+    started.wait(5)
+
+    followers = [threading.Thread(target=lambda: results.append(flight.do("jobs", slow_list))) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    while flight.stats()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [["job-1"]] * 5
+    assert flight.stats()["coalesced"] == 4
+
+def test_singleflight_does_not_cache_errors():
+    """Test that a failed call is raised and not cached."""
+    flight = SingleFlight(ttl=60)
+    fn = MagicMock(side_effect=[Exception("API failure"), ["job-1"]])
+
+    with pytest.raises(Exception, match="API failure"):
+        flight.do("jobs", fn)
+    assert flight.do("jobs", fn) == ["job-1"]
+    assert flight.stats()["errors"] == 1
+
+def test_singleflight_drops_result_invalidated_in_flight():
+    """Test that a result computed before an invalidation is neither cached nor shared with later callers."""
+    flight = SingleFlight(ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def stale_list():
+        started.set()
+        release.wait(5)
+        return ["stale"]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("jobs", stale_list)))
+    leader.start()
+    started.wait(5)
+
+    flight.invalidate()
+    assert flight.do("jobs", lambda: ["fresh"]) == ["fresh"]
+    release.set()
+    leader.join(5)
+
+    assert results == [["stale"]]
+    assert flight.do("jobs", stale_list) == ["fresh"]
+    assert flight.stats()["in_flight"] == 0
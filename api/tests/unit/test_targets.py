@@ -0,0 +1,82 @@
+import json
+from unittest.mock import patch
+
+from app.shared.targets import parse_targets, target_can_mount, DEFAULT_TARGET_NAME
+from app.shared.placement import select_target, ALPHAFOLD_PVCS, ALPHAFOLD3_PVCS
+
+TARGETS = [
+    {"name": "a", "namespace": "ns-a", "capacity": 10,
+     "pvcs": {"PVC_VOL1_ALPHAFOLD": "vol1", "PVC_VOL2": "vol2", "PVC_STORAGE": "storage"}},
+    {"name": "b", "namespace": "ns-b", "capacity": 20,
+     "pvcs": {"PVC_VOL1_ALPHAFOLD": "vol1", "PVC_VOL1_ALPHAFOLD3": "vol1-af3", "PVC_VOL2": "vol2",
+              "PVC_STORAGE": "storage", "PVC_TMP": "tmp"}},
+]
+
+def test_parse_targets_default():
+    """Test the fallback to the single-cluster configuration."""
+    assert parse_targets("")[0]["name"] == DEFAULT_TARGET_NAME
+    assert parse_targets("not json")[0]["name"] == DEFAULT_TARGET_NAME
+    assert parse_targets("[]")[0]["name"] == DEFAULT_TARGET_NAME
+
+def test_parse_targets():
+    """Test parsing of the configured targets."""
+    targets = parse_targets(json.dumps(TARGETS + [{"name": "no-namespace"}]))
+
+    assert [target["name"] for target in targets] == ["a", "b"]
+    assert targets[0]["pvcs"]["PVC_VOL1_ALPHAFOLD3"] is None
+    assert targets[1]["capacity"] == 20
+
+def test_parse_targets_invalid_capacity(caplog):
+    """Test that targets with an invalid capacity are skipped with an error naming the target."""
+    invalid = [{"name": "c", "namespace": "ns-c", "capacity": "twenty"},
+               {"name": "d", "namespace": "ns-d", "capacity": -1},
+               {"name": "e", "namespace": "ns-e", "capacity": 1.5}]
+    targets = parse_targets(json.dumps(TARGETS + invalid + [{"name": "f", "namespace": "ns-f", "capacity": "5"}]))
+
+    assert [target["name"] for target in targets] == ["a", "b", "f"]
+    assert targets[2]["capacity"] == 5
+    assert "'c': capacity must be an integer, got 'twenty'" in caplog.text
+    assert "'d': capacity must not be negative" in caplog.text
+
+def test_target_can_mount():
+    """Test the PVC requirements of the tools."""
+    target_a, target_b = parse_targets(json.dumps(TARGETS))
+
+    assert target_can_mount(target_a, ALPHAFOLD_PVCS)
+    assert not target_can_mount(target_a, ALPHAFOLD3_PVCS)
+    assert target_can_mount(target_b, ALPHAFOLD3_PVCS)
+
+def test_select_target():
+    """Test the choice of the least-loaded target."""
+    targets = parse_targets(json.dumps(TARGETS))
+    active_jobs = {"a": 5, "b": 5}
+
+    with patch("app.shared.placement.load_targets", return_value=targets), \
+         patch("app.shared.placement.count_active_jobs", side_effect=lambda target: active_jobs[target["name"]]):
+        assert select_target(ALPHAFOLD_PVCS)["name"] == "b"
+        assert select_target(ALPHAFOLD3_PVCS)["name"] == "b"
+
+        active_jobs["b"] = 15
+        assert select_target(ALPHAFOLD_PVCS)["name"] == "a"
+
+def test_select_target_drained():
+    """Test that targets with capacity 0 get no jobs."""
+    targets = parse_targets(json.dumps([dict(TARGETS[0], capacity=0), TARGETS[1]]))
+
+    with patch("app.shared.placement.load_targets", return_value=targets), \
+         patch("app.shared.placement.count_active_jobs", return_value=0):
+        assert select_target(ALPHAFOLD_PVCS)["name"] == "b"
+
+    with patch("app.shared.placement.load_targets", return_value=targets[:1]):
+        assert select_target(ALPHAFOLD_PVCS) is None
+
+def test_select_target_unreachable():
+    """Test that unreachable targets are skipped and missing databases are reported."""
+    targets = parse_targets(json.dumps(TARGETS))
+
+    with patch("app.shared.placement.load_targets", return_value=targets), \
+         patch("app.shared.placement.count_active_jobs", side_effect=lambda target: None if target["name"] == "b" else 3):
+        assert select_target(ALPHAFOLD_PVCS)["name"] == "a"
+
+    with patch("app.shared.placement.load_targets", return_value=targets[:1]):
+        assert select_target(ALPHAFOLD3_PVCS) is None
@@ -0,0 +1,95 @@
+import hashlib
+import io
+import os
+import time
+from unittest.mock import patch
+
+import jwt
+
+from app.alphafold3.v1_submission import save_ccd_file, save_json_input
+from app.shared.uploads import UPLOAD_TTL, create_upload, get_upload_dir, get_upload_part_path, remove_stale_uploads, \
+    save_stream_atomic, write_upload_chunk
+
+UPLOAD_URL = "/api/flask/alphafold3/v1/upload"
+
+
+def test_chunked_upload(app, tmp_path):
+    """Test that an interrupted upload resumes from the received offset and is moved to the input directory when verified."""
+    client = app.test_client()
+    content = b"data_ccd\n" * 1000
+    checksum = hashlib.sha256(content).hexdigest()
+
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+
+        response = client.post(UPLOAD_URL, json={"kind": "ccd", "size": len(content), "sha256": checksum})
+        assert response.status_code == 201
+        upload_id = response.json["uploadId"]
+
+        response = client.put(f"{UPLOAD_URL}/{upload_id}", data=content[:4000], headers={"Upload-Offset": "0"})
+        assert response.json["received"] == 4000
+
+        # A retried chunk at a stale offset is rejected with the offset to resume from
+        response = client.put(f"{UPLOAD_URL}/{upload_id}", data=content[:4000], headers={"Upload-Offset": "0"})
+        assert response.status_code == 409 and response.json["received"] == 4000
+        assert client.get(f"{UPLOAD_URL}/{upload_id}").json["received"] == 4000
+
+        response = client.put(f"{UPLOAD_URL}/{upload_id}", data=content[4000:] + b"extra", headers={"Upload-Offset": "4000"})
+        assert response.status_code == 413
+        response = client.put(f"{UPLOAD_URL}/{upload_id}", data=content[4000:], headers={"Upload-Offset": "4000"})
+        assert response.json["received"] == len(content)
+
+        with app.test_request_context():
+            assert save_ccd_file(None, "job", "guest_session1", upload_id) is None
+
+        saved = [os.path.join(root, name) for root, _, names in os.walk(tmp_path) for name in names if name == "job-ccd.cif"]
+        assert len(saved) == 1
+        with open(saved[0], "rb") as f:
+            assert f.read() == content
+        assert client.get(f"{UPLOAD_URL}/{upload_id}").status_code == 404
+
+
+def test_upload_checksum_and_limits(app, tmp_path):
+    """Test that a corrupted upload is not committed and that oversized files are refused."""
+    client = app.test_client()
+    with patch.dict(os.environ, {"SESSION_SECRET": "secret"}), \
+            patch("app.shared.common.get_working_directory", return_value=str(tmp_path)), \
+            patch("app.shared.uploads.get_max_upload_size", return_value=100):
+        client.set_cookie("session", jwt.encode({"sessionId": "session1"}, "secret", algorithm="HS256"))
+
+        response = client.post(UPLOAD_URL, json={"kind": "json", "size": 101, "sha256": "0" * 64})
+        assert response.status_code == 413
+
+        response = client.post(UPLOAD_URL, json={"kind": "json", "size": 2, "sha256": "0" * 64})
+        upload_id = response.json["uploadId"]
+        client.put(f"{UPLOAD_URL}/{upload_id}", data=b"{}", headers={"Upload-Offset": "0"})
+
+        with app.test_request_context():
+            response, status_code = save_json_input(None, {"name": "job"}, "guest_session1", upload_id)
+        assert status_code == 422
+
+        assert save_stream_atomic(io.BytesIO(b"x" * 50), str(tmp_path / "small")) is None
+        with app.test_request_context():
+            assert save_stream_atomic(io.BytesIO(b"x" * 150), str(tmp_path / "large"))[1] == 413
+        assert sorted(os.listdir(tmp_path)) == ["index", "small"]
+
+
+def test_remove_stale_uploads(tmp_path):
+    """Test that an upload still receiving chunks is kept, even when its directory is old, and an idle one is removed."""
+    with patch("app.shared.common.get_working_directory", return_value=str(tmp_path)):
+        active = create_upload("guest_a", "ccd", 10, "0" * 64)[0]
+        idle = create_upload("guest_a", "ccd", 10, "0" * 64)[0]
+        write_upload_chunk("guest_a", active, 0, io.BytesIO(b"data"))
+
+        old = time.time() - UPLOAD_TTL - 60
+        for upload_id in [active, idle]:
+            for name in os.listdir(get_upload_dir("guest_a", upload_id)):
+                os.utime(os.path.join(get_upload_dir("guest_a", upload_id), name), (old, old))
+            os.utime(get_upload_dir("guest_a", upload_id), (old, old))
+        # The last chunk of the active upload
+        os.utime(get_upload_part_path("guest_a", active))
+
+        remove_stale_uploads("guest_a")
+        assert os.path.isdir(get_upload_dir("guest_a", active))
+        assert not os.path.exists(get_upload_dir("guest_a", idle))
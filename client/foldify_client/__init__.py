@@ -0,0 +1,4 @@
+from foldify_client.client import FoldifyClient, FoldifyError
+from foldify_client.manifest import BatchManifest, run_batch
+
+__all__ = ["FoldifyClient", "FoldifyError", "BatchManifest", "run_batch"]
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from urllib.parse import quote
+
+import httpx
+
+from foldify_client.routes import API_PREFIX, ROUTES, SUBMIT_ROUTES
+
+# Responses worth another try: the API is overloaded or no cluster is available right now
+RETRY_STATUSES = {429, 502, 503, 504}
+# Block size of the reads hashing an uploaded file and of the streamed downloads
+BLOCK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class FoldifyError(Exception):
+    """Error response of the Foldify API."""
+
+    def __init__(self, status, message, body=None):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+        self.body = body
+
+
+def get_job_name(tool, data):
+    """Return the name of the job submitted with the data, AlphaFold 3 names it in its input JSON."""
+    return data["name"] if tool == "AlphaFold3" else data["jobName"]
+
+
+def get_file_checksum(path):
+    """Return the sha256 digest of the file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_error_message(response):
+    """Return the error message of the API response, the API answers errors with {"error": ...}."""
+    try:
+        body = response.json()
+    except ValueError:
+        return response.text or response.reason_phrase, None
+    if isinstance(body, dict):
+        return str(body.get("error") or body.get("message") or body), body
+    return str(body), body
+
+
+class FoldifyClient:
+    """
+    Asynchronous client of the Foldify API.
+
+    All the requests share one pool of connections, and at most max_concurrency of them run at once,
+    so thousands of submissions can be started together without flooding the API. The session token
+    is the JWT of the anonymous session, the "session" cookie of the web application.
+
+        async with FoldifyClient("https://foldify.example.org", token) as foldify:
+            await foldify.submit("ESMFold", {"jobName": "test", ...})
+    """
+
+    def __init__(self, base_url, session_token, max_concurrency=8, max_connections=16, timeout=60.0,
+                 retries=3, retry_delay=1.0, transport=None):
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            cookies={"session": session_token},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            transport=transport,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        await self.http.aclose()
+
+    @staticmethod
+    def get_url(route, **path_params):
+        """Return the path of the API route with its path parameters, e.g. get_url("result", job_name="test")."""
+        method, path = ROUTES[route]
+        return API_PREFIX + path.format(**{key: quote(str(value), safe="") for key, value in path_params.items()})
+
+    async def send(self, route, path_params, stream=False, **kwargs):
+        """Send the request of the route, retried on connection errors and overloaded responses."""
+        method = ROUTES[route][0]
+        url = self.get_url(route, **path_params)
+        for attempt in range(self.retries + 1):
+            try:
+                request = self.http.build_request(method, url, **kwargs)
+                response = await self.http.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # The request never reached the API, it is safe to send it again
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"{method} {url} failed ({e}), retrying.")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return response
+                await response.aclose()
+                logger.warning(f"{method} {url} answered {response.status_code}, retrying.")
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    async def request(self, route, path_params=None, **kwargs):
+        """
+        Call the API route and return its JSON response, raises FoldifyError for error responses.
+        The keyword arguments are those of httpx (json, data, files, content, headers, params).
+        """
+        async with self.semaphore:
+            response = await self.send(route, path_params or {}, **kwargs)
+        if response.status_code >= 400:
+            message, body = get_error_message(response)
+            raise FoldifyError(response.status_code, message, body)
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    async def download(self, route, dest, path_params=None, **kwargs):
+        """
+        Stream the file returned by the API route to the dest path, through a temporary file next to it,
+        so an interrupted download never leaves a partial file. Returns the path.
+        """
+        directory = os.path.dirname(os.path.abspath(dest))
+        os.makedirs(directory, exist_ok=True)
+        async with self.semaphore:
+            response = await self.send(route, path_params or {}, stream=True, **kwargs)
+            try:
+                if response.status_code >= 400:
+                    await response.aread()
+                    message, body = get_error_message(response)
+                    raise FoldifyError(response.status_code, message, body)
+
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".download-")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        async for block in response.aiter_bytes(BLOCK_SIZE):
+                            f.write(block)
+                    os.replace(tmp_path, dest)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+            finally:
+                await response.aclose()
+        return dest
+
+    async def upload_file(self, path, kind):
+        """
+        Upload the CCD or JSON file ("ccd" or "json") of an AlphaFold 3 job in chunks, resumed from
+        the offset the API has received after an interrupted chunk. Returns the upload ID.
+        """
+        size = os.path.getsize(path)
+        upload = await self.request("upload_start", json={"kind": kind, "size": size, "sha256": get_file_checksum(path)})
+        upload_id, received = upload["uploadId"], upload["received"]
+        chunk_size = upload.get("chunkSize") or 8 * BLOCK_SIZE
+
+        with open(path, "rb") as f:
+            while received < size:
+                f.seek(received)
+                chunk = f.read(chunk_size)
+                try:
+                    status = await self.request("upload_chunk", {"upload_id": upload_id}, content=chunk,
+                                                headers={"Upload-Offset": str(received)})
+                except (httpx.TransportError, FoldifyError) as e:
+                    if isinstance(e, FoldifyError) and e.status != 409:
+                        raise
+                    # Resume from what the API has received
+                    status = await self.request("upload_status", {"upload_id": upload_id})
+                received = status["received"]
+        return upload_id
+
+    async def submit(self, tool, data, ccd_path=None):
+        """
+        Submit a job of the tool ("AlphaFold", "AlphaFold3", "ColabFold", "ESMFold" or "OmegaFold")
+        with the data the web forms send. The CCD file of an AlphaFold 3 job is uploaded first.
+        """
+        if tool not in SUBMIT_ROUTES:
+            raise ValueError(f"Unknown tool: {tool}")
+        if tool != "AlphaFold3":
+            return await self.request(SUBMIT_ROUTES[tool], json=data)
+
+        if ccd_path:
+            data = dict(data, userCCDUploadId=await self.upload_file(ccd_path, "ccd"))
+        return await self.request("alphafold3_submit", data={"data": json.dumps(data)})
+
+    async def submit_alphafold3_json(self, settings, json_path, ccd_path=None):
+        """Submit an AlphaFold 3 job from its input JSON file, with the computation settings (name, email, public, ...)."""
+        settings = dict(settings, jsonUploadId=await self.upload_file(json_path, "json"))
+        if ccd_path:
+            settings["userCCDUploadId"] = await self.upload_file(ccd_path, "ccd")
+        return await self.request("alphafold3_submit_json", data={"data": json.dumps(settings)})
+
+    async def submit_many(self, jobs):
+        """
+        Submit the (tool, data) jobs concurrently, bounded by the concurrency of the client.
+        Returns the response or the FoldifyError of each job, in their order.
+        """
+        async def submit_job(tool, data):
+            try:
+                return await self.submit(tool, data)
+            except FoldifyError as e:
+                return e
+
+        return await asyncio.gather(*(submit_job(tool, data) for tool, data in jobs))
+
+    async def submit_multifold(self, data):
+        """Submit the sequence to several tools at once, returns the group ID and the jobs of the tools."""
+        return await self.request("multifold_submit", json=data)
+
+    async def group(self, group_id, wait=None):
+        """Return the status of the job group, waiting up to wait seconds for it to become ready."""
+        params = {"wait": wait} if wait else None
+        return await self.request("multifold_group", {"group_id": group_id}, params=params)
+
+    async def jobs(self):
+        """Return the status of all the jobs of the user by name ("Success", "Failed" or the state of a running job)."""
+        response = await self.request("user_jobs")
+        return {job[1]: job[5] for job in response["jobs"]}
+
+    async def result(self, job_name):
+        """Return the basic result info of the job."""
+        return await self.request("result", {"job_name": job_name})
+
+    async def clone(self, job_name, new_name, settings=None):
+        """Submit a copy of the job under a new name with some of its settings changed."""
+        return await self.request("clone_job", {"job_name": job_name}, json={"jobName": new_name, "settings": settings or {}})
+
+    async def set_publicity(self, job_names, publicity):
+        """Set the publicity ("Public" or "Private") of the jobs, returns the result of each job."""
+        return await self.request("set_publicity", json={"jobs": list(job_names), "publicity": publicity})
+
+    async def delete(self, job_name):
+        """Delete the job and its files."""
+        return await self.request("delete_job", {"job_name": job_name})
+
+    async def download_zip(self, job_name, dest):
+        """Stream the archive of the job outputs to the dest path."""
+        return await self.download("download_zip", dest, {"job_name": job_name})
+
+    async def download_output(self, job_name, file_name, service, dest):
+        """Stream an output file of the job to the dest path, service is the one of the job, e.g. "Alphafold3"."""
+        return await self.download("download_output", dest, {"job_name": job_name, "file_name": file_name, "service": service})
+
+    async def download_input(self, job_name, file_type, dest):
+        """Stream an input file ("fasta", "json" or "cif") of the job to the dest path."""
+        return await self.download("download_input", dest, {"job_name": job_name, "file_type": file_type})
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from foldify_client.client import FoldifyError, get_job_name
+
+# States of a job of the batch, in their order
+PENDING, SUBMITTING, SUBMITTED, DONE, FAILED, DOWNLOADED = "pending", "submitting", "submitted", "done", "failed", "downloaded"
+
+# Least time between two saves of the manifest while the jobs are submitted
+SAVE_INTERVAL = 1.0
+# Polls a finished job is tried to be downloaded at, its archive is written shortly before it finishes
+DOWNLOAD_ATTEMPTS = 5
+# Polls in a row a job must be reported failed at to count as failed, a failure may not be final
+# (e.g. the API resubmits a job which ran out of memory)
+FAILED_POLLS = 3
+# Error of the jobs which failed on the API, they are polled again when the batch is resumed
+JOB_FAILED_ERROR = "The job failed."
+
+logger = logging.getLogger(__name__)
+
+
+class BatchManifest:
+    """
+    JSON file with the jobs of a batch and the state of each of them, saved as the batch advances,
+    so a batch interrupted at any point is resumed by running it again with the same manifest.
+    """
+
+    def __init__(self, path, jobs=None):
+        self.path = path
+        self.jobs = jobs or {}
+        self.saved_at = 0.0
+
+    @classmethod
+    def open(cls, path):
+        """Load the manifest from the path, or start an empty one."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        return cls(path, {job["name"]: job for job in data["jobs"]})
+
+    def add(self, tool, data):
+        """Add a job of the tool to the batch, a job already in it is kept with its state. Returns the job name."""
+        name = get_job_name(tool, data)
+        if name not in self.jobs:
+            self.jobs[name] = {"name": name, "tool": tool, "data": data, "state": PENDING}
+        return name
+
+    def with_state(self, *states):
+        """Return the jobs in the states."""
+        return [job for job in self.jobs.values() if job["state"] in states]
+
+    def set_state(self, job, state, error=None):
+        """Move the job to the state, with the error of a failed job."""
+        job["state"] = state
+        if error is None:
+            job.pop("error", None)
+        else:
+            job["error"] = error
+
+    def save(self, force=True):
+        """Write the manifest atomically, unless it was written less than SAVE_INTERVAL ago and not forced."""
+        if not force and time.monotonic() - self.saved_at < SAVE_INTERVAL:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"jobs": list(self.jobs.values())}, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.saved_at = time.monotonic()
+
+    def summary(self):
+        """Return the number of jobs in each state."""
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        return counts
+
+
+async def submit_jobs(client, manifest, chunk_size):
+    """
+    Submit the pending jobs of the manifest in chunks. The jobs of a chunk are saved as submitting before
+    they are sent, after an interruption the API rejecting their name means they were submitted.
+    """
+    async def submit_job(job):
+        try:
+            await client.submit(job["tool"], job["data"])
+            manifest.set_state(job, SUBMITTED)
+        except FoldifyError as e:
+            if job["state"] == SUBMITTING and e.status == 400 and "already exists" in e.message:
+                manifest.set_state(job, SUBMITTED)
+            else:
+                logger.error(f"Job {job['name']} was not submitted: {e}")
+                manifest.set_state(job, FAILED, e.message)
+        manifest.save(force=False)
+
+    # Jobs interrupted while submitting are sent again first
+    jobs = manifest.with_state(SUBMITTING) + manifest.with_state(PENDING)
+    for start in range(0, len(jobs), chunk_size):
+        chunk = jobs[start:start + chunk_size]
+        for job in chunk:
+            if job["state"] == PENDING:
+                job["state"] = SUBMITTING
+        manifest.save()
+        await asyncio.gather(*(submit_job(job) for job in chunk))
+    manifest.save()
+
+
+async def download_jobs(client, manifest, download_dir):
+    """Stream the output archives of the finished jobs to the download directory."""
+    async def download_job(job):
+        try:
+            await client.download_zip(job["name"], os.path.join(download_dir, f"{job['name']}.zip"))
+            manifest.set_state(job, DOWNLOADED)
+        except FoldifyError as e:
+            # The archive may still be written, the download is tried again at the next poll
+            job["downloadAttempts"] = job.get("downloadAttempts", 0) + 1
+            logger.warning(f"Outputs of job {job['name']} were not downloaded: {e}")
+            if job["downloadAttempts"] >= DOWNLOAD_ATTEMPTS:
+                manifest.set_state(job, FAILED, f"The outputs were not downloaded: {e.message}")
+        manifest.save(force=False)
+
+    await asyncio.gather(*(download_job(job) for job in manifest.with_state(DONE)))
+    manifest.save()
+
+
+async def run_batch(client, manifest, download_dir=None, poll_interval=30.0, chunk_size=100):
+    """
+    Submit the pending jobs of the manifest, poll their states until they finish and download
+    the archives of the successful ones to download_dir (when given). Resumes an interrupted batch
+    from the states saved in the manifest, the jobs which failed on the API are polled again.
+    Returns the number of jobs in each state.
+
+    All the jobs of the user are polled with one request, whatever the size of the batch.
+    """
+    # Jobs failed on the API may have been resubmitted since the last run
+    for job in manifest.with_state(FAILED):
+        if job.get("error") == JOB_FAILED_ERROR:
+            manifest.set_state(job, SUBMITTED)
+
+    await submit_jobs(client, manifest, chunk_size)
+
+    while True:
+        if download_dir:
+            await download_jobs(client, manifest, download_dir)
+
+        submitted = manifest.with_state(SUBMITTED)
+        if not submitted and not (download_dir and manifest.with_state(DONE)):
+            break
+        await asyncio.sleep(poll_interval)
+
+        statuses = await client.jobs()
+        for job in submitted:
+            status = statuses.get(job["name"])
+            if status == "Failed":
+                job["failedPolls"] = job.get("failedPolls", 0) + 1
+            else:
+                job.pop("failedPolls", None)
+            if status == "Success":
+                manifest.set_state(job, DONE)
+            elif job.get("failedPolls", 0) >= FAILED_POLLS:
+                job.pop("failedPolls")
+                manifest.set_state(job, FAILED, JOB_FAILED_ERROR)
+        manifest.save()
+
+    return manifest.summary()
@@ -0,0 +1,63 @@
+"""
+Routes of the Foldify API used by the client, as (method, path) with the path parameters in braces.
+
+The table mirrors the Flask routes of the API (api/app), tests/unit/test_client_routes.py of the API
+fails when a route changes or a new user route is not added here. The module has no dependencies,
+so the API tests load it without the client requirements.
+"""
+
+API_PREFIX = "/api/flask"
+
+ROUTES = {
+    # Submission
+    "alphafold_submit": ("POST", "/alphafold/submit"),
+    "alphafold_submit_batch": ("POST", "/alphafold/submit/batch"),
+    "alphafold3_submit": ("POST", "/alphafold3/v1/submit"),
+    "alphafold3_submit_json": ("POST", "/alphafold3/v1/submit/json"),
+    "colabfold_submit": ("POST", "/colabfold/submit"),
+    "esmfold_submit": ("POST", "/esmfold/submit"),
+    "omegafold_submit": ("POST", "/omegafold/submit"),
+    "multifold_submit": ("POST", "/multifold/submit"),
+
+    # Chunked uploads of the AlphaFold 3 CCD and JSON input files
+    "upload_start": ("POST", "/alphafold3/v1/upload"),
+    "upload_status": ("GET", "/alphafold3/v1/upload/{upload_id}"),
+    "upload_chunk": ("PUT", "/alphafold3/v1/upload/{upload_id}"),
+    "upload_cancel": ("DELETE", "/alphafold3/v1/upload/{upload_id}"),
+
+    # Jobs
+    "user_jobs": ("GET", "/dashboard/user_jobs"),
+    "public_jobs": ("GET", "/dashboard/public_jobs"),
+    "delete_job": ("DELETE", "/dashboard/delete/{job_name}"),
+    "delete_jobs": ("DELETE", "/dashboard/delete_multiple/{job_names}"),
+    "clone_job": ("POST", "/dashboard/clone/{job_name}"),
+    "multifold_group": ("GET", "/multifold/group/{group_id}"),
+    "multifold_group_models": ("GET", "/multifold/group/{group_id}/models"),
+
+    # Results
+    "result": ("GET", "/result/{job_name}"),
+    "result_stdout": ("GET", "/result/{job_name}/stdout"),
+    "result_molstar_url": ("GET", "/result/{job_name}/molstar_url"),
+    "result_model": ("GET", "/result/{job_name}/model"),
+    "result_plddt": ("GET", "/result/{job_name}/plddt"),
+    "result_sequence": ("GET", "/result/{job_name}/sequence"),
+    "result_files": ("GET", "/result/{job_name}/files"),
+    "result_multi_models": ("GET", "/result/multi/{job_names}/models"),
+    "switch_publicity": ("GET", "/result/switch_publicity/{job_name}"),
+    "set_publicity": ("POST", "/result/switch_publicity"),
+
+    # Downloads
+    "zip_available": ("GET", "/download/zip_available/{job_name}"),
+    "download_zip": ("POST", "/download/download_zip/{job_name}"),
+    "download_output": ("GET", "/download/{job_name}/output/{file_name}/{service}"),
+    "download_input": ("GET", "/download/{job_name}/input/{file_type}"),
+}
+
+# Submission route of each tool, the tool names are those of the API
+SUBMIT_ROUTES = {
+    "AlphaFold": "alphafold_submit",
+    "AlphaFold3": "alphafold3_submit",
+    "ColabFold": "colabfold_submit",
+    "ESMFold": "esmfold_submit",
+    "OmegaFold": "omegafold_submit",
+}
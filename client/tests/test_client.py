@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+import pytest
+
+from foldify_client import BatchManifest, FoldifyClient, FoldifyError, run_batch
+from foldify_client.manifest import FAILED_POLLS, SUBMITTING
+
+
+class FakeAPI:
+    """Handler of the mock transport answering like the Foldify API."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.uploads = {}
+        self.unavailable = 0
+        # Polls at which a job is reported failed before its status, e.g. before the API resubmitted it
+        self.transient_failures = {}
+        self.requests = []
+
+    def __call__(self, request):
+        path = request.url.path
+        self.requests.append((request.method, path))
+        assert request.headers["cookie"] == "session=token"
+
+        if path.endswith("/submit") and self.unavailable:
+            self.unavailable -= 1
+            return httpx.Response(503, json={"error": "No Kubernetes cluster is available for this tool."})
+        if path == "/api/flask/esmfold/submit":
+            name = json.loads(request.content)["jobName"]
+            if name in self.jobs:
+                return httpx.Response(400, json={"error": "Job with this name already exists. Please choose a different name."})
+            self.jobs[name] = "Running"
+            return httpx.Response(200, json={"message": f'Job "{name}" created successfully.'})
+        if path == "/api/flask/dashboard/user_jobs":
+            jobs = []
+            for name, status in self.jobs.items():
+                if self.transient_failures.get(name):
+                    self.transient_failures[name] -= 1
+                    status = "Failed"
+                jobs.append([False, name, "ESMFold", "", "", status])
+            return httpx.Response(200, json={"jobs": jobs})
+        if path.startswith("/api/flask/download/download_zip/"):
+            return httpx.Response(200, content=b"zip:" + path.rsplit("/", 1)[1].encode())
+        if path == "/api/flask/alphafold3/v1/upload":
+            self.uploads["u1"] = b""
+            return httpx.Response(201, json={"uploadId": "u1", "received": 0, "chunkSize": 4})
+        if path == "/api/flask/alphafold3/v1/upload/u1":
+            if request.method == "GET":
+                return httpx.Response(200, json={"received": len(self.uploads["u1"])})
+            if int(request.headers["Upload-Offset"]) != len(self.uploads["u1"]):
+                return httpx.Response(409, json={"error": "Offset mismatch.", "received": len(self.uploads["u1"])})
+            self.uploads["u1"] += request.content
+            return httpx.Response(200, json={"received": len(self.uploads["u1"])})
+        if path == "/api/flask/alphafold3/v1/submit":
+            return httpx.Response(200, json={"data": dict(httpx.QueryParams(request.content.decode()))["data"]})
+        return httpx.Response(404, json={"error": "Not found."})
+
+
+def create_client(api):
+    return FoldifyClient("http://foldify", "token", retry_delay=0, transport=httpx.MockTransport(api))
+
+
+def test_get_url():
+    """Test that the path parameters of the routes are escaped."""
+    assert FoldifyClient.get_url("result", job_name="a b/c") == "/api/flask/result/a%20b%2Fc"
+
+
+def test_submit_retries_unavailable_api(tmp_path):
+    """Test that a submission is retried while the API is unavailable and errors are raised with their message."""
+    api = FakeAPI()
+    api.unavailable = 2
+
+    async def run():
+        async with create_client(api) as foldify:
+            await foldify.submit("ESMFold", {"jobName": "first"})
+            with pytest.raises(FoldifyError) as error:
+                await foldify.submit("ESMFold", {"jobName": "first"})
+            assert error.value.status == 400 and "already exists" in error.value.message
+
+            await foldify.download_zip("first", tmp_path / "first.zip")
+
+    asyncio.run(run())
+    assert api.requests.count(("POST", "/api/flask/esmfold/submit")) == 4
+    assert (tmp_path / "first.zip").read_bytes() == b"zip:first"
+    assert [path.name for path in tmp_path.iterdir()] == ["first.zip"]
+
+
+def test_chunked_upload(tmp_path):
+    """Test that the CCD file of an AlphaFold 3 job is uploaded in chunks before the job is submitted."""
+    api = FakeAPI()
+    ccd_path = tmp_path / "ligand.cif"
+    ccd_path.write_bytes(b"data_ligand\n")
+
+    async def run():
+        async with create_client(api) as foldify:
+            return await foldify.submit("AlphaFold3", {"name": "af3"}, ccd_path=ccd_path)
+
+    response = asyncio.run(run())
+    assert api.uploads["u1"] == b"data_ligand\n"
+    assert json.loads(response["data"]) == {"name": "af3", "userCCDUploadId": "u1"}
+    assert hashlib.sha256(api.uploads["u1"]).hexdigest() == hashlib.sha256(ccd_path.read_bytes()).hexdigest()
+
+
+def test_run_batch_resumes(tmp_path):
+    """
+    Test that a batch is submitted, polled and downloaded, and an interrupted submission is resumed.
+    A job counts as failed once it is reported failed at FAILED_POLLS polls in a row, and is polled again on resume.
+    """
+    api = FakeAPI()
+    manifest_path = tmp_path / "batch.json"
+    manifest = BatchManifest.open(manifest_path)
+    for name in ["first", "second", "third"]:
+        manifest.add("ESMFold", {"jobName": name})
+    # The first job was sent by an interrupted run
+    manifest.jobs["first"]["state"] = SUBMITTING
+    api.jobs["first"] = "Running"
+
+    async def run():
+        async with create_client(api) as foldify:
+            task = asyncio.create_task(run_batch(foldify, manifest, download_dir=tmp_path / "results", poll_interval=0.01))
+            await asyncio.sleep(0.05)
+            api.transient_failures["second"] = FAILED_POLLS - 1
+            api.jobs.update({"first": "Success", "second": "Success", "third": "Failed"})
+            return await task
+
+    assert asyncio.run(run()) == {"downloaded": 2, "failed": 1}
+    assert (tmp_path / "results" / "second.zip").read_bytes() == b"zip:second"
+
+    saved = BatchManifest.open(manifest_path)
+    assert saved.jobs["first"]["state"] == "downloaded" and saved.jobs["third"]["error"] == "The job failed."
+
+    # The failed job was resubmitted by the API since
+    api.jobs["third"] = "Success"
+
+    async def resume():
+        async with create_client(api) as foldify:
+            return await run_batch(foldify, saved, download_dir=tmp_path / "results", poll_interval=0.01)
+
+    assert asyncio.run(resume()) == {"downloaded": 3}
+    assert (tmp_path / "results" / "third.zip").read_bytes() == b"zip:third"